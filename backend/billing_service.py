@@ -0,0 +1,197 @@
+"""
+Faturamento Mensal - Billing Service
+Generates the monthly payment of every active contract with one aggregation
+and one bulk insert, relying on a unique (contract_id, period) index for
+idempotency. Billing refuses to run while that index is missing, e.g. because
+legacy duplicates kept it from being created; the duplicates are reported.
+"""
+
+import calendar
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAYMENT_DAY = 10
+DUPLICATE_KEY_ERROR = 11000
+UNIQUE_INDEX_NAME = "contract_period_unique"
+DUPLICATE_SAMPLE_SIZE = 10
+
+
+def current_period(now: Optional[datetime] = None) -> str:
+    """Billing period key (YYYY-MM) for a moment in time"""
+    now = now or datetime.now(timezone.utc)
+    return f"{now.year}-{now.month:02d}"
+
+
+def parse_period(period: str) -> tuple:
+    """Validate a YYYY-MM period string and return (year, month)"""
+    try:
+        year, month = (int(part) for part in period.split("-"))
+    except (AttributeError, ValueError):
+        raise ValueError("Período inválido. Use o formato AAAA-MM")
+    if not 1 <= month <= 12:
+        raise ValueError("Período inválido. Use o formato AAAA-MM")
+    return year, month
+
+
+def due_date_for(year: int, month: int, payment_day: Optional[int]) -> datetime:
+    """Due date in the period, clamping days like 31 to the last day of short months"""
+    last_day = calendar.monthrange(year, month)[1]
+    day = min(max(int(payment_day or DEFAULT_PAYMENT_DAY), 1), last_day)
+    return datetime(year, month, day, tzinfo=timezone.utc)
+
+
+class BillingService:
+    """Set-based monthly billing over contracts and payments"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def ensure_indexes(self):
+        """Backfill `period` on legacy payments and enforce one payment per contract/period"""
+        await self.db.payments.update_many(
+            {"period": {"$exists": False}, "due_date": {"$type": "date"}},
+            [{"$set": {"period": {"$dateToString": {"format": "%Y-%m", "date": "$due_date"}}}}]
+        )
+        await self.db.payments.update_many(
+            {"period": {"$exists": False}, "due_date": {"$type": "string"}},
+            [{"$set": {"period": {"$substrCP": ["$due_date", 0, 7]}}}]
+        )
+        duplicates = await self.find_duplicate_periods()
+        if duplicates:
+            raise RuntimeError(self._duplicates_message(duplicates))
+        await self.db.payments.create_index(
+            [("contract_id", 1), ("period", 1)],
+            unique=True,
+            partialFilterExpression={"period": {"$exists": True}},
+            name=UNIQUE_INDEX_NAME
+        )
+        await self.db.counters.create_index("id", unique=True)
+        await self.db.contracts.create_index([("status", 1)])
+
+    async def find_duplicate_periods(self, limit: int = DUPLICATE_SAMPLE_SIZE) -> List[Dict]:
+        """Contracts billed more than once in a period, which block the unique index"""
+        return await self.db.payments.aggregate([
+            {"$match": {"period": {"$exists": True}}},
+            {"$group": {
+                "_id": {"contract_id": "$contract_id", "period": "$period"},
+                "count": {"$sum": 1},
+                "payment_ids": {"$push": "$id"}
+            }},
+            {"$match": {"count": {"$gt": 1}}},
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0,
+                "contract_id": "$_id.contract_id",
+                "period": "$_id.period",
+                "count": 1,
+                "payment_ids": 1
+            }}
+        ], allowDiskUse=True).to_list(limit)
+
+    @staticmethod
+    def _duplicates_message(duplicates: List[Dict]) -> str:
+        sample = ", ".join(f"{d['contract_id']}/{d['period']} ({d['count']}x)" for d in duplicates)
+        return f"Pagamentos duplicados por contrato/período impedem o índice único: {sample}"
+
+    async def _require_unique_index(self):
+        """Create the idempotency indexes if they are missing; raise when they cannot be"""
+        payments = await self.db.payments.index_information()
+        counters = await self.db.counters.index_information()
+        if payments.get(UNIQUE_INDEX_NAME, {}).get("unique") and any(
+            index.get("unique") and index["key"] == [("id", 1)] for index in counters.values()
+        ):
+            return
+        try:
+            await self.ensure_indexes()
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Índice único de cobranças indisponível, faturamento bloqueado: {e}")
+
+    async def _contracts_without_payment(self, period: str) -> List[Dict]:
+        pipeline = [
+            {"$match": {"status": "active"}},
+            {"$project": {"_id": 0, "id": 1, "customer_id": 1, "monthly_value": 1, "payment_day": 1}},
+            {"$lookup": {
+                "from": "payments",
+                "localField": "id",
+                "foreignField": "contract_id",
+                "pipeline": [
+                    {"$match": {"period": period}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 1}}
+                ],
+                "as": "existing"
+            }},
+            {"$match": {"existing": {"$size": 0}}},
+            {"$project": {"existing": 0}}
+        ]
+        return await self.db.contracts.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+    async def _reserve_invoice_numbers(self, period: str, count: int) -> int:
+        """Atomically reserve `count` sequential invoice numbers, returning the first"""
+        counter = await self.db.counters.find_one_and_update(
+            {"id": f"invoice-{period}"},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"] - count + 1
+
+    async def generate_monthly_payments(self, period: Optional[str] = None) -> Dict:
+        """Create the payment for `period` of every active contract that lacks one"""
+        now = datetime.now(timezone.utc)
+        period = period or current_period(now)
+        year, month = parse_period(period)
+        await self._require_unique_index()
+
+        contracts = await self._contracts_without_payment(period)
+        if not contracts:
+            return {"period": period, "generated": 0, "duplicates": 0}
+
+        first_number = await self._reserve_invoice_numbers(period, len(contracts))
+        invoice_prefix = f"INV-{year}{month:02d}"
+
+        docs = []
+        for offset, contract in enumerate(contracts):
+            docs.append({
+                "id": str(uuid.uuid4()),
+                "customer_id": contract["customer_id"],
+                "contract_id": contract["id"],
+                "invoice_number": f"{invoice_prefix}-{first_number + offset:04d}",
+                "amount": contract["monthly_value"],
+                "due_date": due_date_for(year, month, contract.get("payment_day")),
+                "period": period,
+                "paid_at": None,
+                "payment_method": None,
+                "status": "pending",
+                "pix_key": None,
+                "pix_qrcode": None,
+                "reminder_sent": False,
+                "overdue_notice_sent": False,
+                "suspension_notice_sent": False,
+                "created_at": now
+            })
+
+        generated = len(docs)
+        duplicates = 0
+        try:
+            await self.db.payments.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent run may have billed some contracts in between;
+            # the unique index rejects those and everything else is kept
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            generated = e.details.get("nInserted", 0)
+            duplicates = len(errors)
+
+        logger.info(f"Billing {period}: {generated} payments generated, {duplicates} duplicates skipped")
+        return {"period": period, "generated": generated, "duplicates": duplicates}
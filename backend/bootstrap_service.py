@@ -0,0 +1,49 @@
+"""
+Bootstrap - Storefront Shell Payload
+Everything the storefront shell needs on first paint (settings, menus, banners
+and featured reviews) as one JSON document. The payload is built from the
+settings registry, encoded and gzipped once per registry change, and served
+with an ETag so repeat visits cost a single 304.
+"""
+
+import json
+from typing import Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from cached_document import CachedDocument
+
+# Payload key -> settings registry entry
+BOOTSTRAP_SECTIONS = {
+    "site": "site_settings",
+    "navbar": "navbar_settings",
+    "footer": "footer_settings",
+    "theme": "theme_settings",
+    "tracking": "tracking_settings",
+    "homepage": "homepage_settings",
+    "menus": "menus",
+    "banners": "banners",
+    "featured_reviews": "featured_reviews"
+}
+
+
+class BootstrapService:
+    """Rebuilds the bootstrap payload only when a registry entry was reloaded"""
+
+    def __init__(self, settings_registry):
+        self.settings_registry = settings_registry
+        self._payload: Optional[CachedDocument] = None
+        self._generation: Optional[int] = None
+
+    async def get_payload(self) -> CachedDocument:
+        if self._payload is None or self._generation != self.settings_registry.generation:
+            self._payload, self._generation = await self._build()
+        return self._payload
+
+    async def _build(self) -> Tuple[CachedDocument, int]:
+        # Read the generation first: a reload during the build forces another one next time
+        generation = self.settings_registry.generation
+        values = await self.settings_registry.values(list(BOOTSTRAP_SECTIONS.values()))
+        document: Dict = {key: values[name] for key, name in BOOTSTRAP_SECTIONS.items()}
+        body = json.dumps(jsonable_encoder(document), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return CachedDocument("application/json", body), generation
@@ -0,0 +1,71 @@
+"""
+Documentos em Cache - Pre-encoded Response Bodies
+Bodies served many times between changes (bootstrap payload, sitemaps, JSON-LD,
+llms.txt) are encoded once and kept with their gzip form and an ETag.
+cached_response answers a request with a 304, the gzip bytes or the plain
+bytes, following If-None-Match and the Accept-Encoding q-values.
+"""
+
+import gzip
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+GZIP_LEVEL = 6
+
+
+class CachedDocument:
+    """Encoded document, its gzip form and ETag; built from the plain or the gzipped bytes"""
+
+    def __init__(self, media_type: str, body: Optional[bytes] = None, gzipped: Optional[bytes] = None,
+                 digest: Optional[str] = None):
+        if body is None and gzipped is None:
+            raise ValueError("CachedDocument needs body or gzipped")
+        self.media_type = media_type
+        self._body = body
+        self.gzipped = gzipped if gzipped is not None else gzip.compress(body, compresslevel=GZIP_LEVEL)
+        self.etag = f'"{(digest or hashlib.sha256(self.body).hexdigest())[:32]}"'
+
+    @property
+    def body(self) -> bytes:
+        # Documents kept only compressed (sitemaps) are inflated for the rare client without gzip
+        return self._body if self._body is not None else gzip.decompress(self.gzipped)
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True when gzip (or `*`) is listed with a q-value above 0; "gzip;q=0" refuses it"""
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            qualities[coding.strip().lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def cached_response(request: Request, document: CachedDocument, cache_control: str) -> Response:
+    """304 when the client has the current ETag, else the gzip or plain bytes"""
+    headers = {"ETag": document.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if document.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=document.gzipped, media_type=document.media_type, headers=headers)
+    return Response(content=document.body, media_type=document.media_type, headers=headers)
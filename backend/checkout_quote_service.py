@@ -0,0 +1,201 @@
+"""
+Cotação do Checkout - One-Round-Trip Checkout Quote
+Cart, coupon and shipping for the checkout in one call: the cart (joined with
+its products' weights in the same aggregation), the cached coupon and the
+shipping settings are read concurrently, then the local and Melhor Envio shipping
+quotes run concurrently. The totals are returned with a signed, short-lived
+quote token; create_order accepts the token and takes the totals from it
+instead of recomputing them, as long as the cart has not changed.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from jose import ExpiredSignatureError, JWTError, jwt
+
+from coupon_service import evaluate_coupon
+
+logger = logging.getLogger(__name__)
+
+QUOTE_TTL = timedelta(minutes=15)
+TOKEN_TYPE = "checkout_quote"
+# Per-unit weight (kg) for products without one, as /shipping/calculate assumes
+DEFAULT_WEIGHT = 1.0
+MELHOR_ENVIO_PREFIX = "me-"
+
+
+def cart_digest(items: List[Dict]) -> str:
+    """Identity of the cart contents the quote was computed for"""
+    lines = sorted((item['product_id'], item['quantity'], item['price']) for item in items)
+    return hashlib.sha256(json.dumps(lines).encode()).hexdigest()
+
+
+class CheckoutQuoteService:
+    """Concurrent checkout quote plus signing/verification of the quote token"""
+
+    def __init__(self, db, settings_registry, coupons, rate_engine, melhor_envio, secret: str,
+                 algorithm: str = "HS256"):
+        self.db = db
+        self.settings_registry = settings_registry
+        self.coupons = coupons
+        self.rate_engine = rate_engine
+        self.melhor_envio = melhor_envio
+        self.secret = secret
+        self.algorithm = algorithm
+
+    # ---------- lookups ----------
+
+    async def _cart(self, session_id: str) -> Optional[Dict]:
+        rows = await self.db.carts.aggregate([
+            {"$match": {"session_id": session_id}},
+            {"$limit": 1},
+            {"$lookup": {
+                "from": "products",
+                "localField": "items.product_id",
+                "foreignField": "id",
+                "as": "products"
+            }},
+            {"$project": {
+                "_id": 0,
+                "items": 1,
+                "products.id": 1,
+                "products.name": 1,
+                "products.weight": 1,
+                "products.dimensions": 1
+            }}
+        ]).to_list(1)
+        return rows[0] if rows else None
+
+    async def _flat_rates(self) -> List[Dict]:
+        """Active fixed/free rates; they apply to every CEP"""
+        rates = await self.settings_registry.get("shipping_rates")
+        return [
+            {
+                "id": rate["id"],
+                "name": rate["name"],
+                "price": 0.0 if rate.get("type") == "free" else float(rate.get("price", 0)),
+                "min_days": rate.get("min_days", 0),
+                "max_days": rate.get("max_days", 0)
+            }
+            for rate in rates if rate.get("type") != "cep"
+        ]
+
+    async def _melhor_envio(self, settings: Dict, cep: str, packages: List[Dict]) -> List[Dict]:
+        if not settings.get('melhor_envio_enabled'):
+            return []
+        try:
+            quote = await self.melhor_envio.quote(settings, cep, packages)
+        except Exception as e:
+            logger.warning(f"Checkout quote without Melhor Envio options: {e}")
+            return []
+        if quote.get("source") == "fallback":
+            # The fallback is the local rate table, whose rates the engine quote already lists
+            return []
+        return [
+            {
+                "id": f"{MELHOR_ENVIO_PREFIX}{option['id']}",
+                "name": f"{option.get('company', '')} {option['name']}".strip(),
+                "price": option["price"],
+                "min_days": option.get("delivery_time", 0),
+                "max_days": option.get("delivery_time", 0)
+            }
+            for option in quote["options"] if not option.get("fallback_reason")
+        ]
+
+    # ---------- quote ----------
+
+    async def quote(self, session_id: str, cep: str, shipping_method: Optional[str] = None,
+                    coupon_code: Optional[str] = None) -> Dict:
+        """Totals for the session's cart; ValueError for an empty cart or an invalid CEP"""
+        cart, coupon, settings, flat_rates = await asyncio.gather(
+            self._cart(session_id),
+            self.coupons.get(coupon_code),
+            self.settings_registry.get("shipping_settings"),
+            self._flat_rates()
+        )
+        if not cart or not cart.get('items'):
+            raise ValueError("Cart is empty")
+
+        items = cart['items']
+        products = {product['id']: product for product in cart.get('products', [])}
+        subtotal = round(sum(item['price'] * item['quantity'] for item in items), 2)
+        weight = sum(
+            (products.get(item['product_id'], {}).get('weight') or DEFAULT_WEIGHT) * item['quantity']
+            for item in items
+        )
+        packages = []
+        for item in items:
+            product = products.get(item['product_id'], {})
+            dimensions = product.get('dimensions') or {}
+            packages.append({
+                "id": item['product_id'],
+                "name": product.get('name', 'Product'),
+                "quantity": item['quantity'],
+                "price": item['price'],
+                "weight": product.get('weight') or DEFAULT_WEIGHT,
+                **{key: dimensions[key] for key in ("width", "height", "length") if dimensions.get(key)}
+            })
+
+        local, melhor_envio = await asyncio.gather(
+            self.rate_engine.quote(cep, weight),
+            self._melhor_envio(settings or {}, cep, packages)
+        )
+        options = sorted(local["rates"] + flat_rates + melhor_envio, key=lambda option: option["price"])
+
+        result = {
+            "items": items,
+            "subtotal": subtotal,
+            "weight": round(weight, 3),
+            "shipping_options": options,
+            "discount": 0.0,
+            "coupon_code": None
+        }
+        if coupon_code:
+            try:
+                discount = evaluate_coupon(coupon, subtotal)
+                result["discount"] = round(min(discount, subtotal), 2)
+                result["coupon_code"] = coupon['code']
+            except (LookupError, ValueError) as e:
+                result["coupon_error"] = str(e)
+
+        selected = next((option for option in options if option["id"] == shipping_method), None)
+        if shipping_method and selected is None:
+            result["shipping_error"] = "Forma de envio indisponível para este CEP"
+        result["shipping_method"] = selected["id"] if selected else None
+        result["shipping_cost"] = selected["price"] if selected else 0.0
+        result["total"] = round(result["subtotal"] - result["discount"] + result["shipping_cost"], 2)
+
+        if selected:
+            expires_at = datetime.now(timezone.utc) + QUOTE_TTL
+            result["expires_at"] = expires_at.isoformat()
+            result["quote_token"] = jwt.encode({
+                "typ": TOKEN_TYPE,
+                "sid": session_id,
+                "cart": cart_digest(items),
+                "subtotal": result["subtotal"],
+                "discount": result["discount"],
+                "coupon": result["coupon_code"],
+                "shipping_method": selected["id"],
+                "shipping_cost": selected["price"],
+                "total": result["total"],
+                "exp": expires_at
+            }, self.secret, algorithm=self.algorithm)
+        return result
+
+    def verify(self, token: str, session_id: Optional[str], items: List[Dict]) -> Dict:
+        """Claims of a quote token issued for this session and these cart items"""
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        except ExpiredSignatureError:
+            raise ValueError("Cotação expirada, refaça a cotação")
+        except JWTError:
+            raise ValueError("Cotação inválida")
+        if claims.get("typ") != TOKEN_TYPE or claims.get("sid") != session_id:
+            raise ValueError("Cotação inválida")
+        if claims.get("cart") != cart_digest(items):
+            raise ValueError("O carrinho mudou desde a cotação, refaça a cotação")
+        return claims
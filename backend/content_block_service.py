@@ -0,0 +1,111 @@
+"""
+Blocos de Conteúdo - Bulk Content Block Editing
+Applies a full block ordering and/or a set of block patches for one page with
+a single bulk_write. Every page has a block version in
+db.content_block_versions; a bulk edit names the version it was based on and
+is rejected when another edit got there first.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from date_codec import decode_dates
+
+# Fields a patch may not change
+PROTECTED_FIELDS = {"_id", "id", "page_id", "created_at"}
+MAX_BULK_OPERATIONS = 500
+
+
+class ContentBlockService:
+    """Optimistic-concurrency bulk edits of a page's content blocks"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def ensure_indexes(self):
+        await self.db.content_block_versions.create_index("page_id", unique=True)
+        await self.db.content_blocks.create_index([("id", 1), ("page_id", 1)])
+
+    async def get_version(self, page_id: str) -> int:
+        state = await self.db.content_block_versions.find_one({"page_id": page_id}, {"_id": 0, "version": 1})
+        return state["version"] if state else 0
+
+    async def bump(self, page_id: str) -> int:
+        """Record a change made outside bulk_update (single-block handlers)"""
+        state = await self.db.content_block_versions.find_one_and_update(
+            {"page_id": page_id},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return state["version"]
+
+    async def _claim(self, page_id: str, expected_version: int) -> bool:
+        """Move the page from `expected_version` to the next one, or fail if it moved on"""
+        try:
+            state = await self.db.content_block_versions.find_one_and_update(
+                {"page_id": page_id, "version": expected_version},
+                {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+                # A page that was never edited starts at version 0
+                upsert=expected_version == 0,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return False
+        return state is not None
+
+    @staticmethod
+    def _operations(page_id: str, order: Optional[List[str]], patches: Optional[List[Dict]]) -> List[UpdateOne]:
+        now = datetime.now(timezone.utc)
+        updates: Dict[str, Dict] = {}
+
+        for patch in patches or []:
+            if not isinstance(patch, dict) or not patch.get("id"):
+                raise ValueError("Cada patch precisa de um id")
+            fields = {k: v for k, v in patch.items() if k not in PROTECTED_FIELDS}
+            if not fields:
+                raise ValueError(f"Patch sem campos para o bloco {patch['id']}")
+            updates.setdefault(patch["id"], {}).update(decode_dates(fields, "content_blocks"))
+
+        if order is not None:
+            if len(set(order)) != len(order):
+                raise ValueError("Ordem com blocos repetidos")
+            for position, block_id in enumerate(order):
+                updates.setdefault(block_id, {})["order"] = position
+
+        if not updates:
+            raise ValueError("Nenhuma alteração enviada")
+        if len(updates) > MAX_BULK_OPERATIONS:
+            raise ValueError(f"Máximo de {MAX_BULK_OPERATIONS} blocos por requisição")
+
+        return [
+            UpdateOne({"id": block_id, "page_id": page_id}, {"$set": {**fields, "updated_at": now}})
+            for block_id, fields in updates.items()
+        ]
+
+    async def bulk_update(
+        self,
+        page_id: str,
+        expected_version: int,
+        order: Optional[List[str]] = None,
+        patches: Optional[List[Dict]] = None
+    ) -> Dict:
+        """Apply `order` (block ids, first to last) and `patches` in one bulk_write.
+
+        Raises ValueError for a malformed request and RuntimeError when the
+        page's block version is no longer `expected_version`.
+        """
+        operations = self._operations(page_id, order, patches)
+
+        if not await self._claim(page_id, expected_version):
+            raise RuntimeError("Os blocos desta página foram alterados por outra edição")
+
+        result = await self.db.content_blocks.bulk_write(operations, ordered=False)
+        return {
+            "version": expected_version + 1,
+            "updated": result.matched_count,
+            "not_found": len(operations) - result.matched_count
+        }
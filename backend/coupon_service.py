@@ -0,0 +1,137 @@
+"""
+Cupons - Coupon Service
+Active coupons are served from the settings registry (a cached collection
+entry keyed by code, reloaded on every worker when an admin endpoint changes a
+coupon). Redemption at order time is one conditional find_one_and_update:
+the $inc only matches while the coupon is active, unexpired and below
+max_uses, so concurrent orders can never redeem more than max_uses.
+Codes are unique: legacy duplicates are renamed and deactivated before the
+unique index is built, keeping the active, oldest coupon of each code.
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+
+from date_codec import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_ENTRY = "coupons"
+
+
+def normalize_code(code: Optional[str]) -> str:
+    return (code or "").strip().upper()
+
+
+def evaluate_coupon(coupon: Optional[Dict], subtotal: float) -> float:
+    """Discount of `coupon` on `subtotal`; LookupError when missing, ValueError when it does not apply"""
+    if not coupon:
+        raise LookupError("Cupom inválido")
+    if coupon.get('expires_at'):
+        if parse_datetime(coupon['expires_at']) < datetime.now(timezone.utc):
+            raise ValueError("Cupom expirado")
+    if coupon.get('max_uses') and coupon.get('uses_count', 0) >= coupon['max_uses']:
+        raise ValueError("Cupom já foi totalmente utilizado")
+    if subtotal < coupon.get('min_purchase', 0):
+        raise ValueError(f"Compra mínima de R$ {coupon['min_purchase']:.2f}")
+    if coupon['discount_type'] == 'percentage':
+        return subtotal * (coupon['discount_value'] / 100)
+    return coupon['discount_value']
+
+
+class CouponService:
+    """Cached coupon lookups and atomic redemption"""
+
+    def __init__(self, db, settings_registry):
+        self.db = db
+        self.settings_registry = settings_registry
+
+    async def ensure_indexes(self):
+        await self.dedupe_codes()
+        await self.db.coupons.create_index("code", unique=True)
+        await self.db.coupons.create_index("id", unique=True)
+
+    async def dedupe_codes(self) -> int:
+        """Rename and deactivate all but one coupon per duplicated code; returns how many"""
+        groups = await self.db.coupons.aggregate([
+            {"$sort": {"active": -1, "created_at": 1}},
+            {"$group": {"_id": "$code", "ids": {"$push": "$id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ], allowDiskUse=True).to_list(None)
+
+        renamed = 0
+        for group in groups:
+            code, (kept, *others) = group["_id"], group["ids"]
+            for coupon_id in others:
+                new_code = f"{code}-{coupon_id[:8].upper()}"
+                await self.db.coupons.update_one(
+                    {"id": coupon_id},
+                    {"$set": {"code": new_code, "active": False, "duplicate_of": kept}}
+                )
+                logger.warning(f"Duplicate coupon {code} ({coupon_id}) renamed to {new_code} and deactivated")
+                renamed += 1
+        if renamed:
+            await self.invalidate()
+        return renamed
+
+    def invalidate(self):
+        return self.settings_registry.invalidate(REGISTRY_ENTRY)
+
+    async def get(self, code: Optional[str]) -> Optional[Dict]:
+        """Active coupon by code, from the cache (uses_count may lag behind redemptions)"""
+        code = normalize_code(code)
+        if not code:
+            return None
+        coupons = await self.settings_registry.values([REGISTRY_ENTRY])
+        coupon = coupons[REGISTRY_ENTRY].get(code)
+        return dict(coupon) if coupon else None
+
+    async def evaluate(self, code: Optional[str], subtotal: float) -> Dict:
+        """{code, discount}; LookupError / ValueError as in evaluate_coupon"""
+        coupon = await self.get(code)
+        discount = evaluate_coupon(coupon, subtotal)
+        return {"code": coupon['code'], "discount": discount}
+
+    async def redeem(self, code: str) -> Dict:
+        """Take one use of `code` and return the coupon; LookupError when unknown, ValueError when used up or expired"""
+        code = normalize_code(code)
+        now = datetime.now(timezone.utc)
+        coupon = await self.db.coupons.find_one_and_update(
+            {
+                "code": code,
+                "active": True,
+                "$and": [
+                    {"$or": [{"expires_at": None}, {"expires_at": {"$gt": now}}]},
+                    {"$or": [
+                        # max_uses unset or 0 means unlimited, as before
+                        {"max_uses": {"$in": [None, 0]}},
+                        {"$expr": {"$lt": [{"$ifNull": ["$uses_count", 0]}, "$max_uses"]}}
+                    ]}
+                ]
+            },
+            {"$inc": {"uses_count": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        if coupon is None:
+            current = await self.db.coupons.find_one({"code": code, "active": True}, {"_id": 0})
+            # Raises with the reason; anything else means the last use went to another order
+            evaluate_coupon(current, float("inf"))
+            raise ValueError("Cupom já foi totalmente utilizado")
+        coupon['uses_count'] = coupon.get('uses_count', 0) + 1
+        if coupon.get('max_uses') and coupon['uses_count'] >= coupon['max_uses']:
+            # Last use taken: stop offering the coupon from the cache
+            await self.invalidate()
+        return coupon
+
+    async def release(self, code: str):
+        """Give back a use taken by `redeem` (the order could not be saved)"""
+        result = await self.db.coupons.update_one(
+            {"code": normalize_code(code), "uses_count": {"$gt": 0}},
+            {"$inc": {"uses_count": -1}}
+        )
+        if result.modified_count:
+            await self.invalidate()
@@ -0,0 +1,196 @@
+"""
+Filas do CRM - Ticket and Payment Queues
+Keyset-paginated list views for maintenance tickets (by priority then age) and
+payments (by due date, with date-range filters). Each page is an index-bounded
+range scan that resumes from an opaque cursor holding the last row's sort key,
+so page N costs the same as page 1 and rows inserted meanwhile never shift or
+repeat results.
+"""
+
+import base64
+import json
+from typing import Dict, List, Optional
+
+from date_codec import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Most urgent first; each priority is one equality range of the ticket index
+TICKET_PRIORITIES = ["urgent", "high", "medium", "low"]
+OPEN_TICKET_STATUSES = ["open", "in_progress"]
+TICKET_SORTS = ["priority", "age", "newest"]
+
+PAYMENT_STATUSES = ["pending", "overdue", "paid", "cancelled"]
+
+# `id` closes every index so ties on the timestamp still have a total order
+TICKET_INDEXES = [
+    [("status", 1), ("priority", 1), ("created_at", 1), ("id", 1)],
+    [("status", 1), ("created_at", 1), ("id", 1)]
+]
+PAYMENT_INDEXES = [
+    [("status", 1), ("due_date", 1), ("id", 1)]
+]
+
+TICKET_LIST_PROJECTION = {
+    "_id": 0, "id": 1, "ticket_number": 1, "customer_id": 1, "equipment_id": 1, "title": 1,
+    "description": 1, "priority": 1, "status": 1, "assigned_to": 1, "created_at": 1
+}
+PAYMENT_LIST_PROJECTION = {
+    "_id": 0, "id": 1, "invoice_number": 1, "customer_id": 1, "contract_id": 1, "amount": 1,
+    "due_date": 1, "paid_at": 1, "payment_method": 1, "status": 1, "period": 1, "pix_key": 1
+}
+
+
+def encode_cursor(values: Dict) -> str:
+    raw = json.dumps(values, default=lambda v: v.isoformat(), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, fields: List[str]) -> Dict:
+    """Opaque cursor -> dict with `fields`; raises ValueError when malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, dict) or any(f not in values for f in fields):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+    return values
+
+
+def _after(field: str, value, last_id: str, descending: bool = False) -> Dict:
+    """Rows strictly after (value, last_id) in (field, id) order"""
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "id": {op: last_id}}
+    ]}
+
+
+def _status_filter(status: Optional[str], default: List[str]):
+    statuses = [s for s in status.split(",") if s] if status else default
+    return statuses[0] if len(statuses) == 1 else {"$in": statuses}
+
+
+def _page_size(limit: int) -> int:
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+class CRMQueueService:
+    """Keyset pagination over tickets and payments"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def ensure_indexes(self):
+        for keys in TICKET_INDEXES:
+            await self.db.tickets.create_index(keys)
+        for keys in PAYMENT_INDEXES:
+            await self.db.payments.create_index(keys)
+
+    # ---------- tickets ----------
+
+    async def ticket_queue(
+        self,
+        status: Optional[str] = None,
+        priority: Optional[str] = None,
+        sort: str = "priority",
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE
+    ) -> Dict:
+        """Tickets by priority then oldest first (`priority`), oldest first (`age`) or newest first"""
+        if sort not in TICKET_SORTS:
+            raise ValueError(f"Ordenação inválida: {sort}")
+        priorities = [p for p in priority.split(",") if p] if priority else TICKET_PRIORITIES
+        if any(p not in TICKET_PRIORITIES for p in priorities):
+            raise ValueError(f"Prioridade inválida: {priority}")
+
+        limit = _page_size(limit)
+        base = {"status": _status_filter(status, OPEN_TICKET_STATUSES)}
+        after = decode_cursor(cursor, ["t", "i"]) if cursor else None
+
+        if sort == "priority":
+            items = await self._tickets_by_priority(base, priorities, after, limit + 1)
+        else:
+            descending = sort == "newest"
+            query = dict(base, priority=priorities[0] if len(priorities) == 1 else {"$in": priorities})
+            if after:
+                query.update(_after("created_at", parse_datetime(after["t"]), after["i"], descending))
+            direction = -1 if descending else 1
+            items = await self.db.tickets.find(query, TICKET_LIST_PROJECTION) \
+                .sort([("created_at", direction), ("id", direction)]).limit(limit + 1).to_list(limit + 1)
+
+        return self._page(items, limit, lambda t: {"p": t.get("priority"), "t": t["created_at"], "i": t["id"]})
+
+    async def _tickets_by_priority(self, base: Dict, priorities: List[str], after: Optional[Dict], wanted: int) -> List[Dict]:
+        # One (status, priority, created_at, id) range scan per priority, most urgent first
+        ordered = [p for p in TICKET_PRIORITIES if p in priorities]
+        if after:
+            if after.get("p") not in ordered:
+                raise ValueError("Cursor inválido")
+            ordered = ordered[ordered.index(after["p"]):]
+
+        items = []
+        for p in ordered:
+            query = dict(base, priority=p)
+            if after and p == after["p"]:
+                query.update(_after("created_at", parse_datetime(after["t"]), after["i"]))
+            remaining = wanted - len(items)
+            items += await self.db.tickets.find(query, TICKET_LIST_PROJECTION) \
+                .sort([("created_at", 1), ("id", 1)]).limit(remaining).to_list(remaining)
+            if len(items) >= wanted:
+                break
+        return items
+
+    # ---------- payments ----------
+
+    async def payment_queue(
+        self,
+        status: Optional[str] = None,
+        due_from: Optional[str] = None,
+        due_to: Optional[str] = None,
+        customer_id: Optional[str] = None,
+        order: str = "asc",
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE
+    ) -> Dict:
+        """Payments by due date, optionally within [due_from, due_to)"""
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Ordenação inválida: {order}")
+
+        limit = _page_size(limit)
+        query = {"status": _status_filter(status, PAYMENT_STATUSES)}
+        if customer_id:
+            query["customer_id"] = customer_id
+
+        date_range = {}
+        for op, text in (("$gte", due_from), ("$lt", due_to)):
+            if text:
+                value = parse_datetime(text)
+                if value is None:
+                    raise ValueError(f"Data inválida: {text}")
+                date_range[op] = value
+        if date_range:
+            query["due_date"] = date_range
+
+        descending = order == "desc"
+        if cursor:
+            after = decode_cursor(cursor, ["t", "i"])
+            query = {"$and": [query, _after("due_date", parse_datetime(after["t"]), after["i"], descending)]}
+
+        direction = -1 if descending else 1
+        items = await self.db.payments.find(query, PAYMENT_LIST_PROJECTION) \
+            .sort([("due_date", direction), ("id", direction)]).limit(limit + 1).to_list(limit + 1)
+
+        return self._page(items, limit, lambda p: {"t": p["due_date"], "i": p["id"]})
+
+    @staticmethod
+    def _page(items: List[Dict], limit: int, key) -> Dict:
+        has_more = len(items) > limit
+        items = items[:limit]
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(key(items[-1])) if has_more else None,
+            "has_more": has_more
+        }
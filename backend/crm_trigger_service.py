@@ -0,0 +1,207 @@
+"""
+Gatilhos CRM - Notification Trigger Service
+Batch engine behind the payment reminder, overdue notice and suspension
+warning triggers: one aggregation joins payments with customers, messages are
+rendered in memory and the results are written with bulk operations.
+"""
+
+import logging
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List
+
+from pymongo.errors import BulkWriteError
+
+from date_codec import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+DEFAULT_CHUNK_SIZE = 1000
+
+# Trigger definitions. `window` selects payments due exactly `days` ahead
+# ("due_in") or more than `days` late ("overdue_by"); `updates` is applied to
+# every notified payment and `suspend_customer` also suspends the customer.
+TRIGGERS = {
+    "payment_reminder": {
+        "notification_type": "payment_reminder",
+        "days_setting": "payment_reminder_days",
+        "default_days": 1,
+        "window": "due_in",
+        "status": "pending",
+        "flag": "reminder_sent",
+        "updates": {"reminder_sent": True},
+        "suspend_customer": False
+    },
+    "overdue_notice": {
+        "notification_type": "overdue",
+        "days_setting": "overdue_notice_days",
+        "default_days": 3,
+        "window": "overdue_by",
+        "status": "pending",
+        "flag": "overdue_notice_sent",
+        "updates": {"overdue_notice_sent": True, "status": "overdue"},
+        "suspend_customer": False
+    },
+    "suspension_warning": {
+        "notification_type": "suspension",
+        "days_setting": "suspension_warning_days",
+        "default_days": 10,
+        "window": "overdue_by",
+        "status": "overdue",
+        "flag": "suspension_notice_sent",
+        "updates": {"suspension_notice_sent": True},
+        "suspend_customer": True
+    }
+}
+
+
+class _TemplateValues(dict):
+    """Leaves unknown placeholders untouched instead of raising KeyError"""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+class CRMTriggerService:
+    """Runs CRM notification triggers with a constant number of round trips"""
+
+    def __init__(self, db, default_settings: Dict, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.db = db
+        self.default_settings = default_settings
+        self.chunk_size = chunk_size
+
+    async def ensure_indexes(self):
+        # One notification per trigger type and payment, so a rerun after a
+        # partial failure cannot notify the same payment twice
+        await self.db.notifications.create_index(
+            [("type", 1), ("payment_id", 1)],
+            unique=True,
+            partialFilterExpression={"payment_id": {"$exists": True}},
+            name="type_payment_unique"
+        )
+
+    async def get_settings(self) -> Dict:
+        settings = await self.db.crm_settings.find_one({"id": "crm_settings"}, {"_id": 0})
+        return settings or self.default_settings
+
+    def _payment_query(self, trigger: Dict, days: int, now: datetime) -> Dict:
+        query = {"status": trigger["status"], trigger["flag"]: False}
+        if trigger["window"] == "due_in":
+            target = now + timedelta(days=days)
+            start = target.replace(hour=0, minute=0, second=0, microsecond=0)
+            end = target.replace(hour=23, minute=59, second=59, microsecond=999999)
+            query["due_date"] = {"$gte": start, "$lte": end}
+        else:
+            query["due_date"] = {"$lt": now - timedelta(days=days)}
+        return query
+
+    def _pipeline(self, query: Dict) -> List[Dict]:
+        return [
+            {"$match": query},
+            {"$lookup": {
+                "from": "customers",
+                "localField": "customer_id",
+                "foreignField": "id",
+                "as": "customer"
+            }},
+            {"$unwind": "$customer"},
+            {"$project": {
+                "_id": 0,
+                "id": 1,
+                "amount": 1,
+                "due_date": 1,
+                "pix_key": 1,
+                "customer_id": "$customer.id",
+                "customer_name": "$customer.name"
+            }},
+            {"$limit": self.chunk_size}
+        ]
+
+    async def run(self, name: str) -> int:
+        """Run one trigger over every eligible payment and return how many were notified"""
+        if name not in TRIGGERS:
+            raise ValueError(f"Gatilho desconhecido: {name}")
+        trigger = TRIGGERS[name]
+
+        settings = await self.get_settings()
+        days = settings.get("trigger_settings", {}).get(trigger["days_setting"], trigger["default_days"])
+        template = settings.get("whatsapp_templates", {}).get(name) \
+            or self.default_settings["whatsapp_templates"][name]
+
+        now = datetime.now(timezone.utc)
+        query = self._payment_query(trigger, days, now)
+
+        sent = 0
+        while True:
+            rows = await self.db.payments.aggregate(self._pipeline(query)).to_list(self.chunk_size)
+            if not rows:
+                break
+            sent += await self._process_chunk(trigger, template, rows, now)
+            if len(rows) < self.chunk_size:
+                break
+        return sent
+
+    async def _process_chunk(self, trigger: Dict, template: str, rows: List[Dict], now: datetime) -> int:
+        notifications = []
+        for row in rows:
+            due_date = parse_datetime(row.get("due_date"))
+            values = _TemplateValues(
+                customer_name=row.get("customer_name", ""),
+                amount=f"{row['amount']:.2f}",
+                due_date=due_date.strftime("%Y-%m-%d") if due_date else "",
+                pix_key=row.get("pix_key") or "Ver fatura"
+            )
+            notifications.append({
+                "id": str(uuid.uuid4()),
+                "customer_id": row["customer_id"],
+                "payment_id": row["id"],
+                "type": trigger["notification_type"],
+                "channel": "whatsapp",
+                "message": template.format_map(values),
+                "status": "pending",
+                "sent_at": None,
+                "created_at": now
+            })
+
+        try:
+            await self.db.notifications.insert_many(notifications, ordered=False)
+        except BulkWriteError as e:
+            # Already-notified payments are skipped by the unique index
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in e.details.get("writeErrors", [])):
+                raise
+
+        # Re-check the selected state: a payment paid (or handled by another
+        # run) since the aggregation must keep its status and not notify
+        payment_ids = [row["id"] for row in rows]
+        await self.db.payments.update_many(
+            {"id": {"$in": payment_ids}, "status": trigger["status"], trigger["flag"]: False},
+            {"$set": trigger["updates"]}
+        )
+        matched = set(await self.db.payments.distinct("id", {
+            "id": {"$in": payment_ids},
+            "status": trigger["updates"].get("status", trigger["status"]),
+            **{key: value for key, value in trigger["updates"].items() if key != "status"}
+        }))
+
+        skipped = [payment_id for payment_id in payment_ids if payment_id not in matched]
+        if skipped:
+            # Withdraw only this run's notifications; a concurrent run's stay
+            skipped = set(skipped)
+            await self.db.notifications.delete_many({
+                "id": {"$in": [n["id"] for n in notifications if n["payment_id"] in skipped]},
+                "status": "pending"
+            })
+
+        if trigger["suspend_customer"] and matched:
+            customer_ids = list({row["customer_id"] for row in rows if row["id"] in matched})
+            await self.db.customers.update_many(
+                {"id": {"$in": customer_ids}},
+                {"$set": {"status": "suspended"}}
+            )
+
+        logger.info(
+            f"Trigger {trigger['notification_type']}: {len(matched)} payments notified, "
+            f"{len(skipped)} changed since selection"
+        )
+        return len(matched)
@@ -0,0 +1,116 @@
+"""
+Visão do Cliente - Customer 360 Service
+Assembles everything the CRM shows about one customer (contracts, equipment,
+open tickets, payments with balances and notification history) in a single
+aggregation backed by customer_id indexes.
+"""
+
+from typing import Dict, Optional
+
+OPEN_TICKET_STATUSES = ["open", "in_progress"]
+OPEN_PAYMENT_STATUSES = ["pending", "overdue"]
+RECENT_PAYMENTS_LIMIT = 12
+OPEN_TICKETS_LIMIT = 50
+NOTIFICATIONS_LIMIT = 20
+
+CUSTOMER_ID_INDEXES = {
+    "contracts": [("customer_id", 1)],
+    "equipment": [("customer_id", 1)],
+    "tickets": [("customer_id", 1), ("status", 1), ("created_at", -1)],
+    "payments": [("customer_id", 1), ("due_date", -1)],
+    "notifications": [("customer_id", 1), ("created_at", -1)]
+}
+
+
+class CustomerOverviewService:
+    """Customer 360 view built from one $lookup/$facet pipeline"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def ensure_indexes(self):
+        await self.db.customers.create_index([("id", 1)])
+        for collection, keys in CUSTOMER_ID_INDEXES.items():
+            await self.db[collection].create_index(keys)
+
+    @staticmethod
+    def _pipeline(customer_id: str) -> list:
+        def lookup(collection: str, alias: str, pipeline: list) -> Dict:
+            return {"$lookup": {
+                "from": collection,
+                "localField": "id",
+                "foreignField": "customer_id",
+                "pipeline": pipeline,
+                "as": alias
+            }}
+
+        return [
+            {"$match": {"id": customer_id}},
+            {"$limit": 1},
+            {"$project": {"_id": 0}},
+            lookup("contracts", "contracts", [
+                {"$sort": {"start_date": -1}},
+                {"$project": {
+                    "_id": 0, "id": 1, "contract_number": 1, "service_type": 1, "monthly_value": 1,
+                    "start_date": 1, "end_date": 1, "payment_day": 1, "status": 1
+                }}
+            ]),
+            lookup("equipment", "equipment", [
+                {"$project": {
+                    "_id": 0, "id": 1, "contract_id": 1, "equipment_type": 1, "brand": 1, "model": 1,
+                    "serial_number": 1, "status": 1, "location": 1, "warranty_until": 1
+                }}
+            ]),
+            lookup("tickets", "open_tickets", [
+                {"$match": {"status": {"$in": OPEN_TICKET_STATUSES}}},
+                {"$sort": {"created_at": -1}},
+                {"$limit": OPEN_TICKETS_LIMIT},
+                {"$project": {
+                    "_id": 0, "id": 1, "ticket_number": 1, "equipment_id": 1, "title": 1,
+                    "priority": 1, "status": 1, "assigned_to": 1, "created_at": 1
+                }}
+            ]),
+            lookup("payments", "payments", [
+                {"$facet": {
+                    "recent": [
+                        {"$sort": {"due_date": -1}},
+                        {"$limit": RECENT_PAYMENTS_LIMIT},
+                        {"$project": {
+                            "_id": 0, "id": 1, "invoice_number": 1, "amount": 1, "due_date": 1,
+                            "paid_at": 1, "status": 1, "period": 1
+                        }}
+                    ],
+                    "by_status": [
+                        {"$group": {"_id": "$status", "count": {"$sum": 1}, "total": {"$sum": "$amount"}}}
+                    ]
+                }}
+            ]),
+            lookup("notifications", "notifications", [
+                {"$sort": {"created_at": -1}},
+                {"$limit": NOTIFICATIONS_LIMIT},
+                {"$project": {
+                    "_id": 0, "id": 1, "type": 1, "channel": 1, "status": 1, "message": 1,
+                    "created_at": 1, "sent_at": 1
+                }}
+            ]),
+            {"$set": {"payments": {"$first": "$payments"}}}
+        ]
+
+    async def get_overview(self, customer_id: str) -> Optional[Dict]:
+        results = await self.db.customers.aggregate(self._pipeline(customer_id)).to_list(1)
+        if not results:
+            return None
+
+        overview = results[0]
+        payments = overview.pop("payments", None) or {}
+        by_status = {
+            row["_id"]: {"count": row["count"], "total": round(row["total"], 2)}
+            for row in payments.get("by_status", [])
+        }
+        overview["recent_payments"] = payments.get("recent", [])
+        overview["balances"] = {
+            "by_status": by_status,
+            "open_balance": round(sum(by_status.get(s, {}).get("total", 0) for s in OPEN_PAYMENT_STATUSES), 2),
+            "paid_total": by_status.get("paid", {}).get("total", 0)
+        }
+        return overview
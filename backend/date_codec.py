@@ -0,0 +1,60 @@
+"""
+Datas - Date Codec
+Dates are stored as native BSON datetimes and the Mongo client is tz-aware,
+so documents come back with UTC datetimes and handlers no longer convert
+ISO strings by hand. DATE_FIELDS lists the date fields per collection (used by
+the migration of legacy ISO strings and to decode incoming payloads) and
+parse_datetime accepts either form for values that may still be strings.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from bson.codec_options import CodecOptions
+
+# Client-wide codec: BSON dates decode as timezone-aware UTC datetimes
+CODEC_OPTIONS = CodecOptions(tz_aware=True, tzinfo=timezone.utc)
+
+DATE_FIELDS = {
+    "customers": ["created_at"],
+    "contracts": ["start_date", "end_date", "created_at"],
+    "equipment": ["installation_date", "warranty_until"],
+    "tickets": ["created_at", "updated_at", "resolved_at"],
+    "payments": ["due_date", "paid_at", "created_at"],
+    "notifications": ["created_at", "sent_at", "claimed_at", "next_attempt_at"],
+    "orders": ["created_at", "updated_at"],
+    "products": ["timestamp", "published_at"],
+    "coupons": ["created_at", "expires_at"],
+    "reviews": ["created_at", "approved_at"],
+    "services": ["created_at", "updated_at"],
+    "banners": ["created_at", "published_at"],
+    "inquiries": ["timestamp"],
+    "custom_pages": ["created_at", "updated_at", "published_at"],
+    "content_blocks": ["created_at", "updated_at"],
+    "analytics_events": ["created_at"],
+    "crawler_logs": ["timestamp"],
+    "seo_logs": ["timestamp"],
+    "scheduler_jobs": ["next_run_at", "last_run_at"],
+    "scheduler_leases": ["acquired_at", "expires_at"]
+}
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """Datetime (made UTC-aware) or ISO 8601 string -> aware datetime; anything else -> None"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def decode_dates(doc: Dict, collection: str) -> Dict:
+    """Convert ISO string date fields of an incoming document or $set payload in place"""
+    for field in DATE_FIELDS.get(collection, []):
+        if isinstance(doc.get(field), str):
+            doc[field] = parse_datetime(doc[field]) or doc[field]
+    return doc
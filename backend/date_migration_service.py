@@ -0,0 +1,123 @@
+"""
+Migração de Datas - ISO String to BSON Datetime Migration
+Converts the legacy ISO string date fields listed in date_codec.DATE_FIELDS
+to native datetimes in _id-ordered batches. Progress is checkpointed per
+collection in db.migrations, so an interrupted run resumes where it stopped.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict
+
+from pymongo import UpdateOne
+
+from date_codec import DATE_FIELDS, parse_datetime
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "iso_dates_to_bson"
+DEFAULT_BATCH_SIZE = 1000
+
+
+class DateMigrationService:
+    """Resumable batch migration of ISO string dates to BSON datetimes"""
+
+    def __init__(self, db, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self._lock = asyncio.Lock()
+
+    async def _state(self) -> Dict:
+        state = await self.db.migrations.find_one({"id": MIGRATION_ID}, {"_id": 0})
+        return state or {"id": MIGRATION_ID, "status": "not_started", "collections": {}}
+
+    async def status(self) -> Dict:
+        """Migration progress with checkpoints rendered as strings"""
+        state = await self._state()
+        for progress in state.get("collections", {}).values():
+            if progress.get("last_id") is not None:
+                progress["last_id"] = str(progress["last_id"])
+        return state
+
+    def start(self):
+        """Run the migration in a background task (used at startup)"""
+        asyncio.create_task(self._run_logged())
+
+    async def _run_logged(self):
+        try:
+            await self.run()
+        except Exception as e:
+            logger.error(f"Date migration failed: {e}")
+
+    async def run(self, restart: bool = False) -> Dict:
+        """Convert every collection, skipping the ones already completed unless `restart`"""
+        if self._lock.locked():
+            raise RuntimeError("Migração já está em execução")
+
+        async with self._lock:
+            if restart:
+                await self.db.migrations.delete_one({"id": MIGRATION_ID})
+            state = await self._state()
+            await self.db.migrations.update_one(
+                {"id": MIGRATION_ID},
+                {"$set": {"status": "running", "started_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+
+            for collection, fields in DATE_FIELDS.items():
+                progress = state.get("collections", {}).get(collection, {})
+                if progress.get("done"):
+                    continue
+                await self._migrate_collection(collection, fields, progress)
+
+            await self.db.migrations.update_one(
+                {"id": MIGRATION_ID},
+                {"$set": {"status": "completed", "finished_at": datetime.now(timezone.utc)}}
+            )
+            return await self.status()
+
+    async def _migrate_collection(self, collection: str, fields: list, progress: Dict):
+        last_id = progress.get("last_id")
+        converted = progress.get("converted", 0)
+        skipped = progress.get("skipped", 0)
+        coll = self.db[collection]
+
+        while True:
+            query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = await coll.find(query, {field: 1 for field in fields}) \
+                .sort("_id", 1).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+
+            operations = []
+            for doc in batch:
+                updates = {}
+                for field in fields:
+                    if isinstance(doc.get(field), str):
+                        value = parse_datetime(doc[field])
+                        if value is None:
+                            # Empty or malformed strings are left for manual review
+                            skipped += 1
+                        else:
+                            updates[field] = value
+                if updates:
+                    operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": updates}))
+
+            if operations:
+                await coll.bulk_write(operations, ordered=False)
+            converted += len(operations)
+            last_id = batch[-1]["_id"]
+            await self._checkpoint(collection, {"last_id": last_id, "converted": converted, "skipped": skipped})
+
+        await self._checkpoint(collection, {"last_id": last_id, "converted": converted, "skipped": skipped, "done": True})
+        logger.info(f"Date migration {collection}: {converted} documents converted, {skipped} values skipped")
+
+    async def _checkpoint(self, collection: str, progress: Dict):
+        await self.db.migrations.update_one(
+            {"id": MIGRATION_ID},
+            {"$set": {f"collections.{collection}": progress}},
+            upsert=True
+        )
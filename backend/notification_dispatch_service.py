@@ -0,0 +1,422 @@
+"""
+Envio de Notificações - Notification Dispatch Service
+Background worker that claims pending notifications, delivers them through
+per-channel adapters (WhatsApp gateway, SendGrid email) under token-bucket
+rate limits and bounded concurrency, and records delivery status and latency.
+The token buckets live in MongoDB (db.rate_limits), so the configured rate is
+the rate across every uvicorn worker running a dispatcher, not per process.
+"""
+
+import asyncio
+import html
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Messages per second allowed per channel
+DEFAULT_RATE_LIMITS = {
+    "whatsapp": 20,
+    "email": 50
+}
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_CONCURRENCY = 20
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_POLL_SECONDS = 5
+RETRY_BASE_SECONDS = 30
+# A notification left in "sending" longer than this (worker crash) is reclaimed
+CLAIM_TIMEOUT_SECONDS = 300
+# Shortest wait before asking the shared bucket again
+MIN_TOKEN_WAIT_SECONDS = 0.01
+
+EMAIL_SUBJECTS = {
+    "payment_reminder": "Lembrete: Pagamento próximo ao vencimento",
+    "overdue": "⚠️ Pagamento em Atraso",
+    "suspension": "🚨 AVISO FINAL - Suspensão de Serviço",
+    "order": "Atualização do seu pedido",
+    "ticket": "Atualização do seu chamado"
+}
+
+
+class DeliveryError(Exception):
+    """Raised by adapters when a message could not be delivered"""
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursting up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SharedTokenBucket:
+    """Token bucket kept in one MongoDB document, shared by every worker.
+
+    Each take is a single find_one_and_update with an update pipeline: refill by
+    the elapsed (wall-clock) time, then take a token if one is available. If
+    MongoDB cannot be reached the process falls back to a local bucket.
+    """
+
+    def __init__(self, collection, key: str, rate: float, capacity: Optional[float] = None):
+        self.collection = collection
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._local = TokenBucket(rate, capacity)
+        # One caller per process polls the shared document at a time
+        self._lock = asyncio.Lock()
+
+    async def _take(self) -> Dict:
+        now = time.time()
+        elapsed = {"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}
+        refilled = {"$min": [
+            self.capacity,
+            {"$add": [{"$ifNull": ["$tokens", self.capacity]}, {"$multiply": [elapsed, self.rate]}]}
+        ]}
+        return await self.collection.find_one_and_update(
+            {"id": self.key},
+            [
+                {"$set": {"tokens": refilled, "updated": now}},
+                {"$set": {
+                    "granted": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]}
+                }}
+            ],
+            projection={"_id": 0, "granted": 1, "tokens": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                try:
+                    state = await self._take()
+                except DuplicateKeyError:
+                    # Another worker created the bucket document first
+                    continue
+                except PyMongoError as e:
+                    logger.warning(f"Shared rate limit {self.key} unavailable, limiting locally: {e}")
+                    await self._local.acquire()
+                    return
+                if state["granted"]:
+                    return
+                await asyncio.sleep(max((1 - state["tokens"]) / self.rate, MIN_TOKEN_WAIT_SECONDS))
+
+
+# ==================== CHANNEL ADAPTERS ====================
+
+class ChannelAdapter:
+    """Delivers one notification on a channel; raise DeliveryError on failure"""
+
+    channel = ""
+
+    def recipient(self, customer: Dict) -> Optional[str]:
+        raise NotImplementedError
+
+    async def send(self, recipient: str, notification: Dict) -> Dict:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class WhatsAppAdapter(ChannelAdapter):
+    """Sends WhatsApp messages through an HTTP gateway (POST {phone, message})"""
+
+    channel = "whatsapp"
+
+    def __init__(self, api_url: str, api_token: str = "", timeout: float = 10.0):
+        headers = {"Authorization": f"Bearer {api_token}"} if api_token else {}
+        self.api_url = api_url
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=DEFAULT_CONCURRENCY, max_keepalive_connections=DEFAULT_CONCURRENCY)
+        )
+
+    def recipient(self, customer: Dict) -> Optional[str]:
+        digits = "".join(c for c in str(customer.get("whatsapp") or customer.get("phone") or "") if c.isdigit())
+        if not digits:
+            return None
+        # Numbers are stored without country code (e.g. 13999999999)
+        return digits if digits.startswith("55") and len(digits) > 11 else f"55{digits}"
+
+    async def send(self, recipient: str, notification: Dict) -> Dict:
+        try:
+            response = await self.client.post(
+                self.api_url,
+                json={"phone": recipient, "message": notification["message"]}
+            )
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"WhatsApp gateway error: {e}")
+        if response.status_code >= 400:
+            raise DeliveryError(f"WhatsApp gateway returned {response.status_code}: {response.text[:200]}")
+        return {"status_code": response.status_code}
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class EmailAdapter(ChannelAdapter):
+    """Sends email through the synchronous send_email helper in a thread"""
+
+    channel = "email"
+
+    def __init__(self, send_func: Callable[[str, str, str], Dict]):
+        self.send_func = send_func
+
+    def recipient(self, customer: Dict) -> Optional[str]:
+        return customer.get("email")
+
+    async def send(self, recipient: str, notification: Dict) -> Dict:
+        subject = EMAIL_SUBJECTS.get(notification.get("type"), "Vigiloc - Notificação")
+        body = html.escape(notification["message"]).replace("\n", "<br>")
+        result = await asyncio.to_thread(self.send_func, recipient, subject, body)
+        if not result.get("success"):
+            raise DeliveryError(result.get("error") or result.get("message") or "Email não enviado")
+        return {"status_code": result.get("status_code")}
+
+
+class StubAdapter(ChannelAdapter):
+    """Local adapter for tests: records messages, with optional latency and failure rate"""
+
+    def __init__(self, channel: str, latency: float = 0.0, failure_rate: float = 0.0):
+        self.channel = channel
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent: List[Dict] = []
+
+    def recipient(self, customer: Dict) -> Optional[str]:
+        if self.channel == "email":
+            return customer.get("email")
+        return customer.get("whatsapp") or customer.get("phone")
+
+    async def send(self, recipient: str, notification: Dict) -> Dict:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise DeliveryError("Stub failure")
+        self.sent.append({"recipient": recipient, "id": notification["id"], "message": notification["message"]})
+        return {"stub": True}
+
+
+# ==================== DISPATCHER ====================
+
+class NotificationDispatchService:
+    """Claims pending notifications and delivers them through channel adapters"""
+
+    def __init__(
+        self,
+        db,
+        adapters: List[ChannelAdapter],
+        rate_limits: Optional[Dict[str, float]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        poll_seconds: float = DEFAULT_POLL_SECONDS
+    ):
+        self.db = db
+        self.adapters = {adapter.channel: adapter for adapter in adapters}
+        rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.buckets = {
+            channel: SharedTokenBucket(db.rate_limits, f"notifications:{channel}", rate_limits.get(channel, 10))
+            for channel in self.adapters
+        }
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_indexes(self):
+        await self.db.notifications.create_index([("status", 1), ("channel", 1), ("created_at", 1)])
+        await self.db.rate_limits.create_index("id", unique=True)
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        if self._task is None and self.adapters:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Notification dispatcher started for {', '.join(self.adapters)}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for adapter in self.adapters.values():
+            await adapter.close()
+
+    async def _loop(self):
+        while True:
+            try:
+                stats = await self.dispatch_batch()
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+                stats = {"claimed": 0}
+            # Keep draining while batches come back full
+            if stats["claimed"] < self.batch_size:
+                await asyncio.sleep(self.poll_seconds)
+
+    # ---------- dispatch ----------
+
+    async def _claim(self, now: datetime) -> Optional[Dict]:
+        stale = now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)
+        return await self.db.notifications.find_one_and_update(
+            {
+                "channel": {"$in": list(self.adapters)},
+                "$or": [
+                    {"status": "pending", "next_attempt_at": None},
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "claimed_at": {"$lt": stale}}
+                ]
+            },
+            {
+                "$set": {"status": "sending", "claimed_by": self.worker_id, "claimed_at": now},
+                "$inc": {"attempts": 1}
+            },
+            projection={"_id": 0},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def dispatch_batch(self) -> Dict:
+        """Claim up to batch_size notifications, deliver them and record the outcome"""
+        now = datetime.now(timezone.utc)
+        claimed = []
+        for _ in range(self.batch_size):
+            notification = await self._claim(now)
+            if not notification:
+                break
+            claimed.append(notification)
+
+        stats = {"claimed": len(claimed), "sent": 0, "retry": 0, "failed": 0}
+        if not claimed:
+            return stats
+
+        customer_ids = list({n["customer_id"] for n in claimed})
+        customers = {
+            c["id"]: c for c in await self.db.customers.find(
+                {"id": {"$in": customer_ids}},
+                {"_id": 0, "id": 1, "email": 1, "phone": 1, "whatsapp": 1}
+            ).to_list(None)
+        }
+
+        outcomes = await asyncio.gather(*[
+            self._deliver(notification, customers.get(notification["customer_id"]))
+            for notification in claimed
+        ])
+
+        await self.db.notifications.bulk_write(
+            [UpdateOne({"id": notification_id, "claimed_by": self.worker_id}, update)
+             for notification_id, update, _ in outcomes],
+            ordered=False
+        )
+        for _, _, status in outcomes:
+            stats[status] += 1
+        return stats
+
+    async def _deliver(self, notification: Dict, customer: Optional[Dict]) -> tuple:
+        """Send one notification and return (id, update, outcome)"""
+        adapter = self.adapters[notification["channel"]]
+        recipient = adapter.recipient(customer) if customer else None
+        if not recipient:
+            return self._failure(notification, "Destinatário sem contato para o canal", retry=False)
+
+        async with self._semaphore:
+            await self.buckets[adapter.channel].acquire()
+            start_time = time.perf_counter()
+            try:
+                await adapter.send(recipient, notification)
+            except Exception as e:
+                return self._failure(notification, str(e), retry=True)
+            latency_ms = round((time.perf_counter() - start_time) * 1000, 1)
+
+        update = {
+            "$set": {"status": "sent", "sent_at": datetime.now(timezone.utc), "latency_ms": latency_ms},
+            "$unset": {"claimed_by": "", "claimed_at": "", "next_attempt_at": ""}
+        }
+        return notification["id"], update, "sent"
+
+    def _failure(self, notification: Dict, error: str, retry: bool) -> tuple:
+        attempts = notification.get("attempts", 1)
+        if retry and attempts < self.max_attempts:
+            next_attempt = datetime.now(timezone.utc) + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+            update = {
+                "$set": {"status": "pending", "last_error": error, "next_attempt_at": next_attempt},
+                "$unset": {"claimed_by": "", "claimed_at": ""}
+            }
+            return notification["id"], update, "retry"
+
+        update = {
+            "$set": {"status": "failed", "last_error": error},
+            "$unset": {"claimed_by": "", "claimed_at": "", "next_attempt_at": ""}
+        }
+        return notification["id"], update, "failed"
+
+    # ---------- admin ----------
+
+    async def get_stats(self, hours: int = 24) -> Dict:
+        """Counts per channel/status plus delivery latency over the last `hours`"""
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        counts = await self.db.notifications.aggregate([
+            {"$group": {"_id": {"channel": "$channel", "status": "$status"}, "count": {"$sum": 1}}}
+        ]).to_list(None)
+        latency = await self.db.notifications.aggregate([
+            {"$match": {"status": "sent", "sent_at": {"$gte": since}, "latency_ms": {"$exists": True}}},
+            {"$group": {
+                "_id": "$channel",
+                "sent": {"$sum": 1},
+                "avg_latency_ms": {"$avg": "$latency_ms"},
+                "max_latency_ms": {"$max": "$latency_ms"}
+            }}
+        ]).to_list(None)
+
+        by_channel: Dict[str, Dict] = {}
+        for row in counts:
+            channel = row["_id"].get("channel") or "unknown"
+            by_channel.setdefault(channel, {"statuses": {}})["statuses"][row["_id"].get("status")] = row["count"]
+        for row in latency:
+            channel = row["_id"] or "unknown"
+            by_channel.setdefault(channel, {"statuses": {}})[f"last_{hours}h"] = {
+                "sent": row["sent"],
+                "avg_latency_ms": round(row["avg_latency_ms"], 1),
+                "max_latency_ms": row["max_latency_ms"]
+            }
+
+        return {
+            "active_channels": list(self.adapters),
+            "running": self._task is not None,
+            "channels": by_channel
+        }
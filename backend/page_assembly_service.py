@@ -0,0 +1,109 @@
+"""
+Montagem de Páginas - Page Assembly Service
+Builds a published custom page with its ordered published content blocks and
+the products of every product_list block in one response. All product lists
+are resolved by a single $facet aggregation and the assembled page is cached
+per slug until a page, block or product change clears the cache.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+DEFAULT_PRODUCT_LIMIT = 12
+MAX_PRODUCT_LIMIT = 100
+MAX_CACHED_PAGES = 500
+# Newest products first; id breaks timestamp ties so a limited list is stable
+PRODUCT_LIST_SORT = {"timestamp": -1, "id": 1}
+
+
+def product_list_filter(block: Dict) -> Dict:
+    """Product query of a product_list block (settings.filter: all, category or badges)"""
+    settings = block.get("settings") or {}
+    content = block.get("content") or {}
+    mode = settings.get("filter")
+    category = content.get("category")
+    badges = content.get("badges") or []
+
+    query = {"published": True}
+    if category and mode in (None, "category"):
+        query["category"] = category
+    if badges and mode in (None, "badges"):
+        query["badges"] = {"$in": badges}
+    return query
+
+
+def product_list_limit(block: Dict) -> int:
+    try:
+        limit = int((block.get("settings") or {}).get("limit") or DEFAULT_PRODUCT_LIMIT)
+    except (TypeError, ValueError):
+        limit = DEFAULT_PRODUCT_LIMIT
+    return max(1, min(limit, MAX_PRODUCT_LIMIT))
+
+
+class PageAssemblyService:
+    """Assembled-page cache keyed by slug"""
+
+    def __init__(self, db):
+        self.db = db
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._generation = 0
+
+    async def ensure_indexes(self):
+        await self.db.custom_pages.create_index([("slug", 1), ("published", 1)])
+        await self.db.content_blocks.create_index([("page_id", 1), ("published", 1), ("order", 1)])
+
+    def clear(self):
+        self._cache.clear()
+        self._generation += 1
+
+    async def get_page(self, slug: str) -> Optional[Dict]:
+        cached = self._cache.get(slug)
+        if cached is not None:
+            self._cache.move_to_end(slug)
+            return cached
+
+        generation = self._generation
+        assembled = await self._assemble(slug)
+        # Skip caching a page assembled from data that changed meanwhile
+        if assembled is not None and generation == self._generation:
+            self._cache[slug] = assembled
+            if len(self._cache) > MAX_CACHED_PAGES:
+                self._cache.popitem(last=False)
+        return assembled
+
+    async def _assemble(self, slug: str) -> Optional[Dict]:
+        page = await self.db.custom_pages.find_one({"slug": slug, "published": True}, {"_id": 0})
+        if not page:
+            return None
+
+        blocks = await self.db.content_blocks.find(
+            {"page_id": page["id"], "published": True},
+            {"_id": 0}
+        ).sort("order", 1).to_list(100)
+
+        await self._resolve_products([b for b in blocks if b.get("type") == "product_list"])
+        return {"page": page, "blocks": blocks}
+
+    async def _resolve_products(self, blocks: List[Dict]):
+        if not blocks:
+            return
+
+        # One sub-pipeline per block, all answered in a single round trip; the
+        # leading $or keeps the facet input to products some block can show
+        filters = [product_list_filter(block) for block in blocks]
+        facets = {
+            f"b{index}": [
+                {"$match": query},
+                {"$sort": PRODUCT_LIST_SORT},
+                {"$limit": product_list_limit(block)},
+                {"$project": {"_id": 0}}
+            ]
+            for index, (block, query) in enumerate(zip(blocks, filters))
+        }
+        results = await self.db.products.aggregate([
+            {"$match": {"$or": filters}},
+            {"$facet": facets}
+        ]).to_list(1)
+        resolved = results[0] if results else {}
+        for index, block in enumerate(blocks):
+            block["products"] = resolved.get(f"b{index}", [])
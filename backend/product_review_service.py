@@ -0,0 +1,163 @@
+"""
+Avaliações de Produtos - Product Review Aggregates
+Each product document carries a `rating` summary of its approved reviews:
+count, sum, average and a 1-5 histogram. Review handlers move it with $inc by
+the difference between a review's old and new state (the approve/reject
+updates are conditional, so repeating them changes nothing), so catalog
+responses include ratings without touching the reviews collection. Reviews
+are listed newest first with keyset pagination on (created_at, id).
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from crm_queue_service import decode_cursor, encode_cursor
+from date_codec import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+RATINGS = (1, 2, 3, 4, 5)
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+LIST_PROJECTION = {"_id": 0}
+
+
+def empty_rating() -> Dict:
+    return {"count": 0, "sum": 0, "average": 0.0, "histogram": {str(r): 0 for r in RATINGS}}
+
+
+def validate_rating(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value) or int(value) not in RATINGS:
+        raise ValueError("A nota deve ser um número inteiro de 1 a 5")
+    return int(value)
+
+
+def _contribution(review: Optional[Dict]) -> Optional[int]:
+    """Rating a review adds to its product's summary, or None when it is not approved"""
+    if not review or review.get("status") != "approved":
+        return None
+    rating = review.get("rating")
+    return int(rating) if rating in RATINGS else None
+
+
+class ProductReviewService:
+    """Incremental per-product rating summaries and paginated review listing"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def ensure_indexes(self):
+        await self.db.reviews.create_index("id", unique=True)
+        await self.db.reviews.create_index([("product_id", 1), ("status", 1), ("created_at", -1), ("id", -1)])
+        await self.db.reviews.create_index([("status", 1), ("created_at", -1)])
+        # First start with this service: build the summaries from the existing reviews
+        if not await self.db.products.count_documents({"rating": {"$exists": True}}, limit=1) \
+                and await self.db.reviews.count_documents({"status": "approved"}, limit=1):
+            await self.rebuild()
+
+    # ---------- summaries ----------
+
+    async def apply_change(self, product_id: str, before: Optional[Dict], after: Optional[Dict]) -> bool:
+        """Move the product's summary by the change from `before` to `after` (None = absent)"""
+        old, new = _contribution(before), _contribution(after)
+        if old == new:
+            return False
+        inc: Dict[str, int] = {"rating.count": 0, "rating.sum": 0}
+        for rating, sign in ((old, -1), (new, 1)):
+            if rating is not None:
+                inc["rating.count"] += sign
+                inc["rating.sum"] += sign * rating
+                key = f"rating.histogram.{rating}"
+                inc[key] = inc.get(key, 0) + sign
+        # Products created before this service (or with rating null) start from an empty summary
+        await self.db.products.update_one({"id": product_id, "rating": None}, {"$set": {"rating": empty_rating()}})
+        product = await self.db.products.find_one_and_update(
+            {"id": product_id},
+            {"$inc": inc},
+            projection={"_id": 0, "rating": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if product is None:
+            return False
+        await self._set_average(product_id, product["rating"])
+        return True
+
+    async def _set_average(self, product_id: str, rating: Dict):
+        count, total = rating.get("count", 0), rating.get("sum", 0)
+        # Guarded on the counters read back, so a slower writer never overwrites a newer average
+        await self.db.products.update_one(
+            {"id": product_id, "rating.count": count, "rating.sum": total},
+            {"$set": {"rating.average": round(total / count, 2) if count else 0.0}}
+        )
+
+    async def rebuild(self, product_id: Optional[str] = None) -> Dict:
+        """Recompute summaries from the approved reviews (initial load, or to repair drift)"""
+        match: Dict = {"status": "approved", "rating": {"$in": list(RATINGS)}}
+        if product_id:
+            match["product_id"] = product_id
+        rows = await self.db.reviews.aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"p": "$product_id", "r": "$rating"}, "n": {"$sum": 1}}}
+        ]).to_list(None)
+
+        summaries: Dict[str, Dict] = {}
+        for row in rows:
+            summary = summaries.setdefault(row["_id"]["p"], empty_rating())
+            summary["histogram"][str(row["_id"]["r"])] = row["n"]
+            summary["count"] += row["n"]
+            summary["sum"] += row["n"] * row["_id"]["r"]
+        for summary in summaries.values():
+            summary["average"] = round(summary["sum"] / summary["count"], 2)
+
+        reset = {"id": product_id} if product_id else {}
+        await self.db.products.update_many(reset, {"$set": {"rating": empty_rating()}})
+        for pid, summary in summaries.items():
+            await self.db.products.update_one({"id": pid}, {"$set": {"rating": summary}})
+        return {"products": len(summaries), "reviews": sum(s["count"] for s in summaries.values())}
+
+    async def summary(self, product_id: str) -> Optional[Dict]:
+        product = await self.db.products.find_one({"id": product_id}, {"_id": 0, "rating": 1})
+        if product is None:
+            return None
+        return product.get("rating") or empty_rating()
+
+    # ---------- reviews ----------
+
+    async def set_status(self, review_id: str, status: str, extra: Optional[Dict] = None) -> Optional[Dict]:
+        """Move a review to `status` and its product's summary with it; None when the review does not exist"""
+        update = {"status": status, **(extra or {})}
+        before = await self.db.reviews.find_one_and_update(
+            {"id": review_id, "status": {"$ne": status}},
+            {"$set": update},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            return await self.db.reviews.find_one({"id": review_id}, {"_id": 0})
+        after = {**before, **update}
+        await self.apply_change(before["product_id"], before, after)
+        return after
+
+    async def list_reviews(self, product_id: str, cursor: Optional[str] = None,
+                           limit: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """Approved reviews, newest first"""
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        query: Dict = {"product_id": product_id, "status": "approved"}
+        if cursor:
+            after = decode_cursor(cursor, ["t", "i"])
+            created_at = parse_datetime(after["t"])
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "id": {"$lt": after["i"]}}
+            ]
+        items: List[Dict] = await self.db.reviews.find(query, LIST_PROJECTION) \
+            .sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+        has_more = len(items) > limit
+        items = items[:limit]
+        return {
+            "items": items,
+            "next_cursor": encode_cursor({"t": items[-1]["created_at"], "i": items[-1]["id"]}) if has_more else None,
+            "has_more": has_more
+        }
@@ -1,6 +1,9 @@
 """
 Prospecção Intel - Data Scraping Service
-Scrapes real data from public sources for sales prospecting
+Scrapes real data from public sources for sales prospecting.
+IBGE population estimates go through one shared httpx client, are fetched
+concurrently, and are cached in the ibge_cache collection: fresh for
+IBGE_CACHE_TTL, then served stale while a background refresh runs.
 """
 
 import asyncio
@@ -8,8 +11,8 @@ import json
 import os
 import re
 import uuid
-from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Dict, Optional
 import httpx
 
 # Try to import Playwright - it may not be available in production
@@ -20,9 +23,17 @@ except ImportError:
     PLAYWRIGHT_AVAILABLE = False
     async_playwright = None
 
-# IBGE API endpoints
-IBGE_API = "https://servicodados.ibge.gov.br/api/v1"
-IBGE_LOCALIDADES = "https://servicodados.ibge.gov.br/api/v1/localidades"
+# IBGE API endpoints (IBGE_API_URL points them elsewhere, e.g. a test server)
+IBGE_BASE_URL = os.environ.get("IBGE_API_URL", "https://servicodados.ibge.gov.br/api").rstrip("/")
+IBGE_API = f"{IBGE_BASE_URL}/v1"
+IBGE_LOCALIDADES = f"{IBGE_API}/localidades"
+IBGE_POPULATION = f"{IBGE_BASE_URL}/v3/agregados/6579/periodos/-1/variaveis/9324"
+IBGE_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+# Population estimates are yearly: serve cached values for days, refresh in background after that
+IBGE_CACHE_TTL = timedelta(days=7)
+# Entries not refreshed for this long are removed by the TTL index
+IBGE_CACHE_RETENTION = timedelta(days=90)
 
 # Baixada Santista municipalities (IBGE codes)
 BAIXADA_SANTISTA = {
@@ -59,51 +70,139 @@ CRIME_CATEGORIES = [
 
 class IBGEDataFetcher:
     """Fetches demographic and geographic data from IBGE API"""
-    
-    @staticmethod
-    async def get_municipios_by_uf(uf: str = "SP") -> List[Dict]:
+
+    def __init__(self, db=None):
+        self.db = db
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"fetches": 0, "cache_hits": 0, "stale_hits": 0, "errors": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=IBGE_TIMEOUT)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def ensure_indexes(self):
+        await self.db.ibge_cache.create_index("key", unique=True)
+        await self.db.ibge_cache.create_index("fetched_at", expireAfterSeconds=int(IBGE_CACHE_RETENTION.total_seconds()))
+
+    async def get_municipios_by_uf(self, uf: str = "SP") -> List[Dict]:
         """Get all municipalities from a state"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{IBGE_LOCALIDADES}/estados/{uf}/municipios"
-            )
-            if response.status_code == 200:
-                return response.json()
-            return []
-    
-    @staticmethod
-    async def get_municipio_data(codigo_ibge: str) -> Dict:
+        response = await self.client.get(f"{IBGE_LOCALIDADES}/estados/{uf}/municipios")
+        if response.status_code == 200:
+            return response.json()
+        return []
+
+    async def get_municipio_data(self, codigo_ibge: str) -> Dict:
         """Get detailed data for a municipality"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{IBGE_LOCALIDADES}/municipios/{codigo_ibge}"
-            )
+        response = await self.client.get(f"{IBGE_LOCALIDADES}/municipios/{codigo_ibge}")
+        if response.status_code == 200:
+            return response.json()
+        return {}
+
+    async def fetch_population(self, codigo_ibge: str) -> Optional[int]:
+        """Population estimate straight from IBGE; None when it could not be fetched"""
+        self.stats["fetches"] += 1
+        try:
+            response = await self.client.get(IBGE_POPULATION, params={"localidades": f"N6[{codigo_ibge}]"})
             if response.status_code == 200:
-                return response.json()
-            return {}
-    
-    @staticmethod
-    async def get_population_estimate(codigo_ibge: str) -> int:
-        """Get population estimate for a municipality"""
-        async with httpx.AsyncClient() as client:
+                data = response.json()
+                if data and len(data) > 0:
+                    resultados = data[0].get("resultados", [])
+                    if resultados:
+                        series = resultados[0].get("series", [])
+                        if series:
+                            serie = series[0].get("serie", {})
+                            if serie:
+                                latest = list(serie.values())[-1]
+                                return int(latest) if latest and latest != "-" else 0
+        except Exception as e:
+            print(f"Error fetching population: {e}")
+        self.stats["errors"] += 1
+        return None
+
+    async def _refresh_population(self, codigo_ibge: str) -> Optional[int]:
+        population = await self.fetch_population(codigo_ibge)
+        if population is not None and self.db is not None:
             try:
-                response = await client.get(
-                    f"https://servicodados.ibge.gov.br/api/v3/agregados/6579/periodos/-1/variaveis/9324?localidades=N6[{codigo_ibge}]"
+                await self.db.ibge_cache.update_one(
+                    {"key": f"population:{codigo_ibge}"},
+                    {"$set": {"value": population, "fetched_at": datetime.now(timezone.utc)}},
+                    upsert=True
                 )
-                if response.status_code == 200:
-                    data = response.json()
-                    if data and len(data) > 0:
-                        resultados = data[0].get("resultados", [])
-                        if resultados:
-                            series = resultados[0].get("series", [])
-                            if series:
-                                serie = series[0].get("serie", {})
-                                if serie:
-                                    latest = list(serie.values())[-1]
-                                    return int(latest) if latest and latest != "-" else 0
             except Exception as e:
-                print(f"Error fetching population: {e}")
-            return 0
+                print(f"Error caching population: {e}")
+        return population
+
+    def _refresh(self, codigo_ibge: str) -> asyncio.Task:
+        """One refresh per municipality at a time, shared by every caller waiting on it"""
+        task = self._inflight.get(codigo_ibge)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh_population(codigo_ibge))
+            self._inflight[codigo_ibge] = task
+            task.add_done_callback(lambda _: self._inflight.pop(codigo_ibge, None))
+        return task
+
+    async def get_population_estimates(self, codigos: Iterable[str]) -> Dict[str, int]:
+        """Population per IBGE code (0 when unknown); missing entries are fetched concurrently"""
+        codigos = list(dict.fromkeys(codigos))
+        cached: Dict[str, Dict] = {}
+        if self.db is not None:
+            async for entry in self.db.ibge_cache.find(
+                {"key": {"$in": [f"population:{codigo}" for codigo in codigos]}}, {"_id": 0}
+            ):
+                cached[entry["key"].split(":", 1)[1]] = entry
+
+        populations: Dict[str, int] = {}
+        missing = []
+        stale_before = datetime.now(timezone.utc) - IBGE_CACHE_TTL
+        for codigo in codigos:
+            entry = cached.get(codigo)
+            if entry is None:
+                missing.append(codigo)
+                continue
+            populations[codigo] = entry["value"]
+            if entry["fetched_at"] < stale_before:
+                # Stale while revalidate: answer now, refresh in the background
+                self.stats["stale_hits"] += 1
+                self._refresh(codigo)
+            else:
+                self.stats["cache_hits"] += 1
+
+        if missing:
+            # shield: a dropped request must not cancel fetches other requests share
+            fetched = await asyncio.gather(*(asyncio.shield(self._refresh(codigo)) for codigo in missing))
+            for codigo, population in zip(missing, fetched):
+                populations[codigo] = population or 0
+        return populations
+
+    async def get_population_estimate(self, codigo_ibge: str) -> int:
+        """Get population estimate for a municipality"""
+        return (await self.get_population_estimates([codigo_ibge]))[codigo_ibge]
+
+    async def expire_cache(self) -> int:
+        """Mark every cached entry stale, so the next read serves it and refreshes it"""
+        result = await self.db.ibge_cache.update_many(
+            {}, {"$set": {"fetched_at": datetime.now(timezone.utc) - IBGE_CACHE_TTL}}
+        )
+        return result.modified_count
+
+    async def cache_status(self) -> Dict:
+        stale_before = datetime.now(timezone.utc) - IBGE_CACHE_TTL
+        return {
+            "api_url": IBGE_BASE_URL,
+            "ttl_days": IBGE_CACHE_TTL.days,
+            "entries": await self.db.ibge_cache.count_documents({}),
+            "stale": await self.db.ibge_cache.count_documents({"fetched_at": {"$lt": stale_before}}),
+            "refreshing": len(self._inflight),
+            **self.stats
+        }
 
 
 class BusinessScraper:
@@ -402,8 +501,14 @@ class ProspectingDataService:
     
     def __init__(self, db):
         self.db = db
-        self.ibge = IBGEDataFetcher()
+        self.ibge = IBGEDataFetcher(db)
         self.business_scraper = BusinessScraper()
+
+    async def ensure_indexes(self):
+        await self.ibge.ensure_indexes()
+
+    async def close(self):
+        await self.ibge.close()
     
     async def get_region_stats(self, region: str = "baixada_santista") -> Dict:
         """Get comprehensive stats for a region"""
@@ -425,8 +530,10 @@ class ProspectingDataService:
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         
+        populations = await self.ibge.get_population_estimates(municipios)
+        
         for codigo, nome in municipios.items():
-            pop = await self.ibge.get_population_estimate(codigo)
+            pop = populations[codigo]
             
             condominios = int(pop / 500) if pop > 0 else 0
             empresas = int(pop / 100) if pop > 0 else 0
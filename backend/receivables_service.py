@@ -0,0 +1,275 @@
+"""
+Contas a Receber - Receivables Aging Service
+Aging report of unpaid payments by overdue bucket and by customer, computed by
+one aggregation over payments joined with customers and contracts. The result
+is kept as a snapshot in db.report_cache: a header document plus one row
+document per customer, keyed by the header's generation, so no single
+document grows with the customer base. A rebuild writes a whole new
+generation before repointing the header, and only one rebuild runs at a time
+(an in-process lock plus a lease document shared by the workers). Rows are
+refreshed per customer when one of their payments changes.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+from date_codec import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ID = "receivables_aging"
+LEASE_ID = f"{SNAPSHOT_ID}:rebuild"
+# A rebuild holding the lease longer than this is presumed dead
+REBUILD_LEASE = timedelta(minutes=5)
+REBUILD_POLL_SECONDS = 0.5
+ROW_BATCH_SIZE = 1000
+UNPAID_STATUSES = ["pending", "overdue"]
+# Snapshot is rebuilt after this long (or when the day changes) to pick up
+# writes that do not refresh it incrementally, e.g. newly generated invoices
+SNAPSHOT_TTL = timedelta(minutes=15)
+
+# Bucket key -> upper bound of days overdue (inclusive); "current" is not yet due
+AGING_BUCKETS = [
+    ("current", 0),
+    ("0_30", 30),
+    ("31_60", 60),
+    ("61_90", 90)
+]
+OVERFLOW_BUCKET = "90_plus"
+DAY_MS = 24 * 60 * 60 * 1000
+BUCKET_KEYS = [key for key, _ in AGING_BUCKETS] + [OVERFLOW_BUCKET]
+
+
+class ReceivablesAgingService:
+    """Cached receivables aging report with per-customer incremental refresh"""
+
+    def __init__(self, db):
+        self.db = db
+        self._rebuild_lock = asyncio.Lock()
+
+    async def ensure_indexes(self):
+        await self.db.payments.create_index([("status", 1), ("due_date", 1)])
+        await self.db.report_cache.create_index("id", unique=True)
+        await self.db.report_cache.create_index([("report", 1), ("generation", 1), ("total", -1)])
+
+    def _pipeline(self, now: datetime, customer_id: Optional[str] = None) -> List[Dict]:
+        match = {"status": {"$in": UNPAID_STATUSES}}
+        if customer_id:
+            match["customer_id"] = customer_id
+
+        return [
+            {"$match": match},
+            # Legacy rows keep due_date as an ISO string; anything that does not
+            # convert to a date has no days overdue and lands in "current"
+            {"$set": {"due_date": {"$convert": {
+                "input": "$due_date", "to": "date", "onError": None, "onNull": None
+            }}}},
+            {"$project": {
+                "_id": 0,
+                "customer_id": 1,
+                "contract_id": 1,
+                "amount": 1,
+                "due_date": 1,
+                "has_pix": {"$gt": [{"$ifNull": ["$pix_key", ""]}, ""]},
+                "days": {"$cond": [
+                    {"$eq": [{"$type": "$due_date"}, "date"]},
+                    {"$floor": {"$divide": [{"$subtract": [now, "$due_date"]}, DAY_MS]}},
+                    0
+                ]}
+            }},
+            {"$set": {"bucket": {"$switch": {
+                "branches": [
+                    {"case": {"$lte": ["$days", limit]}, "then": key} for key, limit in AGING_BUCKETS
+                ],
+                "default": OVERFLOW_BUCKET
+            }}}},
+            {"$group": {
+                "_id": "$customer_id",
+                **{
+                    key: {"$sum": {"$cond": [{"$eq": ["$bucket", key]}, "$amount", 0]}}
+                    for key in BUCKET_KEYS
+                },
+                "total": {"$sum": "$amount"},
+                "payments": {"$sum": 1},
+                "payments_with_pix": {"$sum": {"$cond": ["$has_pix", 1, 0]}},
+                "contract_ids": {"$addToSet": "$contract_id"},
+                "oldest_due_date": {"$min": "$due_date"}
+            }},
+            {"$lookup": {
+                "from": "customers",
+                "localField": "_id",
+                "foreignField": "id",
+                "pipeline": [{"$project": {"_id": 0, "name": 1, "status": 1}}],
+                "as": "customer"
+            }},
+            {"$lookup": {
+                "from": "contracts",
+                "localField": "contract_ids",
+                "foreignField": "id",
+                "pipeline": [{"$project": {"_id": 0, "id": 1, "contract_number": 1, "service_type": 1}}],
+                "as": "contracts"
+            }},
+            {"$project": {
+                "_id": 0,
+                "customer_id": "$_id",
+                "customer_name": {"$first": "$customer.name"},
+                "customer_status": {"$first": "$customer.status"},
+                "contracts": 1,
+                "buckets": {key: f"${key}" for key in BUCKET_KEYS},
+                "total": 1,
+                "payments": 1,
+                "payments_with_pix": 1,
+                "oldest_due_date": 1
+            }}
+        ]
+
+    @staticmethod
+    def _normalize(row: Dict) -> Dict:
+        row["buckets"] = {key: round(row["buckets"].get(key, 0), 2) for key in BUCKET_KEYS}
+        row["total"] = round(row["total"], 2)
+        return row
+
+    @staticmethod
+    def _row_id(generation: str, customer_id: str) -> str:
+        return f"{SNAPSHOT_ID}:{generation}:{customer_id}"
+
+    def _row(self, row: Dict, generation: str, generated_at: datetime) -> Dict:
+        return {
+            **self._normalize(row),
+            "id": self._row_id(generation, row["customer_id"]),
+            "report": SNAPSHOT_ID,
+            "generation": generation,
+            "generated_at": generated_at
+        }
+
+    async def _acquire(self) -> Optional[str]:
+        """Take the rebuild lease when it is free or expired; returns its token"""
+        now = datetime.now(timezone.utc)
+        token = str(uuid.uuid4())
+        try:
+            await self.db.report_cache.update_one(
+                {"id": LEASE_ID, "expires_at": {"$lt": now}},
+                {"$set": {"token": token, "expires_at": now + REBUILD_LEASE}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+        return token
+
+    async def _release(self, token: str):
+        await self.db.report_cache.delete_one({"id": LEASE_ID, "token": token})
+
+    async def rebuild(self) -> Dict:
+        """Recompute the whole report, one rebuild at a time; a caller that finds
+        another rebuild running waits for it and returns its header"""
+        requested = datetime.now(timezone.utc)
+        async with self._rebuild_lock:
+            while True:
+                header = await self.db.report_cache.find_one({"id": SNAPSHOT_ID}, {"_id": 0})
+                if header and "generation" in header and parse_datetime(header["generated_at"]) >= requested:
+                    return header
+                token = await self._acquire()
+                if token:
+                    break
+                await asyncio.sleep(REBUILD_POLL_SECONDS)
+            try:
+                return await self._build()
+            finally:
+                await self._release(token)
+
+    async def _build(self) -> Dict:
+        """Write the rows of a new generation, point the header at it, then drop
+        the rows of the generations built before it"""
+        now = datetime.now(timezone.utc)
+        generation = str(uuid.uuid4())
+        customers = 0
+        batch = []
+        cursor = self.db.payments.aggregate(self._pipeline(now), allowDiskUse=True)
+        async for row in cursor:
+            row = self._row(row, generation, now)
+            batch.append(ReplaceOne({"id": row["id"]}, row, upsert=True))
+            if len(batch) >= ROW_BATCH_SIZE:
+                await self.db.report_cache.bulk_write(batch, ordered=False)
+                customers += len(batch)
+                batch = []
+        if batch:
+            await self.db.report_cache.bulk_write(batch, ordered=False)
+            customers += len(batch)
+
+        header = {
+            "id": SNAPSHOT_ID,
+            "generated_at": now,
+            "as_of": now.date().isoformat(),
+            "generation": generation
+        }
+        await self.db.report_cache.replace_one({"id": SNAPSHOT_ID}, header, upsert=True)
+        await self.db.report_cache.delete_many({
+            "report": SNAPSHOT_ID,
+            "generation": {"$ne": generation},
+            "generated_at": {"$lte": now}
+        })
+        logger.info(f"Receivables aging rebuilt: {customers} customers with open balance")
+        return header
+
+    async def refresh_customer(self, customer_id: str):
+        """Recompute one customer's row of the current generation after a payment of theirs changed"""
+        header = await self.db.report_cache.find_one(
+            {"id": SNAPSHOT_ID}, {"_id": 0, "generation": 1, "generated_at": 1}
+        )
+        if not header or "generation" not in header:
+            return
+        rows = await self.db.payments.aggregate(
+            self._pipeline(datetime.now(timezone.utc), customer_id)
+        ).to_list(1)
+        if rows:
+            row = self._row(rows[0], header["generation"], header["generated_at"])
+            await self.db.report_cache.replace_one({"id": row["id"]}, row, upsert=True)
+        else:
+            await self.db.report_cache.delete_one({"id": self._row_id(header["generation"], customer_id)})
+
+    async def invalidate(self):
+        # Rows of the dropped generation are removed by the next rebuild, which
+        # may already be writing its own generation next to them
+        await self.db.report_cache.delete_one({"id": SNAPSHOT_ID})
+
+    async def get_report(self, limit: int = 100, refresh: bool = False) -> Dict:
+        """Bucket totals plus the customers with the largest open balance"""
+        now = datetime.now(timezone.utc)
+        header = None if refresh else await self.db.report_cache.find_one({"id": SNAPSHOT_ID}, {"_id": 0})
+        if (
+            not header
+            or "generation" not in header
+            or header.get("as_of") != now.date().isoformat()
+            or now - parse_datetime(header["generated_at"]) > SNAPSHOT_TTL
+        ):
+            header = await self.rebuild()
+
+        rows = {"report": SNAPSHOT_ID, "generation": header["generation"]}
+        totals = await self.db.report_cache.aggregate([
+            {"$match": rows},
+            {"$group": {
+                "_id": None,
+                **{key: {"$sum": f"$buckets.{key}"} for key in BUCKET_KEYS},
+                "customers": {"$sum": 1}
+            }}
+        ]).to_list(1)
+        totals = totals[0] if totals else {}
+        buckets = {key: round(totals.get(key, 0), 2) for key in BUCKET_KEYS}
+        customers = await self.db.report_cache.find(
+            rows, {"_id": 0, "id": 0, "report": 0, "generation": 0, "generated_at": 0}
+        ).sort("total", -1).to_list(limit)
+
+        return {
+            "generated_at": header["generated_at"],
+            "buckets": buckets,
+            "overdue_total": round(sum(v for k, v in buckets.items() if k != "current"), 2),
+            "total": round(sum(buckets.values()), 2),
+            "customer_count": totals.get("customers", 0),
+            "customers": customers
+        }
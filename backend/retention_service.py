@@ -0,0 +1,305 @@
+"""
+Retenção de Dados - Archival Service
+Moves expired log/event documents out of MongoDB into date-partitioned
+compressed files on local disk, and reads archived ranges back for reports.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from date_codec import parse_datetime
+
+# Parquet needs pyarrow - fall back to gzip JSONL when it is not installed
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Default policies per collection. `date_field` is the datetime used both for
+# expiry and for the archive partition; `filter` restricts which documents
+# may ever be archived (pending notifications must stay in the hot set).
+RETENTION_POLICIES = {
+    "analytics_events": {
+        "date_field": "created_at",
+        "retention_days": 90,
+        "format": "parquet",
+        "filter": {},
+        "enabled": True
+    },
+    "crawler_logs": {
+        "date_field": "timestamp",
+        "retention_days": 30,
+        "format": "parquet",
+        "filter": {},
+        "enabled": True
+    },
+    "seo_logs": {
+        "date_field": "timestamp",
+        "retention_days": 180,
+        "format": "jsonl",
+        "filter": {},
+        "enabled": True
+    },
+    "notifications": {
+        "date_field": "created_at",
+        "retention_days": 180,
+        "format": "jsonl",
+        "filter": {"status": {"$in": ["sent", "failed"]}},
+        "enabled": True
+    }
+}
+
+ARCHIVE_FORMATS = ["parquet", "jsonl"]
+DEFAULT_BATCH_SIZE = 5000
+
+
+class ArchiveWriter:
+    """Writes batches of documents into date-partitioned archive files"""
+
+    def __init__(self, archive_dir: Path):
+        self.archive_dir = Path(archive_dir)
+
+    def partition_dir(self, collection: str, day: str) -> Path:
+        return self.archive_dir / collection / f"date={day}"
+
+    def write_batch(self, collection: str, day: str, docs: List[Dict], fmt: str) -> Path:
+        """Write one batch to a new part file and return its path.
+
+        Parquet is used when available and the batch has a consistent schema;
+        anything pyarrow cannot type (mixed column types) goes to gzip JSONL.
+        """
+        directory = self.partition_dir(collection, day)
+        directory.mkdir(parents=True, exist_ok=True)
+        part = f"part-{datetime.now(timezone.utc).strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        if fmt == "parquet" and PARQUET_AVAILABLE:
+            try:
+                return self._write_parquet(directory / f"{part}.parquet", docs)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+                logger.warning(f"Parquet write failed for {collection}/{day}, using JSONL: {e}")
+
+        return self._write_jsonl(directory / f"{part}.jsonl.gz", docs)
+
+    @staticmethod
+    def _write_parquet(path: Path, docs: List[Dict]) -> Path:
+        # Nested values (metadata dicts, lists) have no stable schema across
+        # documents, so they are stored as JSON text and decoded on read
+        json_columns = {
+            key for doc in docs for key, value in doc.items() if isinstance(value, (dict, list))
+        }
+        rows = [
+            {
+                key: json.dumps(value, ensure_ascii=False, default=str)
+                if key in json_columns and value is not None else value
+                for key, value in doc.items()
+            }
+            for doc in docs
+        ]
+
+        table = pa.Table.from_pylist(rows)
+        table = table.replace_schema_metadata({"json_columns": json.dumps(sorted(json_columns))})
+        tmp_path = path.with_suffix(".tmp")
+        pq.write_table(table, tmp_path, compression="zstd")
+        tmp_path.rename(path)
+        return path
+
+    @staticmethod
+    def _write_jsonl(path: Path, docs: List[Dict]) -> Path:
+        tmp_path = path.with_name(path.name + ".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps(doc, ensure_ascii=False, default=str))
+                f.write("\n")
+        tmp_path.rename(path)
+        return path
+
+    def read_partition(self, collection: str, day: str) -> List[Dict]:
+        """Read every document archived for one collection/day"""
+        directory = self.partition_dir(collection, day)
+        if not directory.exists():
+            return []
+
+        docs = []
+        for path in sorted(directory.iterdir()):
+            if path.name.endswith(".parquet") and PARQUET_AVAILABLE:
+                table = pq.read_table(path)
+                metadata = table.schema.metadata or {}
+                json_columns = json.loads(metadata.get(b"json_columns", b"[]"))
+                for row in table.to_pylist():
+                    for key in json_columns:
+                        if isinstance(row.get(key), str):
+                            row[key] = json.loads(row[key])
+                    docs.append({k: v for k, v in row.items() if v is not None})
+            elif path.name.endswith(".jsonl.gz"):
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    docs.extend(json.loads(line) for line in f if line.strip())
+        return docs
+
+    def list_partitions(self, collection: str) -> List[str]:
+        directory = self.archive_dir / collection
+        if not directory.exists():
+            return []
+        return sorted(
+            p.name.split("=", 1)[1] for p in directory.iterdir()
+            if p.is_dir() and p.name.startswith("date=")
+        )
+
+
+class RetentionService:
+    """Applies per-collection retention policies and serves archived data"""
+
+    def __init__(self, db, archive_dir: Path, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.writer = ArchiveWriter(archive_dir)
+        self.batch_size = batch_size
+        self._lock = asyncio.Lock()
+
+    async def get_policies(self) -> Dict[str, Dict]:
+        """Default policies merged with the admin overrides in retention_settings"""
+        settings = await self.db.retention_settings.find_one({"id": "retention_settings"}, {"_id": 0})
+        overrides = (settings or {}).get("policies", {})
+
+        policies = {}
+        for collection, policy in RETENTION_POLICIES.items():
+            policies[collection] = {**policy, **overrides.get(collection, {})}
+        return policies
+
+    async def update_policy(self, collection: str, data: Dict) -> Dict:
+        if collection not in RETENTION_POLICIES:
+            raise ValueError(f"Coleção sem política de retenção: {collection}")
+
+        allowed = {k: v for k, v in data.items() if k in ("retention_days", "format", "enabled")}
+        if "retention_days" in allowed:
+            allowed["retention_days"] = int(allowed["retention_days"])
+            if allowed["retention_days"] < 1:
+                raise ValueError("retention_days deve ser maior que zero")
+        if "format" in allowed and allowed["format"] not in ARCHIVE_FORMATS:
+            raise ValueError(f"Formato inválido. Use: {', '.join(ARCHIVE_FORMATS)}")
+
+        await self.db.retention_settings.update_one(
+            {"id": "retention_settings"},
+            {"$set": {f"policies.{collection}.{k}": v for k, v in allowed.items()}},
+            upsert=True
+        )
+        return (await self.get_policies())[collection]
+
+    async def run(self, collection: Optional[str] = None, dry_run: bool = False) -> Dict:
+        """Archive and delete expired documents for one or all collections"""
+        policies = await self.get_policies()
+        if collection:
+            if collection not in policies:
+                raise ValueError(f"Coleção sem política de retenção: {collection}")
+            policies = {collection: policies[collection]}
+
+        async with self._lock:
+            started = datetime.now(timezone.utc)
+            results = {}
+            for name, policy in policies.items():
+                if not policy.get("enabled", True):
+                    results[name] = {"skipped": True}
+                    continue
+                results[name] = await self._apply_policy(name, policy, dry_run)
+
+            run = {
+                "id": str(uuid.uuid4()),
+                "started_at": started,
+                "finished_at": datetime.now(timezone.utc),
+                "dry_run": dry_run,
+                "results": results
+            }
+            if not dry_run:
+                await self.db.retention_runs.insert_one(dict(run))
+            return run
+
+    def _expiry_query(self, policy: Dict) -> Dict:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=policy["retention_days"])
+        return {**policy.get("filter", {}), policy["date_field"]: {"$lt": cutoff}}
+
+    async def _apply_policy(self, collection: str, policy: Dict, dry_run: bool) -> Dict:
+        query = self._expiry_query(policy)
+        coll = self.db[collection]
+
+        if dry_run:
+            return {"expired": await coll.count_documents(query)}
+
+        date_field = policy["date_field"]
+        archived = 0
+        files = set()
+        batch = []
+
+        cursor = coll.find(query).sort(date_field, 1).batch_size(self.batch_size)
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                archived += await self._flush(collection, policy, batch, files)
+                batch = []
+        if batch:
+            archived += await self._flush(collection, policy, batch, files)
+
+        return {"archived": archived, "files": sorted(files)}
+
+    async def _flush(self, collection: str, policy: Dict, batch: List[Dict], files: set) -> int:
+        """Write one batch to disk, then delete exactly the archived _ids"""
+        date_field = policy["date_field"]
+        by_day: Dict[str, List[Dict]] = {}
+        for doc in batch:
+            date = parse_datetime(doc.get(date_field))
+            day = date.strftime("%Y-%m-%d") if date else "unknown"
+            by_day.setdefault(day, []).append({k: v for k, v in doc.items() if k != "_id"})
+
+        for day, docs in by_day.items():
+            path = await asyncio.to_thread(
+                self.writer.write_batch, collection, day, docs, policy.get("format", "jsonl")
+            )
+            files.add(str(path))
+
+        # Only delete once every partition of the batch is safely on disk
+        result = await self.db[collection].delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        return result.deleted_count
+
+    async def query_archive(
+        self,
+        collection: str,
+        start: str,
+        end: str,
+        limit: int = 1000
+    ) -> List[Dict]:
+        """Read archived documents whose date falls in [start, end] (YYYY-MM-DD)"""
+        if collection not in RETENTION_POLICIES:
+            raise ValueError(f"Coleção sem política de retenção: {collection}")
+
+        date_field = RETENTION_POLICIES[collection]["date_field"]
+        days = [d for d in self.writer.list_partitions(collection) if start <= d <= end]
+
+        docs = []
+        for day in days:
+            partition = await asyncio.to_thread(self.writer.read_partition, collection, day)
+            partition.sort(key=lambda d: str(d.get(date_field, "")))
+            docs.extend(partition)
+            if len(docs) >= limit:
+                break
+        return docs[:limit]
+
+    async def archive_summary(self) -> Dict:
+        """Partitions available on disk per collection"""
+        summary = {}
+        for collection in RETENTION_POLICIES:
+            partitions = self.writer.list_partitions(collection)
+            summary[collection] = {
+                "partitions": len(partitions),
+                "first_day": partitions[0] if partitions else None,
+                "last_day": partitions[-1] if partitions else None
+            }
+        return summary
@@ -0,0 +1,369 @@
+"""
+Agendador - Background Job Scheduler
+Runs registered jobs (CRM triggers, monthly billing) on cron-like schedules
+inside the API process. A lease document in MongoDB makes sure only one run of
+a given job happens at a time across uvicorn workers (and within one): each
+acquisition gets its own token, the lease is renewed while the job runs and
+only the holder of the token releases it. Runs missed while the API was down
+are caught up once on the next tick.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from date_codec import parse_datetime
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # pragma: no cover - Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = "America/Sao_Paulo"
+DEFAULT_TICK_SECONDS = 30
+DEFAULT_LEASE_SECONDS = 600
+MAX_MISSED_COUNT = 1000
+
+# (min, max) of each cron field: minute hour day-of-month month day-of-week
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+
+class CronSchedule:
+    """Five-field cron expression (`*`, lists, ranges and `/step`), evaluated in wall-clock time"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Expressão cron inválida: {expression}")
+
+        fields = [self._parse_field(part, low, high) for part, (low, high) in zip(parts, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        # Both 0 and 7 mean Sunday
+        self.weekdays = {0 if d == 7 else d for d in weekdays}
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> set:
+        # Day-of-week accepts 7 as an alias of Sunday
+        upper = 7 if (low, high) == (0, 6) else high
+        values = set()
+        try:
+            for item in field.split(","):
+                step = 1
+                if "/" in item:
+                    item, step_text = item.split("/", 1)
+                    step = int(step_text)
+                if item == "*":
+                    start, end = low, high
+                elif "-" in item:
+                    start, end = (int(v) for v in item.split("-", 1))
+                else:
+                    start = end = int(item)
+                    if step != 1:
+                        end = high
+                if step < 1 or start < low or end > upper or start > end:
+                    raise ValueError
+                values.update(range(start, end + 1, step))
+        except ValueError:
+            raise ValueError(f"Campo cron inválido: {field}")
+        return values
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: when both fields are restricted either one may match
+        if not self.any_day and not self.any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First naive wall-clock minute strictly after `after` matching the expression"""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Expressão cron nunca executa: {self.expression}")
+
+
+class SchedulerService:
+    """Cron-like job runner with a MongoDB lease per job"""
+
+    def __init__(
+        self,
+        db,
+        tick_seconds: int = DEFAULT_TICK_SECONDS,
+        lease_seconds: int = DEFAULT_LEASE_SECONDS,
+        timezone_name: str = DEFAULT_TIMEZONE
+    ):
+        self.db = db
+        self.tick_seconds = tick_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.jobs: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        try:
+            self.tz = ZoneInfo(timezone_name) if ZoneInfo else timezone.utc
+        except ZoneInfoNotFoundError:
+            logger.warning(f"Timezone {timezone_name} not available, scheduling in UTC")
+            self.tz = timezone.utc
+
+    def register(self, name: str, schedule: str, func: Callable[[], Awaitable], description: str = ""):
+        """Register a job; `func` is a coroutine function taking no arguments"""
+        CronSchedule(schedule)
+        self.jobs[name] = {"schedule": schedule, "func": func, "description": description}
+
+    async def ensure_indexes(self):
+        await self.db.scheduler_leases.create_index("id", unique=True)
+        await self.db.scheduler_jobs.create_index("id", unique=True)
+        await self.db.scheduler_runs.create_index([("job", 1), ("started_at", -1)])
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Scheduler started on worker {self.worker_id}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    # ---------- scheduling ----------
+
+    def _next_run(self, schedule: str, after: datetime) -> datetime:
+        local = after.astimezone(self.tz).replace(tzinfo=None)
+        return CronSchedule(schedule).next_after(local).replace(tzinfo=self.tz).astimezone(timezone.utc)
+
+    def _missed_runs(self, schedule: str, scheduled_for: datetime, now: datetime) -> int:
+        """Scheduled slots after `scheduled_for` that also passed before `now`"""
+        missed = 0
+        slot = self._next_run(schedule, scheduled_for)
+        while slot <= now and missed < MAX_MISSED_COUNT:
+            missed += 1
+            slot = self._next_run(schedule, slot)
+        return missed
+
+    async def tick(self):
+        now = datetime.now(timezone.utc)
+        for name in self.jobs:
+            try:
+                await self._maybe_run(name, now)
+            except Exception as e:
+                logger.error(f"Scheduler job {name} failed to start: {e}")
+
+    async def _maybe_run(self, name: str, now: datetime):
+        job = self.jobs[name]
+        state = await self.db.scheduler_jobs.find_one({"id": name}, {"_id": 0}) or {}
+        if not state.get("enabled", True):
+            return
+
+        schedule = state.get("schedule") or job["schedule"]
+        if not state.get("next_run_at"):
+            await self.db.scheduler_jobs.update_one(
+                {"id": name},
+                {"$set": {"next_run_at": self._next_run(schedule, now)}},
+                upsert=True
+            )
+            return
+        if parse_datetime(state["next_run_at"]) > now:
+            return
+
+        token = await self._acquire(name)
+        if token is None:
+            return
+        try:
+            # Another worker may have run the slot between our read and the lease
+            state = await self.db.scheduler_jobs.find_one({"id": name}, {"_id": 0}) or {}
+            scheduled_for = parse_datetime(state["next_run_at"])
+            if scheduled_for > now:
+                return
+
+            late_by = (now - scheduled_for).total_seconds()
+            await self._execute(
+                name,
+                token,
+                trigger="schedule",
+                scheduled_for=scheduled_for,
+                catch_up=late_by > self.tick_seconds * 2,
+                missed=self._missed_runs(schedule, scheduled_for, now)
+            )
+            await self.db.scheduler_jobs.update_one(
+                {"id": name},
+                {"$set": {"next_run_at": self._next_run(schedule, datetime.now(timezone.utc))}}
+            )
+        finally:
+            await self._release(name, token)
+
+    async def run_now(self, name: str) -> Dict:
+        """Run a job immediately (outside its schedule) if no worker holds its lease"""
+        if name not in self.jobs:
+            raise KeyError(name)
+        token = await self._acquire(name)
+        if token is None:
+            raise RuntimeError("Job já está em execução")
+        try:
+            return await self._execute(name, token, trigger="manual", scheduled_for=None, catch_up=False, missed=0)
+        finally:
+            await self._release(name, token)
+
+    async def _execute(self, name: str, token: str, **meta) -> Dict:
+        started = datetime.now(timezone.utc)
+        start_time = time.perf_counter()
+        run = {
+            "id": str(uuid.uuid4()),
+            "job": name,
+            "worker": self.worker_id,
+            "started_at": started,
+            **meta
+        }
+        heartbeat = asyncio.create_task(self._keep_lease(name, token))
+        try:
+            run["result"] = await self.jobs[name]["func"]()
+            run["status"] = "success"
+        except Exception as e:
+            logger.error(f"Scheduler job {name} raised: {e}")
+            run["status"] = "error"
+            run["error"] = str(e)
+        finally:
+            heartbeat.cancel()
+
+        run["duration_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        run["finished_at"] = datetime.now(timezone.utc)
+        await self.db.scheduler_runs.insert_one(dict(run))
+        await self.db.scheduler_jobs.update_one(
+            {"id": name},
+            {"$set": {
+                "last_run_at": run["started_at"],
+                "last_status": run["status"],
+                "last_duration_ms": run["duration_ms"]
+            }},
+            upsert=True
+        )
+        return run
+
+    # ---------- lease ----------
+
+    async def _acquire(self, name: str) -> Optional[str]:
+        """Token of a new lease on `name`, or None while any run (on any worker) holds it"""
+        now = datetime.now(timezone.utc)
+        token = uuid.uuid4().hex
+        try:
+            await self.db.scheduler_leases.find_one_and_update(
+                {"id": name, "expires_at": {"$lt": now}},
+                {"$set": {
+                    "owner": self.worker_id,
+                    "token": token,
+                    "acquired_at": now,
+                    "expires_at": now + timedelta(seconds=self.lease_seconds)
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return token
+        except DuplicateKeyError:
+            # The lease exists and is unexpired: another run holds it
+            return None
+
+    async def _renew(self, name: str, token: str) -> bool:
+        result = await self.db.scheduler_leases.update_one(
+            {"id": name, "token": token},
+            {"$set": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.matched_count == 1
+
+    async def _keep_lease(self, name: str, token: str):
+        """Extend the lease while the job runs, so long jobs are not started again elsewhere"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await self._renew(name, token):
+                    logger.warning(f"Scheduler lease for {name} was lost while the job was running")
+                    return
+            except Exception as e:
+                logger.error(f"Scheduler lease renewal for {name} failed: {e}")
+
+    async def _release(self, name: str, token: str):
+        await self.db.scheduler_leases.delete_one({"id": name, "token": token})
+
+    # ---------- admin ----------
+
+    async def list_jobs(self) -> List[Dict]:
+        states = {s["id"]: s for s in await self.db.scheduler_jobs.find({}, {"_id": 0}).to_list(None)}
+        leases = {l["id"]: l for l in await self.db.scheduler_leases.find({}, {"_id": 0}).to_list(None)}
+
+        jobs = []
+        for name, job in self.jobs.items():
+            state = states.get(name, {})
+            lease = leases.get(name)
+            jobs.append({
+                "name": name,
+                "description": job["description"],
+                "schedule": state.get("schedule") or job["schedule"],
+                "default_schedule": job["schedule"],
+                "enabled": state.get("enabled", True),
+                "next_run_at": state.get("next_run_at"),
+                "last_run_at": state.get("last_run_at"),
+                "last_status": state.get("last_status"),
+                "last_duration_ms": state.get("last_duration_ms"),
+                "running_on": lease["owner"] if lease else None
+            })
+        return jobs
+
+    async def list_runs(self, job: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        query = {"job": job} if job else {}
+        return await self.db.scheduler_runs.find(query, {"_id": 0}) \
+            .sort("started_at", -1).limit(limit).to_list(limit)
+
+    async def update_job(self, name: str, data: Dict) -> Dict:
+        """Override a job's schedule and/or enabled flag"""
+        if name not in self.jobs:
+            raise KeyError(name)
+
+        updates = {}
+        if "enabled" in data:
+            updates["enabled"] = bool(data["enabled"])
+        if "schedule" in data:
+            schedule = data["schedule"] or self.jobs[name]["schedule"]
+            CronSchedule(schedule)
+            updates["schedule"] = schedule
+            updates["next_run_at"] = self._next_run(schedule, datetime.now(timezone.utc))
+
+        if updates:
+            await self.db.scheduler_jobs.update_one({"id": name}, {"$set": updates}, upsert=True)
+        return next(j for j in await self.list_jobs() if j["name"] == name)
@@ -0,0 +1,292 @@
+"""
+Análise de SEO - Batch Page Analyzer
+Scores pages for on-page SEO (title, description, headings, content, images,
+links). Pages are fetched concurrently through one pooled httpx client with a
+per-host connection limit, parsed and scored in a process pool so the event
+loop never runs the HTML parser, and scores are cached by a hash of the page
+body so unchanged pages are not re-scored.
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+MAX_CONNECTIONS = 20
+MAX_CONNECTIONS_PER_HOST = 4
+REQUEST_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+MAX_BATCH_URLS = 200
+CACHE_SIZE = 2000
+USER_AGENT = "VigiLocSEOAnalyzer/1.0"
+# What a bad URL or a failed fetch raises: httpx.InvalidURL is not an HTTPError,
+# and urlsplit raises ValueError on e.g. an unclosed IPv6 bracket
+FETCH_ERRORS = (httpx.HTTPError, httpx.InvalidURL, ValueError)
+
+
+async def read_body(response: httpx.Response, max_bytes: int = MAX_PAGE_BYTES) -> str:
+    """Decoded body of a streamed response, reading no more than `max_bytes` from the network"""
+    body = bytearray()
+    async for chunk in response.aiter_bytes():
+        body += chunk
+        if len(body) >= max_bytes:
+            break
+    return bytes(body[:max_bytes]).decode(response.encoding or "utf-8", errors="replace")
+
+
+def analyze_html(html: str) -> Dict:
+    """Score one HTML document; runs in a worker process"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    # Initialize scores
+    title_score = 0
+    description_score = 0
+    keywords_score = 0
+    headings_score = 0
+    content_score = 0
+    images_score = 0
+    links_score = 0
+    issues = []
+    warnings = []
+    suggestions = []
+
+    # Analyze Title
+    title = None
+    title_tag = soup.find('title')
+    if title_tag:
+        title = title_tag.string or ""
+        if 30 <= len(title) <= 60:
+            title_score = 100
+        elif len(title) < 30:
+            title_score = 50
+            warnings.append(f"Título muito curto ({len(title)} caracteres). Recomendado: 30-60.")
+        else:
+            title_score = 70
+            warnings.append(f"Título muito longo ({len(title)} caracteres). Recomendado: 30-60.")
+    else:
+        issues.append("❌ Título ausente")
+
+    # Analyze Meta Description
+    desc = None
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    if meta_desc and meta_desc.get('content'):
+        desc = meta_desc.get('content', '')
+        if 120 <= len(desc) <= 160:
+            description_score = 100
+        elif len(desc) < 120:
+            description_score = 60
+            warnings.append(f"Meta description curta ({len(desc)} caracteres). Recomendado: 120-160.")
+        else:
+            description_score = 80
+            warnings.append(f"Meta description longa ({len(desc)} caracteres). Recomendado: 120-160.")
+    else:
+        issues.append("❌ Meta description ausente")
+
+    # Analyze Keywords
+    meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
+    if meta_keywords and meta_keywords.get('content'):
+        keywords_score = 100
+    else:
+        keywords_score = 50
+        suggestions.append("💡 Adicione meta keywords relevantes")
+
+    # Analyze Headings
+    h1_tags = soup.find_all('h1')
+    if len(h1_tags) == 1:
+        headings_score = 100
+    elif len(h1_tags) == 0:
+        issues.append("❌ Nenhum H1 encontrado")
+        headings_score = 0
+    else:
+        warnings.append(f"⚠️ Múltiplos H1 encontrados ({len(h1_tags)}). Use apenas um.")
+        headings_score = 50
+
+    h2_tags = soup.find_all('h2')
+    if len(h2_tags) >= 2:
+        headings_score = min(headings_score + 20, 100)
+    else:
+        suggestions.append("💡 Adicione mais H2 para estruturar o conteúdo")
+
+    # Analyze Content
+    paragraphs = soup.find_all('p')
+    total_text = ' '.join([p.get_text() for p in paragraphs])
+    word_count = len(total_text.split())
+
+    if word_count >= 300:
+        content_score = 100
+    elif word_count >= 150:
+        content_score = 70
+        suggestions.append(f"💡 Conteúdo com {word_count} palavras. Recomendado: 300+")
+    else:
+        content_score = 40
+        warnings.append(f"⚠️ Conteúdo muito curto ({word_count} palavras)")
+
+    # Analyze Images
+    images = soup.find_all('img')
+    images_with_alt = [img for img in images if img.get('alt')]
+    if len(images) > 0:
+        images_score = int((len(images_with_alt) / len(images)) * 100)
+        if images_score < 100:
+            warnings.append(f"⚠️ {len(images) - len(images_with_alt)} imagens sem atributo ALT")
+    else:
+        images_score = 100
+
+    # Analyze Links
+    links = soup.find_all('a')
+    internal_links = [a for a in links if a.get('href', '').startswith('/') or 'vigiloc' in a.get('href', '')]
+
+    if len(internal_links) >= 3:
+        links_score = 100
+    elif len(internal_links) >= 1:
+        links_score = 70
+        suggestions.append("💡 Adicione mais links internos")
+    else:
+        links_score = 40
+        warnings.append("⚠️ Poucos ou nenhum link interno")
+
+    # Calculate overall score
+    overall_score = int((
+        title_score + description_score + keywords_score +
+        headings_score + content_score + images_score + links_score
+    ) / 7)
+
+    return {
+        "score": overall_score,
+        "title_score": title_score,
+        "description_score": description_score,
+        "keywords_score": keywords_score,
+        "headings_score": headings_score,
+        "content_score": content_score,
+        "images_score": images_score,
+        "links_score": links_score,
+        "issues": issues,
+        "warnings": warnings,
+        "suggestions": suggestions,
+        "title": title,
+        "meta_description": desc,
+        "links": [a.get('href') for a in links if a.get('href')]
+    }
+
+
+class SeoAnalyzer:
+    """Pooled fetching plus off-loop, content-hash-cached scoring"""
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        per_host: int = MAX_CONNECTIONS_PER_HOST,
+        workers: Optional[int] = None
+    ):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                headers={"User-Agent": USER_AGENT}
+            )
+        return self._client
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: never fork a process that holds the event loop and Mongo client threads
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        return self._host_slots[host]
+
+    async def fetch(self, url: str) -> Tuple[httpx.Response, str]:
+        """GET through the shared client, at most `per_host` at a time per host; returns the response and its body"""
+        async with self._host_slot(url):
+            async with self.client.stream("GET", url) as response:
+                return response, await read_body(response)
+
+    async def score(self, html: str) -> Dict:
+        """Scores for `html`, from the cache when the same body was scored before"""
+        digest = hashlib.sha256(html.encode("utf-8", "surrogatepass")).hexdigest()
+        cached = self._cache.get(digest)
+        if cached is not None:
+            self._cache.move_to_end(digest)
+            return {**cached, "content_hash": digest, "cached": True}
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.pool, analyze_html, html)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool on the next call
+            self._pool = None
+            raise
+        self._cache[digest] = result
+        if len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return {**result, "content_hash": digest, "cached": False}
+
+    async def analyze(self, url: str) -> Dict:
+        """Fetch and score one page; raises one of FETCH_ERRORS when the URL is bad or the fetch fails"""
+        response, html = await self.fetch(url)
+        result = await self.score(html)
+        return {
+            "page_url": url,
+            "status_code": response.status_code,
+            **result,
+            "analyzed_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    async def analyze_many(self, urls: List[str]) -> List[Dict]:
+        """Analyze `urls` concurrently; a failed page gets an `error` instead of scores"""
+        async def one(url: str) -> Dict:
+            try:
+                return await self.analyze(url)
+            except FETCH_ERRORS as e:
+                return {"page_url": url, "error": f"{type(e).__name__}: {e}"}
+
+        # Pool limits bound the concurrency; dict.fromkeys drops repeated URLs, keeping order
+        return await asyncio.gather(*(one(url) for url in dict.fromkeys(urls)))
+
+    def status(self) -> Dict:
+        return {
+            "parser": HTML_PARSER,
+            "workers": self.workers,
+            "max_connections": self.max_connections,
+            "per_host": self.per_host,
+            "cached_pages": len(self._cache)
+        }
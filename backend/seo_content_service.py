@@ -0,0 +1,288 @@
+"""
+Conteúdo para Robôs - JSON-LD and llms.txt Cache
+The JSON-LD graph and llms.txt are built once per content version and kept as
+encoded bytes plus gzip and an ETag. The published review count and rating sum
+behind the aggregateRating live in db.review_stats and are moved with $inc by
+the review handlers, so a rebuild never scans the reviews.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from cached_document import CachedDocument
+
+logger = logging.getLogger(__name__)
+
+REVIEW_STATS_ID = "social_reviews"
+# Average shown while there are no published reviews (previous behaviour)
+DEFAULT_RATING = 5.0
+STRUCTURED_DATA_REVIEWS = 10
+
+
+def _published_rating(review: Optional[Dict]) -> Dict[str, float]:
+    """Contribution of one review to the stats: {count, rating_sum}"""
+    if not review or not review.get("published"):
+        return {"count": 0, "rating_sum": 0}
+    return {"count": 1, "rating_sum": review.get("rating", 5)}
+
+
+class SeoContentService:
+    """Byte cache of the crawler documents plus incremental review stats"""
+
+    def __init__(self, db, site_url: str):
+        self.db = db
+        self.site_url = site_url.rstrip("/")
+        self._builders: Dict[str, Callable] = {
+            "structured_data": self._build_structured_data,
+            "llms_txt": self._build_llms_txt
+        }
+        self._cache: Dict[str, CachedDocument] = {}
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    async def ensure_indexes(self):
+        await self.db.review_stats.create_index("id", unique=True)
+        await self.db.social_reviews.create_index([("published", 1), ("created_at", -1)])
+        if not await self.db.review_stats.count_documents({"id": REVIEW_STATS_ID}, limit=1):
+            await self.rebuild_review_stats()
+
+    def clear(self):
+        """Drop the cached documents; the next request rebuilds them"""
+        self._version += 1
+        self._cache.clear()
+
+    async def get(self, name: str) -> CachedDocument:
+        document = self._cache.get(name)
+        if document is not None:
+            return document
+        async with self._lock:
+            if name not in self._cache:
+                version = self._version
+                document = await self._builders[name]()
+                # Skip caching a build that raced with an invalidation
+                if version == self._version:
+                    self._cache[name] = document
+                return document
+            return self._cache[name]
+
+    # ---------- review stats ----------
+
+    async def rebuild_review_stats(self) -> Dict:
+        """Recount published reviews (initial load, or to repair drift)"""
+        rows = await self.db.social_reviews.aggregate([
+            {"$match": {"published": True}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "rating_sum": {"$sum": {"$ifNull": ["$rating", 5]}}}}
+        ]).to_list(1)
+        stats = {"count": rows[0]["count"], "rating_sum": rows[0]["rating_sum"]} if rows else {"count": 0, "rating_sum": 0}
+        await self.db.review_stats.update_one(
+            {"id": REVIEW_STATS_ID},
+            {"$set": {**stats, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        self.clear()
+        return stats
+
+    async def apply_review_change(self, before: Optional[Dict], after: Optional[Dict]):
+        """Move the stats by the difference between a review's old and new state (None = absent)"""
+        old, new = _published_rating(before), _published_rating(after)
+        delta = {key: new[key] - old[key] for key in old}
+        if not any(delta.values()):
+            return
+        await self.db.review_stats.update_one(
+            {"id": REVIEW_STATS_ID},
+            {"$inc": delta, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def review_stats(self) -> Dict:
+        stats = await self.db.review_stats.find_one({"id": REVIEW_STATS_ID}, {"_id": 0}) or {}
+        count = stats.get("count", 0)
+        average = stats.get("rating_sum", 0) / count if count else DEFAULT_RATING
+        return {"count": count, "average": round(average, 2)}
+
+    # ---------- documents ----------
+
+    async def _published_services(self):
+        return await self.db.services.find({"published": True}, {"_id": 0}).sort("order", 1).to_list(100)
+
+    async def _build_structured_data(self) -> CachedDocument:
+        site = self.site_url
+        services = await self._published_services()
+        reviews = await self.db.social_reviews.find(
+            {"published": True}, {"_id": 0, "author_name": 1, "rating": 1, "text": 1}
+        ).sort("created_at", -1).to_list(STRUCTURED_DATA_REVIEWS)
+        stats = await self.review_stats()
+
+        aggregate_rating = {
+            "@type": "AggregateRating",
+            "ratingValue": round(stats["average"], 1),
+            "reviewCount": stats["count"],
+            "bestRating": 5,
+            "worstRating": 1
+        }
+        address = {
+            "@type": "PostalAddress",
+            "addressLocality": "São Paulo",
+            "addressRegion": "SP",
+            "addressCountry": "BR"
+        }
+        graph = [
+            {
+                "@type": "Organization",
+                "@id": f"{site}/#organization",
+                "name": "VigiLoc",
+                "url": site,
+                "logo": {
+                    "@type": "ImageObject",
+                    "url": f"{site}/logo512.png"
+                },
+                "description": "Líder em soluções de automação e segurança eletrônica para condomínios e empresas",
+                "address": address,
+                "areaServed": {
+                    "@type": "GeoCircle",
+                    "geoMidpoint": {
+                        "@type": "GeoCoordinates",
+                        "latitude": -23.5505,
+                        "longitude": -46.6333
+                    },
+                    "geoRadius": "100000"
+                },
+                "sameAs": [],
+                "aggregateRating": aggregate_rating
+            },
+            {
+                "@type": "WebSite",
+                "@id": f"{site}/#website",
+                "url": site,
+                "name": "VigiLoc",
+                "description": "Soluções em Automação e Segurança Eletrônica",
+                "publisher": {"@id": f"{site}/#organization"},
+                "inLanguage": "pt-BR"
+            },
+            {
+                "@type": "LocalBusiness",
+                "@id": f"{site}/#localbusiness",
+                "name": "VigiLoc",
+                "image": f"{site}/logo512.png",
+                "url": site,
+                "telephone": "",
+                "priceRange": "$$",
+                "address": address,
+                "geo": {
+                    "@type": "GeoCoordinates",
+                    "latitude": -23.5505,
+                    "longitude": -46.6333
+                },
+                "openingHoursSpecification": {
+                    "@type": "OpeningHoursSpecification",
+                    "dayOfWeek": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+                    "opens": "08:00",
+                    "closes": "18:00"
+                },
+                "aggregateRating": aggregate_rating
+            }
+        ]
+
+        for service in services:
+            graph.append({
+                "@type": "Service",
+                "name": service.get("name"),
+                "description": service.get("shortDescription"),
+                "url": f"{site}/servico/{service.get('slug')}",
+                "provider": {"@id": f"{site}/#organization"},
+                "areaServed": {
+                    "@type": "Place",
+                    "name": "São Paulo, Brasil"
+                }
+            })
+
+        for review in reviews:
+            graph.append({
+                "@type": "Review",
+                "author": {
+                    "@type": "Person",
+                    "name": review.get("author_name")
+                },
+                "reviewRating": {
+                    "@type": "Rating",
+                    "ratingValue": review.get("rating", 5),
+                    "bestRating": 5,
+                    "worstRating": 1
+                },
+                "reviewBody": review.get("text"),
+                "itemReviewed": {"@id": f"{site}/#organization"}
+            })
+
+        document = {"@context": "https://schema.org", "@graph": graph}
+        body = json.dumps(jsonable_encoder(document), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return CachedDocument("application/json", body)
+
+    async def _build_llms_txt(self) -> CachedDocument:
+        site = self.site_url
+        services = await self._published_services()
+
+        lines = [
+            "# =====================================================",
+            "# VIGILOC - llms.txt",
+            "# Informações para Large Language Models (LLMs)",
+            f"# Website: {site}",
+            f"# Última atualização: {datetime.now(timezone.utc).strftime('%Y-%m-%d')}",
+            "# =====================================================",
+            "",
+            "# Sobre a Empresa",
+            "> VigiLoc é líder em soluções de automação e segurança eletrônica para condomínios e empresas no Brasil.",
+            "> Fundada há mais de 10 anos, atendemos mais de 500 clientes com 99% de satisfação.",
+            "> Localização: São Paulo, Brasil",
+            f"> Website: {site}",
+            "> Contato: WhatsApp disponível no site",
+            "",
+            "# Serviços Principais"
+        ]
+        for service in services:
+            lines += [
+                "",
+                f"## {service.get('name', 'Serviço')}",
+                f"> {service.get('shortDescription', '')}",
+                f"> URL: {site}/servico/{service.get('slug', '')}"
+            ]
+        lines += [
+            "",
+            "# Diferenciais",
+            "- Monitoramento 24/7",
+            "- Suporte técnico especializado",
+            "- Mais de 10 anos de experiência",
+            "- 500+ clientes atendidos",
+            "- 99% de satisfação",
+            "- Tecnologia de ponta com IA",
+            "- Instalação profissional",
+            "- Garantia estendida",
+            "",
+            "# Áreas de Atuação",
+            "- Condomínios residenciais e comerciais",
+            "- Empresas e escritórios",
+            "- Indústrias",
+            "- Hospitais e clínicas",
+            "- Escolas e universidades",
+            "",
+            "# Região de Atendimento",
+            "- São Paulo (SP) e Grande São Paulo",
+            "- Região Metropolitana",
+            "- Interior de São Paulo",
+            "",
+            "# Contato",
+            f"- Website: {site}",
+            f"- Página de Contato: {site}/contato",
+            "- WhatsApp: Disponível no site",
+            "",
+            "# Informações Técnicas",
+            "- Idioma: Português Brasileiro (pt-BR)",
+            "- Moeda: Real Brasileiro (BRL)",
+            "- Setor: Segurança Eletrônica / Automação Predial",
+            ""
+        ]
+        return CachedDocument("text/plain; charset=utf-8", "\n".join(lines).encode("utf-8"))
@@ -0,0 +1,396 @@
+"""
+Auditoria de SEO - Site Crawl Engine
+Crawls a whole site for an SEO audit: seeds from the sitemap(s) announced in
+robots.txt (or /sitemap.xml), honours robots.txt rules, and walks internal
+links with a bounded number of concurrent fetches. Each page's score, title,
+description and status go to db.seo_crawl_pages; broken links and duplicate
+titles/descriptions are summarised when the job finishes. Job progress lives in
+db.seo_crawl_jobs so any worker can report it.
+"""
+
+import asyncio
+import gzip
+import logging
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+from pymongo import UpdateOne
+
+from seo_analyzer import FETCH_ERRORS, USER_AGENT, read_body
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PAGES = 2000
+MAX_PAGES_LIMIT = 20000
+DEFAULT_CONCURRENCY = 8
+MAX_CONCURRENCY = 20
+MAX_SITEMAPS = 50
+MAX_REFERRERS = 5
+REFERRER_WRITE_BATCH = 1000
+LOW_SCORE = 60
+# Progress (and the cancel flag) is synced with the job document this often
+PROGRESS_INTERVAL = 1.0
+# A running job whose worker has not written progress for this long is dead
+STALE_AFTER = timedelta(minutes=2)
+
+PAGE_FILTERS = {
+    "broken": {"$or": [{"status_code": {"$gte": 400}}, {"error": {"$ne": None}}]},
+    "low_score": {"score": {"$lt": LOW_SCORE}},
+    "missing_title": {"html": True, "title": {"$in": [None, ""]}},
+    "missing_description": {"html": True, "meta_description": {"$in": [None, ""]}}
+}
+PAGE_LIST_PROJECTION = {"_id": 0, "job_id": 0}
+
+
+def _normalize(url: str) -> str:
+    url, _ = urldefrag(url)
+    parts = urlsplit(url)
+    return parts._replace(netloc=parts.netloc.lower(), path=parts.path or "/").geturl()
+
+
+def _sitemap_locs(body: bytes) -> Tuple[List[str], List[str]]:
+    """(<url> locs, nested <sitemap> locs) of a urlset or sitemap index"""
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    root = ET.fromstring(body)
+    locs = [element.text.strip() for element in root.iter() if element.tag.endswith("loc") and element.text]
+    return ([], locs) if root.tag.endswith("sitemapindex") else (locs, [])
+
+
+class CrawlJob:
+    """In-process state of one running crawl"""
+
+    def __init__(self, job_id: str, site_url: str, max_pages: int, concurrency: int):
+        self.id = job_id
+        self.site_url = site_url
+        self.host = urlsplit(site_url).netloc.lower()
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.seen: Set[str] = set()
+        self.referrers: Dict[str, List[str]] = {}
+        self.robots: Optional[RobotFileParser] = None
+        self.crawled = 0
+        self.failed = 0
+        self.skipped_by_robots = 0
+        self.cancelled = False
+
+    def is_internal(self, url: str) -> bool:
+        parts = urlsplit(url)
+        return parts.scheme in ("http", "https") and parts.netloc.lower() == self.host
+
+    def allowed(self, url: str) -> bool:
+        return self.robots is None or self.robots.can_fetch(USER_AGENT, url)
+
+    def enqueue(self, url: str, depth: int, referrer: Optional[str] = None) -> bool:
+        url = _normalize(url)
+        if referrer is not None:
+            refs = self.referrers.setdefault(url, [])
+            if len(refs) < MAX_REFERRERS and referrer not in refs:
+                refs.append(referrer)
+        if url in self.seen or len(self.seen) >= self.max_pages or not self.is_internal(url):
+            return False
+        if not self.allowed(url):
+            self.seen.add(url)
+            self.skipped_by_robots += 1
+            return False
+        self.seen.add(url)
+        self.queue.put_nowait((url, depth))
+        return True
+
+
+class SeoCrawlService:
+    """Starts crawl jobs and serves their progress and results"""
+
+    def __init__(self, db, analyzer):
+        self.db = db
+        self.analyzer = analyzer
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def ensure_indexes(self):
+        await self.db.seo_crawl_jobs.create_index("id", unique=True)
+        await self.db.seo_crawl_jobs.create_index([("created_at", -1)])
+        await self.db.seo_crawl_pages.create_index([("job_id", 1), ("url", 1)], unique=True)
+        await self.db.seo_crawl_pages.create_index([("job_id", 1), ("score", 1)])
+
+    # ---------- jobs ----------
+
+    async def start(self, site_url: str, max_pages: int = DEFAULT_MAX_PAGES, concurrency: int = DEFAULT_CONCURRENCY) -> Dict:
+        parts = urlsplit(site_url or "")
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            raise ValueError("URL do site inválida")
+        if not 1 <= max_pages <= MAX_PAGES_LIMIT:
+            raise ValueError(f"max_pages deve estar entre 1 e {MAX_PAGES_LIMIT}")
+        if not 1 <= concurrency <= MAX_CONCURRENCY:
+            raise ValueError(f"concurrency deve estar entre 1 e {MAX_CONCURRENCY}")
+        site_url = f"{parts.scheme}://{parts.netloc.lower()}"
+        await self._expire_stale()
+        if await self.db.seo_crawl_jobs.count_documents({"site_url": site_url, "status": {"$in": ["running", "cancelling"]}}, limit=1):
+            raise RuntimeError("Já existe uma auditoria em andamento para este site")
+
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "site_url": site_url,
+            "status": "running",
+            "max_pages": max_pages,
+            "concurrency": concurrency,
+            "pages_discovered": 0,
+            "pages_crawled": 0,
+            "pages_failed": 0,
+            "skipped_by_robots": 0,
+            "summary": None,
+            "error": None,
+            "created_at": now,
+            "heartbeat_at": now,
+            "finished_at": None
+        }
+        await self.db.seo_crawl_jobs.insert_one(job)
+        job.pop("_id", None)
+
+        state = CrawlJob(job["id"], job["site_url"], max_pages, concurrency)
+        self._tasks[job["id"]] = asyncio.create_task(self._run(state))
+        return job
+
+    async def _expire_stale(self):
+        await self.db.seo_crawl_jobs.update_many(
+            {"status": {"$in": ["running", "cancelling"]}, "heartbeat_at": {"$lt": datetime.now(timezone.utc) - STALE_AFTER}},
+            {"$set": {"status": "failed", "error": "Auditoria interrompida", "finished_at": datetime.now(timezone.utc)}}
+        )
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        await self._expire_stale()
+        return await self.db.seo_crawl_jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def list_jobs(self, limit: int = 20) -> List[Dict]:
+        await self._expire_stale()
+        return await self.db.seo_crawl_jobs.find({}, {"_id": 0}).sort("created_at", -1).to_list(limit)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Ask the job to stop; the worker running it sees the flag on its next progress sync"""
+        result = await self.db.seo_crawl_jobs.update_one(
+            {"id": job_id, "status": "running"},
+            {"$set": {"status": "cancelling"}}
+        )
+        return result.modified_count > 0
+
+    async def get_pages(self, job_id: str, issue: Optional[str] = None, after: Optional[str] = None, limit: int = 100) -> Dict:
+        """Crawled pages by URL, keyset-paginated on the URL"""
+        query: Dict = {"job_id": job_id}
+        if issue:
+            if issue not in PAGE_FILTERS:
+                raise ValueError(f"Filtro inválido: {issue}")
+            query.update(PAGE_FILTERS[issue])
+        if after:
+            query["url"] = {"$gt": after}
+        limit = max(1, min(limit, 500))
+        items = await self.db.seo_crawl_pages.find(query, PAGE_LIST_PROJECTION).sort("url", 1).limit(limit + 1).to_list(limit + 1)
+        has_more = len(items) > limit
+        items = items[:limit]
+        return {"items": items, "next_cursor": items[-1]["url"] if has_more else None, "has_more": has_more}
+
+    # ---------- crawling ----------
+
+    async def _fetch(self, url: str) -> httpx.Response:
+        # The crawl's own worker count bounds concurrency, so the analyzer's
+        # per-host slots (sized for ad-hoc analysis) are bypassed here
+        return await self.analyzer.client.get(url)
+
+    async def _load_robots(self, job: CrawlJob) -> List[str]:
+        """Parse robots.txt into the job; returns the sitemaps it announces"""
+        robots = RobotFileParser()
+        try:
+            response = await self._fetch(urljoin(job.site_url, "/robots.txt"))
+            if response.status_code >= 500:
+                # Unreachable robots.txt: crawl nothing rather than ignore the rules
+                robots.disallow_all = True
+            elif response.status_code >= 400:
+                robots.allow_all = True
+            else:
+                robots.parse(response.text.splitlines())
+        except httpx.HTTPError:
+            robots.allow_all = True
+        job.robots = robots
+        return robots.site_maps() or []
+
+    async def _seed_from_sitemaps(self, job: CrawlJob, sitemaps: List[str]):
+        pending = sitemaps or [urljoin(job.site_url, "/sitemap.xml")]
+        visited = set()
+        while pending and len(visited) < MAX_SITEMAPS:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+            try:
+                response = await self._fetch(sitemap_url)
+                if response.status_code != 200:
+                    continue
+                pages, nested = _sitemap_locs(response.content)
+            except (httpx.HTTPError, ET.ParseError, OSError) as e:
+                logger.warning(f"SEO crawl {job.id}: sitemap {sitemap_url} unreadable: {e}")
+                continue
+            pending += nested
+            for url in pages:
+                job.enqueue(url, 0)
+
+    async def _crawl_page(self, job: CrawlJob, url: str, depth: int):
+        page = {
+            "job_id": job.id, "url": url, "depth": depth, "status_code": None, "error": None,
+            "html": False, "score": None, "title": None, "meta_description": None,
+            "internal_links": 0, "crawled_at": datetime.now(timezone.utc)
+        }
+        try:
+            # Streamed: only HTML bodies are read, and no more than MAX_PAGE_BYTES of them
+            async with self.analyzer.client.stream("GET", url) as response:
+                page["status_code"] = response.status_code
+                is_html = response.status_code < 400 and "html" in response.headers.get("content-type", "")
+                html = await read_body(response) if is_html else None
+            final_url = _normalize(str(response.url))
+            if final_url != url:
+                page["redirected_to"] = final_url
+                job.enqueue(final_url, depth, referrer=url)
+            if is_html:
+                result = await self.analyzer.score(html)
+                page.update({
+                    "html": True,
+                    "score": result["score"],
+                    "title": (result["title"] or "").strip() or None,
+                    "meta_description": (result["meta_description"] or "").strip() or None,
+                    "issues": result["issues"],
+                    "warnings": result["warnings"],
+                    "content_hash": result["content_hash"]
+                })
+                links = {_normalize(urljoin(final_url, href)) for href in result["links"]}
+                internal = [link for link in links if job.is_internal(link)]
+                page["internal_links"] = len(internal)
+                for link in internal:
+                    job.enqueue(link, depth + 1, referrer=url)
+        except FETCH_ERRORS as e:
+            page["error"] = f"{type(e).__name__}: {e}"
+        except Exception as e:
+            logger.error(f"SEO crawl {job.id}: failed to process {url}: {e}")
+            page["error"] = str(e)
+
+        job.crawled += 1
+        if page["error"] or (page["status_code"] or 0) >= 400:
+            job.failed += 1
+        await self.db.seo_crawl_pages.replace_one({"job_id": job.id, "url": url}, page, upsert=True)
+
+    async def _worker(self, job: CrawlJob):
+        while True:
+            url, depth = await job.queue.get()
+            try:
+                if not job.cancelled:
+                    await self._crawl_page(job, url, depth)
+            finally:
+                job.queue.task_done()
+
+    async def _sync_progress(self, job: CrawlJob):
+        state = await self.db.seo_crawl_jobs.find_one_and_update(
+            {"id": job.id},
+            {"$set": {
+                "pages_discovered": len(job.seen) - job.skipped_by_robots,
+                "pages_crawled": job.crawled,
+                "pages_failed": job.failed,
+                "skipped_by_robots": job.skipped_by_robots,
+                "heartbeat_at": datetime.now(timezone.utc)
+            }},
+            projection={"_id": 0, "status": 1}
+        )
+        if state and state["status"] == "cancelling":
+            job.cancelled = True
+
+    async def _run(self, job: CrawlJob):
+        workers: List[asyncio.Task] = []
+        try:
+            sitemaps = await self._load_robots(job)
+            await self._seed_from_sitemaps(job, sitemaps)
+            job.enqueue(job.site_url + "/", 0)
+
+            workers = [asyncio.create_task(self._worker(job)) for _ in range(job.concurrency)]
+            drained = asyncio.create_task(job.queue.join())
+            while not drained.done():
+                await asyncio.wait([drained], timeout=PROGRESS_INTERVAL)
+                await self._sync_progress(job)
+            await self._sync_progress(job)
+
+            await self._save_referrers(job)
+            summary = await self._summarize(job.id)
+            await self.db.seo_crawl_jobs.update_one({"id": job.id}, {"$set": {
+                "status": "cancelled" if job.cancelled else "completed",
+                "summary": summary,
+                "finished_at": datetime.now(timezone.utc)
+            }})
+            logger.info(f"SEO crawl {job.id} finished: {job.crawled} pages, {job.failed} failed")
+        except Exception as e:
+            logger.error(f"SEO crawl {job.id} failed: {e}")
+            await self.db.seo_crawl_jobs.update_one({"id": job.id}, {"$set": {
+                "status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc)
+            }})
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self._tasks.pop(job.id, None)
+
+    async def _save_referrers(self, job: CrawlJob):
+        """Store the collected referrers with unordered bulk writes"""
+        updates = [
+            UpdateOne({"job_id": job.id, "url": url}, {"$set": {"referrers": refs}})
+            for url, refs in job.referrers.items()
+        ]
+        for start in range(0, len(updates), REFERRER_WRITE_BATCH):
+            await self.db.seo_crawl_pages.bulk_write(updates[start:start + REFERRER_WRITE_BATCH], ordered=False)
+
+    async def _summarize(self, job_id: str) -> Dict:
+        """Score stats, broken links and duplicate titles/descriptions in one aggregation"""
+        def duplicates(field: str) -> List[Dict]:
+            return [
+                {"$match": {"html": True, field: {"$ne": None}}},
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}, "urls": {"$push": "$url"}}},
+                {"$match": {"count": {"$gt": 1}}},
+                {"$sort": {"count": -1}},
+                {"$limit": 100},
+                {"$project": {"_id": 0, "value": "$_id", "count": 1, "urls": {"$slice": ["$urls", 20]}}}
+            ]
+
+        rows = await self.db.seo_crawl_pages.aggregate([
+            {"$match": {"job_id": job_id}},
+            {"$facet": {
+                "scores": [
+                    {"$match": {"score": {"$ne": None}}},
+                    {"$group": {
+                        "_id": None,
+                        "average": {"$avg": "$score"},
+                        "low": {"$sum": {"$cond": [{"$lt": ["$score", LOW_SCORE]}, 1, 0]}},
+                        "pages": {"$sum": 1}
+                    }}
+                ],
+                "broken_links": [
+                    {"$match": PAGE_FILTERS["broken"]},
+                    {"$sort": {"url": 1}},
+                    {"$limit": 500},
+                    {"$project": {"_id": 0, "url": 1, "status_code": 1, "error": 1, "referrers": 1}}
+                ],
+                "duplicate_titles": duplicates("title"),
+                "duplicate_descriptions": duplicates("meta_description")
+            }}
+        ], allowDiskUse=True).to_list(1)
+        facets = rows[0] if rows else {}
+        scores = (facets.get("scores") or [{}])[0]
+        return {
+            "average_score": round(scores["average"], 1) if scores.get("average") is not None else None,
+            "scored_pages": scores.get("pages", 0),
+            "low_score_pages": scores.get("low", 0),
+            "broken_links": facets.get("broken_links", []),
+            "duplicate_titles": facets.get("duplicate_titles", []),
+            "duplicate_descriptions": facets.get("duplicate_descriptions", [])
+        }
+
+    async def stop(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
@@ -0,0 +1,281 @@
+"""
+Arquivos de SEO - Versioned SEO File Store
+robots.txt, llms.txt, manifest.json and security.txt in the frontend public
+folder. Disk I/O runs in a thread and every write is a temp file + fsync +
+rename, so readers never see a half-written file. Each save is a version in
+db.seo_file_versions: the newest is stored in full and older ones as line
+diffs against their successor (reverse deltas), so any version can be rebuilt
+and restored while the history stays small. Current contents are cached in
+memory and revalidated by mtime.
+"""
+
+import asyncio
+import difflib
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+from pymongo.errors import DuplicateKeyError
+
+FRONTEND_PUBLIC = "/app/frontend/public"
+# type -> (name, path relative to the public folder)
+SEO_FILE_TYPES = {
+    "robots": ("robots.txt", "robots.txt"),
+    "llms": ("llms.txt", "llms.txt"),
+    "manifest": ("manifest.json", "manifest.json"),
+    "security": ("security.txt", ".well-known/security.txt")
+}
+MAX_VERSIONS = 50
+MAX_FILE_BYTES = 512 * 1024
+
+
+def _digest(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def make_diff(base: str, target: str) -> List:
+    """Ops rebuilding `target` from `base`: [i1, i2] copies base lines, [text] inserts"""
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(["".join(target_lines[j1:j2])])
+    return ops
+
+
+def apply_diff(base: str, ops: List) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if len(op) == 2:
+            parts.extend(base_lines[op[0]:op[1]])
+        else:
+            parts.append(op[0])
+    return "".join(parts)
+
+
+def _read(path: str) -> Optional[Tuple[str, os.stat_result]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            stat = os.fstat(f.fileno())
+            return f.read(), stat
+    except FileNotFoundError:
+        return None
+
+
+def _stat(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def atomic_write(path: str, content: Union[str, bytes]) -> os.stat_result:
+    """Write through a temp file in the same directory and os.replace it over `path`"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return os.stat(path)
+
+
+class SeoFileStore:
+    """Cached, versioned, atomically written SEO files"""
+
+    def __init__(self, db, root: str = FRONTEND_PUBLIC, max_versions: int = MAX_VERSIONS):
+        self.db = db
+        self.root = root
+        self.max_versions = max_versions
+        # type -> {"content", "stamp"}; stamp is (mtime_ns, size) of the cached read
+        self._cache: Dict[str, Dict] = {}
+        self._locks = {file_type: asyncio.Lock() for file_type in SEO_FILE_TYPES}
+
+    async def ensure_indexes(self):
+        await self.db.seo_file_versions.create_index([("file_type", 1), ("version", -1)], unique=True)
+
+    def path(self, file_type: str) -> str:
+        if file_type not in SEO_FILE_TYPES:
+            raise KeyError(file_type)
+        return os.path.join(self.root, SEO_FILE_TYPES[file_type][1])
+
+    # ---------- reads ----------
+
+    async def read(self, file_type: str) -> Optional[Dict]:
+        """Current content with size/modified, or None when the file does not exist"""
+        path = self.path(file_type)
+        stat = await asyncio.to_thread(_stat, path)
+        if stat is None:
+            self._cache.pop(file_type, None)
+            return None
+        cached = self._cache.get(file_type)
+        if cached is None or cached["stamp"] != (stat.st_mtime_ns, stat.st_size):
+            result = await asyncio.to_thread(_read, path)
+            if result is None:
+                self._cache.pop(file_type, None)
+                return None
+            content, stat = result
+            cached = {"content": content, "stamp": (stat.st_mtime_ns, stat.st_size), "mtime": stat.st_mtime}
+            self._cache[file_type] = cached
+        return {
+            "content": cached["content"],
+            "size": cached["stamp"][1],
+            "modified": datetime.fromtimestamp(cached["mtime"], timezone.utc)
+        }
+
+    async def list_files(self) -> List[Dict]:
+        files = []
+        for file_type, (name, _) in SEO_FILE_TYPES.items():
+            info = {"name": name, "path": self.path(file_type), "type": file_type, "editable": True}
+            try:
+                current = await self.read(file_type)
+            except (OSError, UnicodeDecodeError) as e:
+                files.append({**info, "error": str(e), "exists": False})
+                continue
+            if current is None:
+                files.append({**info, "exists": False})
+                continue
+            head = await self._head(file_type)
+            files.append({
+                **info,
+                "size": current["size"],
+                "modified": current["modified"].isoformat(),
+                "content": current["content"],
+                "lines": len(current["content"].split('\n')),
+                "version": head["version"] if head else None,
+                "exists": True
+            })
+        return files
+
+    # ---------- versions ----------
+
+    async def _head(self, file_type: str) -> Optional[Dict]:
+        return await self.db.seo_file_versions.find_one(
+            {"file_type": file_type}, {"_id": 0}, sort=[("version", -1)]
+        )
+
+    async def versions(self, file_type: str) -> List[Dict]:
+        self.path(file_type)
+        return await self.db.seo_file_versions.find(
+            {"file_type": file_type}, {"_id": 0, "content": 0, "diff": 0}
+        ).sort("version", -1).to_list(self.max_versions + 1)
+
+    async def get_version(self, file_type: str, version: int) -> str:
+        """Rebuild `version` by walking the reverse deltas down from the newest full copy"""
+        self.path(file_type)
+        docs = await self.db.seo_file_versions.find(
+            {"file_type": file_type, "version": {"$gte": version}}, {"_id": 0}
+        ).sort("version", -1).to_list(None)
+        if not docs or docs[-1]["version"] != version:
+            raise KeyError(version)
+        content = None
+        for doc in docs:
+            content = doc["content"] if "content" in doc else apply_diff(content, doc["diff"])
+        if _digest(content) != docs[-1]["sha256"]:
+            raise RuntimeError(f"Histórico corrompido na versão {version}")
+        return content
+
+    async def diff(self, file_type: str, version: int) -> Dict:
+        """Unified diff from `version` to the current file"""
+        old = await self.get_version(file_type, version)
+        current = await self.read(file_type)
+        new = current["content"] if current else ""
+        lines = difflib.unified_diff(
+            old.splitlines(keepends=True), new.splitlines(keepends=True),
+            fromfile=f"v{version}", tofile="atual"
+        )
+        return {"version": version, "diff": "".join(lines), "content": old}
+
+    async def _claim(self, file_type: str, content: str, head: Optional[Dict], user: Optional[str], note: str) -> Dict:
+        """Insert `content` as the version after `head`; RuntimeError when another edit took that number"""
+        now = datetime.now(timezone.utc)
+        doc = {
+            "file_type": file_type,
+            "version": (head["version"] if head else 0) + 1,
+            "content": content,
+            "sha256": _digest(content),
+            "size": len(content.encode("utf-8")),
+            "user": user,
+            "note": note,
+            "created_at": now
+        }
+        try:
+            await self.db.seo_file_versions.insert_one(doc)
+        except DuplicateKeyError:
+            raise RuntimeError("O arquivo foi alterado por outra edição")
+        doc.pop("_id", None)
+        return doc
+
+    async def _compact(self, file_type: str, doc: Dict, head: Optional[Dict]):
+        """Turn the previous head into a diff against the new one and drop versions past max_versions"""
+        content = doc["content"]
+        if head and "content" in head:
+            await self.db.seo_file_versions.update_one(
+                {"file_type": file_type, "version": head["version"]},
+                {"$set": {"diff": make_diff(content, head["content"])}, "$unset": {"content": ""}}
+            )
+        await self.db.seo_file_versions.delete_many(
+            {"file_type": file_type, "version": {"$lte": doc["version"] - self.max_versions}}
+        )
+
+    async def _record(self, file_type: str, content: str, head: Optional[Dict], user: Optional[str], note: str) -> Dict:
+        """Record `content` (already on disk) as the new full head"""
+        doc = await self._claim(file_type, content, head, user, note)
+        await self._compact(file_type, doc, head)
+        return doc
+
+    # ---------- writes ----------
+
+    async def save(self, file_type: str, content: str, user: Optional[str] = None, note: str = "edit") -> Dict:
+        """Atomically write `content` and record it as a new version"""
+        path = self.path(file_type)
+        if len(content.encode("utf-8")) > MAX_FILE_BYTES:
+            raise ValueError(f"Arquivo maior que {MAX_FILE_BYTES // 1024} KB")
+
+        async with self._locks[file_type]:
+            head = await self._head(file_type)
+            on_disk = await self.read(file_type)
+            # Keep edits made outside the store (deploys, manual changes) in the history
+            if on_disk is not None and (head is None or head["sha256"] != _digest(on_disk["content"])):
+                head = await self._record(file_type, on_disk["content"], head, None, "external")
+            if head is not None and head["sha256"] == _digest(content):
+                return {"version": head["version"], "changed": False}
+
+            # Claim the version number first: an edit that loses the race never reaches the disk
+            doc = await self._claim(file_type, content, head, user, note)
+            try:
+                stat = await asyncio.to_thread(atomic_write, path, content)
+            except BaseException:
+                await self.db.seo_file_versions.delete_one({"file_type": file_type, "version": doc["version"]})
+                raise
+            self._cache[file_type] = {"content": content, "stamp": (stat.st_mtime_ns, stat.st_size), "mtime": stat.st_mtime}
+            await self._compact(file_type, doc, head)
+        return {"version": doc["version"], "changed": True}
+
+    async def restore(self, file_type: str, version: Optional[int] = None, user: Optional[str] = None) -> Dict:
+        """Write `version` (default: the one before the newest) back as a new version"""
+        if version is None:
+            head = await self._head(file_type)
+            if not head or head["version"] <= 1:
+                raise KeyError("previous")
+            version = head["version"] - 1
+        content = await self.get_version(file_type, version)
+        result = await self.save(file_type, content, user, note=f"restore v{version}")
+        return {**result, "restored_from": version}
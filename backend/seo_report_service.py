@@ -0,0 +1,153 @@
+"""
+Relatório de SEO - SEO Report Metrics
+Content metrics for the SEO report and health check, computed by one
+aggregation ($unionWith + $facet, projected fields only) instead of loading the
+published documents, and cached until services, pages or reviews change. The
+static SEO files are checked off the event loop at most every FILE_CHECK_TTL
+seconds, and a file is only re-read when its mtime or size changed.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from seo_file_store import FRONTEND_PUBLIC, SEO_FILE_TYPES
+
+SEO_FILES = {name: os.path.join(FRONTEND_PUBLIC, relative) for name, relative in SEO_FILE_TYPES.values()}
+FILE_CHECK_TTL = 5.0
+# Same bound the report always used for the listed service URLs
+MAX_LISTED_SERVICES = 100
+
+
+class FileStatusCache:
+    """exists/size/modified/lines per file, revalidated by mtime"""
+
+    def __init__(self, paths: Dict[str, str], ttl: float = FILE_CHECK_TTL):
+        self.paths = paths
+        self.ttl = ttl
+        self._status: Dict[str, Dict] = {}
+        self._stamps: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _check(self):
+        # Runs in a thread: stat every file, read only the ones that changed
+        for name, path in self.paths.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self._stamps[name] = None
+                self._status[name] = {"path": path, "exists": False}
+                continue
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if self._stamps.get(name) == stamp:
+                continue
+            try:
+                with open(path, "rb") as f:
+                    lines = f.read().count(b"\n") + 1
+            except OSError:
+                lines = None
+            self._stamps[name] = stamp
+            self._status[name] = {
+                "path": path,
+                "exists": True,
+                "size": stat.st_size,
+                "modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                "lines": lines
+            }
+
+    async def status(self) -> Dict[str, Dict]:
+        if time.monotonic() - self._checked_at >= self.ttl:
+            async with self._lock:
+                if time.monotonic() - self._checked_at >= self.ttl:
+                    await asyncio.to_thread(self._check)
+                    self._checked_at = time.monotonic()
+        return {name: dict(status) for name, status in self._status.items()}
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+
+class SeoReportService:
+    """Cached content metrics and file status for the SEO report / health check"""
+
+    def __init__(self, db, seo_content_service, files: Optional[Dict[str, str]] = None):
+        self.db = db
+        self.seo_content_service = seo_content_service
+        self.files = FileStatusCache(files or SEO_FILES)
+        self._metrics: Optional[Dict] = None
+        self._version = 0
+
+    def clear(self):
+        self._version += 1
+        self._metrics = None
+
+    @staticmethod
+    def _pipeline():
+        return [
+            {"$match": {"published": True}},
+            {"$project": {
+                "_id": 0,
+                "kind": {"$literal": "service"},
+                "slug": 1,
+                "has_description": {"$gt": [{"$ifNull": ["$shortDescription", ""]}, ""]},
+                "has_banner": {"$gt": [{"$ifNull": ["$headerBanner.mediaUrl", ""]}, ""]}
+            }},
+            {"$unionWith": {"coll": "custom_pages", "pipeline": [
+                {"$match": {"published": True}},
+                {"$project": {"_id": 0, "kind": {"$literal": "page"}}}
+            ]}},
+            {"$facet": {
+                "services": [
+                    {"$match": {"kind": "service"}},
+                    {"$group": {
+                        "_id": None,
+                        "count": {"$sum": 1},
+                        "with_description": {"$sum": {"$cond": ["$has_description", 1, 0]}},
+                        "with_banner": {"$sum": {"$cond": ["$has_banner", 1, 0]}}
+                    }}
+                ],
+                "pages": [
+                    {"$match": {"kind": "page"}},
+                    {"$count": "count"}
+                ],
+                "service_slugs": [
+                    {"$match": {"kind": "service"}},
+                    {"$sort": {"slug": 1}},
+                    {"$limit": MAX_LISTED_SERVICES},
+                    {"$project": {"slug": 1}}
+                ]
+            }}
+        ]
+
+    async def content_metrics(self) -> Dict:
+        """Service/page counts and review stats; cached until content changes"""
+        if self._metrics is not None:
+            return self._metrics
+
+        version = self._version
+        rows = await self.db.services.aggregate(self._pipeline()).to_list(1)
+        facets = rows[0] if rows else {}
+        services = (facets.get("services") or [{}])[0]
+        pages = (facets.get("pages") or [{}])[0]
+        reviews = await self.seo_content_service.review_stats()
+
+        metrics = {
+            "services": services.get("count", 0),
+            "services_with_description": services.get("with_description", 0),
+            "services_with_banner": services.get("with_banner", 0),
+            "pages": pages.get("count", 0),
+            "reviews": reviews["count"],
+            # The report shows 0 (not the JSON-LD default) when there are no reviews
+            "average_rating": reviews["average"] if reviews["count"] else 0,
+            "service_slugs": [row["slug"] for row in facets.get("service_slugs", [])]
+        }
+        # Skip caching a result that raced with an invalidation
+        if version == self._version:
+            self._metrics = metrics
+        return metrics
+
+    async def file_status(self) -> Dict[str, Dict]:
+        return await self.files.status()
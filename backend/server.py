@@ -3,8 +3,10 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -18,6 +20,8 @@ from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Email, To, Content
 import httpx
 
+from cached_document import cached_response
+from date_codec import CODEC_OPTIONS, decode_dates, parse_datetime
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -25,7 +29,8 @@ load_dotenv(ROOT_DIR / '.env')
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Dates are stored as BSON datetimes and decoded as UTC-aware datetimes
+db = client.get_database(os.environ['DB_NAME'], codec_options=CODEC_OPTIONS)
 
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -65,6 +70,9 @@ def send_email(to_email: str, subject: str, html_content: str):
 UPLOAD_DIR = Path(os.environ.get('UPLOAD_DIR', '/app/backend/uploads'))
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Archive directory for expired logs/events (see retention_service.py)
+ARCHIVE_DIR = Path(os.environ.get('ARCHIVE_DIR', str(ROOT_DIR / 'archive')))
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -219,6 +227,7 @@ class Product(BaseModel):
     show_on_pages: List[str] = []  # ["home", "totens", "produtos", "todas"]
     badges: List[str] = []  # ["novidade", "lancamento", "custo-beneficio", "top-linha", "oferta", "destaque"]
     enable_cart: bool = False  # Se permite adicionar ao carrinho (default: false para venda consultiva)
+    rating: Optional[dict] = None  # Avaliações aprovadas: {count, sum, average, histogram}
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ProductCreate(BaseModel):
@@ -335,7 +344,9 @@ class ShippingRate(BaseModel):
     price: float = 0.0
     min_days: int = 0
     max_days: int = 0
-    regions: Optional[List[str]] = None
+    regions: Optional[List[str]] = None  # CEP prefixes ("01"), CEPs or ranges ("01000-000:09999-999")
+    weight_brackets: Optional[List[dict]] = None  # [{"max_weight": 1.0, "price": 15.0}, ...]
+    price_per_kg: float = 0.0
     active: bool = True
 
 # ==================== CRM/ERP MODELS ====================
@@ -414,6 +425,7 @@ class Payment(BaseModel):
     reminder_sent: bool = False
     overdue_notice_sent: bool = False
     suspension_notice_sent: bool = False
+    period: Optional[str] = None  # Billing period YYYY-MM (unique per contract)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Notification(BaseModel):
@@ -423,7 +435,11 @@ class Notification(BaseModel):
     type: str  # payment_reminder, overdue, suspension, order, ticket
     channel: str = "whatsapp"  # whatsapp, email, sms
     message: str
-    status: str = "pending"  # pending, sent, failed
+    status: str = "pending"  # pending, sending, sent, failed
+    payment_id: Optional[str] = None  # Payment that triggered it (one per type)
+    attempts: int = 0
+    latency_ms: Optional[float] = None
+    last_error: Optional[str] = None
     sent_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -710,6 +726,7 @@ class ShippingSettings(BaseModel):
     melhor_envio_token: Optional[str] = None
     melhor_envio_sandbox: bool = False
     origin_cep: Optional[str] = None  # CEP de origem dos produtos
+    melhor_envio_api_url: Optional[str] = None  # Sobrescreve a URL da API (ex.: servidor de teste)
     
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -802,6 +819,8 @@ class ShippingRateCreate(BaseModel):
     name: str
     type: str
     regions: Optional[List[str]] = None
+    weight_brackets: Optional[List[dict]] = None
+    price_per_kg: float = 0.0
     price: float = 0.0
     min_days: int = 0
     max_days: int = 0
@@ -817,6 +836,8 @@ class Order(BaseModel):
     customer_phone: str
     items: List[CartItem]
     subtotal: float
+    discount: float = 0.0
+    coupon_code: Optional[str] = None
     shipping_cost: float
     total: float
     shipping_address: dict
@@ -844,10 +865,11 @@ class OrderCreate(BaseModel):
     customer_name: str
     customer_email: EmailStr
     customer_phone: str
-    items: List[CartItem]
+    items: List[CartItem] = []  # Ignored: the order is built from the session cart
     shipping_address: dict
     shipping_method: str
     notes: Optional[str] = None
+    quote_token: Optional[str] = None  # From /checkout/quote; totals are taken from it
 
 class SiteContent(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -1320,11 +1342,6 @@ async def get_products(category: Optional[str] = None):
         query["category"] = category
     
     products = await db.products.find(query, {"_id": 0}).to_list(1000)
-    for product in products:
-        if isinstance(product.get('timestamp'), str):
-            product['timestamp'] = datetime.fromisoformat(product['timestamp'])
-        if isinstance(product.get('published_at'), str):
-            product['published_at'] = datetime.fromisoformat(product['published_at'])
     return products
 
 
@@ -1358,11 +1375,6 @@ async def get_products_by_page(page_name: str, badges: Optional[str] = None):
         query["badges"] = {"$in": badge_list}
     
     products = await db.products.find(query, {"_id": 0}).to_list(1000)
-    for product in products:
-        if isinstance(product.get('timestamp'), str):
-            product['timestamp'] = datetime.fromisoformat(product['timestamp'])
-        if isinstance(product.get('published_at'), str):
-            product['published_at'] = datetime.fromisoformat(product['published_at'])
     return products
 
 @api_router.get("/products/{product_id}", response_model=Product)
@@ -1370,28 +1382,19 @@ async def get_product(product_id: str):
     product = await db.products.find_one({"id": product_id, "published": True}, {"_id": 0})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    if isinstance(product.get('timestamp'), str):
-        product['timestamp'] = datetime.fromisoformat(product['timestamp'])
-    if isinstance(product.get('published_at'), str):
-        product['published_at'] = datetime.fromisoformat(product['published_at'])
     return product
 
 @api_router.get("/admin/products", response_model=List[Product])
 async def get_all_products_admin(current_user: User = Depends(get_current_admin)):
     products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    for product in products:
-        if isinstance(product.get('timestamp'), str):
-            product['timestamp'] = datetime.fromisoformat(product['timestamp'])
-        if isinstance(product.get('published_at'), str):
-            product['published_at'] = datetime.fromisoformat(product['published_at'])
     return products
 
 @api_router.post("/admin/products", response_model=Product)
 async def create_product(product_data: ProductCreate, current_user: User = Depends(get_current_admin)):
     product = Product(**product_data.model_dump())
-    doc = product.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    await db.products.insert_one(doc)
+    await db.products.insert_one(product.model_dump())
+    await settings_registry.invalidate("pages")
+    await settings_registry.invalidate("sitemap_products")
     return product
 
 @api_router.put("/admin/products/{product_id}", response_model=Product)
@@ -1401,27 +1404,21 @@ async def update_product(product_id: str, product_data: ProductCreate, current_u
         raise HTTPException(status_code=404, detail="Product not found")
     
     updated_doc = product_data.model_dump()
-    updated_doc['timestamp'] = datetime.now(timezone.utc).isoformat()
+    updated_doc['timestamp'] = datetime.now(timezone.utc)
     
     # Handle published_at timestamp
     if updated_doc.get('published') and not existing.get('published'):
         # Product is being published for the first time
-        updated_doc['published_at'] = datetime.now(timezone.utc).isoformat()
+        updated_doc['published_at'] = datetime.now(timezone.utc)
     elif not updated_doc.get('published'):
         # Product is being unpublished
         updated_doc['published_at'] = None
-    elif updated_doc.get('published_at'):
-        # Convert datetime to ISO string if needed
-        if isinstance(updated_doc['published_at'], datetime):
-            updated_doc['published_at'] = updated_doc['published_at'].isoformat()
     
     await db.products.update_one({"id": product_id}, {"$set": updated_doc})
+    await settings_registry.invalidate("pages")
+    await settings_registry.invalidate("sitemap_products")
     
     product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if isinstance(product.get('timestamp'), str):
-        product['timestamp'] = datetime.fromisoformat(product['timestamp'])
-    if isinstance(product.get('published_at'), str):
-        product['published_at'] = datetime.fromisoformat(product['published_at'])
     return Product(**product)
 
 @api_router.patch("/admin/products/{product_id}/publish")
@@ -1433,12 +1430,14 @@ async def toggle_product_publication(product_id: str, published: bool, current_u
     update_data = {"published": published}
     if published and not existing.get('published'):
         # Product is being published for the first time
-        update_data['published_at'] = datetime.now(timezone.utc).isoformat()
+        update_data['published_at'] = datetime.now(timezone.utc)
     elif not published:
         # Product is being unpublished
         update_data['published_at'] = None
     
     await db.products.update_one({"id": product_id}, {"$set": update_data})
+    await settings_registry.invalidate("pages")
+    await settings_registry.invalidate("sitemap_products")
     
     return {"message": f"Product {'published' if published else 'unpublished'} successfully"}
 
@@ -1447,6 +1446,8 @@ async def delete_product(product_id: str, current_user: User = Depends(get_curre
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    await settings_registry.invalidate("pages")
+    await settings_registry.invalidate("sitemap_products")
     return {"message": "Product deleted successfully"}
 
 # ==================== CATEGORY ROUTES ====================
@@ -1504,17 +1505,19 @@ async def create_service(service_data: ServiceCreate, current_user: User = Depen
     """Create a new service"""
     service = Service(**service_data.model_dump())
     await db.services.insert_one(service.model_dump())
+    await settings_registry.invalidate("sitemap_services")
     return service
 
 @api_router.put("/admin/services/{service_id}")
 async def update_service(service_id: str, service_data: ServiceCreate, current_user: User = Depends(get_current_admin)):
     """Update a service"""
     update_data = service_data.model_dump()
-    update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    update_data['updated_at'] = datetime.now(timezone.utc)
     
     result = await db.services.update_one({"id": service_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Service not found")
+    await settings_registry.invalidate("sitemap_services")
     
     service = await db.services.find_one({"id": service_id}, {"_id": 0})
     return service
@@ -1525,6 +1528,7 @@ async def delete_service(service_id: str, current_user: User = Depends(get_curre
     result = await db.services.delete_one({"id": service_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Service not found")
+    await settings_registry.invalidate("sitemap_services")
     return {"message": "Service deleted successfully"}
 
 # ==================== CART ROUTES ====================
@@ -1597,20 +1601,29 @@ async def clear_cart(session_id: Optional[str] = None):
 
 @api_router.get("/shipping/rates", response_model=List[ShippingRate])
 async def get_shipping_rates():
-    rates = await db.shipping_rates.find({"active": True}, {"_id": 0}).to_list(100)
-    return rates
+    return await settings_registry.get("shipping_rates")
 
 @api_router.post("/admin/shipping/rates", response_model=ShippingRate)
 async def create_shipping_rate(rate_data: ShippingRateCreate, current_user: User = Depends(get_current_admin)):
+    try:
+        validate_rate(rate_data.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     rate = ShippingRate(**rate_data.model_dump())
     await db.shipping_rates.insert_one(rate.model_dump())
+    await settings_registry.invalidate("shipping_rates")
     return rate
 
 @api_router.put("/admin/shipping/rates/{rate_id}", response_model=ShippingRate)
 async def update_shipping_rate(rate_id: str, rate_data: ShippingRateCreate, current_user: User = Depends(get_current_admin)):
+    try:
+        validate_rate(rate_data.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     result = await db.shipping_rates.update_one({"id": rate_id}, {"$set": rate_data.model_dump()})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Shipping rate not found")
+    await settings_registry.invalidate("shipping_rates")
     rate = await db.shipping_rates.find_one({"id": rate_id}, {"_id": 0})
     return ShippingRate(**rate)
 
@@ -1619,6 +1632,7 @@ async def delete_shipping_rate(rate_id: str, current_user: User = Depends(get_cu
     result = await db.shipping_rates.delete_one({"id": rate_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Shipping rate not found")
+    await settings_registry.invalidate("shipping_rates")
     return {"message": "Shipping rate deleted successfully"}
 
 # ==================== ORDER ROUTES ====================
@@ -1630,11 +1644,33 @@ async def create_order(order_data: OrderCreate, session_id: Optional[str] = None
     if not cart or not cart.get('items'):
         raise HTTPException(status_code=400, detail="Cart is empty")
     
-    subtotal = sum(item['price'] * item['quantity'] for item in cart['items'])
+    discount = 0.0
+    coupon_code = None
+    shipping_method = order_data.shipping_method
+    if order_data.quote_token:
+        # Totals were computed (and signed) by /checkout/quote for this exact cart
+        try:
+            quote = checkout_quote_service.verify(order_data.quote_token, session_id, cart['items'])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        subtotal = quote['subtotal']
+        discount = quote['discount']
+        coupon_code = quote['coupon']
+        shipping_method = quote['shipping_method']
+        shipping_cost = quote['shipping_cost']
+    else:
+        subtotal = sum(item['price'] * item['quantity'] for item in cart['items'])
+        
+        # Get shipping cost
+        shipping_rate = await db.shipping_rates.find_one({"id": order_data.shipping_method}, {"_id": 0})
+        shipping_cost = shipping_rate['price'] if shipping_rate else 0.0
     
-    # Get shipping cost
-    shipping_rate = await db.shipping_rates.find_one({"id": order_data.shipping_method}, {"_id": 0})
-    shipping_cost = shipping_rate['price'] if shipping_rate else 0.0
+    if coupon_code:
+        # Atomic: fails once max_uses is reached, however many orders race for the last use
+        try:
+            await coupon_service.redeem(coupon_code)
+        except (LookupError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"{e}. Refaça a cotação.")
     
     order = Order(
         order_number=f"ORD-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}",
@@ -1643,18 +1679,22 @@ async def create_order(order_data: OrderCreate, session_id: Optional[str] = None
         customer_phone=order_data.customer_phone,
         items=cart['items'],
         subtotal=subtotal,
+        discount=discount,
+        coupon_code=coupon_code,
         shipping_cost=shipping_cost,
-        total=subtotal + shipping_cost,
+        total=round(subtotal - discount + shipping_cost, 2),
         shipping_address=order_data.shipping_address,
-        shipping_method=order_data.shipping_method,
+        shipping_method=shipping_method,
         notes=order_data.notes,
         status="pending"
     )
     
-    doc = order.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
-    await db.orders.insert_one(doc)
+    try:
+        await db.orders.insert_one(order.model_dump())
+    except Exception:
+        if coupon_code:
+            await coupon_service.release(coupon_code)
+        raise
     
     # Clear cart
     await db.carts.update_one({"session_id": session_id}, {"$set": {"items": []}})
@@ -1858,12 +1898,6 @@ async def get_customer_orders(current_user: User = Depends(get_customer_user)):
         {"_id": 0}
     ).sort("created_at", -1).to_list(1000)
     
-    for order in orders:
-        if isinstance(order.get('created_at'), str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-        if isinstance(order.get('updated_at'), str):
-            order['updated_at'] = datetime.fromisoformat(order['updated_at'])
-    
     return orders
 
 # ==================== GOOGLE OAUTH ROUTES ====================
@@ -1973,22 +2007,12 @@ async def get_customer_order_detail(order_id: str, current_user: User = Depends(
     if not order:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
     
-    if isinstance(order.get('created_at'), str):
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-    if isinstance(order.get('updated_at'), str):
-        order['updated_at'] = datetime.fromisoformat(order['updated_at'])
-    
     return order
 
 
 @api_router.get("/admin/orders", response_model=List[Order])
 async def get_orders(current_user: User = Depends(get_current_admin)):
     orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for order in orders:
-        if isinstance(order.get('created_at'), str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-        if isinstance(order.get('updated_at'), str):
-            order['updated_at'] = datetime.fromisoformat(order['updated_at'])
     return orders
 
 @api_router.get("/admin/orders/{order_id}", response_model=Order)
@@ -1996,10 +2020,6 @@ async def get_order(order_id: str, current_user: User = Depends(get_current_admi
     order = await db.orders.find_one({"id": order_id}, {"_id": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    if isinstance(order.get('created_at'), str):
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-    if isinstance(order.get('updated_at'), str):
-        order['updated_at'] = datetime.fromisoformat(order['updated_at'])
     return order
 
 @api_router.put("/admin/orders/{order_id}/status")
@@ -2010,7 +2030,7 @@ async def update_order_status(order_id: str, status: str, current_user: User = D
     
     result = await db.orders.update_one(
         {"id": order_id},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc)}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -2046,11 +2066,7 @@ async def create_order_manually(order_data: dict, current_user: User = Depends(g
         notes=order_data.get('notes')
     )
     
-    order_doc = order.model_dump()
-    order_doc['created_at'] = order_doc['created_at'].isoformat()
-    order_doc['updated_at'] = order_doc['updated_at'].isoformat()
-    
-    await db.orders.insert_one(order_doc)
+    await db.orders.insert_one(order.model_dump())
     return order
 
 # ==================== SITE CONTENT ROUTES ====================
@@ -2085,17 +2101,12 @@ async def update_site_content(content_data: dict, current_user: User = Depends(g
 async def create_contact(input: ContactInquiryCreate):
     inquiry_dict = input.model_dump()
     inquiry_obj = ContactInquiry(**inquiry_dict)
-    doc = inquiry_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    await db.inquiries.insert_one(doc)
+    await db.inquiries.insert_one(inquiry_obj.model_dump())
     return inquiry_obj
 
 @api_router.get("/admin/contacts", response_model=List[ContactInquiry])
 async def get_contacts(current_user: User = Depends(get_current_admin)):
     contacts = await db.inquiries.find({}, {"_id": 0}).sort("timestamp", -1).to_list(1000)
-    for contact in contacts:
-        if isinstance(contact.get('timestamp'), str):
-            contact['timestamp'] = datetime.fromisoformat(contact['timestamp'])
     return contacts
 
 # ==================== STATS ROUTES ====================
@@ -2148,20 +2159,13 @@ class BannerCreate(BaseModel):
 @api_router.get("/banners", response_model=List[Banner])
 async def get_banners():
     # Public route - only show PUBLISHED banners
-    banners = await db.banners.find({"active": True, "published": True}, {"_id": 0}).sort("order", 1).to_list(100)
-    for banner in banners:
-        if isinstance(banner.get('created_at'), str):
-            banner['created_at'] = datetime.fromisoformat(banner['created_at'])
-        if isinstance(banner.get('published_at'), str):
-            banner['published_at'] = datetime.fromisoformat(banner['published_at'])
-    return banners
+    return await settings_registry.get("banners")
 
 @api_router.post("/admin/banners", response_model=Banner)
 async def create_banner(banner_data: BannerCreate, current_user: User = Depends(get_current_admin)):
     banner = Banner(**banner_data.model_dump())
-    doc = banner.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.banners.insert_one(doc)
+    await db.banners.insert_one(banner.model_dump())
+    await settings_registry.invalidate("banners")
     return banner
 
 @api_router.put("/admin/banners/{banner_id}", response_model=Banner)
@@ -2175,17 +2179,14 @@ async def update_banner(banner_id: str, banner_data: BannerCreate, current_user:
     # Handle published_at timestamp
     if updated_doc.get('published') and not existing.get('published'):
         # Banner is being published for the first time
-        updated_doc['published_at'] = datetime.now(timezone.utc).isoformat()
+        updated_doc['published_at'] = datetime.now(timezone.utc)
     elif not updated_doc.get('published'):
         # Banner is being unpublished
         updated_doc['published_at'] = None
     
     result = await db.banners.update_one({"id": banner_id}, {"$set": updated_doc})
+    await settings_registry.invalidate("banners")
     banner = await db.banners.find_one({"id": banner_id}, {"_id": 0})
-    if isinstance(banner.get('created_at'), str):
-        banner['created_at'] = datetime.fromisoformat(banner['created_at'])
-    if isinstance(banner.get('published_at'), str):
-        banner['published_at'] = datetime.fromisoformat(banner['published_at'])
     return Banner(**banner)
 
 @api_router.delete("/admin/banners/{banner_id}")
@@ -2193,17 +2194,13 @@ async def delete_banner(banner_id: str, current_user: User = Depends(get_current
     result = await db.banners.delete_one({"id": banner_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Banner not found")
+    await settings_registry.invalidate("banners")
     return {"message": "Banner deleted successfully"}
 
 @api_router.get("/admin/banners", response_model=List[Banner])
 async def get_all_banners_admin(current_user: User = Depends(get_current_admin)):
     # Admin route - show ALL banners (published and unpublished)
     banners = await db.banners.find({}, {"_id": 0}).sort("order", 1).to_list(100)
-    for banner in banners:
-        if isinstance(banner.get('created_at'), str):
-            banner['created_at'] = datetime.fromisoformat(banner['created_at'])
-        if isinstance(banner.get('published_at'), str):
-            banner['published_at'] = datetime.fromisoformat(banner['published_at'])
     return banners
 
 @api_router.patch("/admin/banners/{banner_id}/publish")
@@ -2216,12 +2213,13 @@ async def toggle_banner_publication(banner_id: str, published: bool, current_use
     update_data = {"published": published}
     if published and not existing.get('published'):
         # Banner is being published for the first time
-        update_data['published_at'] = datetime.now(timezone.utc).isoformat()
+        update_data['published_at'] = datetime.now(timezone.utc)
     elif not published:
         # Banner is being unpublished
         update_data['published_at'] = None
     
     await db.banners.update_one({"id": banner_id}, {"$set": update_data})
+    await settings_registry.invalidate("banners")
     
     return {"message": f"Banner {'published' if published else 'unpublished'} successfully"}
 
@@ -2250,67 +2248,38 @@ class CouponCreate(BaseModel):
 
 @api_router.post("/validate-coupon")
 async def validate_coupon(code: str, subtotal: float):
-    coupon = await db.coupons.find_one({"code": code.upper(), "active": True}, {"_id": 0})
-    
-    if not coupon:
-        raise HTTPException(status_code=404, detail="Cupom inválido")
-    
-    # Check expiration
-    if coupon.get('expires_at'):
-        expires_at = datetime.fromisoformat(coupon['expires_at']) if isinstance(coupon['expires_at'], str) else coupon['expires_at']
-        if expires_at < datetime.now(timezone.utc):
-            raise HTTPException(status_code=400, detail="Cupom expirado")
-    
-    # Check max uses
-    if coupon.get('max_uses') and coupon.get('uses_count', 0) >= coupon['max_uses']:
-        raise HTTPException(status_code=400, detail="Cupom já foi totalmente utilizado")
-    
-    # Check minimum purchase
-    if subtotal < coupon.get('min_purchase', 0):
-        raise HTTPException(status_code=400, detail=f"Compra mínima de R$ {coupon['min_purchase']:.2f}")
-    
-    # Calculate discount
-    if coupon['discount_type'] == 'percentage':
-        discount = subtotal * (coupon['discount_value'] / 100)
-    else:
-        discount = coupon['discount_value']
+    try:
+        result = await coupon_service.evaluate(code, subtotal)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "valid": True,
-        "discount_amount": discount,
-        "code": coupon['code']
+        "discount_amount": result["discount"],
+        "code": result["code"]
     }
 
 @api_router.get("/admin/coupons", response_model=List[Coupon])
 async def get_coupons(current_user: User = Depends(get_current_admin)):
     coupons = await db.coupons.find({}, {"_id": 0}).to_list(1000)
-    for coupon in coupons:
-        if isinstance(coupon.get('created_at'), str):
-            coupon['created_at'] = datetime.fromisoformat(coupon['created_at'])
-        if coupon.get('expires_at') and isinstance(coupon['expires_at'], str):
-            coupon['expires_at'] = datetime.fromisoformat(coupon['expires_at'])
     return coupons
 
 @api_router.post("/admin/coupons", response_model=Coupon)
 async def create_coupon(coupon_data: CouponCreate, current_user: User = Depends(get_current_admin)):
-    # Check if code already exists
-    existing = await db.coupons.find_one({"code": coupon_data.code.upper()})
-    if existing:
-        raise HTTPException(status_code=400, detail="Código de cupom já existe")
-    
     coupon_dict = coupon_data.model_dump()
     coupon_dict['code'] = coupon_dict['code'].upper()
     
     if coupon_dict.get('expires_at'):
-        coupon_dict['expires_at'] = datetime.fromisoformat(coupon_dict['expires_at'])
+        coupon_dict['expires_at'] = parse_datetime(coupon_dict['expires_at'])
     
     coupon = Coupon(**coupon_dict)
-    doc = coupon.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    if doc.get('expires_at'):
-        doc['expires_at'] = doc['expires_at'].isoformat()
-    
-    await db.coupons.insert_one(doc)
+    try:
+        await db.coupons.insert_one(coupon.model_dump())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Código de cupom já existe")
+    await coupon_service.invalidate()
     return coupon
 
 @api_router.put("/admin/coupons/{coupon_id}", response_model=Coupon)
@@ -2319,17 +2288,17 @@ async def update_coupon(coupon_id: str, coupon_data: CouponCreate, current_user:
     coupon_dict['code'] = coupon_dict['code'].upper()
     
     if coupon_dict.get('expires_at'):
-        coupon_dict['expires_at'] = datetime.fromisoformat(coupon_dict['expires_at']).isoformat()
+        coupon_dict['expires_at'] = parse_datetime(coupon_dict['expires_at'])
     
-    result = await db.coupons.update_one({"id": coupon_id}, {"$set": coupon_dict})
+    try:
+        result = await db.coupons.update_one({"id": coupon_id}, {"$set": coupon_dict})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Código de cupom já existe")
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Coupon not found")
+    await coupon_service.invalidate()
     
     coupon = await db.coupons.find_one({"id": coupon_id}, {"_id": 0})
-    if isinstance(coupon.get('created_at'), str):
-        coupon['created_at'] = datetime.fromisoformat(coupon['created_at'])
-    if coupon.get('expires_at') and isinstance(coupon['expires_at'], str):
-        coupon['expires_at'] = datetime.fromisoformat(coupon['expires_at'])
     return Coupon(**coupon)
 
 @api_router.delete("/admin/coupons/{coupon_id}")
@@ -2337,55 +2306,38 @@ async def delete_coupon(coupon_id: str, current_user: User = Depends(get_current
     result = await db.coupons.delete_one({"id": coupon_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Coupon not found")
+    await coupon_service.invalidate()
     return {"message": "Coupon deleted successfully"}
 
 # ==================== CEP SHIPPING CALCULATION ====================
 
+from shipping_rate_engine import ShippingRateEngine, validate_rate
+
+shipping_rate_engine = ShippingRateEngine(lambda: settings_registry.get("shipping_rates"))
+
 @api_router.get("/shipping/calculate")
 async def calculate_shipping(cep: str, weight: float = 1.0):
     """Calculate shipping cost by CEP"""
-    cep_clean = cep.replace("-", "").replace(".", "")
-    
-    if len(cep_clean) != 8:
-        raise HTTPException(status_code=400, detail="CEP inválido")
-    
-    # Simple region-based calculation
-    region = cep_clean[:2]
-    rates = []
-    
-    # São Paulo region
-    if region in ["01", "02", "03", "04", "05", "06", "07", "08", "09"]:
-        rates.append({
-            "id": "pac-sp",
-            "name": "PAC",
-            "price": 15.00,
-            "min_days": 3,
-            "max_days": 5
-        })
-        rates.append({
-            "id": "sedex-sp",
-            "name": "SEDEX",
-            "price": 25.00,
-            "min_days": 1,
-            "max_days": 2
-        })
-    else:
-        rates.append({
-            "id": "pac-other",
-            "name": "PAC",
-            "price": 20.00 + (weight * 2),
-            "min_days": 7,
-            "max_days": 12
-        })
-        rates.append({
-            "id": "sedex-other",
-            "name": "SEDEX",
-            "price": 35.00 + (weight * 3),
-            "min_days": 3,
-            "max_days": 5
-        })
-    
-    return {"rates": rates}
+    try:
+        return await shipping_rate_engine.quote(cep, weight)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/shipping/calculate-batch")
+async def calculate_shipping_batch(data: dict):
+    """Calculate shipping for many {cep, weight} pairs in one call"""
+    items = data.get("items")
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise HTTPException(status_code=400, detail="Envie items: [{cep, weight}, ...]")
+    try:
+        return {"results": await shipping_rate_engine.quote_many(items)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/admin/shipping/rate-index")
+async def get_shipping_rate_index(current_user: User = Depends(get_current_admin)):
+    """Compiled CEP rate index status - Admin only"""
+    return await shipping_rate_engine.status()
 
 # ==================== ANALYTICS & REPORTS ====================
 
@@ -2509,37 +2461,143 @@ async def startup_event():
             logger.info("Admin user already exists")
     except Exception as e:
         logger.error(f"Error creating admin user: {e}")
+    
+    # Convert legacy ISO string dates in the background; resumes from its checkpoint
+    date_migration_service.start()
+
+    try:
+        await billing_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating billing indexes: {e}")
+
+    try:
+        await aging_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating receivables aging indexes: {e}")
+
+    try:
+        await crm_trigger_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating notification indexes: {e}")
+
+    try:
+        await customer_overview_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating CRM customer indexes: {e}")
+
+    try:
+        await crm_queue_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating CRM queue indexes: {e}")
+
+    try:
+        await scheduler_service.ensure_indexes()
+        if os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true':
+            scheduler_service.start()
+    except Exception as e:
+        logger.error(f"Error starting scheduler: {e}")
+
+    try:
+        await notification_dispatcher.ensure_indexes()
+        notification_dispatcher.start()
+    except Exception as e:
+        logger.error(f"Error starting notification dispatcher: {e}")
+
+    try:
+        await content_block_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating content block indexes: {e}")
+
+    try:
+        await page_assembly_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating page assembly indexes: {e}")
+
+    try:
+        await sitemap_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating sitemap indexes: {e}")
+
+    try:
+        await seo_content_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating SEO content indexes: {e}")
+
+    try:
+        await seo_crawl_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating SEO crawl indexes: {e}")
+
+    try:
+        await seo_file_store.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating SEO file store indexes: {e}")
+
+    try:
+        await coupon_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating coupon indexes: {e}")
+
+    try:
+        await product_review_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating product review indexes: {e}")
+
+    try:
+        await prospecting_service.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating IBGE cache indexes: {e}")
+
+    try:
+        await settings_registry.ensure_indexes()
+        await settings_registry.load_all()
+        settings_registry.start()
+    except Exception as e:
+        logger.error(f"Error loading settings registry: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await scheduler_service.stop()
+    await notification_dispatcher.stop()
+    await settings_registry.stop()
+    await seo_crawl_service.stop()
+    await seo_analyzer.close()
+    await shipping_quote_service.close()
+    await prospecting_service.close()
     client.close()# CRM/ERP Routes - Para adicionar ao server.py
 
 # ==================== CUSTOMER ROUTES ====================
 
+from customer_overview_service import CustomerOverviewService
+
+customer_overview_service = CustomerOverviewService(db)
+
 @api_router.get("/admin/customers", response_model=List[Customer])
 async def get_customers(current_user: User = Depends(get_current_admin)):
     customers = await db.customers.find({}, {"_id": 0}).to_list(1000)
-    for customer in customers:
-        if isinstance(customer.get('created_at'), str):
-            customer['created_at'] = datetime.fromisoformat(customer['created_at'])
     return customers
 
 @api_router.post("/admin/customers", response_model=Customer)
 async def create_customer(customer_data: dict, current_user: User = Depends(get_current_admin)):
     customer = Customer(**customer_data)
-    doc = customer.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.customers.insert_one(doc)
+    await db.customers.insert_one(customer.model_dump())
     return customer
 
+@api_router.get("/admin/customers/{customer_id}/overview")
+async def get_customer_overview(customer_id: str, current_user: User = Depends(get_current_admin)):
+    """Get customer 360 view: contracts, equipment, open tickets, payments, balances and notifications"""
+    overview = await customer_overview_service.get_overview(customer_id)
+    if not overview:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    return overview
+
 @api_router.put("/admin/customers/{customer_id}", response_model=Customer)
 async def update_customer(customer_id: str, customer_data: dict, current_user: User = Depends(get_current_admin)):
+    decode_dates(customer_data, "customers")
     result = await db.customers.update_one({"id": customer_id}, {"$set": customer_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     customer = await db.customers.find_one({"id": customer_id}, {"_id": 0})
-    if isinstance(customer.get('created_at'), str):
-        customer['created_at'] = datetime.fromisoformat(customer['created_at'])
     return Customer(**customer)
 
 # ==================== CONTRACT ROUTES ====================
@@ -2547,10 +2605,6 @@ async def update_customer(customer_id: str, customer_data: dict, current_user: U
 @api_router.get("/admin/contracts", response_model=List[Contract])
 async def get_contracts(current_user: User = Depends(get_current_admin)):
     contracts = await db.contracts.find({}, {"_id": 0}).to_list(1000)
-    for contract in contracts:
-        for field in ['created_at', 'start_date', 'end_date']:
-            if contract.get(field) and isinstance(contract[field], str):
-                contract[field] = datetime.fromisoformat(contract[field])
     return contracts
 
 @api_router.post("/admin/contracts", response_model=Contract)
@@ -2560,13 +2614,7 @@ async def create_contract(contract_data: dict, current_user: User = Depends(get_
     contract_data['contract_number'] = f"CTR-{datetime.now().year}-{count+1:04d}"
     
     contract = Contract(**contract_data)
-    doc = contract.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['start_date'] = doc['start_date'].isoformat()
-    if doc.get('end_date'):
-        doc['end_date'] = doc['end_date'].isoformat()
-    
-    await db.contracts.insert_one(doc)
+    await db.contracts.insert_one(contract.model_dump())
     return contract
 
 # ==================== EQUIPMENT ROUTES ====================
@@ -2575,51 +2623,50 @@ async def create_contract(contract_data: dict, current_user: User = Depends(get_
 async def get_equipment(customer_id: Optional[str] = None, current_user: User = Depends(get_current_admin)):
     query = {"customer_id": customer_id} if customer_id else {}
     equipment = await db.equipment.find(query, {"_id": 0}).to_list(1000)
-    for eq in equipment:
-        for field in ['installation_date', 'warranty_until']:
-            if eq.get(field) and isinstance(eq[field], str):
-                eq[field] = datetime.fromisoformat(eq[field])
     return equipment
 
 @api_router.post("/admin/equipment", response_model=Equipment)
 async def create_equipment(equipment_data: dict, current_user: User = Depends(get_current_admin)):
     equipment = Equipment(**equipment_data)
-    doc = equipment.model_dump()
-    doc['installation_date'] = doc['installation_date'].isoformat()
-    if doc.get('warranty_until'):
-        doc['warranty_until'] = doc['warranty_until'].isoformat()
-    await db.equipment.insert_one(doc)
+    await db.equipment.insert_one(equipment.model_dump())
     return equipment
 
 
 @api_router.put("/admin/equipment/{equipment_id}", response_model=Equipment)
 async def update_equipment(equipment_id: str, equipment_data: dict, current_user: User = Depends(get_current_admin)):
-    # Convert dates to ISO format
-    if 'installation_date' in equipment_data and isinstance(equipment_data['installation_date'], str):
-        equipment_data['installation_date'] = equipment_data['installation_date']
-    if 'warranty_until' in equipment_data and equipment_data['warranty_until']:
-        equipment_data['warranty_until'] = equipment_data['warranty_until']
-    
+    decode_dates(equipment_data, "equipment")
     result = await db.equipment.update_one({"id": equipment_id}, {"$set": equipment_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Equipamento não encontrado")
     
     equipment = await db.equipment.find_one({"id": equipment_id}, {"_id": 0})
-    for field in ['installation_date', 'warranty_until']:
-        if equipment.get(field) and isinstance(equipment[field], str):
-            equipment[field] = datetime.fromisoformat(equipment[field])
     return Equipment(**equipment)
 
 # ==================== MAINTENANCE TICKET ROUTES ====================
 
+from crm_queue_service import CRMQueueService
+
+crm_queue_service = CRMQueueService(db)
+
+@api_router.get("/admin/tickets/queue")
+async def get_ticket_queue(
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    sort: str = "priority",
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_admin)
+):
+    """Keyset-paginated ticket queue (sort: priority, age, newest) - Admin only"""
+    try:
+        return await crm_queue_service.ticket_queue(status, priority, sort, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @api_router.get("/admin/tickets", response_model=List[MaintenanceTicket])
 async def get_tickets(status: Optional[str] = None, current_user: User = Depends(get_current_admin)):
     query = {"status": status} if status else {}
     tickets = await db.tickets.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for ticket in tickets:
-        for field in ['created_at', 'updated_at', 'resolved_at']:
-            if ticket.get(field) and isinstance(ticket[field], str):
-                ticket[field] = datetime.fromisoformat(ticket[field])
     return tickets
 
 @api_router.post("/admin/tickets", response_model=MaintenanceTicket)
@@ -2628,100 +2675,100 @@ async def create_ticket(ticket_data: dict, current_user: User = Depends(get_curr
     ticket_data['ticket_number'] = f"TKT-{datetime.now().year}-{count+1:05d}"
     
     ticket = MaintenanceTicket(**ticket_data)
-    doc = ticket.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    doc['updated_at'] = doc['updated_at'].isoformat()
-    if doc.get('resolved_at'):
-        doc['resolved_at'] = doc['resolved_at'].isoformat()
-    
-    await db.tickets.insert_one(doc)
+    await db.tickets.insert_one(ticket.model_dump())
     return ticket
 
 @api_router.put("/admin/tickets/{ticket_id}", response_model=MaintenanceTicket)
 async def update_ticket(ticket_id: str, ticket_data: dict, current_user: User = Depends(get_current_admin)):
-    ticket_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    decode_dates(ticket_data, "tickets")
+    ticket_data['updated_at'] = datetime.now(timezone.utc)
     result = await db.tickets.update_one({"id": ticket_id}, {"$set": ticket_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
     ticket = await db.tickets.find_one({"id": ticket_id}, {"_id": 0})
-    for field in ['created_at', 'updated_at', 'resolved_at']:
-        if ticket.get(field) and isinstance(ticket[field], str):
-            ticket[field] = datetime.fromisoformat(ticket[field])
     return MaintenanceTicket(**ticket)
 
 # ==================== PAYMENT ROUTES ====================
 
+from billing_service import BillingService
+from receivables_service import ReceivablesAgingService
+
+billing_service = BillingService(db)
+aging_service = ReceivablesAgingService(db)
+
+async def run_monthly_billing(period: Optional[str] = None) -> dict:
+    """Generate the period's payments and drop the aging snapshot they make stale"""
+    result = await billing_service.generate_monthly_payments(period)
+    if result['generated']:
+        await aging_service.invalidate()
+    return result
+
 @api_router.get("/admin/payments", response_model=List[Payment])
 async def get_payments(status: Optional[str] = None, current_user: User = Depends(get_current_admin)):
     query = {"status": status} if status else {}
     payments = await db.payments.find(query, {"_id": 0}).sort("due_date", -1).to_list(1000)
-    for payment in payments:
-        for field in ['due_date', 'paid_at', 'created_at']:
-            if payment.get(field) and isinstance(payment[field], str):
-                payment[field] = datetime.fromisoformat(payment[field])
     return payments
 
+@api_router.get("/admin/payments/queue")
+async def get_payment_queue(
+    status: Optional[str] = None,
+    due_from: Optional[str] = None,
+    due_to: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    order: str = "asc",
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_admin)
+):
+    """Keyset-paginated payments by due date with a date range - Admin only"""
+    try:
+        return await crm_queue_service.payment_queue(status, due_from, due_to, customer_id, order, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @api_router.post("/admin/payments/generate-monthly")
-async def generate_monthly_payments(current_user: User = Depends(get_current_admin)):
-    """Generate monthly payments for all active contracts"""
-    contracts = await db.contracts.find({"status": "active"}, {"_id": 0}).to_list(1000)
-    
-    generated = 0
-    for contract in contracts:
-        # Check if payment for this month already exists
-        current_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        existing = await db.payments.find_one({
-            "contract_id": contract['id'],
-            "due_date": {"$gte": current_month.isoformat()}
-        })
-        
-        if not existing:
-            payment_day = contract.get('payment_day', 10)
-            due_date = datetime.now().replace(day=payment_day, hour=0, minute=0, second=0, microsecond=0)
-            
-            payment = Payment(
-                customer_id=contract['customer_id'],
-                contract_id=contract['id'],
-                invoice_number=f"INV-{datetime.now().year}{datetime.now().month:02d}-{generated+1:04d}",
-                amount=contract['monthly_value'],
-                due_date=due_date,
-                status="pending"
-            )
-            
-            doc = payment.model_dump()
-            doc['due_date'] = doc['due_date'].isoformat()
-            doc['created_at'] = doc['created_at'].isoformat()
-            
-            await db.payments.insert_one(doc)
-            generated += 1
-    
-    return {"message": f"{generated} pagamentos gerados"}
+async def generate_monthly_payments(period: Optional[str] = None, current_user: User = Depends(get_current_admin)):
+    """Generate monthly payments for all active contracts (period: YYYY-MM, default current month)"""
+    try:
+        result = await run_monthly_billing(period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": f"{result['generated']} pagamentos gerados", **result}
+
+@api_router.get("/admin/payments/aging")
+async def get_payments_aging(limit: int = 100, refresh: bool = False, current_user: User = Depends(get_current_admin)):
+    """Receivables aging by overdue bucket and per customer - Admin only"""
+    return await aging_service.get_report(min(limit, 1000), refresh)
 
 @api_router.post("/admin/payments/{payment_id}/mark-paid")
 async def mark_payment_paid(payment_id: str, payment_method: str, current_user: User = Depends(get_current_admin)):
-    result = await db.payments.update_one(
+    payment = await db.payments.find_one_and_update(
         {"id": payment_id},
         {"$set": {
             "status": "paid",
-            "paid_at": datetime.now(timezone.utc).isoformat(),
+            "paid_at": datetime.now(timezone.utc),
             "payment_method": payment_method
-        }}
+        }},
+        projection={"_id": 0, "customer_id": 1}
     )
-    if result.matched_count == 0:
+    if not payment:
         raise HTTPException(status_code=404, detail="Pagamento não encontrado")
+    await aging_service.refresh_customer(payment["customer_id"])
     return {"message": "Pagamento marcado como pago"}
 
 
 # ==================== PAGE BUILDER ROUTES ====================
 
+from page_assembly_service import PageAssemblyService
+
+page_assembly_service = PageAssemblyService(db)
+
 @api_router.get("/admin/pages", response_model=List[CustomPage])
 async def get_all_pages(current_user: User = Depends(get_current_admin)):
     """Get all custom pages - Admin only"""
     pages = await db.custom_pages.find({}, {"_id": 0}).to_list(1000)
-    for page in pages:
-        for field in ['created_at', 'updated_at', 'published_at']:
-            if page.get(field) and isinstance(page[field], str):
-                page[field] = datetime.fromisoformat(page[field])
     return pages
 
 @api_router.get("/admin/all-pages")
@@ -2753,34 +2800,40 @@ async def get_page_by_slug(slug: str):
         raise HTTPException(status_code=404, detail="Page not found")
     return page
 
+@api_router.get("/pages/{slug}/assembled")
+async def get_assembled_page(slug: str):
+    """Get published page with its published blocks and product lists resolved - Public"""
+    assembled = await page_assembly_service.get_page(slug)
+    if not assembled:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return assembled
+
 @api_router.post("/admin/pages", response_model=CustomPage)
 async def create_page(page_data: dict, current_user: User = Depends(get_current_admin)):
     """Create custom page"""
     page = CustomPage(**page_data)
-    doc = page.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.custom_pages.insert_one(doc)
+    await db.custom_pages.insert_one(page.model_dump())
+    await settings_registry.invalidate("pages")
+    await settings_registry.invalidate("sitemap_pages")
     return page
 
 @api_router.put("/admin/pages/{page_id}", response_model=CustomPage)
 async def update_page(page_id: str, page_data: dict, current_user: User = Depends(get_current_admin)):
     """Update custom page"""
-    page_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    decode_dates(page_data, "custom_pages")
+    page_data['updated_at'] = datetime.now(timezone.utc)
     
     existing = await db.custom_pages.find_one({"id": page_id}, {"_id": 0})
     if not existing:
         raise HTTPException(status_code=404, detail="Page not found")
     
     if page_data.get('published') and not existing.get('published'):
-        page_data['published_at'] = datetime.now(timezone.utc).isoformat()
+        page_data['published_at'] = datetime.now(timezone.utc)
     
     await db.custom_pages.update_one({"id": page_id}, {"$set": page_data})
+    await settings_registry.invalidate("pages")
+    await settings_registry.invalidate("sitemap_pages")
     updated = await db.custom_pages.find_one({"id": page_id}, {"_id": 0})
-    
-    for field in ['created_at', 'updated_at', 'published_at']:
-        if updated.get(field) and isinstance(updated[field], str):
-            updated[field] = datetime.fromisoformat(updated[field])
-    
     return CustomPage(**updated)
 
 @api_router.delete("/admin/pages/{page_id}")
@@ -2789,18 +2842,44 @@ async def delete_page(page_id: str, current_user: User = Depends(get_current_adm
     result = await db.custom_pages.delete_one({"id": page_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Page not found")
+    await settings_registry.invalidate("pages")
+    await settings_registry.invalidate("sitemap_pages")
     return {"message": "Page deleted"}
 
 # ==================== CONTENT BLOCKS ROUTES ====================
 
+from content_block_service import ContentBlockService
+
+content_block_service = ContentBlockService(db)
+
+@api_router.get("/admin/content-blocks/{page_id}/version")
+async def get_content_blocks_version(page_id: str, current_user: User = Depends(get_current_admin)):
+    """Get the block version a bulk edit must be based on - Admin only"""
+    return {"page_id": page_id, "version": await content_block_service.get_version(page_id)}
+
+@api_router.post("/admin/content-blocks/{page_id}/bulk")
+async def bulk_update_content_blocks(page_id: str, data: dict, current_user: User = Depends(get_current_admin)):
+    """Reorder and/or patch many blocks of a page in one write (expected_version, order, patches) - Admin only"""
+    if not isinstance(data.get("expected_version"), int):
+        raise HTTPException(status_code=400, detail="expected_version é obrigatório")
+    try:
+        result = await content_block_service.bulk_update(
+            page_id, data["expected_version"], data.get("order"), data.get("patches")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail={
+            "message": str(e),
+            "current_version": await content_block_service.get_version(page_id)
+        })
+    await settings_registry.invalidate("pages")
+    return result
+
 @api_router.get("/admin/content-blocks/{page_id}")
 async def get_page_blocks(page_id: str, current_user: User = Depends(get_current_admin)):
     """Get all content blocks for a specific page"""
     blocks = await db.content_blocks.find({"page_id": page_id}, {"_id": 0}).sort("order", 1).to_list(100)
-    for block in blocks:
-        for field in ['created_at', 'updated_at']:
-            if block.get(field) and isinstance(block[field], str):
-                block[field] = datetime.fromisoformat(block[field])
     return blocks
 
 @api_router.get("/content-blocks/{page_id}/published")
@@ -2825,24 +2904,177 @@ async def get_page_blocks_public(page_id: str):
 async def create_content_block(block_data: dict, current_user: User = Depends(get_current_admin)):
     """Create new content block"""
     block = ContentBlock(**block_data)
-    doc = block.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    if doc.get('updated_at'):
-        doc['updated_at'] = doc['updated_at'].isoformat()
-    await db.content_blocks.insert_one(doc)
+    await db.content_blocks.insert_one(block.model_dump())
+    await content_block_service.bump(block.page_id)
+    await settings_registry.invalidate("pages")
     return block
 
 
+# ==================== SETTINGS REGISTRY ====================
+
+from settings_registry import SettingsRegistry
+from bootstrap_service import BootstrapService
+from coupon_service import CouponService
+
+CONTACT_PAGE_DEFAULTS = {
+    "hero_title": "Entre em Contato",
+    "hero_subtitle": "Estamos prontos para ajudar você",
+    "hero_background_image": "",
+    "phone": "",
+    "phone_secondary": "",
+    "email": "",
+    "email_secondary": "",
+    "whatsapp_number": "",
+    "whatsapp_message": "Olá! Gostaria de mais informações sobre os serviços da VigiLoc.",
+    "whatsapp_button_text": "Falar pelo WhatsApp",
+    "show_whatsapp_button": True,
+    "address_street": "",
+    "address_neighborhood": "",
+    "address_city": "",
+    "address_state": "",
+    "address_zip": "",
+    "address_country": "Brasil",
+    "working_hours_weekdays": "Segunda a Sexta: 08:00 - 18:00",
+    "working_hours_saturday": "Sábado: 08:00 - 12:00",
+    "working_hours_sunday": "Domingo: Fechado",
+    "google_maps_embed": "",
+    "show_map": True,
+    "facebook_url": "",
+    "instagram_url": "",
+    "youtube_url": "",
+    "linkedin_url": "",
+    "website_url": "",
+    "form_title": "Envie sua Mensagem",
+    "form_subtitle": "Preencha o formulário abaixo e entraremos em contato",
+    "form_success_message": "Mensagem enviada com sucesso! Entraremos em contato em breve.",
+    "show_contact_form": True
+}
+
+WHATSAPP_AUTO_REPLY_DEFAULTS = {
+    "enabled": False,
+    "welcome_message": "Olá! 👋 Bem-vindo à VigiLoc! Como posso ajudar você hoje?",
+    "business_hours_message": "Nosso horário de atendimento é de Segunda a Sexta, das 8h às 18h. Deixe sua mensagem que retornaremos o mais breve possível!",
+    "outside_hours_message": "Estamos fora do horário de atendimento. Retornaremos sua mensagem no próximo dia útil. Obrigado pela compreensão! 🙏",
+    "auto_replies": [
+        {"id": "1", "trigger": "preço", "response": "Para informações sobre preços e orçamentos, por favor acesse nosso site ou fale com um consultor."},
+        {"id": "2", "trigger": "horário", "response": "Nosso horário de atendimento é de Segunda a Sexta, das 8h às 18h, e Sábados das 8h às 12h."},
+        {"id": "3", "trigger": "endereço", "response": "Estamos localizados na Av. Paulista, 1000 - São Paulo/SP. CEP: 01310-100"}
+    ]
+}
+
+HOMEPAGE_DEFAULTS = {
+    "id": "homepage_settings",
+    "hero": {
+        "video_url": "https://customer-assets.emergentagent.com/job_smart-security-12/artifacts/2cbdrd0e_vigiloc.mp4",
+        "poster_url": "",
+        "badge_text": "🛡️ Líder em Automação e Segurança Eletrônica",
+        "title": "Transformando <span class='text-blue-400'>Espaços</span><br />em Ambientes <span class='text-blue-400'>Inteligentes</span>",
+        "subtitle": "Soluções completas em portaria autônoma, automação comercial e segurança eletrônica para condomínios e empresas. Tecnologia de ponta para o seu negócio.",
+        "cta_primary_text": "Fale com um Consultor",
+        "cta_primary_url": "",
+        "cta_secondary_text": "Conheça Nossos Serviços",
+        "cta_secondary_url": "/servicos",
+        "show_stats": True,
+        "stats": [
+            {"value": "+500", "label": "Clientes Atendidos"},
+            {"value": "24/7", "label": "Monitoramento"},
+            {"value": "10+", "label": "Anos de Experiência"},
+            {"value": "99%", "label": "Satisfação"}
+        ]
+    },
+    "services": {
+        "enabled": True,
+        "title": "Nossas Soluções",
+        "subtitle": "Tecnologia de ponta para transformar seu espaço em um ambiente inteligente e seguro",
+        "show_all_button": True,
+        "featured_ids": []
+    },
+    "features": {
+        "enabled": True,
+        "title": "Por que escolher a VigiLoc?",
+        "items": [
+            {"icon": "Shield", "title": "Segurança Garantida", "description": "Sistemas certificados e testados para máxima proteção"},
+            {"icon": "Clock", "title": "Suporte 24/7", "description": "Equipe técnica disponível a qualquer momento"},
+            {"icon": "Users", "title": "Atendimento Personalizado", "description": "Soluções sob medida para cada cliente"},
+            {"icon": "Award", "title": "Experiência Comprovada", "description": "Mais de 10 anos no mercado de segurança"}
+        ]
+    },
+    "cta_section": {
+        "enabled": True,
+        "title": "Pronto para Transformar seu Espaço?",
+        "subtitle": "Entre em contato conosco e descubra como podemos ajudar",
+        "button_text": "Solicitar Orçamento",
+        "button_url": "/contato"
+    }
+}
+
+settings_registry = SettingsRegistry(db)
+settings_registry.register("site_settings", "site_settings", default=lambda: SiteSettings().model_dump())
+settings_registry.register("navbar_settings", "navbar_settings", default=lambda: NavbarSettings().model_dump())
+settings_registry.register("footer_settings", "footer_settings", default=lambda: FooterSettings().model_dump())
+settings_registry.register("theme_settings", "theme_settings", default=lambda: ThemeSettings().model_dump())
+settings_registry.register("tracking_settings", "tracking_settings", default=lambda: TrackingSettings().model_dump())
+settings_registry.register("seo_settings", "seo_settings", default=lambda: SEOSettings().model_dump())
+settings_registry.register("payment_settings", "payment_settings", default=lambda: PaymentSettings().model_dump())
+settings_registry.register("shipping_settings", "shipping_settings", default=lambda: ShippingSettings().model_dump())
+settings_registry.register("homepage_settings", "homepage_settings", default=lambda: HOMEPAGE_DEFAULTS)
+settings_registry.register("contact_page_settings", "contact_page_settings", default=lambda: CONTACT_PAGE_DEFAULTS)
+settings_registry.register(
+    "whatsapp_auto_reply", "whatsapp_auto_reply_settings",
+    doc_id="whatsapp_auto_reply",
+    default=lambda: WHATSAPP_AUTO_REPLY_DEFAULTS
+)
+settings_registry.register_collection("menus", "menus", key_field="name", query={"active": True})
+settings_registry.register_collection(
+    "banners", "banners",
+    query={"active": True, "published": True},
+    sort=[("order", 1)],
+    limit=100
+)
+settings_registry.register_collection(
+    "featured_reviews", "social_reviews",
+    query={"published": True, "featured": True},
+    sort=[("order", 1), ("created_at", -1)],
+    limit=20
+)
+# Active shipping rates; the compiled CEP index is rebuilt on every worker when they change
+settings_registry.register_collection("shipping_rates", "shipping_rates", query={"active": True})
+settings_registry.on_change("shipping_rates", shipping_rate_engine.clear)
+# Active coupons by code; redemption itself always goes to Mongo
+settings_registry.register_collection("coupons", "coupons", key_field="code", query={"active": True})
+coupon_service = CouponService(db, settings_registry)
+# Assembled pages are dropped on every worker when a page, block or product changes
+settings_registry.register_signal("pages")
+settings_registry.on_change("pages", page_assembly_service.clear)
+
+bootstrap_service = BootstrapService(settings_registry)
+
+@api_router.get("/admin/settings-cache")
+async def get_settings_cache_status(current_user: User = Depends(get_current_admin)):
+    """List cached settings entries and their versions - Admin only"""
+    return settings_registry.status()
+
+@api_router.post("/admin/settings-cache/invalidate")
+async def invalidate_settings_cache(name: Optional[str] = None, current_user: User = Depends(get_current_admin)):
+    """Reload one settings entry (or all) on every worker - Admin only"""
+    try:
+        names = await settings_registry.invalidate(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Configuração não encontrada")
+    return {"message": "Cache de configurações invalidado", "invalidated": names}
+
+@api_router.get("/bootstrap")
+async def get_bootstrap(request: Request):
+    """Settings, menus, banners and featured reviews for the storefront shell - Public"""
+    return cached_response(request, await bootstrap_service.get_payload(), "no-cache")
+
+
 # ==================== FOOTER SETTINGS ROUTES ====================
 
 @api_router.get("/footer-settings")
 async def get_footer_settings():
     """Get footer settings"""
-    settings = await db.footer_settings.find_one({"id": "footer_settings"}, {"_id": 0})
-    if not settings:
-        default = FooterSettings()
-        return default.model_dump()
-    return settings
+    return await settings_registry.get("footer_settings")
 
 @api_router.put("/admin/footer-settings")
 async def update_footer_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -2850,45 +3082,50 @@ async def update_footer_settings(settings_data: dict, current_user: User = Depen
     settings_data['id'] = "footer_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.footer_settings.update_one(
-        {"id": "footer_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("footer_settings", settings_data)
     return {"message": "Footer settings updated successfully"}
 
 
 @api_router.put("/admin/content-blocks/{block_id}")
 async def update_content_block(block_id: str, block_data: dict, current_user: User = Depends(get_current_admin)):
     """Update content block"""
-    block_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    decode_dates(block_data, "content_blocks")
+    block_data['updated_at'] = datetime.now(timezone.utc)
     
-    result = await db.content_blocks.update_one(
+    block = await db.content_blocks.find_one_and_update(
         {"id": block_id},
-        {"$set": block_data}
+        {"$set": block_data},
+        projection={"_id": 0, "page_id": 1}
     )
-    if result.matched_count == 0:
+    if not block:
         raise HTTPException(status_code=404, detail="Content block not found")
+    await content_block_service.bump(block["page_id"])
+    await settings_registry.invalidate("pages")
     
     return {"message": "Content block updated"}
 
 @api_router.delete("/admin/content-blocks/{block_id}")
 async def delete_content_block(block_id: str, current_user: User = Depends(get_current_admin)):
     """Delete content block"""
-    result = await db.content_blocks.delete_one({"id": block_id})
-    if result.deleted_count == 0:
+    block = await db.content_blocks.find_one_and_delete({"id": block_id}, projection={"_id": 0, "page_id": 1})
+    if not block:
         raise HTTPException(status_code=404, detail="Content block not found")
+    await content_block_service.bump(block["page_id"])
+    await settings_registry.invalidate("pages")
     return {"message": "Content block deleted"}
 
 @api_router.put("/admin/content-blocks/{block_id}/reorder")
 async def reorder_content_block(block_id: str, new_order: int, current_user: User = Depends(get_current_admin)):
     """Change the order of a content block"""
-    result = await db.content_blocks.update_one(
+    block = await db.content_blocks.find_one_and_update(
         {"id": block_id},
-        {"$set": {"order": new_order, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"order": new_order, "updated_at": datetime.now(timezone.utc)}},
+        projection={"_id": 0, "page_id": 1}
     )
-    if result.matched_count == 0:
+    if not block:
         raise HTTPException(status_code=404, detail="Content block not found")
+    await content_block_service.bump(block["page_id"])
+    await settings_registry.invalidate("pages")
     return {"message": "Block order updated"}
 
 # ==================== THEME CUSTOMIZER ROUTES ====================
@@ -2896,11 +3133,7 @@ async def reorder_content_block(block_id: str, new_order: int, current_user: Use
 @api_router.get("/theme-settings")
 async def get_theme_settings():
     """Get theme settings - Public"""
-    settings = await db.theme_settings.find_one({"id": "theme_settings"}, {"_id": 0})
-    if not settings:
-        default = ThemeSettings()
-        return default.model_dump()
-    return settings
+    return await settings_registry.get("theme_settings")
 
 @api_router.put("/admin/theme-settings")
 async def update_theme_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -2908,11 +3141,7 @@ async def update_theme_settings(settings_data: dict, current_user: User = Depend
     settings_data['id'] = "theme_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.theme_settings.update_one(
-        {"id": "theme_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("theme_settings", settings_data)
     return {"message": "Theme settings updated"}
 
 
@@ -2921,11 +3150,7 @@ async def update_theme_settings(settings_data: dict, current_user: User = Depend
 @api_router.get("/admin/payment-settings")
 async def get_payment_settings(current_user: User = Depends(get_current_admin)):
     """Get payment settings - Admin only"""
-    settings = await db.payment_settings.find_one({"id": "payment_settings"}, {"_id": 0})
-    if not settings:
-        default = PaymentSettings()
-        return default.model_dump()
-    return settings
+    return await settings_registry.get("payment_settings")
 
 @api_router.put("/admin/payment-settings")
 async def update_payment_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -2933,29 +3158,16 @@ async def update_payment_settings(settings_data: dict, current_user: User = Depe
     settings_data['id'] = "payment_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.payment_settings.update_one(
-        {"id": "payment_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("payment_settings", settings_data)
     return {"message": "Payment settings updated successfully"}
 
 
-# ==================== MENU BUILDER ROUTES ====================
-
-@api_router.get("/menus/{menu_name}")
-
-
 # ==================== SHIPPING SETTINGS ROUTES ====================
 
 @api_router.get("/admin/shipping-settings")
 async def get_shipping_settings(current_user: User = Depends(get_current_admin)):
     """Get shipping settings - Admin only"""
-    settings = await db.shipping_settings.find_one({"id": "shipping_settings"}, {"_id": 0})
-    if not settings:
-        default = ShippingSettings()
-        return default.model_dump()
-    return settings
+    return await settings_registry.get("shipping_settings")
 
 @api_router.put("/admin/shipping-settings")
 async def update_shipping_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -2963,127 +3175,65 @@ async def update_shipping_settings(settings_data: dict, current_user: User = Dep
     settings_data['id'] = "shipping_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.shipping_settings.update_one(
-        {"id": "shipping_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("shipping_settings", settings_data)
     return {"message": "Shipping settings updated successfully"}
 
 
 # ==================== MELHOR ENVIO SHIPPING CALCULATION ====================
 
+from shipping_quote_service import ShippingQuoteService
+
+# Served from the local table while Melhor Envio is down or slow
+shipping_quote_service = ShippingQuoteService(fallback=lambda cep, weight: calculate_shipping(cep, weight))
+settings_registry.on_change("shipping_settings", shipping_quote_service.clear)
+
 @api_router.post("/shipping/calculate-melhor-envio")
 async def calculate_shipping_melhor_envio(data: dict):
     """Calculate shipping using Melhor Envio API"""
+    settings = await settings_registry.get("shipping_settings")
     try:
-        # Get shipping settings
-        settings = await db.shipping_settings.find_one({"id": "shipping_settings"})
-        
-        if not settings or not settings.get('melhor_envio_enabled'):
-            raise HTTPException(status_code=400, detail="Melhor Envio integration not enabled")
-        
-        if not settings.get('melhor_envio_token'):
-            raise HTTPException(status_code=400, detail="Melhor Envio token not configured")
-        
-        # Extract request data
-        destination_cep = data.get('destination_cep', '').replace('-', '')
-        origin_cep = settings.get('origin_cep', '').replace('-', '')
-        products = data.get('products', [])
-        
-        if not destination_cep or len(destination_cep) != 8:
-            raise HTTPException(status_code=400, detail="Invalid destination CEP")
-        
-        if not origin_cep or len(origin_cep) != 8:
-            raise HTTPException(status_code=400, detail="Origin CEP not configured in settings")
-        
-        if not products:
-            raise HTTPException(status_code=400, detail="No products provided")
-        
-        # Prepare payload for Melhor Envio API
-        melhor_envio_products = []
-        for product in products:
-            melhor_envio_products.append({
-                "id": product.get('id', str(uuid.uuid4())),
-                "name": product.get('name', 'Product'),
-                "quantity": product.get('quantity', 1),
-                "unitary_value": float(product.get('price', 0)),
-                "weight": float(product.get('weight', 1)),
-                "width": int(product.get('width', 10)),
-                "height": int(product.get('height', 10)),
-                "length": int(product.get('length', 10))
-            })
-        
-        payload = {
-            "from": {"postal_code": origin_cep},
-            "to": {"postal_code": destination_cep},
-            "products": melhor_envio_products
-        }
-        
-        # Make request to Melhor Envio API
-        api_url = "https://sandbox.melhorenvio.com.br" if settings.get('melhor_envio_sandbox') else "https://melhorenvio.com.br"
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {settings['melhor_envio_token']}",
-            "User-Agent": "SecuShop/1.0"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{api_url}/api/v2/me/shipment/calculate",
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                error_detail = response.text
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Melhor Envio API error: {error_detail}"
-                )
-            
-            api_response = response.json()
-        
-        # Parse and format response
-        shipping_options = []
-        for option in api_response:
-            shipping_options.append({
-                "id": str(option.get('id')),
-                "name": option.get('name', 'Unknown'),
-                "company": option.get('company', {}).get('name', 'Unknown'),
-                "price": float(option.get('custom_price', option.get('price', 0))),
-                "custom_price": float(option.get('custom_price', 0)),
-                "original_price": float(option.get('price', 0)),
-                "delivery_time": int(option.get('custom_delivery_time', option.get('delivery_time', 0))),
-                "custom_delivery_time": int(option.get('custom_delivery_time', 0)),
-                "delivery_range": option.get('delivery_range', {}),
-                "currency": option.get('currency', 'BRL'),
-                "packages": option.get('packages', [])
-            })
-        
-        # Sort by price
-        shipping_options.sort(key=lambda x: x['price'])
-        
-        return {
-            "success": True,
-            "origin_cep": origin_cep,
-            "destination_cep": destination_cep,
-            "options": shipping_options
-        }
-        
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=500, detail=f"Failed to connect to Melhor Envio API: {str(e)}")
+        return await shipping_quote_service.quote(
+            settings, data.get('destination_cep', ''), data.get('products', [])
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        logger.error(f"Error calculating shipping: {e}")
         raise HTTPException(status_code=500, detail=f"Error calculating shipping: {str(e)}")
 
+@api_router.get("/admin/shipping/quote-status")
+async def get_shipping_quote_status(current_user: User = Depends(get_current_admin)):
+    """Melhor Envio circuit breaker and quote cache status - Admin only"""
+    return shipping_quote_service.status()
+
+# ==================== CHECKOUT QUOTE ====================
+
+from checkout_quote_service import CheckoutQuoteService
+
+checkout_quote_service = CheckoutQuoteService(
+    db, settings_registry, coupon_service, shipping_rate_engine, shipping_quote_service, JWT_SECRET, JWT_ALGORITHM
+)
+
+@api_router.post("/checkout/quote")
+async def get_checkout_quote(data: dict, session_id: Optional[str] = None):
+    """Cart totals, coupon and shipping options in one call, with a signed quote token"""
+    session_id = session_id or data.get('session_id')
+    if not session_id:
+        raise HTTPException(status_code=400, detail="Session ID required")
+    try:
+        return await checkout_quote_service.quote(
+            session_id, data.get('cep', ''), data.get('shipping_method'), data.get('coupon_code')
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ==================== MENU BUILDER ROUTES ====================
+
+@api_router.get("/menus/{menu_name}")
 async def get_menu(menu_name: str):
     """Get menu by name - Public"""
-    menu = await db.menus.find_one({"name": menu_name, "active": True}, {"_id": 0})
-    if not menu:
-        return {"name": menu_name, "items": []}
-    return menu
+    menus = await settings_registry.get("menus")
+    return menus.get(menu_name) or {"name": menu_name, "items": []}
 
 @api_router.get("/admin/menus")
 async def get_all_menus(current_user: User = Depends(get_current_admin)):
@@ -3096,26 +3246,45 @@ async def update_menu(menu_id: str, menu_data: dict, current_user: User = Depend
     """Update menu"""
     menu_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     await db.menus.update_one({"id": menu_id}, {"$set": menu_data}, upsert=True)
+    await settings_registry.invalidate("menus")
     return {"message": "Menu updated"}
 
 # ==================== REVIEWS ROUTES ====================
 
+from product_review_service import ProductReviewService, validate_rating
+
+product_review_service = ProductReviewService(db)
+
 @api_router.get("/products/{product_id}/reviews")
-async def get_product_reviews(product_id: str):
-    """Get approved reviews for product - Public"""
-    reviews = await db.reviews.find({
-        "product_id": product_id,
-        "status": "approved"
-    }, {"_id": 0}).sort("created_at", -1).to_list(100)
-    return reviews
+async def get_product_reviews(product_id: str, cursor: Optional[str] = None, limit: int = 20):
+    """Get approved reviews for product, newest first, with its rating summary - Public"""
+    try:
+        page = await product_review_service.list_reviews(product_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page["rating"] = await product_review_service.summary(product_id)
+    return page
+
+@api_router.get("/products/{product_id}/rating")
+async def get_product_rating(product_id: str):
+    """Rating summary (count, average, 1-5 histogram) for product - Public"""
+    rating = await product_review_service.summary(product_id)
+    if rating is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return rating
 
 @api_router.post("/reviews")
 async def create_review(review_data: dict):
     """Create review - Public"""
+    try:
+        review_data['rating'] = validate_rating(review_data.get('rating'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     review = Review(**review_data)
     doc = review.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.reviews.insert_one(doc)
+    if await product_review_service.apply_change(review.product_id, None, doc):
+        await settings_registry.invalidate("pages")
     return {"message": "Review submitted for approval"}
 
 @api_router.get("/admin/reviews")
@@ -3130,21 +3299,30 @@ async def get_all_reviews(status: Optional[str] = None, current_user: User = Dep
 @api_router.patch("/admin/reviews/{review_id}/approve")
 async def approve_review(review_id: str, current_user: User = Depends(get_current_admin)):
     """Approve review"""
-    await db.reviews.update_one(
-        {"id": review_id},
-        {"$set": {
-            "status": "approved",
-            "approved_at": datetime.now(timezone.utc).isoformat()
-        }}
+    review = await product_review_service.set_status(
+        review_id, "approved", {"approved_at": datetime.now(timezone.utc)}
     )
+    if review is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    await settings_registry.invalidate("pages")
     return {"message": "Review approved"}
 
 @api_router.patch("/admin/reviews/{review_id}/reject")
 async def reject_review(review_id: str, current_user: User = Depends(get_current_admin)):
     """Reject review"""
-    await db.reviews.update_one({"id": review_id}, {"$set": {"status": "rejected"}})
+    review = await product_review_service.set_status(review_id, "rejected")
+    if review is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    await settings_registry.invalidate("pages")
     return {"message": "Review rejected"}
 
+@api_router.post("/admin/reviews/ratings/rebuild")
+async def rebuild_product_ratings(product_id: Optional[str] = None, current_user: User = Depends(get_current_admin)):
+    """Recompute product rating summaries from the approved reviews - Admin only"""
+    result = await product_review_service.rebuild(product_id)
+    await settings_registry.invalidate("pages")
+    return result
+
 # ==================== SOCIAL REVIEWS / TESTIMONIALS ROUTES ====================
 
 @api_router.get("/social-reviews")
@@ -3159,11 +3337,7 @@ async def get_public_social_reviews():
 @api_router.get("/social-reviews/featured")
 async def get_featured_social_reviews():
     """Get featured social reviews for homepage"""
-    reviews = await db.social_reviews.find(
-        {"published": True, "featured": True},
-        {"_id": 0}
-    ).sort([("order", 1), ("created_at", -1)]).to_list(20)
-    return reviews
+    return await settings_registry.get("featured_reviews")
 
 @api_router.get("/admin/social-reviews")
 async def get_all_social_reviews(current_user: User = Depends(get_current_admin)):
@@ -3194,6 +3368,8 @@ async def create_social_review(review_data: SocialReviewCreate, current_user: Us
         doc['review_date'] = doc['review_date'].isoformat()
     
     await db.social_reviews.insert_one(doc)
+    await seo_content_service.apply_review_change(None, doc)
+    await settings_registry.invalidate("featured_reviews")
     return {**doc, "_id": None}
 
 @api_router.put("/admin/social-reviews/{review_id}")
@@ -3206,19 +3382,25 @@ async def update_social_review(review_id: str, review_data: dict, current_user:
         except:
             pass
     
-    await db.social_reviews.update_one(
+    before = await db.social_reviews.find_one_and_update(
         {"id": review_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0, "published": 1, "rating": 1}
     )
+    if before:
+        await seo_content_service.apply_review_change(before, {**before, **update_data})
+    await settings_registry.invalidate("featured_reviews")
     updated = await db.social_reviews.find_one({"id": review_id}, {"_id": 0})
     return updated
 
 @api_router.delete("/admin/social-reviews/{review_id}")
 async def delete_social_review(review_id: str, current_user: User = Depends(get_current_admin)):
     """Delete social review - Admin"""
-    result = await db.social_reviews.delete_one({"id": review_id})
-    if result.deleted_count == 0:
+    review = await db.social_reviews.find_one_and_delete({"id": review_id}, projection={"_id": 0, "published": 1, "rating": 1})
+    if not review:
         raise HTTPException(status_code=404, detail="Review not found")
+    await seo_content_service.apply_review_change(review, None)
+    await settings_registry.invalidate("featured_reviews")
     return {"message": "Review deleted"}
 
 @api_router.patch("/admin/social-reviews/{review_id}/toggle-publish")
@@ -3229,10 +3411,14 @@ async def toggle_social_review_publish(review_id: str, current_user: User = Depe
         raise HTTPException(status_code=404, detail="Review not found")
     
     new_status = not review.get('published', False)
-    await db.social_reviews.update_one(
-        {"id": review_id},
+    # Conditional on the status read above so a concurrent toggle is not counted twice
+    result = await db.social_reviews.update_one(
+        {"id": review_id, "published": {"$ne": new_status}},
         {"$set": {"published": new_status}}
     )
+    if result.modified_count:
+        await seo_content_service.apply_review_change(review, {**review, "published": new_status})
+    await settings_registry.invalidate("featured_reviews")
     return {"published": new_status}
 
 @api_router.patch("/admin/social-reviews/{review_id}/toggle-featured")
@@ -3247,307 +3433,88 @@ async def toggle_social_review_featured(review_id: str, current_user: User = Dep
         {"id": review_id},
         {"$set": {"featured": new_status}}
     )
+    await settings_registry.invalidate("featured_reviews")
     return {"featured": new_status}
 
 # ==================== SEO & SITEMAP ROUTES ====================
 
 SITE_DOMAIN = os.environ.get('SITE_URL', os.environ.get('REACT_APP_BACKEND_URL', 'https://www.vigiloc.com.br'))
 
+from sitemap_service import SitemapService
+
+sitemap_service = SitemapService(db, SITE_DOMAIN)
+
+# Content writes invalidate only the sitemap source they touch, on every worker
+for _source in ("services", "pages", "products"):
+    settings_registry.register_signal(f"sitemap_{_source}")
+    settings_registry.on_change(f"sitemap_{_source}", lambda source=_source: sitemap_service.mark_dirty(source))
+
 @api_router.get("/sitemap.xml")
-async def get_dynamic_sitemap():
-    """Generate dynamic sitemap.xml"""
-    from fastapi.responses import Response
-    
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    
-    # Fetch all published services
-    services = await db.services.find({"published": True}, {"_id": 0, "slug": 1, "name": 1}).to_list(100)
-    
-    # Fetch all published custom pages
-    pages = await db.custom_pages.find({"published": True}, {"_id": 0, "slug": 1, "title": 1}).to_list(100)
-    
-    # Fetch all published categories
-    categories = await db.categories.find({}, {"_id": 0, "slug": 1}).to_list(100)
-    
-    sitemap_xml = f'''<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
-        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"
-        xmlns:xhtml="http://www.w3.org/1999/xhtml">
-  
-  <!-- Homepage - Highest Priority -->
-  <url>
-    <loc>{SITE_DOMAIN}/</loc>
-    <lastmod>{today}</lastmod>
-    <changefreq>daily</changefreq>
-    <priority>1.0</priority>
-  </url>
-  
-  <!-- Services Landing Page -->
-  <url>
-    <loc>{SITE_DOMAIN}/servicos</loc>
-    <lastmod>{today}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>0.9</priority>
-  </url>
-  
-  <!-- Contact Page -->
-  <url>
-    <loc>{SITE_DOMAIN}/contato</loc>
-    <lastmod>{today}</lastmod>
-    <changefreq>monthly</changefreq>
-    <priority>0.8</priority>
-  </url>
-  
-  <!-- Individual Service Pages -->
-'''
-    
-    for service in services:
-        sitemap_xml += f'''  <url>
-    <loc>{SITE_DOMAIN}/servico/{service.get('slug', '')}</loc>
-    <lastmod>{today}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>0.8</priority>
-  </url>
-'''
-    
-    # Add custom pages
-    for page in pages:
-        sitemap_xml += f'''  <url>
-    <loc>{SITE_DOMAIN}/p/{page.get('slug', '')}</loc>
-    <lastmod>{today}</lastmod>
-    <changefreq>weekly</changefreq>
-    <priority>0.6</priority>
-  </url>
-'''
-    
-    sitemap_xml += '''
-</urlset>'''
-    
-    return Response(content=sitemap_xml, media_type="application/xml")
+async def get_dynamic_sitemap(request: Request):
+    """Serve sitemap.xml (a sitemap index above 50k URLs) - Public"""
+    return cached_response(request, await sitemap_service.get_index(), "public, max-age=300")
 
-@api_router.get("/llms.txt")
-async def get_llms_txt():
+@api_router.get("/sitemap-{number}.xml")
+async def get_sitemap_chunk(number: int, request: Request):
+    """Serve one numbered sitemap of the sitemap index - Public"""
+    try:
+        return cached_response(request, await sitemap_service.get_chunk(number), "public, max-age=300")
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+
+from seo_content_service import SeoContentService
+
+seo_content_service = SeoContentService(db, SITE_DOMAIN)
+
+# Service and review writes already signal these entries on every worker
+settings_registry.on_change("sitemap_services", seo_content_service.clear)
+settings_registry.on_change("featured_reviews", seo_content_service.clear)
+
+@api_router.get("/llms.txt")
+async def get_llms_txt(request: Request):
     """Serve llms.txt for LLM crawlers"""
-    from fastapi.responses import PlainTextResponse
-    
-    # Fetch services for dynamic content
-    services = await db.services.find({"published": True}, {"_id": 0}).to_list(100)
-    
-    llms_content = f"""# =====================================================
-# VIGILOC - llms.txt
-# Informações para Large Language Models (LLMs)
-# Website: {SITE_DOMAIN}
-# Última atualização: {datetime.now(timezone.utc).strftime("%Y-%m-%d")}
-# =====================================================
-
-# Sobre a Empresa
-> VigiLoc é líder em soluções de automação e segurança eletrônica para condomínios e empresas no Brasil.
-> Fundada há mais de 10 anos, atendemos mais de 500 clientes com 99% de satisfação.
-> Localização: São Paulo, Brasil
-> Website: {SITE_DOMAIN}
-> Contato: WhatsApp disponível no site
-
-# Serviços Principais
-"""
-    
-    for service in services:
-        llms_content += f"""
-## {service.get('name', 'Serviço')}
-> {service.get('shortDescription', '')}
-> URL: {SITE_DOMAIN}/servico/{service.get('slug', '')}
-"""
-    
-    llms_content += """
-# Diferenciais
-- Monitoramento 24/7
-- Suporte técnico especializado
-- Mais de 10 anos de experiência
-- 500+ clientes atendidos
-- 99% de satisfação
-- Tecnologia de ponta com IA
-- Instalação profissional
-- Garantia estendida
-
-# Áreas de Atuação
-- Condomínios residenciais e comerciais
-- Empresas e escritórios
-- Indústrias
-- Hospitais e clínicas
-- Escolas e universidades
-
-# Região de Atendimento
-- São Paulo (SP) e Grande São Paulo
-- Região Metropolitana
-- Interior de São Paulo
-
-# Contato
-- Website: """ + SITE_DOMAIN + """
-- Página de Contato: """ + SITE_DOMAIN + """/contato
-- WhatsApp: Disponível no site
-
-# Informações Técnicas
-- Idioma: Português Brasileiro (pt-BR)
-- Moeda: Real Brasileiro (BRL)
-- Setor: Segurança Eletrônica / Automação Predial
-"""
-    
-    return PlainTextResponse(content=llms_content)
+    return cached_response(request, await seo_content_service.get("llms_txt"), "public, max-age=300")
 
 @api_router.get("/seo/structured-data")
-async def get_structured_data():
+async def get_structured_data(request: Request):
     """Get JSON-LD structured data for SEO"""
-    
-    # Fetch services
-    services = await db.services.find({"published": True}, {"_id": 0}).to_list(100)
-    
-    # Fetch reviews
-    reviews = await db.social_reviews.find({"published": True}, {"_id": 0}).to_list(50)
-    
-    # Calculate average rating
-    avg_rating = 5.0
-    if reviews:
-        avg_rating = sum(r.get('rating', 5) for r in reviews) / len(reviews)
-    
-    structured_data = {
-        "@context": "https://schema.org",
-        "@graph": [
-            {
-                "@type": "Organization",
-                "@id": f"{SITE_DOMAIN}/#organization",
-                "name": "VigiLoc",
-                "url": SITE_DOMAIN,
-                "logo": {
-                    "@type": "ImageObject",
-                    "url": f"{SITE_DOMAIN}/logo512.png"
-                },
-                "description": "Líder em soluções de automação e segurança eletrônica para condomínios e empresas",
-                "address": {
-                    "@type": "PostalAddress",
-                    "addressLocality": "São Paulo",
-                    "addressRegion": "SP",
-                    "addressCountry": "BR"
-                },
-                "areaServed": {
-                    "@type": "GeoCircle",
-                    "geoMidpoint": {
-                        "@type": "GeoCoordinates",
-                        "latitude": -23.5505,
-                        "longitude": -46.6333
-                    },
-                    "geoRadius": "100000"
-                },
-                "sameAs": [],
-                "aggregateRating": {
-                    "@type": "AggregateRating",
-                    "ratingValue": round(avg_rating, 1),
-                    "reviewCount": len(reviews),
-                    "bestRating": 5,
-                    "worstRating": 1
-                }
-            },
-            {
-                "@type": "WebSite",
-                "@id": f"{SITE_DOMAIN}/#website",
-                "url": SITE_DOMAIN,
-                "name": "VigiLoc",
-                "description": "Soluções em Automação e Segurança Eletrônica",
-                "publisher": {"@id": f"{SITE_DOMAIN}/#organization"},
-                "inLanguage": "pt-BR"
-            },
-            {
-                "@type": "LocalBusiness",
-                "@id": f"{SITE_DOMAIN}/#localbusiness",
-                "name": "VigiLoc",
-                "image": f"{SITE_DOMAIN}/logo512.png",
-                "url": SITE_DOMAIN,
-                "telephone": "",
-                "priceRange": "$$",
-                "address": {
-                    "@type": "PostalAddress",
-                    "addressLocality": "São Paulo",
-                    "addressRegion": "SP",
-                    "addressCountry": "BR"
-                },
-                "geo": {
-                    "@type": "GeoCoordinates",
-                    "latitude": -23.5505,
-                    "longitude": -46.6333
-                },
-                "openingHoursSpecification": {
-                    "@type": "OpeningHoursSpecification",
-                    "dayOfWeek": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
-                    "opens": "08:00",
-                    "closes": "18:00"
-                },
-                "aggregateRating": {
-                    "@type": "AggregateRating",
-                    "ratingValue": round(avg_rating, 1),
-                    "reviewCount": len(reviews),
-                    "bestRating": 5,
-                    "worstRating": 1
-                }
-            }
-        ]
-    }
-    
-    # Add services as Service schema
-    for service in services:
-        structured_data["@graph"].append({
-            "@type": "Service",
-            "name": service.get("name"),
-            "description": service.get("shortDescription"),
-            "url": f"{SITE_DOMAIN}/servico/{service.get('slug')}",
-            "provider": {"@id": f"{SITE_DOMAIN}/#organization"},
-            "areaServed": {
-                "@type": "Place",
-                "name": "São Paulo, Brasil"
-            }
-        })
-    
-    # Add reviews
-    for review in reviews[:10]:
-        structured_data["@graph"].append({
-            "@type": "Review",
-            "author": {
-                "@type": "Person",
-                "name": review.get("author_name")
-            },
-            "reviewRating": {
-                "@type": "Rating",
-                "ratingValue": review.get("rating", 5),
-                "bestRating": 5,
-                "worstRating": 1
-            },
-            "reviewBody": review.get("text"),
-            "itemReviewed": {"@id": f"{SITE_DOMAIN}/#organization"}
-        })
-    
-    return structured_data
+    return cached_response(request, await seo_content_service.get("structured_data"), "public, max-age=300")
+
+@api_router.get("/seo/review-stats")
+async def get_review_stats():
+    """Published review count and average rating - Public"""
+    return await seo_content_service.review_stats()
+
+@api_router.post("/admin/seo/review-stats/rebuild")
+async def rebuild_review_stats(current_user: User = Depends(get_current_admin)):
+    """Recount the published reviews behind the review stats - Admin only"""
+    await seo_content_service.rebuild_review_stats()
+    return await seo_content_service.review_stats()
+
+from seo_report_service import SeoReportService
+
+seo_report_service = SeoReportService(db, seo_content_service)
+
+for _name in ("sitemap_services", "sitemap_pages", "featured_reviews"):
+    settings_registry.on_change(_name, seo_report_service.clear)
 
 @api_router.get("/seo/report")
 async def get_seo_report(current_user: User = Depends(get_current_admin)):
     """Generate SEO analysis report"""
     
-    # Fetch data
-    services = await db.services.find({"published": True}, {"_id": 0}).to_list(100)
-    pages = await db.custom_pages.find({"published": True}, {"_id": 0}).to_list(100)
-    reviews = await db.social_reviews.find({"published": True}, {"_id": 0}).to_list(100)
-    site_settings = await db.site_settings.find_one({}, {"_id": 0}) or {}
-    
-    # Calculate scores
-    avg_rating = sum(r.get('rating', 5) for r in reviews) / len(reviews) if reviews else 0
+    metrics = await seo_report_service.content_metrics()
     
     report = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "domain": SITE_DOMAIN,
         
         "content_analysis": {
-            "total_services": len(services),
-            "total_pages": len(pages),
-            "total_reviews": len(reviews),
-            "average_rating": round(avg_rating, 2),
-            "services_with_description": sum(1 for s in services if s.get('shortDescription')),
-            "services_with_banner": sum(1 for s in services if s.get('headerBanner', {}).get('mediaUrl'))
+            "total_services": metrics["services"],
+            "total_pages": metrics["pages"],
+            "total_reviews": metrics["reviews"],
+            "average_rating": round(metrics["average_rating"], 2),
+            "services_with_description": metrics["services_with_description"],
+            "services_with_banner": metrics["services_with_banner"]
         },
         
         "seo_checklist": {
@@ -3567,8 +3534,8 @@ async def get_seo_report(current_user: User = Depends(get_current_admin)):
             "llms_txt": {"status": "✅", "note": "Arquivo disponível para GPTBot, Claude, Perplexity"},
             "clear_content_structure": {"status": "✅", "note": "Conteúdo bem estruturado com headings"},
             "business_info": {"status": "✅", "note": "Informações da empresa claras e acessíveis"},
-            "services_description": {"status": "✅", "note": f"{len(services)} serviços com descrições"},
-            "reviews_available": {"status": "✅", "note": f"{len(reviews)} avaliações para credibilidade"}
+            "services_description": {"status": "✅", "note": f"{metrics['services']} serviços com descrições"},
+            "reviews_available": {"status": "✅", "note": f"{metrics['reviews']} avaliações para credibilidade"}
         },
         
         "search_engines": {
@@ -3613,7 +3580,7 @@ async def get_seo_report(current_user: User = Depends(get_current_admin)):
             {
                 "priority": "média",
                 "action": "Adicionar mais avaliações de clientes",
-                "note": f"Atualmente: {len(reviews)} avaliações"
+                "note": f"Atualmente: {metrics['reviews']} avaliações"
             },
             {
                 "priority": "baixa",
@@ -3626,99 +3593,35 @@ async def get_seo_report(current_user: User = Depends(get_current_admin)):
             f"{SITE_DOMAIN}/",
             f"{SITE_DOMAIN}/servicos",
             f"{SITE_DOMAIN}/contato"
-        ] + [f"{SITE_DOMAIN}/servico/{s.get('slug')}" for s in services]
+        ] + [f"{SITE_DOMAIN}/servico/{slug}" for slug in metrics["service_slugs"]]
     }
     
     return report
 
 # ==================== SEO FILES MANAGEMENT ROUTES ====================
 
+from seo_file_store import FRONTEND_PUBLIC, SEO_FILE_TYPES, SeoFileStore, atomic_write
+
+seo_file_store = SeoFileStore(db)
+
 @api_router.get("/admin/seo/files")
 async def get_seo_files(current_user: User = Depends(get_current_admin)):
     """Get all SEO configuration files"""
-    import os
-    
-    files_info = []
-    frontend_public = "/app/frontend/public"
-    
-    # Define SEO files to track
-    seo_files = [
-        {"name": "robots.txt", "path": f"{frontend_public}/robots.txt", "type": "robots", "editable": True},
-        {"name": "llms.txt", "path": f"{frontend_public}/llms.txt", "type": "llms", "editable": True},
-        {"name": "manifest.json", "path": f"{frontend_public}/manifest.json", "type": "manifest", "editable": True},
-        {"name": "security.txt", "path": f"{frontend_public}/.well-known/security.txt", "type": "security", "editable": True},
-    ]
-    
-    for file_info in seo_files:
-        try:
-            if os.path.exists(file_info["path"]):
-                stat = os.stat(file_info["path"])
-                with open(file_info["path"], 'r') as f:
-                    content = f.read()
-                files_info.append({
-                    "name": file_info["name"],
-                    "path": file_info["path"],
-                    "type": file_info["type"],
-                    "editable": file_info["editable"],
-                    "size": stat.st_size,
-                    "modified": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
-                    "content": content,
-                    "lines": len(content.split('\n')),
-                    "exists": True
-                })
-            else:
-                files_info.append({
-                    "name": file_info["name"],
-                    "path": file_info["path"],
-                    "type": file_info["type"],
-                    "editable": file_info["editable"],
-                    "exists": False
-                })
-        except Exception as e:
-            files_info.append({
-                "name": file_info["name"],
-                "path": file_info["path"],
-                "type": file_info["type"],
-                "error": str(e),
-                "exists": False
-            })
-    
-    return files_info
+    return await seo_file_store.list_files()
 
 @api_router.put("/admin/seo/files/{file_type}")
 async def update_seo_file(file_type: str, data: dict, current_user: User = Depends(get_current_admin)):
     """Update SEO configuration file"""
-    import os
-    
-    frontend_public = "/app/frontend/public"
-    
-    file_paths = {
-        "robots": f"{frontend_public}/robots.txt",
-        "llms": f"{frontend_public}/llms.txt",
-        "manifest": f"{frontend_public}/manifest.json",
-        "security": f"{frontend_public}/.well-known/security.txt"
-    }
-    
-    if file_type not in file_paths:
-        raise HTTPException(status_code=400, detail="Invalid file type")
-    
-    file_path = file_paths[file_type]
     content = data.get("content", "")
-    
-    # Create backup
-    backup_path = f"{file_path}.backup"
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            backup_content = f.read()
-        with open(backup_path, 'w') as f:
-            f.write(backup_content)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    
-    # Write new content
-    with open(file_path, 'w') as f:
-        f.write(content)
+    try:
+        result = await seo_file_store.save(file_type, content, user=current_user.email)
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Invalid file type")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    seo_report_service.files.invalidate()
     
     # Log the change
     await db.seo_logs.insert_one({
@@ -3726,42 +3629,47 @@ async def update_seo_file(file_type: str, data: dict, current_user: User = Depen
         "type": "file_edit",
         "file": file_type,
         "user": current_user.email,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "content_length": len(content)
+        "timestamp": datetime.now(timezone.utc),
+        "content_length": len(content),
+        "version": result["version"]
     })
     
-    return {"message": "File updated successfully", "backup_created": True}
+    return {"message": "File updated successfully", "backup_created": result["changed"], **result}
+
+@api_router.get("/admin/seo/files/{file_type}/versions")
+async def get_seo_file_versions(file_type: str, current_user: User = Depends(get_current_admin)):
+    """Version history of an SEO file (newest first) - Admin only"""
+    try:
+        return await seo_file_store.versions(file_type)
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Invalid file type")
+
+@api_router.get("/admin/seo/files/{file_type}/versions/{version}")
+async def get_seo_file_version(file_type: str, version: int, current_user: User = Depends(get_current_admin)):
+    """Content of a version and its unified diff to the current file - Admin only"""
+    if file_type not in SEO_FILE_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid file type")
+    try:
+        return await seo_file_store.diff(file_type, version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Versão não encontrada")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 @api_router.post("/admin/seo/files/{file_type}/restore")
-async def restore_seo_file(file_type: str, current_user: User = Depends(get_current_admin)):
-    """Restore SEO file from backup"""
-    import os
-    
-    frontend_public = "/app/frontend/public"
-    
-    file_paths = {
-        "robots": f"{frontend_public}/robots.txt",
-        "llms": f"{frontend_public}/llms.txt",
-        "manifest": f"{frontend_public}/manifest.json",
-        "security": f"{frontend_public}/.well-known/security.txt"
-    }
-    
-    if file_type not in file_paths:
+async def restore_seo_file(file_type: str, version: Optional[int] = None, current_user: User = Depends(get_current_admin)):
+    """Restore SEO file to a version (default: the previous one)"""
+    if file_type not in SEO_FILE_TYPES:
         raise HTTPException(status_code=400, detail="Invalid file type")
-    
-    file_path = file_paths[file_type]
-    backup_path = f"{file_path}.backup"
-    
-    if not os.path.exists(backup_path):
+    try:
+        result = await seo_file_store.restore(file_type, version, user=current_user.email)
+    except KeyError:
         raise HTTPException(status_code=404, detail="No backup found")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    seo_report_service.files.invalidate()
     
-    with open(backup_path, 'r') as f:
-        backup_content = f.read()
-    
-    with open(file_path, 'w') as f:
-        f.write(backup_content)
-    
-    return {"message": "File restored from backup"}
+    return {"message": "File restored from backup", **result}
 
 @api_router.post("/seo/log-crawler")
 async def log_crawler_access(request: Request):
@@ -3810,7 +3718,7 @@ async def log_crawler_access(request: Request):
     
     log_entry = {
         "id": str(uuid.uuid4()),
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": datetime.now(timezone.utc),
         "user_agent": user_agent,
         "crawler": detected_crawler,
         "category": crawler_category,
@@ -3858,14 +3766,14 @@ async def get_crawler_logs(
     # Get last 24h stats
     yesterday = datetime.now(timezone.utc) - timedelta(hours=24)
     last_24h = await db.crawler_logs.count_documents({
-        "timestamp": {"$gte": yesterday.isoformat()}
+        "timestamp": {"$gte": yesterday}
     })
     
     # Get last 7 days by day
     seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
     pipeline_daily = [
-        {"$match": {"timestamp": {"$gte": seven_days_ago.isoformat()}}},
-        {"$addFields": {"date": {"$substr": ["$timestamp", 0, 10]}}},
+        {"$match": {"timestamp": {"$gte": seven_days_ago}}},
+        {"$addFields": {"date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}}},
         {"$group": {"_id": "$date", "count": {"$sum": 1}}},
         {"$sort": {"_id": 1}}
     ]
@@ -3895,9 +3803,6 @@ async def get_seo_activity_logs(current_user: User = Depends(get_current_admin),
 @api_router.get("/admin/seo/health-check")
 async def seo_health_check(current_user: User = Depends(get_current_admin)):
     """Check SEO health status"""
-    import os
-    import aiohttp
-    
     health = {
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "files": {},
@@ -3905,21 +3810,15 @@ async def seo_health_check(current_user: User = Depends(get_current_admin)):
         "recommendations": []
     }
     
-    frontend_public = "/app/frontend/public"
+    # Check files exist (cached, revalidated by mtime)
+    files_to_check = await seo_report_service.file_status()
     
-    # Check files exist
-    files_to_check = {
-        "robots.txt": f"{frontend_public}/robots.txt",
-        "llms.txt": f"{frontend_public}/llms.txt",
-        "manifest.json": f"{frontend_public}/manifest.json",
-        "security.txt": f"{frontend_public}/.well-known/security.txt"
-    }
-    
-    for name, path in files_to_check.items():
-        exists = os.path.exists(path)
+    for name, status in files_to_check.items():
+        exists = status["exists"]
         health["files"][name] = {
             "exists": exists,
-            "status": "✅" if exists else "❌"
+            "status": "✅" if exists else "❌",
+            **({"size": status["size"], "modified": status["modified"]} if exists else {})
         }
         if not exists:
             health["recommendations"].append(f"Criar arquivo {name}")
@@ -3938,15 +3837,14 @@ async def seo_health_check(current_user: User = Depends(get_current_admin)):
         }
     
     # Check content quality
-    services = await db.services.find({"published": True}, {"_id": 0}).to_list(100)
-    reviews = await db.social_reviews.find({"published": True}, {"_id": 0}).to_list(100)
+    metrics = await seo_report_service.content_metrics()
     
     health["content"] = {
-        "services_count": len(services),
-        "services_with_description": sum(1 for s in services if s.get("shortDescription")),
-        "services_with_banner": sum(1 for s in services if s.get("headerBanner", {}).get("mediaUrl")),
-        "reviews_count": len(reviews),
-        "average_rating": round(sum(r.get("rating", 5) for r in reviews) / len(reviews), 2) if reviews else 0
+        "services_count": metrics["services"],
+        "services_with_description": metrics["services_with_description"],
+        "services_with_banner": metrics["services_with_banner"],
+        "reviews_count": metrics["reviews"],
+        "average_rating": round(metrics["average_rating"], 2)
     }
     
     # Generate score
@@ -3957,13 +3855,13 @@ async def seo_health_check(current_user: User = Depends(get_current_admin)):
     score += sum(20/len(files_to_check) for name, data in health["files"].items() if data["exists"])
     
     # Content (40 points)
-    if len(services) >= 5:
+    if metrics["services"] >= 5:
         score += 10
-    if health["content"]["services_with_description"] >= len(services) * 0.8:
+    if health["content"]["services_with_description"] >= metrics["services"] * 0.8:
         score += 10
-    if health["content"]["services_with_banner"] >= len(services) * 0.5:
+    if health["content"]["services_with_banner"] >= metrics["services"] * 0.5:
         score += 10
-    if len(reviews) >= 5:
+    if metrics["reviews"] >= 5:
         score += 10
     
     # Endpoints (40 points)
@@ -3980,9 +3878,7 @@ async def seo_health_check(current_user: User = Depends(get_current_admin)):
 async def track_event(event_data: dict):
     """Track analytics event - Public"""
     event = AnalyticsEvent(**event_data)
-    doc = event.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.analytics_events.insert_one(doc)
+    await db.analytics_events.insert_one(event.model_dump())
     return {"message": "Event tracked"}
 
 @api_router.get("/admin/analytics/dashboard")
@@ -3999,7 +3895,7 @@ async def get_analytics_dashboard(current_user: User = Depends(get_current_admin
     total_revenue = sum(order.get('total', 0) for order in orders)
     
     # Orders last 30 days
-    orders_30d = [o for o in orders if datetime.fromisoformat(o.get('created_at', '2020-01-01')) > last_30_days]
+    orders_30d = [o for o in orders if (parse_datetime(o.get('created_at')) or datetime.min.replace(tzinfo=timezone.utc)) > last_30_days]
     revenue_30d = sum(o.get('total', 0) for o in orders_30d)
     
     # Products count
@@ -4026,7 +3922,8 @@ async def get_analytics_dashboard(current_user: User = Depends(get_current_admin
         daily_sales[day_str] = 0
     
     for order in orders:
-        order_date = datetime.fromisoformat(order.get('created_at', '2020-01-01')).strftime('%Y-%m-%d')
+        created_at = parse_datetime(order.get('created_at'))
+        order_date = created_at.strftime('%Y-%m-%d') if created_at else None
         if order_date in daily_sales:
             daily_sales[order_date] += order.get('total', 0)
     
@@ -4041,18 +3938,87 @@ async def get_analytics_dashboard(current_user: User = Depends(get_current_admin
         "daily_sales": daily_sales
     }
 
+# ==================== DATE MIGRATION ROUTES ====================
+
+from date_migration_service import DateMigrationService
+
+date_migration_service = DateMigrationService(db)
+
+@api_router.get("/admin/migrations/dates")
+async def get_date_migration_status(current_user: User = Depends(get_current_admin)):
+    """Get progress of the ISO string to datetime migration"""
+    return await date_migration_service.status()
+
+@api_router.post("/admin/migrations/dates/run")
+async def run_date_migration(restart: bool = False, current_user: User = Depends(get_current_admin)):
+    """Run (or resume) the ISO string to datetime migration"""
+    try:
+        return await date_migration_service.run(restart)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+# ==================== DATA RETENTION ROUTES ====================
+
+from retention_service import RetentionService
+
+retention_service = RetentionService(db, ARCHIVE_DIR)
+
+@api_router.get("/admin/retention/policies")
+async def get_retention_policies(current_user: User = Depends(get_current_admin)):
+    """Get effective retention policies per collection"""
+    return await retention_service.get_policies()
+
+@api_router.put("/admin/retention/policies/{collection}")
+async def update_retention_policy(collection: str, data: dict, current_user: User = Depends(get_current_admin)):
+    """Update retention days, archive format or enabled flag for a collection"""
+    try:
+        policy = await retention_service.update_policy(collection, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Política de retenção atualizada", "policy": policy}
+
+@api_router.post("/admin/retention/run")
+async def run_retention(collection: Optional[str] = None, dry_run: bool = False, current_user: User = Depends(get_current_admin)):
+    """Archive expired documents to disk and delete them from MongoDB"""
+    try:
+        return await retention_service.run(collection, dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/admin/retention/runs")
+async def get_retention_runs(current_user: User = Depends(get_current_admin), limit: int = 20):
+    """Get retention run history"""
+    runs = await db.retention_runs.find({}, {"_id": 0}).sort("started_at", -1).limit(limit).to_list(limit)
+    return runs
+
+@api_router.get("/admin/retention/archive")
+async def get_archive_summary(current_user: User = Depends(get_current_admin)):
+    """Get archived partitions available on disk"""
+    return await retention_service.archive_summary()
+
+@api_router.get("/admin/retention/archive/{collection}")
+async def query_archive(collection: str, start: str, end: str, limit: int = 1000, current_user: User = Depends(get_current_admin)):
+    """Read archived documents for a date range (YYYY-MM-DD) back for reports"""
+    try:
+        documents = await retention_service.query_archive(collection, start[:10], end[:10], min(limit, 10000))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"collection": collection, "start": start, "end": end, "count": len(documents), "documents": documents}
+
 @api_router.put("/admin/payments/{payment_id}/pix")
 async def update_payment_pix(payment_id: str, pix_data: dict, current_user: User = Depends(get_current_admin)):
     """Update PIX information for a payment"""
-    result = await db.payments.update_one(
+    payment = await db.payments.find_one_and_update(
         {"id": payment_id},
         {"$set": {
             "pix_key": pix_data.get("pix_key", ""),
             "pix_qrcode": pix_data.get("pix_qrcode", "")
-        }}
+        }},
+        projection={"_id": 0, "customer_id": 1}
     )
-    if result.matched_count == 0:
+    if not payment:
         raise HTTPException(status_code=404, detail="Pagamento não encontrado")
+    await aging_service.refresh_customer(payment["customer_id"])
     return {"message": "Informações PIX atualizadas"}
 
 # ==================== PAGE CONTENT ROUTES ====================
@@ -4135,12 +4101,7 @@ async def toggle_page_content_publication(page_name: str, published: bool, curre
 @api_router.get("/site-settings")
 async def get_site_settings():
     """Get site settings (public)"""
-    settings = await db.site_settings.find_one({"id": "site_settings"}, {"_id": 0})
-    if not settings:
-        # Return default settings
-        default_settings = SiteSettings()
-        return default_settings.model_dump()
-    return settings
+    return await settings_registry.get("site_settings")
 
 @api_router.put("/admin/site-settings")
 async def update_site_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -4148,11 +4109,7 @@ async def update_site_settings(settings_data: dict, current_user: User = Depends
     settings_data['id'] = "site_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.site_settings.update_one(
-        {"id": "site_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("site_settings", settings_data)
     return {"message": "Configurações do site atualizadas com sucesso"}
 
 # ==================== NAVBAR SETTINGS ROUTES ====================
@@ -4160,11 +4117,7 @@ async def update_site_settings(settings_data: dict, current_user: User = Depends
 @api_router.get("/navbar-settings")
 async def get_navbar_settings():
     """Get navbar settings - Public"""
-    settings = await db.navbar_settings.find_one({"id": "navbar_settings"}, {"_id": 0})
-    if not settings:
-        # Return defaults
-        return NavbarSettings().model_dump()
-    return settings
+    return await settings_registry.get("navbar_settings")
 
 @api_router.put("/admin/navbar-settings")
 async def update_navbar_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -4172,11 +4125,7 @@ async def update_navbar_settings(settings_data: dict, current_user: User = Depen
     settings_data['id'] = "navbar_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.navbar_settings.update_one(
-        {"id": "navbar_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("navbar_settings", settings_data)
     return {"message": "Configurações da navbar atualizadas com sucesso"}
 
 
@@ -4185,42 +4134,7 @@ async def update_navbar_settings(settings_data: dict, current_user: User = Depen
 @api_router.get("/contact-page-settings")
 async def get_contact_page_settings():
     """Get contact page settings - Public"""
-    settings = await db.contact_page_settings.find_one({"id": "contact_page_settings"}, {"_id": 0})
-    if not settings:
-        return {
-            "hero_title": "Entre em Contato",
-            "hero_subtitle": "Estamos prontos para ajudar você",
-            "hero_background_image": "",
-            "phone": "",
-            "phone_secondary": "",
-            "email": "",
-            "email_secondary": "",
-            "whatsapp_number": "",
-            "whatsapp_message": "Olá! Gostaria de mais informações sobre os serviços da VigiLoc.",
-            "whatsapp_button_text": "Falar pelo WhatsApp",
-            "show_whatsapp_button": True,
-            "address_street": "",
-            "address_neighborhood": "",
-            "address_city": "",
-            "address_state": "",
-            "address_zip": "",
-            "address_country": "Brasil",
-            "working_hours_weekdays": "Segunda a Sexta: 08:00 - 18:00",
-            "working_hours_saturday": "Sábado: 08:00 - 12:00",
-            "working_hours_sunday": "Domingo: Fechado",
-            "google_maps_embed": "",
-            "show_map": True,
-            "facebook_url": "",
-            "instagram_url": "",
-            "youtube_url": "",
-            "linkedin_url": "",
-            "website_url": "",
-            "form_title": "Envie sua Mensagem",
-            "form_subtitle": "Preencha o formulário abaixo e entraremos em contato",
-            "form_success_message": "Mensagem enviada com sucesso! Entraremos em contato em breve.",
-            "show_contact_form": True
-        }
-    return settings
+    return await settings_registry.get("contact_page_settings")
 
 @api_router.put("/admin/contact-page-settings")
 async def update_contact_page_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -4228,11 +4142,7 @@ async def update_contact_page_settings(settings_data: dict, current_user: User =
     settings_data['id'] = "contact_page_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.contact_page_settings.update_one(
-        {"id": "contact_page_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("contact_page_settings", settings_data)
     return {"message": "Configurações da página de contato atualizadas com sucesso"}
 
 
@@ -4241,20 +4151,7 @@ async def update_contact_page_settings(settings_data: dict, current_user: User =
 @api_router.get("/whatsapp-auto-reply-settings")
 async def get_whatsapp_auto_reply_settings():
     """Get WhatsApp auto-reply settings - Public"""
-    settings = await db.whatsapp_auto_reply_settings.find_one({"id": "whatsapp_auto_reply"}, {"_id": 0})
-    if not settings:
-        return {
-            "enabled": False,
-            "welcome_message": "Olá! 👋 Bem-vindo à VigiLoc! Como posso ajudar você hoje?",
-            "business_hours_message": "Nosso horário de atendimento é de Segunda a Sexta, das 8h às 18h. Deixe sua mensagem que retornaremos o mais breve possível!",
-            "outside_hours_message": "Estamos fora do horário de atendimento. Retornaremos sua mensagem no próximo dia útil. Obrigado pela compreensão! 🙏",
-            "auto_replies": [
-                {"id": "1", "trigger": "preço", "response": "Para informações sobre preços e orçamentos, por favor acesse nosso site ou fale com um consultor."},
-                {"id": "2", "trigger": "horário", "response": "Nosso horário de atendimento é de Segunda a Sexta, das 8h às 18h, e Sábados das 8h às 12h."},
-                {"id": "3", "trigger": "endereço", "response": "Estamos localizados na Av. Paulista, 1000 - São Paulo/SP. CEP: 01310-100"}
-            ]
-        }
-    return settings
+    return await settings_registry.get("whatsapp_auto_reply")
 
 @api_router.put("/admin/whatsapp-auto-reply-settings")
 async def update_whatsapp_auto_reply_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -4262,179 +4159,75 @@ async def update_whatsapp_auto_reply_settings(settings_data: dict, current_user:
     settings_data['id'] = "whatsapp_auto_reply"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.whatsapp_auto_reply_settings.update_one(
-        {"id": "whatsapp_auto_reply"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("whatsapp_auto_reply", settings_data)
     return {"message": "Configurações de resposta automática do WhatsApp atualizadas com sucesso"}
 
 
 # ==================== NOTIFICATION/AUTOMATION ROUTES ====================
 
+from crm_trigger_service import CRMTriggerService
+crm_trigger_service = CRMTriggerService(db, CRMSettings().model_dump())
+
 @api_router.post("/admin/notifications/send-payment-reminders")
 async def send_payment_reminders(current_user: User = Depends(get_current_admin)):
     """Send payment reminders based on configurable days before due date"""
-    # Get settings
-    settings = await db.crm_settings.find_one({"id": "crm_settings"}, {"_id": 0})
-    if not settings:
-        settings = CRMSettings().model_dump()
-    
-    days_before = settings.get('trigger_settings', {}).get('payment_reminder_days', 1)
-    target_date = datetime.now() + timedelta(days=days_before)
-    target_start = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    target_end = target_date.replace(hour=23, minute=59, second=59)
-    
-    payments = await db.payments.find({
-        "status": "pending",
-        "reminder_sent": False,
-        "due_date": {
-            "$gte": target_start.isoformat(),
-            "$lte": target_end.isoformat()
-        }
-    }, {"_id": 0}).to_list(1000)
-    
-    sent = 0
-    whatsapp_template = settings.get('whatsapp_templates', {}).get('payment_reminder', 
-        "Olá {customer_name}! Lembrete: Seu pagamento de R$ {amount} vence em {due_date}. PIX: {pix_key}")
-    
-    for payment in payments:
-        customer = await db.customers.find_one({"id": payment['customer_id']}, {"_id": 0})
-        if customer:
-            # Format message with template
-            message = whatsapp_template.format(
-                customer_name=customer['name'],
-                amount=f"{payment['amount']:.2f}",
-                due_date=payment['due_date'][:10],
-                pix_key=payment.get('pix_key', 'Ver fatura')
-            )
-            
-            # Create notification
-            notification = Notification(
-                customer_id=customer['id'],
-                type="payment_reminder",
-                channel="whatsapp",
-                message=message
-            )
-            
-            notif_doc = notification.model_dump()
-            notif_doc['created_at'] = notif_doc['created_at'].isoformat()
-            await db.notifications.insert_one(notif_doc)
-            
-            # Mark as sent
-            await db.payments.update_one({"id": payment['id']}, {"$set": {"reminder_sent": True}})
-            sent += 1
-    
-    return {"message": f"{sent} lembretes agendados"}
+    sent = await crm_trigger_service.run("payment_reminder")
+    return {"message": f"{sent} lembretes agendados", "sent": sent}
 
 @api_router.post("/admin/notifications/send-overdue-notices")
 async def send_overdue_notices(current_user: User = Depends(get_current_admin)):
     """Send overdue notices based on configurable days after due date"""
-    # Get settings
-    settings = await db.crm_settings.find_one({"id": "crm_settings"}, {"_id": 0})
-    if not settings:
-        settings = CRMSettings().model_dump()
-    
-    days_overdue = settings.get('trigger_settings', {}).get('overdue_notice_days', 3)
-    target_date = datetime.now() - timedelta(days=days_overdue)
-    
-    payments = await db.payments.find({
-        "status": "pending",
-        "overdue_notice_sent": False,
-        "due_date": {"$lt": target_date.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    
-    sent = 0
-    whatsapp_template = settings.get('whatsapp_templates', {}).get('overdue_notice',
-        "⚠️ {customer_name}, seu pagamento de R$ {amount} está atrasado. Por favor, regularize para evitar suspensão do serviço. PIX: {pix_key}")
-    
-    for payment in payments:
-        customer = await db.customers.find_one({"id": payment['customer_id']}, {"_id": 0})
-        if customer:
-            # Format message with template
-            message = whatsapp_template.format(
-                customer_name=customer['name'],
-                amount=f"{payment['amount']:.2f}",
-                due_date=payment['due_date'][:10],
-                pix_key=payment.get('pix_key', 'Ver fatura')
-            )
-            
-            notification = Notification(
-                customer_id=customer['id'],
-                type="overdue",
-                channel="whatsapp",
-                message=message
-            )
-            
-            notif_doc = notification.model_dump()
-            notif_doc['created_at'] = notif_doc['created_at'].isoformat()
-            await db.notifications.insert_one(notif_doc)
-            
-            await db.payments.update_one({"id": payment['id']}, {"$set": {"overdue_notice_sent": True, "status": "overdue"}})
-            sent += 1
-    
-    return {"message": f"{sent} avisos de atraso enviados"}
+    sent = await crm_trigger_service.run("overdue_notice")
+    return {"message": f"{sent} avisos de atraso enviados", "sent": sent}
 
 @api_router.post("/admin/notifications/send-suspension-warnings")
 async def send_suspension_warnings(current_user: User = Depends(get_current_admin)):
     """Send suspension warnings based on configurable days after due date"""
-    # Get settings
-    settings = await db.crm_settings.find_one({"id": "crm_settings"}, {"_id": 0})
-    if not settings:
-        settings = CRMSettings().model_dump()
-    
-    days_overdue = settings.get('trigger_settings', {}).get('suspension_warning_days', 10)
-    target_date = datetime.now() - timedelta(days=days_overdue)
-    
-    payments = await db.payments.find({
-        "status": "overdue",
-        "suspension_notice_sent": False,
-        "due_date": {"$lt": target_date.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    
-    sent = 0
-    whatsapp_template = settings.get('whatsapp_templates', {}).get('suspension_warning',
-        "🚨 AVISO FINAL {customer_name}: Seu serviço será suspenso em 24h por falta de pagamento. Valor: R$ {amount}. Regularize URGENTE! PIX: {pix_key}")
-    
-    for payment in payments:
-        customer = await db.customers.find_one({"id": payment['customer_id']}, {"_id": 0})
-        if customer:
-            # Format message with template
-            message = whatsapp_template.format(
-                customer_name=customer['name'],
-                amount=f"{payment['amount']:.2f}",
-                due_date=payment['due_date'][:10],
-                pix_key=payment.get('pix_key', 'Ver fatura')
-            )
-            
-            notification = Notification(
-                customer_id=customer['id'],
-                type="suspension",
-                channel="whatsapp",
-                message=message
-            )
-            
-            notif_doc = notification.model_dump()
-            notif_doc['created_at'] = notif_doc['created_at'].isoformat()
-            await db.notifications.insert_one(notif_doc)
-            
-            await db.payments.update_one({"id": payment['id']}, {"$set": {"suspension_notice_sent": True}})
-            
-            # Update customer status to suspended
-            await db.customers.update_one({"id": customer['id']}, {"$set": {"status": "suspended"}})
-            sent += 1
-    
-    return {"message": f"{sent} avisos de suspensão enviados"}
+    sent = await crm_trigger_service.run("suspension_warning")
+    return {"message": f"{sent} avisos de suspensão enviados", "sent": sent}
 
 @api_router.get("/admin/notifications", response_model=List[Notification])
 async def get_notifications(current_user: User = Depends(get_current_admin)):
     notifications = await db.notifications.find({}, {"_id": 0}).sort("created_at", -1).limit(100).to_list(100)
-    for notif in notifications:
-        for field in ['created_at', 'sent_at']:
-            if notif.get(field) and isinstance(notif[field], str):
-                notif[field] = datetime.fromisoformat(notif[field])
     return notifications
 
+from notification_dispatch_service import (
+    NotificationDispatchService, WhatsAppAdapter, EmailAdapter, StubAdapter
+)
+
+# NOTIFICATION_ADAPTERS=stub delivers to in-process stubs (local/test runs)
+if os.environ.get('NOTIFICATION_ADAPTERS', '').lower() == 'stub':
+    notification_adapters = [StubAdapter("whatsapp"), StubAdapter("email")]
+else:
+    notification_adapters = []
+    if os.environ.get('WHATSAPP_API_URL'):
+        notification_adapters.append(
+            WhatsAppAdapter(os.environ['WHATSAPP_API_URL'], os.environ.get('WHATSAPP_API_TOKEN', ''))
+        )
+    if SENDGRID_API_KEY:
+        notification_adapters.append(EmailAdapter(send_email))
+
+notification_dispatcher = NotificationDispatchService(
+    db,
+    notification_adapters,
+    rate_limits={
+        "whatsapp": float(os.environ.get('WHATSAPP_RATE_PER_SECOND', 20)),
+        "email": float(os.environ.get('EMAIL_RATE_PER_SECOND', 50))
+    }
+)
+
+@api_router.post("/admin/notifications/dispatch")
+async def dispatch_notifications(current_user: User = Depends(get_current_admin)):
+    """Deliver one batch of pending notifications now"""
+    if not notification_dispatcher.adapters:
+        raise HTTPException(status_code=400, detail="Nenhum canal de envio configurado")
+    return await notification_dispatcher.dispatch_batch()
+
+@api_router.get("/admin/notifications/dispatch/stats")
+async def get_dispatch_stats(hours: int = 24, current_user: User = Depends(get_current_admin)):
+    """Get delivery counts per channel/status and latency"""
+    return await notification_dispatcher.get_stats(hours)
+
 # ==================== CRM SETTINGS ROUTES ====================
 
 @api_router.get("/admin/crm/settings")
@@ -4477,101 +4270,73 @@ async def update_whatsapp_templates(templates: dict, current_user: User = Depend
     )
     return {"message": "Templates de WhatsApp atualizados"}
 
-@api_router.post("/admin/notifications/send-overdue-notices")
-async def send_overdue_notices(current_user: User = Depends(get_current_admin)):
-    """Send overdue notices based on configurable days after due date"""
-    # Get settings
-    settings = await db.crm_settings.find_one({"id": "crm_settings"}, {"_id": 0})
-    if not settings:
-        settings = CRMSettings().model_dump()
-    
-    days_overdue = settings.get('trigger_settings', {}).get('overdue_notice_days', 3)
-    target_date = datetime.now() - timedelta(days=days_overdue)
-    
-    payments = await db.payments.find({
-        "status": "pending",
-        "overdue_notice_sent": False,
-        "due_date": {"$lt": target_date.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    
-    sent = 0
-    whatsapp_template = settings.get('whatsapp_templates', {}).get('overdue_notice',
-        "⚠️ {customer_name}, seu pagamento de R$ {amount} está atrasado. Por favor, regularize para evitar suspensão do serviço. PIX: {pix_key}")
-    
-    for payment in payments:
-        customer = await db.customers.find_one({"id": payment['customer_id']}, {"_id": 0})
-        if customer:
-            # Format message with template
-            message = whatsapp_template.format(
-                customer_name=customer['name'],
-                amount=f"{payment['amount']:.2f}",
-                due_date=payment['due_date'][:10],
-                pix_key=payment.get('pix_key', 'Ver fatura')
-            )
-            
-            notification = Notification(
-                customer_id=customer['id'],
-                type="overdue",
-                channel="whatsapp",
-                message=message
-            )
-            
-            notif_doc = notification.model_dump()
-            notif_doc['created_at'] = notif_doc['created_at'].isoformat()
-            await db.notifications.insert_one(notif_doc)
-            
-            await db.payments.update_one({"id": payment['id']}, {"$set": {"overdue_notice_sent": True, "status": "overdue"}})
-            sent += 1
-    
-    return {"message": f"{sent} avisos de atraso enviados"}
 
-@api_router.post("/admin/notifications/send-suspension-warnings")
-async def send_suspension_warnings(current_user: User = Depends(get_current_admin)):
-    """Send suspension warnings based on configurable days after due date"""
-    # Get settings
-    settings = await db.crm_settings.find_one({"id": "crm_settings"}, {"_id": 0})
-    if not settings:
-        settings = CRMSettings().model_dump()
-    
-    days_overdue = settings.get('trigger_settings', {}).get('suspension_warning_days', 10)
-    target_date = datetime.now() - timedelta(days=days_overdue)
-    
-    payments = await db.payments.find({
-        "status": "overdue",
-        "suspension_notice_sent": False,
-        "due_date": {"$lt": target_date.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    
-    sent = 0
-    whatsapp_template = settings.get('whatsapp_templates', {}).get('suspension_warning',
-        "🚨 AVISO FINAL {customer_name}: Seu serviço será suspenso em 24h por falta de pagamento. Valor: R$ {amount}. Regularize URGENTE! PIX: {pix_key}")
-    
-    for payment in payments:
-        customer = await db.customers.find_one({"id": payment['customer_id']}, {"_id": 0})
-        if customer:
-            # Format message with template
-            message = whatsapp_template.format(
-                customer_name=customer['name'],
-                amount=f"{payment['amount']:.2f}",
-                due_date=payment['due_date'][:10],
-                pix_key=payment.get('pix_key', 'Ver fatura')
-            )
-            
-            notification = Notification(
-                customer_id=customer['id'],
-                type="suspension",
-                channel="whatsapp",
-                message=message
-            )
-            
-            notif_doc = notification.model_dump()
-            notif_doc['created_at'] = notif_doc['created_at'].isoformat()
-            await db.notifications.insert_one(notif_doc)
-            
-            await db.payments.update_one({"id": payment['id']}, {"$set": {"suspension_notice_sent": True}})
-            sent += 1
-    
-    return {"message": f"{sent} avisos de suspensão enviados"}
+# ==================== SCHEDULER ROUTES ====================
+
+from scheduler_service import SchedulerService
+
+scheduler_service = SchedulerService(
+    db,
+    timezone_name=os.environ.get('SCHEDULER_TIMEZONE', 'America/Sao_Paulo')
+)
+
+# Trigger days come from crm_settings.trigger_settings on every run
+scheduler_service.register(
+    "payment_reminders", "0 9 * * *",
+    lambda: crm_trigger_service.run("payment_reminder"),
+    "Lembretes de pagamento"
+)
+scheduler_service.register(
+    "overdue_notices", "0 10 * * *",
+    lambda: crm_trigger_service.run("overdue_notice"),
+    "Avisos de atraso"
+)
+scheduler_service.register(
+    "suspension_warnings", "0 11 * * *",
+    lambda: crm_trigger_service.run("suspension_warning"),
+    "Avisos de suspensão"
+)
+scheduler_service.register(
+    "monthly_billing", "0 6 1 * *",
+    run_monthly_billing,
+    "Geração de cobranças mensais"
+)
+scheduler_service.register(
+    "data_retention", "0 3 * * *",
+    retention_service.run,
+    "Arquivamento de logs e eventos expirados"
+)
+
+@api_router.get("/admin/scheduler/jobs")
+async def get_scheduler_jobs(current_user: User = Depends(get_current_admin)):
+    """Get scheduled jobs with next/last run and lease holder"""
+    return await scheduler_service.list_jobs()
+
+@api_router.put("/admin/scheduler/jobs/{job_name}")
+async def update_scheduler_job(job_name: str, data: dict, current_user: User = Depends(get_current_admin)):
+    """Update a job's cron schedule or enabled flag"""
+    try:
+        job = await scheduler_service.update_job(job_name, data)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Job atualizado", "job": job}
+
+@api_router.post("/admin/scheduler/jobs/{job_name}/run")
+async def run_scheduler_job(job_name: str, current_user: User = Depends(get_current_admin)):
+    """Run a job immediately"""
+    try:
+        return await scheduler_service.run_now(job_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@api_router.get("/admin/scheduler/runs")
+async def get_scheduler_runs(job: Optional[str] = None, limit: int = 50, current_user: User = Depends(get_current_admin)):
+    """Get job run history with durations and catch-up info"""
+    return await scheduler_service.list_runs(job, min(limit, 500))
 
 
 # ==================== TRACKING & ANALYTICS ROUTES ====================
@@ -4579,10 +4344,7 @@ async def send_suspension_warnings(current_user: User = Depends(get_current_admi
 @api_router.get("/tracking-settings")
 async def get_tracking_settings():
     """Get tracking settings - Public for script injection"""
-    settings = await db.tracking_settings.find_one({"id": "tracking_settings"}, {"_id": 0})
-    if not settings:
-        return TrackingSettings().model_dump()
-    return settings
+    return await settings_registry.get("tracking_settings")
 
 @api_router.put("/admin/tracking-settings")
 async def update_tracking_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -4590,11 +4352,7 @@ async def update_tracking_settings(settings_data: dict, current_user: User = Dep
     settings_data['id'] = "tracking_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.tracking_settings.update_one(
-        {"id": "tracking_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("tracking_settings", settings_data)
     return {"message": "Configurações de tracking atualizadas"}
 
 
@@ -4603,10 +4361,7 @@ async def update_tracking_settings(settings_data: dict, current_user: User = Dep
 @api_router.get("/seo-settings")
 async def get_seo_settings():
     """Get SEO settings - Public"""
-    settings = await db.seo_settings.find_one({"id": "seo_settings"}, {"_id": 0})
-    if not settings:
-        return SEOSettings().model_dump()
-    return settings
+    return await settings_registry.get("seo_settings")
 
 @api_router.put("/admin/seo-settings")
 async def update_seo_settings(settings_data: dict, current_user: User = Depends(get_current_admin)):
@@ -4614,225 +4369,129 @@ async def update_seo_settings(settings_data: dict, current_user: User = Depends(
     settings_data['id'] = "seo_settings"
     settings_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.seo_settings.update_one(
-        {"id": "seo_settings"},
-        {"$set": settings_data},
-        upsert=True
-    )
+    await settings_registry.update("seo_settings", settings_data)
     return {"message": "Configurações de SEO atualizadas"}
 
+from seo_analyzer import SeoAnalyzer, MAX_BATCH_URLS
+
+seo_analyzer = SeoAnalyzer()
+
 @api_router.post("/admin/seo/analyze")
 async def analyze_page_seo(url: str, current_user: User = Depends(get_current_admin)):
     """Analyze a page for SEO - Returns score and suggestions"""
     try:
-        import httpx
-        from bs4 import BeautifulSoup
-        
-        # Fetch page content
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            html = response.text
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Initialize scores
-        title_score = 0
-        description_score = 0
-        keywords_score = 0
-        headings_score = 0
-        content_score = 0
-        images_score = 0
-        links_score = 0
-        issues = []
-        warnings = []
-        suggestions = []
-        
-        # Analyze Title
-        title_tag = soup.find('title')
-        if title_tag:
-            title = title_tag.string or ""
-            if 30 <= len(title) <= 60:
-                title_score = 100
-            elif len(title) < 30:
-                title_score = 50
-                warnings.append(f"Título muito curto ({len(title)} caracteres). Recomendado: 30-60.")
-            else:
-                title_score = 70
-                warnings.append(f"Título muito longo ({len(title)} caracteres). Recomendado: 30-60.")
-        else:
-            issues.append("❌ Título ausente")
-        
-        # Analyze Meta Description
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc and meta_desc.get('content'):
-            desc = meta_desc.get('content', '')
-            if 120 <= len(desc) <= 160:
-                description_score = 100
-            elif len(desc) < 120:
-                description_score = 60
-                warnings.append(f"Meta description curta ({len(desc)} caracteres). Recomendado: 120-160.")
-            else:
-                description_score = 80
-                warnings.append(f"Meta description longa ({len(desc)} caracteres). Recomendado: 120-160.")
-        else:
-            issues.append("❌ Meta description ausente")
-        
-        # Analyze Keywords
-        meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
-        if meta_keywords and meta_keywords.get('content'):
-            keywords_score = 100
-        else:
-            keywords_score = 50
-            suggestions.append("💡 Adicione meta keywords relevantes")
-        
-        # Analyze Headings
-        h1_tags = soup.find_all('h1')
-        if len(h1_tags) == 1:
-            headings_score = 100
-        elif len(h1_tags) == 0:
-            issues.append("❌ Nenhum H1 encontrado")
-            headings_score = 0
-        else:
-            warnings.append(f"⚠️ Múltiplos H1 encontrados ({len(h1_tags)}). Use apenas um.")
-            headings_score = 50
-        
-        h2_tags = soup.find_all('h2')
-        if len(h2_tags) >= 2:
-            headings_score = min(headings_score + 20, 100)
-        else:
-            suggestions.append("💡 Adicione mais H2 para estruturar o conteúdo")
-        
-        # Analyze Content
-        paragraphs = soup.find_all('p')
-        total_text = ' '.join([p.get_text() for p in paragraphs])
-        word_count = len(total_text.split())
-        
-        if word_count >= 300:
-            content_score = 100
-        elif word_count >= 150:
-            content_score = 70
-            suggestions.append(f"💡 Conteúdo com {word_count} palavras. Recomendado: 300+")
-        else:
-            content_score = 40
-            warnings.append(f"⚠️ Conteúdo muito curto ({word_count} palavras)")
-        
-        # Analyze Images
-        images = soup.find_all('img')
-        images_with_alt = [img for img in images if img.get('alt')]
-        if len(images) > 0:
-            images_score = int((len(images_with_alt) / len(images)) * 100)
-            if images_score < 100:
-                warnings.append(f"⚠️ {len(images) - len(images_with_alt)} imagens sem atributo ALT")
-        else:
-            images_score = 100
-        
-        # Analyze Links
-        links = soup.find_all('a')
-        internal_links = [a for a in links if a.get('href', '').startswith('/') or 'vigiloc' in a.get('href', '')]
-        external_links = [a for a in links if a.get('href', '').startswith('http') and 'vigiloc' not in a.get('href', '')]
-        
-        if len(internal_links) >= 3:
-            links_score = 100
-        elif len(internal_links) >= 1:
-            links_score = 70
-            suggestions.append("💡 Adicione mais links internos")
-        else:
-            links_score = 40
-            warnings.append("⚠️ Poucos ou nenhum link interno")
-        
-        # Calculate overall score
-        overall_score = int((
-            title_score + description_score + keywords_score + 
-            headings_score + content_score + images_score + links_score
-        ) / 7)
-        
-        return {
-            "page_url": url,
-            "score": overall_score,
-            "title_score": title_score,
-            "description_score": description_score,
-            "keywords_score": keywords_score,
-            "headings_score": headings_score,
-            "content_score": content_score,
-            "images_score": images_score,
-            "links_score": links_score,
-            "issues": issues,
-            "warnings": warnings,
-            "suggestions": suggestions,
-            "analyzed_at": datetime.now(timezone.utc).isoformat()
-        }
+        return await seo_analyzer.analyze(url)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na análise: {str(e)}")
 
+@api_router.post("/admin/seo/analyze-batch")
+async def analyze_pages_seo(payload: dict, current_user: User = Depends(get_current_admin)):
+    """Analyze many pages concurrently; failed pages carry an error - Admin only"""
+    urls = payload.get("urls")
+    if not isinstance(urls, list) or not urls or not all(isinstance(u, str) and u for u in urls):
+        raise HTTPException(status_code=400, detail="Informe uma lista de URLs")
+    if len(urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BATCH_URLS} URLs por análise")
+    
+    results = await seo_analyzer.analyze_many(urls)
+    scored = [r for r in results if "error" not in r]
+    return {
+        "results": results,
+        "analyzed": len(scored),
+        "failed": len(results) - len(scored),
+        "average_score": round(sum(r["score"] for r in scored) / len(scored), 1) if scored else None
+    }
+
+@api_router.get("/admin/seo/analyzer-status")
+async def get_seo_analyzer_status(current_user: User = Depends(get_current_admin)):
+    """Parser, pool sizes and cached page count of the SEO analyzer - Admin only"""
+    return seo_analyzer.status()
+
+from seo_crawl_service import SeoCrawlService, DEFAULT_MAX_PAGES, DEFAULT_CONCURRENCY
+
+seo_crawl_service = SeoCrawlService(db, seo_analyzer)
+
+@api_router.post("/admin/seo/crawl")
+async def start_seo_crawl(payload: dict, current_user: User = Depends(get_current_admin)):
+    """Start a site-wide SEO audit crawl (defaults to this site) - Admin only"""
+    try:
+        return await seo_crawl_service.start(
+            payload.get("site_url") or SITE_DOMAIN,
+            max_pages=int(payload.get("max_pages") or DEFAULT_MAX_PAGES),
+            concurrency=int(payload.get("concurrency") or DEFAULT_CONCURRENCY)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@api_router.get("/admin/seo/crawl")
+async def list_seo_crawls(limit: int = 20, current_user: User = Depends(get_current_admin)):
+    """Recent SEO audit crawls - Admin only"""
+    return await seo_crawl_service.list_jobs(min(limit, 100))
+
+@api_router.get("/admin/seo/crawl/{job_id}")
+async def get_seo_crawl(job_id: str, current_user: User = Depends(get_current_admin)):
+    """Progress of a crawl, and its summary once finished - Admin only"""
+    job = await seo_crawl_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Auditoria não encontrada")
+    return job
+
+@api_router.get("/admin/seo/crawl/{job_id}/pages")
+async def get_seo_crawl_pages(
+    job_id: str,
+    issue: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_admin)
+):
+    """Crawled pages, optionally only broken / low_score / missing_title / missing_description - Admin only"""
+    try:
+        return await seo_crawl_service.get_pages(job_id, issue, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/admin/seo/crawl/{job_id}/cancel")
+async def cancel_seo_crawl(job_id: str, current_user: User = Depends(get_current_admin)):
+    """Stop a running crawl - Admin only"""
+    if not await seo_crawl_service.cancel(job_id):
+        raise HTTPException(status_code=409, detail="A auditoria não está em andamento")
+    return {"message": "Cancelamento solicitado"}
+
 @api_router.post("/admin/seo/generate-sitemap")
 async def generate_sitemap(current_user: User = Depends(get_current_admin)):
-    """Generate sitemap.xml"""
+    """Rebuild sitemap.xml and write it to the frontend public folder - Admin only"""
     try:
-        seo_settings = await db.seo_settings.find_one({"id": "seo_settings"}, {"_id": 0})
-        site_url = seo_settings.get('site_url', 'https://www.vigiloc.com.br') if seo_settings else 'https://www.vigiloc.com.br'
-        
-        # Get all published pages and products
-        products = await db.products.find({"published": True}, {"_id": 0, "id": 1, "timestamp": 1}).to_list(1000)
-        custom_pages = await db.custom_pages.find({"published": True}, {"_id": 0, "slug": 1, "updated_at": 1}).to_list(1000)
-        
-        # Build sitemap
-        sitemap_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        sitemap_content += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        sitemap_service.mark_dirty()
+        sitemap = await sitemap_service.get_index()
         
-        # Homepage
-        sitemap_content += '  <url>\n'
-        sitemap_content += f'    <loc>{site_url}/</loc>\n'
-        sitemap_content += '    <changefreq>daily</changefreq>\n'
-        sitemap_content += '    <priority>1.0</priority>\n'
-        sitemap_content += '  </url>\n'
+        # Save to file off the event loop; readers see the old or the new file, never a partial one
+        await asyncio.to_thread(atomic_write, os.path.join(FRONTEND_PUBLIC, 'sitemap.xml'), sitemap.body)
         
-        # System pages
-        for page in ['/produtos', '/totens', '/contato', '/sobre']:
-            sitemap_content += '  <url>\n'
-            sitemap_content += f'    <loc>{site_url}{page}</loc>\n'
-            sitemap_content += '    <changefreq>weekly</changefreq>\n'
-            sitemap_content += '    <priority>0.8</priority>\n'
-            sitemap_content += '  </url>\n'
-        
-        # Products
-        for product in products:
-            sitemap_content += '  <url>\n'
-            sitemap_content += f'    <loc>{site_url}/produto/{product["id"]}</loc>\n'
-            sitemap_content += '    <changefreq>monthly</changefreq>\n'
-            sitemap_content += '    <priority>0.6</priority>\n'
-            sitemap_content += '  </url>\n'
-        
-        # Custom pages
-        for page in custom_pages:
-            sitemap_content += '  <url>\n'
-            sitemap_content += f'    <loc>{site_url}/pages/{page["slug"]}</loc>\n'
-            sitemap_content += '    <changefreq>monthly</changefreq>\n'
-            sitemap_content += '    <priority>0.5</priority>\n'
-            sitemap_content += '  </url>\n'
-        
-        sitemap_content += '</urlset>'
-        
-        # Save to file
-        with open('/app/frontend/public/sitemap.xml', 'w', encoding='utf-8') as f:
-            f.write(sitemap_content)
-        
-        return {"message": "Sitemap gerado com sucesso", "urls_count": len(products) + len(custom_pages) + 5}
+        sitemap_status = await sitemap_service.status()
+        return {
+            "message": "Sitemap gerado com sucesso",
+            "urls_count": sitemap_status["urls"],
+            "files": sitemap_status["files"]
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar sitemap: {str(e)}")
 
+@api_router.get("/admin/seo/sitemap-status")
+async def get_sitemap_status(current_user: User = Depends(get_current_admin)):
+    """URL counts per source and files of the cached sitemap - Admin only"""
+    return await sitemap_service.status()
+
 @api_router.post("/admin/seo/update-robots")
 async def update_robots_txt(content: str, current_user: User = Depends(get_current_admin)):
     """Update robots.txt"""
     try:
-        with open('/app/frontend/public/robots.txt', 'w', encoding='utf-8') as f:
-            f.write(content)
+        await seo_file_store.save("robots", content, user=current_user.email)
+        seo_report_service.files.invalidate()
         
         # Update in settings
-        await db.seo_settings.update_one(
-            {"id": "seo_settings"},
-            {"$set": {"robots_txt_content": content}},
-            upsert=True
-        )
+        await settings_registry.update("seo_settings", {"robots_txt_content": content})
         
         return {"message": "robots.txt atualizado com sucesso"}
     except Exception as e:
@@ -4865,7 +4524,7 @@ async def submit_for_indexing(urls: List[str], current_user: User = Depends(get_
         "type": "indexing_request",
         "urls": urls,
         "results": results,
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": datetime.now(timezone.utc)
     }
     await db.seo_logs.insert_one(log_entry)
     
@@ -4888,6 +4547,17 @@ async def get_prospecting_stats(region: str = "baixada_santista", current_user:
     stats = await prospecting_service.get_region_stats(region)
     return stats
 
+@api_router.get("/admin/prospecting/ibge-cache")
+async def get_ibge_cache_status(current_user: User = Depends(get_current_admin)):
+    """IBGE cache entries, staleness and fetch counters"""
+    return await prospecting_service.ibge.cache_status()
+
+@api_router.post("/admin/prospecting/ibge-cache/expire")
+async def expire_ibge_cache(current_user: User = Depends(get_current_admin)):
+    """Mark cached IBGE data stale; it is refreshed in the background on the next read"""
+    expired = await prospecting_service.ibge.expire_cache()
+    return {"expired": expired}
+
 @api_router.get("/admin/prospecting/leads/{municipio}")
 async def get_leads_by_municipio(municipio: str, tipo: str = "all", current_user: User = Depends(get_current_admin)):
     """Get potential leads for a municipality"""
@@ -5166,55 +4836,7 @@ async def add_prospect_to_route(prospect_id: str, data: dict, current_user: User
 @api_router.get("/homepage-settings")
 async def get_homepage_settings():
     """Get homepage settings (public endpoint)"""
-    settings = await db.homepage_settings.find_one({"id": "homepage_settings"}, {"_id": 0})
-    if not settings:
-        # Return default settings
-        return {
-            "id": "homepage_settings",
-            "hero": {
-                "video_url": "https://customer-assets.emergentagent.com/job_smart-security-12/artifacts/2cbdrd0e_vigiloc.mp4",
-                "poster_url": "",
-                "badge_text": "🛡️ Líder em Automação e Segurança Eletrônica",
-                "title": "Transformando <span class='text-blue-400'>Espaços</span><br />em Ambientes <span class='text-blue-400'>Inteligentes</span>",
-                "subtitle": "Soluções completas em portaria autônoma, automação comercial e segurança eletrônica para condomínios e empresas. Tecnologia de ponta para o seu negócio.",
-                "cta_primary_text": "Fale com um Consultor",
-                "cta_primary_url": "",
-                "cta_secondary_text": "Conheça Nossos Serviços",
-                "cta_secondary_url": "/servicos",
-                "show_stats": True,
-                "stats": [
-                    {"value": "+500", "label": "Clientes Atendidos"},
-                    {"value": "24/7", "label": "Monitoramento"},
-                    {"value": "10+", "label": "Anos de Experiência"},
-                    {"value": "99%", "label": "Satisfação"}
-                ]
-            },
-            "services": {
-                "enabled": True,
-                "title": "Nossas Soluções",
-                "subtitle": "Tecnologia de ponta para transformar seu espaço em um ambiente inteligente e seguro",
-                "show_all_button": True,
-                "featured_ids": []
-            },
-            "features": {
-                "enabled": True,
-                "title": "Por que escolher a VigiLoc?",
-                "items": [
-                    {"icon": "Shield", "title": "Segurança Garantida", "description": "Sistemas certificados e testados para máxima proteção"},
-                    {"icon": "Clock", "title": "Suporte 24/7", "description": "Equipe técnica disponível a qualquer momento"},
-                    {"icon": "Users", "title": "Atendimento Personalizado", "description": "Soluções sob medida para cada cliente"},
-                    {"icon": "Award", "title": "Experiência Comprovada", "description": "Mais de 10 anos no mercado de segurança"}
-                ]
-            },
-            "cta_section": {
-                "enabled": True,
-                "title": "Pronto para Transformar seu Espaço?",
-                "subtitle": "Entre em contato conosco e descubra como podemos ajudar",
-                "button_text": "Solicitar Orçamento",
-                "button_url": "/contato"
-            }
-        }
-    return settings
+    return await settings_registry.get("homepage_settings")
 
 
 @api_router.get("/admin/homepage-settings")
@@ -5230,11 +4852,7 @@ async def update_homepage_settings(data: dict, current_user: User = Depends(get_
     data["updated_at"] = datetime.now(timezone.utc).isoformat()
     data["updated_by"] = current_user.id
     
-    await db.homepage_settings.update_one(
-        {"id": "homepage_settings"},
-        {"$set": data},
-        upsert=True
-    )
+    await settings_registry.update("homepage_settings", data)
     
     return {"message": "Configurações da homepage atualizadas com sucesso", "settings": data}
 
@@ -0,0 +1,206 @@
+"""
+Configurações - Settings Registry
+In-memory cache of the singleton settings documents (site, navbar, footer,
+theme, tracking, SEO, homepage, ...) and of the active menus. Public reads are
+served from memory; the admin PUT handlers write through the registry, which
+reloads the entry and bumps its version in db.settings_versions so the other
+uvicorn workers reload it on their next poll. Signal entries carry no data and
+only notify listeners, so other caches can reuse the same invalidation path.
+"""
+
+import asyncio
+import copy
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_SECONDS = 5
+
+
+class SettingsEntry:
+    """One cached settings document, or with `many` the matching documents of a collection"""
+
+    def __init__(
+        self,
+        name: str,
+        collection: Optional[str],
+        doc_id: Optional[str] = None,
+        default: Optional[Callable[[], Dict]] = None,
+        many: bool = False,
+        query: Optional[Dict] = None,
+        key_field: Optional[str] = None,
+        sort: Optional[List] = None,
+        limit: Optional[int] = None
+    ):
+        self.name = name
+        self.collection = collection
+        self.doc_id = doc_id or name
+        self.default = default or dict
+        self.many = many
+        self.query = query or {}
+        self.key_field = key_field
+        self.sort = sort
+        self.limit = limit
+
+
+class SettingsRegistry:
+    """Write-through cache of settings documents with cross-worker invalidation"""
+
+    def __init__(self, db, poll_seconds: int = DEFAULT_POLL_SECONDS):
+        self.db = db
+        self.poll_seconds = poll_seconds
+        self.entries: Dict[str, SettingsEntry] = {}
+        self._values: Dict[str, Any] = {}
+        self._versions: Dict[str, int] = {}
+        # Bumped on every reload so derived caches (e.g. /bootstrap) know to rebuild
+        self.generation = 0
+        self._listeners: Dict[str, List[Callable[[], None]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, collection: str, doc_id: Optional[str] = None,
+                 default: Optional[Callable[[], Dict]] = None):
+        """Singleton document `{"id": doc_id}`; `default` builds the value used while it does not exist"""
+        self.entries[name] = SettingsEntry(name, collection, doc_id, default)
+
+    def register_collection(self, name: str, collection: str, key_field: Optional[str] = None,
+                            query: Optional[Dict] = None, sort: Optional[List] = None, limit: Optional[int] = None):
+        """Documents of `collection` matching `query`: a dict keyed by `key_field`, or a sorted list"""
+        self.entries[name] = SettingsEntry(
+            name, collection, many=True, query=query, key_field=key_field, sort=sort, limit=limit
+        )
+
+    def register_signal(self, name: str):
+        """Data-less entry whose invalidation only notifies `on_change` listeners"""
+        self.entries[name] = SettingsEntry(name, collection=None)
+
+    def on_change(self, name: str, callback: Callable[[], None]):
+        """Call `callback` whenever `name` is reloaded on this worker"""
+        self._listeners.setdefault(name, []).append(callback)
+
+    async def ensure_indexes(self):
+        await self.db.settings_versions.create_index("id", unique=True)
+
+    # ---------- loading ----------
+
+    async def _fetch(self, entry: SettingsEntry) -> Any:
+        if entry.collection is None:
+            return None
+        collection = self.db[entry.collection]
+        if entry.many:
+            cursor = collection.find(entry.query, {"_id": 0})
+            if entry.sort:
+                cursor = cursor.sort(entry.sort)
+            docs = await cursor.to_list(entry.limit)
+            if entry.key_field is None:
+                return docs
+            return {doc.get(entry.key_field): doc for doc in docs}
+
+        doc = await collection.find_one({"id": entry.doc_id}, {"_id": 0})
+        # Defaults are built once per load instead of on every request
+        return doc if doc is not None else entry.default()
+
+    async def _reload(self, name: str):
+        self._values[name] = await self._fetch(self.entries[name])
+        self.generation += 1
+        for callback in self._listeners.get(name, []):
+            callback()
+
+    async def load_all(self):
+        versions = await self._read_versions()
+        await asyncio.gather(*(self._reload(name) for name in self.entries))
+        self._versions.update(versions)
+        logger.info(f"Settings registry loaded {len(self.entries)} entries")
+
+    async def get(self, name: str) -> Any:
+        """Cached value (a copy, safe to mutate); loads the entry on first use"""
+        if name not in self._values:
+            await self._reload(name)
+        return copy.deepcopy(self._values[name])
+
+    async def values(self, names: List[str]) -> Dict[str, Any]:
+        """Cached values without copying, for read-only consumers such as serializers"""
+        for name in names:
+            if name not in self._values:
+                await self._reload(name)
+        return {name: self._values[name] for name in names}
+
+    # ---------- writes and invalidation ----------
+
+    async def update(self, name: str, data: Dict) -> Any:
+        """Upsert `$set: data` into a singleton entry and invalidate it on every worker"""
+        entry = self.entries[name]
+        await self.db[entry.collection].update_one({"id": entry.doc_id}, {"$set": data}, upsert=True)
+        await self.invalidate(name)
+        return await self.get(name)
+
+    async def invalidate(self, name: Optional[str] = None) -> List[str]:
+        """Reload `name` (all entries when None) here and signal the other workers"""
+        names = [name] if name else list(self.entries)
+        for key in names:
+            if key not in self.entries:
+                raise KeyError(key)
+
+        for key in names:
+            state = await self.db.settings_versions.find_one_and_update(
+                {"id": key},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            await self._reload(key)
+            self._versions[key] = state["version"]
+        return names
+
+    async def _read_versions(self) -> Dict[str, int]:
+        docs = await self.db.settings_versions.find({}, {"_id": 0, "id": 1, "version": 1}).to_list(None)
+        return {doc["id"]: doc.get("version", 0) for doc in docs}
+
+    async def sync(self) -> List[str]:
+        """Reload entries whose version was bumped by another worker"""
+        # Versions are bumped after the write, so data read after them is at least that new
+        versions = await self._read_versions()
+        changed = [
+            name for name, version in versions.items()
+            if name in self.entries and self._versions.get(name) != version
+        ]
+        for name in changed:
+            await self._reload(name)
+            self._versions[name] = versions[name]
+        return changed
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Settings registry sync failed: {e}")
+
+    def status(self) -> List[Dict]:
+        return [
+            {
+                "name": name,
+                "collection": entry.collection,
+                "loaded": name in self._values,
+                "version": self._versions.get(name, 0)
+            }
+            for name, entry in self.entries.items()
+        ]
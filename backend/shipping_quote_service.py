@@ -0,0 +1,311 @@
+"""
+Cotação de Frete - Melhor Envio Quote Service
+Shipping quotes from the Melhor Envio API through one pooled httpx client.
+Quotes are cached for QUOTE_TTL seconds by origin CEP, destination CEP and a
+normalized package signature. Identical requests already in flight share one
+upstream call. A circuit breaker stops calling the provider after repeated
+timeouts or 5xx answers and serves the local shipping table until a probe
+request succeeds again.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PRODUCTION_URL = "https://melhorenvio.com.br"
+SANDBOX_URL = "https://sandbox.melhorenvio.com.br"
+CALCULATE_PATH = "/api/v2/me/shipment/calculate"
+USER_AGENT = "SecuShop/1.0"
+REQUEST_TIMEOUT = httpx.Timeout(8.0, connect=3.0)
+MAX_CONNECTIONS = 20
+QUOTE_TTL = 600
+CACHE_SIZE = 5000
+FAILURE_THRESHOLD = 5
+RESET_AFTER = 30.0
+MAX_PRODUCTS = 100
+
+# Local table quote: (cep, total weight) -> {"rates": [...]}
+Fallback = Callable[[str, float], Awaitable[Dict]]
+
+
+class ProviderUnavailable(Exception):
+    """Timeout, connection error, 429 or 5xx: counts against the circuit breaker"""
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures; one probe is let through after `reset_after`"""
+
+    def __init__(self, threshold: int = FAILURE_THRESHOLD, reset_after: float = RESET_AFTER):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning(f"Melhor Envio circuit opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def status(self) -> Dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+def _clean_cep(cep: Optional[str]) -> str:
+    return (cep or "").replace("-", "").replace(".", "").strip()
+
+
+def normalize_products(products: List[Dict]) -> List[Dict]:
+    """Melhor Envio product payload, with defaults applied and values rounded"""
+    normalized = []
+    for product in products:
+        normalized.append({
+            "id": str(product.get('id') or uuid.uuid4()),
+            "name": product.get('name', 'Product'),
+            "quantity": int(product.get('quantity', 1)),
+            "unitary_value": round(float(product.get('price', 0)), 2),
+            "weight": round(float(product.get('weight', 1)), 3),
+            "width": int(product.get('width', 10)),
+            "height": int(product.get('height', 10)),
+            "length": int(product.get('length', 10))
+        })
+    return normalized
+
+
+def package_signature(products: List[Dict]) -> List[Tuple]:
+    """What the price depends on, order-independent: ids and names are left out"""
+    return sorted(
+        (p["weight"], p["width"], p["height"], p["length"], p["unitary_value"], p["quantity"])
+        for p in products
+    )
+
+
+def _format_option(option: Dict) -> Dict:
+    return {
+        "id": str(option.get('id')),
+        "name": option.get('name', 'Unknown'),
+        "company": (option.get('company') or {}).get('name', 'Unknown'),
+        "price": float(option.get('custom_price', option.get('price', 0))),
+        "custom_price": float(option.get('custom_price', 0)),
+        "original_price": float(option.get('price', 0)),
+        "delivery_time": int(option.get('custom_delivery_time', option.get('delivery_time', 0))),
+        "custom_delivery_time": int(option.get('custom_delivery_time', 0)),
+        "delivery_range": option.get('delivery_range', {}),
+        "currency": option.get('currency', 'BRL'),
+        "packages": option.get('packages', [])
+    }
+
+
+class ShippingQuoteService:
+    """Pooled, cached, coalesced and circuit-broken Melhor Envio quotes"""
+
+    def __init__(self, fallback: Fallback, ttl: int = QUOTE_TTL, breaker: Optional[CircuitBreaker] = None):
+        self.fallback = fallback
+        self.ttl = ttl
+        self.breaker = breaker or CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+        # key -> (expires_at, options)
+        self._cache: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"upstream": 0, "cache_hits": 0, "coalesced": 0, "fallbacks": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+                headers={"Accept": "application/json", "User-Agent": USER_AGENT}
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def clear(self):
+        """Drop cached quotes (shipping settings changed)"""
+        self._cache.clear()
+
+    @staticmethod
+    def api_url(settings: Dict) -> str:
+        if settings.get('melhor_envio_api_url'):
+            return settings['melhor_envio_api_url'].rstrip('/')
+        return SANDBOX_URL if settings.get('melhor_envio_sandbox') else PRODUCTION_URL
+
+    def _cache_key(self, settings: Dict, origin_cep: str, destination_cep: str, products: List[Dict]) -> str:
+        # The token is part of the key: another account may have other contracted prices
+        token = hashlib.sha256(settings['melhor_envio_token'].encode()).hexdigest()[:16]
+        raw = json.dumps([self.api_url(settings), token, origin_cep, destination_cep, package_signature(products)])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _cached(self, key: str) -> Optional[List[Dict]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: str, options: List[Dict]):
+        self._cache[key] = (time.monotonic() + self.ttl, options)
+        self._cache.move_to_end(key)
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def _request(self, settings: Dict, origin_cep: str, destination_cep: str, products: List[Dict]) -> List[Dict]:
+        payload = {
+            "from": {"postal_code": origin_cep},
+            "to": {"postal_code": destination_cep},
+            "products": products
+        }
+        self.stats["upstream"] += 1
+        try:
+            response = await self.client.post(
+                f"{self.api_url(settings)}{CALCULATE_PATH}",
+                json=payload,
+                headers={"Authorization": f"Bearer {settings['melhor_envio_token']}"}
+            )
+        except httpx.HTTPError as e:
+            raise ProviderUnavailable(f"{type(e).__name__}: {e}")
+        if response.status_code == 429 or response.status_code >= 500:
+            raise ProviderUnavailable(f"HTTP {response.status_code}")
+        if response.status_code != 200:
+            # Bad token, invalid CEP, ...: the provider is up, so this is not a breaker failure
+            raise ValueError(f"Melhor Envio API error: {response.text[:500]}")
+
+        options = [
+            _format_option(option) for option in response.json()
+            if isinstance(option, dict) and not option.get('error')
+        ]
+        options.sort(key=lambda x: x['price'])
+        return options
+
+    async def _upstream(self, key: str, settings: Dict, origin_cep: str, destination_cep: str,
+                        products: List[Dict]) -> List[Dict]:
+        try:
+            options = await self._request(settings, origin_cep, destination_cep, products)
+        except ProviderUnavailable:
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            # Still a completed round trip (e.g. a 4xx or bad JSON): free a half-open probe slot
+            self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        self._store(key, options)
+        return options
+
+    async def _fallback(self, destination_cep: str, products: List[Dict], reason: str) -> List[Dict]:
+        self.stats["fallbacks"] += 1
+        weight = sum(p["weight"] * p["quantity"] for p in products)
+        table = await self.fallback(destination_cep, weight)
+        return [
+            {
+                "id": rate["id"],
+                "name": rate["name"],
+                "company": "VigiLoc",
+                "price": float(rate["price"]),
+                "original_price": float(rate["price"]),
+                "delivery_time": rate.get("max_days", 0),
+                "delivery_range": {"min": rate.get("min_days", 0), "max": rate.get("max_days", 0)},
+                "currency": "BRL",
+                "fallback_reason": reason
+            }
+            for rate in sorted(table.get("rates", []), key=lambda r: r["price"])
+        ]
+
+    async def quote(self, settings: Dict, destination_cep: str, products: List[Dict]) -> Dict:
+        """Quote `products` to `destination_cep`; ValueError for bad input or a 4xx from the provider"""
+        if not settings or not settings.get('melhor_envio_enabled'):
+            raise ValueError("Melhor Envio integration not enabled")
+        if not settings.get('melhor_envio_token'):
+            raise ValueError("Melhor Envio token not configured")
+
+        destination_cep = _clean_cep(destination_cep)
+        origin_cep = _clean_cep(settings.get('origin_cep'))
+        if len(destination_cep) != 8 or not destination_cep.isdigit():
+            raise ValueError("Invalid destination CEP")
+        if len(origin_cep) != 8 or not origin_cep.isdigit():
+            raise ValueError("Origin CEP not configured in settings")
+        if not products:
+            raise ValueError("No products provided")
+        if len(products) > MAX_PRODUCTS:
+            raise ValueError(f"At most {MAX_PRODUCTS} products per quote")
+        try:
+            products = normalize_products(products)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid product dimensions")
+
+        result = {"success": True, "origin_cep": origin_cep, "destination_cep": destination_cep}
+        key = self._cache_key(settings, origin_cep, destination_cep, products)
+
+        options = self._cached(key)
+        if options is not None:
+            self.stats["cache_hits"] += 1
+            return {**result, "options": options, "source": "cache"}
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        elif not self.breaker.allow():
+            options = await self._fallback(destination_cep, products, "circuit_open")
+            return {**result, "options": options, "source": "fallback"}
+        else:
+            task = asyncio.ensure_future(self._upstream(key, settings, origin_cep, destination_cep, products))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        try:
+            # shield: a client disconnecting must not cancel the call other requests wait on
+            options = await asyncio.shield(task)
+        except ProviderUnavailable as e:
+            logger.warning(f"Melhor Envio unavailable, using local table: {e}")
+            options = await self._fallback(destination_cep, products, "provider_unavailable")
+            return {**result, "options": options, "source": "fallback"}
+        return {**result, "options": options, "source": "melhor_envio"}
+
+    def status(self) -> Dict:
+        return {
+            "circuit": self.breaker.status(),
+            "cached_quotes": len(self._cache),
+            "in_flight": len(self._inflight),
+            **self.stats
+        }
@@ -0,0 +1,247 @@
+"""
+Tabela de Frete - Local Shipping Rate Engine
+Quotes shipping from the admin-defined 'cep' rates. Each rate covers CEP
+regions (a prefix such as "01" or "01310", a single CEP or a range
+"01000-000:09999-999") and may price by weight brackets plus a per-kg
+amount. Active rates are compiled into a sorted list of disjoint CEP
+segments, each holding the rates that cover it, so a lookup is one binary
+search; batches are resolved with numpy.searchsorted in one call. The index is
+rebuilt when the rates change. Without any 'cep' rate the built-in table
+(São Paulo vs. rest of Brazil) is used, as before.
+"""
+
+import asyncio
+import bisect
+import logging
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_ITEMS = 1000
+CEP_RE = re.compile(r"^\d{8}$")
+PREFIX_RE = re.compile(r"^\d{1,8}$")
+
+# Previous hard-coded table: São Paulo (01-09) and everywhere else
+DEFAULT_RATES = [
+    {"id": "pac-sp", "name": "PAC", "regions": ["01:09"], "price": 15.00, "min_days": 3, "max_days": 5},
+    {"id": "sedex-sp", "name": "SEDEX", "regions": ["01:09"], "price": 25.00, "min_days": 1, "max_days": 2},
+    {"id": "pac-other", "name": "PAC", "regions": ["00", "10:99"], "price": 20.00, "price_per_kg": 2.0,
+     "min_days": 7, "max_days": 12},
+    {"id": "sedex-other", "name": "SEDEX", "regions": ["00", "10:99"], "price": 35.00, "price_per_kg": 3.0,
+     "min_days": 3, "max_days": 5}
+]
+
+
+def clean_cep(cep) -> str:
+    return str(cep or "").replace("-", "").replace(".", "").strip()
+
+
+def _prefix_bounds(prefix: str) -> Tuple[int, int]:
+    return int(prefix.ljust(8, "0")), int(prefix.ljust(8, "9"))
+
+
+def parse_region(region: str) -> Tuple[int, int]:
+    """Inclusive (low, high) CEP bounds of a region; ValueError when malformed"""
+    text = str(region).replace(" ", "").replace("-", "").replace("..", ":")
+    if PREFIX_RE.match(text):
+        return _prefix_bounds(text)
+    # Range of CEPs or prefixes: "01000000:09999999", "01:09" (01000000-09999999)
+    start, separator, end = text.partition(":")
+    if not (separator and PREFIX_RE.match(start) and PREFIX_RE.match(end)):
+        raise ValueError(f"Região de CEP inválida: {region}")
+    low, high = _prefix_bounds(start)[0], _prefix_bounds(end)[1]
+    if low > high:
+        raise ValueError(f"Região de CEP invertida: {region}")
+    return low, high
+
+
+def has_regions(rate: Dict) -> bool:
+    """True when the rate has at least one region and all of them parse"""
+    try:
+        return bool([parse_region(region) for region in rate.get("regions") or []])
+    except (TypeError, ValueError):
+        return False
+
+
+def validate_rate(rate: Dict):
+    """Check the lookup fields of a rate before it is saved"""
+    if rate.get("type") == "cep" and not rate.get("regions"):
+        raise ValueError("Taxas por CEP precisam de ao menos uma região")
+    for region in rate.get("regions") or []:
+        parse_region(region)
+    previous = 0.0
+    for bracket in rate.get("weight_brackets") or []:
+        max_weight = float(bracket.get("max_weight", 0))
+        if max_weight <= previous:
+            raise ValueError("Faixas de peso devem ter max_weight crescente e positivo")
+        if float(bracket.get("price", 0)) < 0:
+            raise ValueError("Preço da faixa de peso não pode ser negativo")
+        previous = max_weight
+
+
+class CompiledRate:
+    """Pricing of one rate, with weight brackets as parallel sorted arrays"""
+
+    def __init__(self, rate: Dict):
+        self.id = rate["id"]
+        self.name = rate["name"]
+        self.min_days = rate.get("min_days", 0)
+        self.max_days = rate.get("max_days", 0)
+        self.price = float(rate.get("price", 0))
+        self.price_per_kg = float(rate.get("price_per_kg") or 0)
+        brackets = sorted(rate.get("weight_brackets") or [], key=lambda b: float(b["max_weight"]))
+        self.max_weights = np.array([float(b["max_weight"]) for b in brackets])
+        self.bracket_prices = np.array([float(b["price"]) for b in brackets])
+
+    def prices(self, weights: np.ndarray) -> np.ndarray:
+        """Price per weight; NaN where the weight is above the last bracket"""
+        if not len(self.max_weights):
+            return self.price + self.price_per_kg * weights
+        position = np.searchsorted(self.max_weights, weights, side="left")
+        inside = position < len(self.max_weights)
+        base = np.full(weights.shape, np.nan)
+        base[inside] = self.bracket_prices[position[inside]]
+        return base + self.price_per_kg * weights
+
+    def entry(self, price: float) -> Dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "price": round(float(price), 2),
+            "min_days": self.min_days,
+            "max_days": self.max_days
+        }
+
+
+class RateIndex:
+    """Disjoint CEP segments [starts[i], starts[i+1]) with the rates covering each"""
+
+    def __init__(self, rates: Sequence[Dict]):
+        self.rates: List[CompiledRate] = []
+        ranges: List[Tuple[int, int, int]] = []
+        for rate in rates:
+            try:
+                bounds = [parse_region(region) for region in rate.get("regions") or []]
+                compiled = CompiledRate(rate)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Skipping shipping rate {rate.get('id')}: {e}")
+                continue
+            self.rates.append(compiled)
+            ranges.extend((low, high, len(self.rates) - 1) for low, high in bounds)
+
+        points = sorted({low for low, _, _ in ranges} | {high + 1 for _, high, _ in ranges})
+        self.starts = np.array(points, dtype=np.int64)
+        segments: List[List[int]] = [[] for _ in points]
+        for low, high, rate_index in ranges:
+            first = bisect.bisect_left(points, low)
+            last = bisect.bisect_left(points, high + 1)
+            for segment in range(first, last):
+                segments[segment].append(rate_index)
+        self.segments: List[Tuple[int, ...]] = [tuple(dict.fromkeys(s)) for s in segments]
+
+    def quote_many(self, ceps: np.ndarray, weights: np.ndarray) -> List[List[Dict]]:
+        """Available rates (cheapest first) for each (cep, weight) pair"""
+        results: List[List[Dict]] = [[] for _ in range(len(ceps))]
+        if not len(self.starts) or not len(ceps):
+            return results
+        segments = np.searchsorted(self.starts, ceps, side="right") - 1
+        for segment in np.unique(segments):
+            if segment < 0 or not self.segments[segment]:
+                continue
+            rows = np.nonzero(segments == segment)[0]
+            for rate_index in self.segments[segment]:
+                rate = self.rates[rate_index]
+                prices = rate.prices(weights[rows])
+                for row, price in zip(rows, prices):
+                    if not np.isnan(price):
+                        results[row].append(rate.entry(price))
+        for rates in results:
+            rates.sort(key=lambda r: r["price"])
+        return results
+
+    def status(self) -> Dict:
+        return {"rates": len(self.rates), "segments": len(self.segments)}
+
+
+class ShippingRateEngine:
+    """Compiled rate index, rebuilt on the first lookup after `clear()`"""
+
+    def __init__(self, load_rates: Callable[[], Awaitable[List[Dict]]]):
+        self.load_rates = load_rates
+        self._index: Optional[RateIndex] = None
+        self._using_defaults = False
+        self._ignored: List[str] = []
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    def clear(self):
+        self._version += 1
+        self._index = None
+
+    async def index(self) -> RateIndex:
+        if self._index is not None:
+            return self._index
+        async with self._lock:
+            if self._index is None:
+                version = self._version
+                rates, ignored = [], []
+                for rate in await self.load_rates():
+                    if rate.get("type") != "cep":
+                        continue
+                    if has_regions(rate):
+                        rates.append(rate)
+                    else:
+                        # 'cep' rates saved before regions existed cover nothing: they must not disable the defaults
+                        ignored.append(rate.get("id"))
+                if ignored:
+                    logger.warning(f"Ignoring 'cep' shipping rates without valid regions: {ignored}")
+                using_defaults = not rates
+                index = RateIndex(DEFAULT_RATES if using_defaults else rates)
+                if version != self._version:
+                    # Rates changed while compiling: serve this build, rebuild on the next lookup
+                    return index
+                self._index, self._using_defaults, self._ignored = index, using_defaults, ignored
+            return self._index
+
+    async def quote_many(self, items: List[Dict]) -> List[Dict]:
+        """Quote [{cep, weight}, ...]; invalid items get an `error` instead of rates"""
+        if len(items) > MAX_BATCH_ITEMS:
+            raise ValueError(f"No máximo {MAX_BATCH_ITEMS} itens por lote")
+        index = await self.index()
+
+        results: List[Optional[Dict]] = [None] * len(items)
+        valid_rows, ceps, weights = [], [], []
+        for row, item in enumerate(items):
+            cep = clean_cep(item.get("cep"))
+            try:
+                weight = float(item.get("weight", 1.0))
+            except (TypeError, ValueError):
+                weight = -1.0
+            if not CEP_RE.match(cep):
+                results[row] = {"cep": item.get("cep"), "error": "CEP inválido"}
+            elif not 0 <= weight < float("inf"):
+                results[row] = {"cep": cep, "error": "Peso inválido"}
+            else:
+                valid_rows.append(row)
+                ceps.append(int(cep))
+                weights.append(weight)
+                results[row] = {"cep": cep, "weight": weight}
+
+        quoted = index.quote_many(np.array(ceps, dtype=np.int64), np.array(weights, dtype=float))
+        for row, rates in zip(valid_rows, quoted):
+            results[row]["rates"] = rates
+        return results
+
+    async def quote(self, cep: str, weight: float = 1.0) -> Dict:
+        """Rates for one CEP; ValueError when the CEP or weight is invalid"""
+        result = (await self.quote_many([{"cep": cep, "weight": weight}]))[0]
+        if "error" in result:
+            raise ValueError(result["error"])
+        return {"rates": result["rates"]}
+
+    async def status(self) -> Dict:
+        index = await self.index()
+        return {**index.status(), "using_defaults": self._using_defaults, "ignored_rates": self._ignored}
@@ -0,0 +1,184 @@
+"""
+Sitemap - Cached Sitemap Engine
+Keeps an in-memory registry of the public URLs (static pages, services, custom
+pages and products) with their real lastmod, loaded per source and reloaded
+only for the source whose content changed. The XML is written with a streaming
+writer straight into gzip and kept as compressed bytes; above
+MAX_URLS_PER_SITEMAP the URLs are split into numbered sitemaps behind a
+sitemap index, and only the chunks whose URLs changed are rewritten.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import io
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+from xml.sax.saxutils import XMLGenerator
+
+from cached_document import CachedDocument
+from date_codec import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Protocol limit per sitemap file (sitemaps.org)
+MAX_URLS_PER_SITEMAP = 50000
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+# path, changefreq, priority
+STATIC_PAGES = [
+    ("/", "daily", "1.0"),
+    ("/produtos", "daily", "0.9"),
+    ("/servicos", "weekly", "0.9"),
+    ("/totens", "weekly", "0.8"),
+    ("/contato", "monthly", "0.8"),
+    ("/sobre", "monthly", "0.7")
+]
+
+# Source name -> (collection, path prefix, lastmod fields, changefreq, priority);
+# sources are listed in sitemap order
+SOURCES = {
+    "services": ("services", "/servico/", ["updated_at", "created_at"], "weekly", "0.8"),
+    "pages": ("custom_pages", "/p/", ["updated_at", "published_at", "created_at"], "weekly", "0.6"),
+    "products": ("products", "/produto/", ["timestamp", "published_at"], "weekly", "0.7")
+}
+
+
+class SitemapUrl(NamedTuple):
+    path: str
+    lastmod: Optional[str]
+    changefreq: str
+    priority: str
+
+
+def _lastmod(doc: Dict, fields: List[str]) -> Optional[str]:
+    dates = [parse_datetime(doc.get(field)) for field in fields]
+    dates = [d for d in dates if d is not None]
+    return max(dates).date().isoformat() if dates else None
+
+
+def _write(root: str, rows: List[Dict[str, Optional[str]]], child: str) -> bytes:
+    """Stream <root> with one <child> per row into gzip"""
+    buffer = io.BytesIO()
+    # mtime=0 keeps the bytes (and so the ETag) stable across rebuilds
+    with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as stream:
+        writer = XMLGenerator(stream, encoding="utf-8", short_empty_elements=True)
+        writer.startDocument()
+        writer.startElement(root, {"xmlns": SITEMAP_NS})
+        for row in rows:
+            writer.startElement(child, {})
+            for tag, value in row.items():
+                if value:
+                    writer.startElement(tag, {})
+                    writer.characters(value)
+                    writer.endElement(tag)
+            writer.endElement(child)
+        writer.endElement(root)
+        writer.endDocument()
+    return buffer.getvalue()
+
+
+def _sitemap_document(gzipped: bytes, digest: str) -> CachedDocument:
+    """Sitemaps are kept only as the gzip bytes; the ETag comes from their URLs"""
+    return CachedDocument("application/xml", gzipped=gzipped, digest=digest)
+
+
+class SitemapService:
+    """URL registry plus the rendered sitemap files, rebuilt on content changes"""
+
+    def __init__(self, db, site_url: str, chunk_size: int = MAX_URLS_PER_SITEMAP):
+        self.db = db
+        self.site_url = site_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self._urls: Dict[str, List[SitemapUrl]] = {"static": [
+            SitemapUrl(path, None, changefreq, priority) for path, changefreq, priority in STATIC_PAGES
+        ]}
+        self._dirty = set(SOURCES)
+        self._chunks: List[CachedDocument] = []
+        self._chunk_keys: List[str] = []
+        self._index: Optional[CachedDocument] = None
+        self._lock = asyncio.Lock()
+        self.built_at: Optional[datetime] = None
+
+    async def ensure_indexes(self):
+        await self.db.services.create_index([("published", 1), ("slug", 1)])
+        await self.db.custom_pages.create_index([("published", 1), ("slug", 1)])
+        await self.db.products.create_index([("published", 1), ("id", 1)])
+
+    def mark_dirty(self, source: Optional[str] = None):
+        """Reload `source` (all sources when None) on the next request"""
+        self._dirty |= {source} if source else set(SOURCES)
+
+    async def _load(self, source: str) -> List[SitemapUrl]:
+        collection, prefix, fields, changefreq, priority = SOURCES[source]
+        key = "slug" if source != "products" else "id"
+        projection = {"_id": 0, key: 1, **{field: 1 for field in fields}}
+        urls = []
+        async for doc in self.db[collection].find({"published": True}, projection).sort(key, 1):
+            if doc.get(key):
+                urls.append(SitemapUrl(f"{prefix}{str(doc[key]).lstrip('/')}", _lastmod(doc, fields), changefreq, priority))
+        return urls
+
+    async def _refresh(self):
+        if not self._dirty and self._index is not None:
+            return
+        async with self._lock:
+            if self._dirty or self._index is None:
+                await self._rebuild()
+
+    async def _rebuild(self):
+        # Taken before loading so a change arriving mid-load marks the source again
+        dirty, self._dirty = self._dirty, set()
+        for source in [s for s in SOURCES if s in dirty]:
+            self._urls[source] = await self._load(source)
+
+        urls = [url for source in ["static", *SOURCES] for url in self._urls.get(source, [])]
+        chunks, keys = [], []
+        for n, start in enumerate(range(0, max(len(urls), 1), self.chunk_size)):
+            chunk = urls[start:start + self.chunk_size]
+            key = hashlib.sha256(repr(chunk).encode()).hexdigest()
+            if n < len(self._chunk_keys) and self._chunk_keys[n] == key:
+                chunks.append(self._chunks[n])
+            else:
+                chunks.append(_sitemap_document(_write("urlset", [
+                    {"loc": f"{self.site_url}{url.path}", "lastmod": url.lastmod,
+                     "changefreq": url.changefreq, "priority": url.priority}
+                    for url in chunk
+                ], "url"), key))
+            keys.append(key)
+
+        rewritten = sum(1 for n, key in enumerate(keys) if n >= len(self._chunk_keys) or self._chunk_keys[n] != key)
+        self._chunks, self._chunk_keys = chunks, keys
+        if len(chunks) == 1:
+            self._index = chunks[0]
+        else:
+            rows = []
+            for n in range(1, len(chunks) + 1):
+                dates = [url.lastmod for url in urls[(n - 1) * self.chunk_size:n * self.chunk_size] if url.lastmod]
+                rows.append({"loc": f"{self.site_url}/api/sitemap-{n}.xml", "lastmod": max(dates) if dates else None})
+            self._index = _sitemap_document(_write("sitemapindex", rows, "sitemap"), hashlib.sha256("".join(keys).encode()).hexdigest())
+        self.built_at = datetime.now(timezone.utc)
+        logger.info(f"Sitemap rebuilt: {len(urls)} URLs, {len(chunks)} file(s), {rewritten} rewritten")
+
+    async def get_index(self) -> CachedDocument:
+        """/sitemap.xml: the urlset itself, or a sitemap index when there are several chunks"""
+        await self._refresh()
+        return self._index
+
+    async def get_chunk(self, number: int) -> CachedDocument:
+        """Numbered sitemap (1-based); raises KeyError when out of range"""
+        await self._refresh()
+        if not 1 <= number <= len(self._chunks):
+            raise KeyError(number)
+        return self._chunks[number - 1]
+
+    async def status(self) -> Dict:
+        await self._refresh()
+        return {
+            "urls": sum(len(urls) for urls in self._urls.values()),
+            "by_source": {source: len(urls) for source, urls in self._urls.items()},
+            "files": len(self._chunks),
+            "is_index": len(self._chunks) > 1,
+            "built_at": self.built_at
+        }
@@ -0,0 +1,80 @@
+"""
+Bootstrap API Tests
+Tests for the composite storefront payload, its compression and ETag
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestBootstrap:
+    """Test GET /api/bootstrap"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_bootstrap_sections(self):
+        """Test the payload carries every shell section"""
+        response = requests.get(f"{BASE_URL}/api/bootstrap")
+        assert response.status_code == 200
+        data = response.json()
+        for section in ["site", "navbar", "footer", "theme", "tracking", "homepage", "menus", "banners", "featured_reviews"]:
+            assert section in data, f"Missing section {section}"
+        assert isinstance(data["banners"], list)
+
+    def test_bootstrap_gzip(self):
+        """Test gzip is served when accepted"""
+        response = requests.get(f"{BASE_URL}/api/bootstrap", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers.get("Content-Encoding") == "gzip"
+        assert "site" in response.json()
+
+    def test_bootstrap_not_modified(self):
+        """Test a matching If-None-Match returns 304"""
+        first = requests.get(f"{BASE_URL}/api/bootstrap")
+        etag = first.headers.get("ETag")
+        assert etag
+
+        second = requests.get(f"{BASE_URL}/api/bootstrap", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+
+    def test_etag_changes_after_settings_update(self, auth_headers):
+        """Test updating a setting changes the combined ETag"""
+        etag = requests.get(f"{BASE_URL}/api/bootstrap").headers["ETag"]
+        theme = requests.get(f"{BASE_URL}/api/theme-settings").json()
+
+        requests.put(
+            f"{BASE_URL}/api/admin/theme-settings",
+            headers=auth_headers,
+            json={**theme, "primary_color": "#123456"}
+        )
+        try:
+            response = requests.get(f"{BASE_URL}/api/bootstrap", headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.json()["theme"]["primary_color"] == "#123456"
+        finally:
+            requests.put(f"{BASE_URL}/api/admin/theme-settings", headers=auth_headers, json=theme)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
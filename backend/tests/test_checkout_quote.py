@@ -0,0 +1,145 @@
+"""
+Checkout Quote API Tests
+Tests for /api/checkout/quote and placing an order from its quote token
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+ORDER_DATA = {
+    "customer_name": "TEST_Checkout Cliente",
+    "customer_email": "test_checkout@example.com",
+    "customer_phone": "11999999999",
+    "shipping_address": {"address": "Rua Teste, 1", "city": "São Paulo", "state": "SP", "cep": "01001-000"},
+    "shipping_method": ""
+}
+
+
+def new_cart(items):
+    """Fresh session cart with `items` [(product_id, quantity, price)]"""
+    session_id = f"test-checkout-{uuid.uuid4().hex[:12]}"
+    for product_id, quantity, price in items:
+        response = requests.post(
+            f"{BASE_URL}/api/cart/add",
+            params={"session_id": session_id},
+            json={"product_id": product_id, "quantity": quantity, "price": price}
+        )
+        assert response.status_code == 200
+    return session_id
+
+
+def get_quote(session_id, **data):
+    response = requests.post(f"{BASE_URL}/api/checkout/quote", params={"session_id": session_id}, json=data)
+    assert response.status_code == 200, f"Quote failed: {response.text}"
+    return response.json()
+
+
+class TestCheckoutQuote:
+    """Test the one-call checkout quote"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_quote_lists_options(self):
+        """Test totals and shipping options without a selected method"""
+        session_id = new_cart([("test-prod-a", 2, 50.0), ("test-prod-b", 1, 30.0)])
+        quote = get_quote(session_id, cep="01001-000")
+        assert quote["subtotal"] == 130.0
+        assert quote["shipping_options"], "Expected shipping options"
+        assert quote["shipping_method"] is None
+        assert "quote_token" not in quote
+
+    def test_order_from_quote(self):
+        """Test the order takes its totals from the quote token"""
+        session_id = new_cart([("test-prod-a", 1, 80.0)])
+        options = get_quote(session_id, cep="01001-000")["shipping_options"]
+        method = options[0]["id"]
+
+        quote = get_quote(session_id, cep="01001-000", shipping_method=method)
+        assert quote["shipping_cost"] == options[0]["price"]
+        assert quote["total"] == round(80.0 + options[0]["price"], 2)
+
+        response = requests.post(
+            f"{BASE_URL}/api/orders",
+            params={"session_id": session_id},
+            json={**ORDER_DATA, "shipping_method": method, "quote_token": quote["quote_token"]}
+        )
+        assert response.status_code == 200, f"Order failed: {response.text}"
+        order = response.json()
+        assert order["total"] == quote["total"]
+        assert order["shipping_cost"] == quote["shipping_cost"]
+        assert order["shipping_method"] == method
+
+    def test_changed_cart_rejects_quote(self):
+        """Test a quote is not reused after the cart changed"""
+        session_id = new_cart([("test-prod-a", 1, 80.0)])
+        method = get_quote(session_id, cep="01001-000")["shipping_options"][0]["id"]
+        quote = get_quote(session_id, cep="01001-000", shipping_method=method)
+        new_cart_items = requests.post(
+            f"{BASE_URL}/api/cart/add",
+            params={"session_id": session_id},
+            json={"product_id": "test-prod-b", "quantity": 1, "price": 10.0}
+        )
+        assert new_cart_items.status_code == 200
+
+        response = requests.post(
+            f"{BASE_URL}/api/orders",
+            params={"session_id": session_id},
+            json={**ORDER_DATA, "shipping_method": method, "quote_token": quote["quote_token"]}
+        )
+        assert response.status_code == 400
+
+    def test_invalid_token_rejected(self):
+        """Test a forged quote token"""
+        session_id = new_cart([("test-prod-a", 1, 80.0)])
+        response = requests.post(
+            f"{BASE_URL}/api/orders",
+            params={"session_id": session_id},
+            json={**ORDER_DATA, "shipping_method": "x", "quote_token": "not-a-token"}
+        )
+        assert response.status_code == 400
+
+    def test_invalid_coupon_reported(self):
+        """Test an unknown coupon does not fail the quote"""
+        session_id = new_cart([("test-prod-a", 1, 80.0)])
+        quote = get_quote(session_id, cep="01001-000", coupon_code=f"NOPE{uuid.uuid4().hex[:6]}")
+        assert quote["discount"] == 0
+        assert quote["coupon_error"] == "Cupom inválido"
+
+    def test_empty_cart_and_bad_cep(self):
+        """Test quote validation"""
+        response = requests.post(
+            f"{BASE_URL}/api/checkout/quote",
+            params={"session_id": f"test-empty-{uuid.uuid4().hex[:8]}"},
+            json={"cep": "01001-000"}
+        )
+        assert response.status_code == 400
+        session_id = new_cart([("test-prod-a", 1, 80.0)])
+        response = requests.post(
+            f"{BASE_URL}/api/checkout/quote", params={"session_id": session_id}, json={"cep": "123"}
+        )
+        assert response.status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
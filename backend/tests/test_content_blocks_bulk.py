@@ -0,0 +1,117 @@
+"""
+Content Block Bulk API Tests
+Tests for bulk reorder/patch of content blocks with a version check
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestContentBlocksBulk:
+    """Test POST /api/admin/content-blocks/{page_id}/bulk"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def page_id(self, auth_headers):
+        """Create four text blocks on a throwaway page id"""
+        page_id = f"test-bulk-{uuid.uuid4().hex[:8]}"
+        for order in range(4):
+            response = requests.post(
+                f"{BASE_URL}/api/admin/content-blocks",
+                headers=auth_headers,
+                json={"page_id": page_id, "type": "text", "order": order, "content": {"html": f"<p>{order}</p>"}}
+            )
+            assert response.status_code == 200
+        return page_id
+
+    def get_state(self, auth_headers, page_id):
+        blocks = requests.get(f"{BASE_URL}/api/admin/content-blocks/{page_id}", headers=auth_headers).json()
+        version = requests.get(f"{BASE_URL}/api/admin/content-blocks/{page_id}/version", headers=auth_headers).json()
+        return blocks, version["version"]
+
+    def test_reorder_and_patch(self, auth_headers, page_id):
+        """Test a full ordering plus a patch is applied in one request"""
+        blocks, version = self.get_state(auth_headers, page_id)
+        reversed_ids = [b["id"] for b in reversed(blocks)]
+
+        response = requests.post(
+            f"{BASE_URL}/api/admin/content-blocks/{page_id}/bulk",
+            headers=auth_headers,
+            json={
+                "expected_version": version,
+                "order": reversed_ids,
+                "patches": [{"id": reversed_ids[0], "content": {"html": "<p>first</p>"}}]
+            }
+        )
+        assert response.status_code == 200, f"Bulk failed: {response.text}"
+        assert response.json() == {"version": version + 1, "updated": 4, "not_found": 0}
+
+        blocks, new_version = self.get_state(auth_headers, page_id)
+        assert [b["id"] for b in blocks] == reversed_ids
+        assert blocks[0]["content"]["html"] == "<p>first</p>"
+        assert new_version == version + 1
+
+    def test_stale_version_conflict(self, auth_headers, page_id):
+        """Test an edit based on an old version is rejected with 409"""
+        blocks, version = self.get_state(auth_headers, page_id)
+
+        response = requests.post(
+            f"{BASE_URL}/api/admin/content-blocks/{page_id}/bulk",
+            headers=auth_headers,
+            json={"expected_version": version - 1, "order": [b["id"] for b in blocks]}
+        )
+        assert response.status_code == 409
+        assert response.json()["detail"]["current_version"] == version
+
+    def test_single_edit_bumps_version(self, auth_headers, page_id):
+        """Test single-block handlers also move the version"""
+        blocks, version = self.get_state(auth_headers, page_id)
+        requests.put(
+            f"{BASE_URL}/api/admin/content-blocks/{blocks[0]['id']}",
+            headers=auth_headers,
+            json={"published": True}
+        )
+        _, new_version = self.get_state(auth_headers, page_id)
+        assert new_version == version + 1
+
+    def test_invalid_payload(self, auth_headers, page_id):
+        """Test missing version or duplicate ids return 400"""
+        _, version = self.get_state(auth_headers, page_id)
+        for payload in [{"order": []}, {"expected_version": version, "order": ["a", "a"]}]:
+            response = requests.post(
+                f"{BASE_URL}/api/admin/content-blocks/{page_id}/bulk",
+                headers=auth_headers,
+                json=payload
+            )
+            assert response.status_code == 400, f"Expected 400 for {payload}"
+
+    def test_bulk_requires_auth(self):
+        """Test bulk edit requires auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/content-blocks/any/bulk", json={})
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,124 @@
+"""
+Coupon Redemption Load Tests
+100 orders race for a coupon with max_uses=10; exactly 10 may get it
+"""
+
+import pytest
+import requests
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+CONCURRENT_ORDERS = 100
+MAX_USES = 10
+
+ORDER_DATA = {
+    "customer_name": "TEST_Cupom Cliente",
+    "customer_email": "test_coupon@example.com",
+    "customer_phone": "11999999999",
+    "shipping_address": {"address": "Rua Teste, 1", "city": "São Paulo", "state": "SP", "cep": "01001-000"}
+}
+
+
+class TestCouponRedemption:
+    """Test max_uses under concurrent orders"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def coupon(self, auth_headers):
+        """Limited coupon, deleted after the class"""
+        response = requests.post(f"{BASE_URL}/api/admin/coupons", headers=auth_headers, json={
+            "code": f"TESTLOAD{uuid.uuid4().hex[:6].upper()}",
+            "discount_type": "fixed",
+            "discount_value": 5,
+            "max_uses": MAX_USES
+        })
+        assert response.status_code == 200, f"Create failed: {response.text}"
+        coupon = response.json()
+        yield coupon
+        requests.delete(f"{BASE_URL}/api/admin/coupons/{coupon['id']}", headers=auth_headers)
+
+    def prepare_checkout(self, code):
+        """Cart + quote with the coupon for a fresh session"""
+        session_id = f"test-coupon-{uuid.uuid4().hex[:12]}"
+        requests.post(
+            f"{BASE_URL}/api/cart/add",
+            params={"session_id": session_id},
+            json={"product_id": "test-prod-a", "quantity": 1, "price": 50.0}
+        )
+        quote = requests.post(
+            f"{BASE_URL}/api/checkout/quote", params={"session_id": session_id}, json={"cep": "01001-000"}
+        ).json()
+        method = quote["shipping_options"][0]["id"]
+        quote = requests.post(
+            f"{BASE_URL}/api/checkout/quote",
+            params={"session_id": session_id},
+            json={"cep": "01001-000", "shipping_method": method, "coupon_code": code}
+        ).json()
+        assert quote["coupon_code"] == code, quote.get("coupon_error")
+        return session_id, method, quote["quote_token"]
+
+    def test_duplicate_code_rejected(self, auth_headers, coupon):
+        """Test the unique code index"""
+        response = requests.post(f"{BASE_URL}/api/admin/coupons", headers=auth_headers, json={
+            "code": coupon["code"].lower(), "discount_type": "fixed", "discount_value": 1
+        })
+        assert response.status_code == 400
+
+    def test_max_uses_holds_under_concurrency(self, auth_headers, coupon):
+        """Test exactly max_uses of 100 concurrent orders redeem the coupon"""
+        with ThreadPoolExecutor(20) as pool:
+            checkouts = list(pool.map(lambda _: self.prepare_checkout(coupon["code"]), range(CONCURRENT_ORDERS)))
+
+        def place(checkout):
+            session_id, method, token = checkout
+            return requests.post(
+                f"{BASE_URL}/api/orders",
+                params={"session_id": session_id},
+                json={**ORDER_DATA, "shipping_method": method, "quote_token": token}
+            )
+
+        with ThreadPoolExecutor(CONCURRENT_ORDERS) as pool:
+            responses = list(pool.map(place, checkouts))
+
+        placed = [r for r in responses if r.status_code == 200]
+        rejected = [r for r in responses if r.status_code == 400]
+        assert len(placed) == MAX_USES, f"{len(placed)} orders redeemed a coupon limited to {MAX_USES}"
+        assert len(rejected) == CONCURRENT_ORDERS - MAX_USES
+        assert all(r.json()["coupon_code"] == coupon["code"] for r in placed)
+        assert all(r.json()["discount"] == 5 for r in placed)
+
+        coupons = requests.get(f"{BASE_URL}/api/admin/coupons", headers=auth_headers).json()
+        stored = next(c for c in coupons if c["id"] == coupon["id"])
+        assert stored["uses_count"] == MAX_USES
+
+    def test_used_up_coupon_no_longer_validates(self, coupon):
+        """Test validation after the last use was taken"""
+        response = requests.post(
+            f"{BASE_URL}/api/validate-coupon", params={"code": coupon["code"], "subtotal": 100}
+        )
+        assert response.status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,113 @@
+"""
+CRM Billing API Tests
+Tests for set-based monthly payment generation
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestMonthlyBilling:
+    """Test POST /api/admin/payments/generate-monthly"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def contract(self, auth_headers):
+        """Create a customer with an active contract billed on day 31"""
+        suffix = uuid.uuid4().hex[:8]
+        customer = requests.post(
+            f"{BASE_URL}/api/admin/customers",
+            headers=auth_headers,
+            json={
+                "name": f"TEST_Billing {suffix}",
+                "email": f"test_billing_{suffix}@example.com",
+                "phone": "13999999999",
+                "whatsapp": "13999999999",
+                "address": {"city": "Santos"}
+            }
+        )
+        assert customer.status_code == 200, f"Create customer failed: {customer.text}"
+
+        response = requests.post(
+            f"{BASE_URL}/api/admin/contracts",
+            headers=auth_headers,
+            json={
+                "customer_id": customer.json()["id"],
+                "service_type": "totem",
+                "monthly_value": 199.9,
+                "installation_value": 0,
+                "start_date": "2026-01-01T00:00:00+00:00",
+                "payment_day": 31
+            }
+        )
+        assert response.status_code == 200, f"Create contract failed: {response.text}"
+        return response.json()
+
+    def _contract_payments(self, auth_headers, contract_id):
+        response = requests.get(f"{BASE_URL}/api/admin/payments", headers=auth_headers)
+        assert response.status_code == 200
+        return [p for p in response.json() if p["contract_id"] == contract_id]
+
+    def test_generate_clamps_payment_day(self, auth_headers, contract):
+        """Test payment_day 31 falls on the last day of February"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/payments/generate-monthly?period=2027-02",
+            headers=auth_headers
+        )
+        assert response.status_code == 200, f"Generate failed: {response.text}"
+        assert response.json()["period"] == "2027-02"
+
+        payments = [p for p in self._contract_payments(auth_headers, contract["id"]) if p.get("period") == "2027-02"]
+        assert len(payments) == 1
+        assert payments[0]["due_date"].startswith("2027-02-28")
+        assert payments[0]["invoice_number"].startswith("INV-202702-")
+
+    def test_generate_is_idempotent(self, auth_headers, contract):
+        """Test a second run for the same period does not duplicate the payment"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/payments/generate-monthly?period=2027-02",
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+
+        payments = [p for p in self._contract_payments(auth_headers, contract["id"]) if p.get("period") == "2027-02"]
+        assert len(payments) == 1, "Payment duplicated for the same period"
+
+    def test_invalid_period(self, auth_headers):
+        """Test malformed periods are rejected"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/payments/generate-monthly?period=2027-13",
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+
+    def test_generate_requires_auth(self):
+        """Test generate-monthly requires auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/payments/generate-monthly")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,181 @@
+"""
+CRM Queue API Tests
+Tests for the keyset-paginated ticket and payment queues
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+PRIORITY_ORDER = ["urgent", "high", "medium", "low"]
+
+
+def collect(url, headers, params):
+    """Follow next_cursor until the queue is exhausted"""
+    items, cursor = [], None
+    for _ in range(200):
+        page_params = dict(params, cursor=cursor) if cursor else params
+        response = requests.get(url, headers=headers, params=page_params)
+        assert response.status_code == 200, f"Queue failed: {response.text}"
+        data = response.json()
+        items += data["items"]
+        cursor = data["next_cursor"]
+        if not cursor:
+            assert data["has_more"] is False
+            return items
+    pytest.fail("Queue did not terminate")
+
+
+class TestTicketQueue:
+    """Test GET /api/admin/tickets/queue"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def tickets(self, auth_headers):
+        """Create a customer with one open ticket per priority"""
+        suffix = uuid.uuid4().hex[:8]
+        customer = requests.post(
+            f"{BASE_URL}/api/admin/customers",
+            headers=auth_headers,
+            json={
+                "name": f"TEST_Queue {suffix}",
+                "email": f"test_queue_{suffix}@example.com",
+                "phone": "13999999999",
+                "whatsapp": "13999999999",
+                "address": {"city": "Santos"}
+            }
+        ).json()
+        created = []
+        for priority in ["low", "urgent", "medium", "high"]:
+            response = requests.post(
+                f"{BASE_URL}/api/admin/tickets",
+                headers=auth_headers,
+                json={
+                    "customer_id": customer["id"],
+                    "title": f"TEST queue {priority}",
+                    "description": "Queue ordering",
+                    "priority": priority
+                }
+            )
+            assert response.status_code == 200
+            created.append(response.json()["id"])
+        return created
+
+    def test_priority_order_across_pages(self, auth_headers, tickets):
+        """Test pages of 2 follow priority order with no duplicates"""
+        items = collect(f"{BASE_URL}/api/admin/tickets/queue", auth_headers, {"limit": 2})
+        ids = [t["id"] for t in items]
+        assert len(ids) == len(set(ids)), "Cursor repeated a ticket"
+        assert set(tickets) <= set(ids)
+
+        ranks = [PRIORITY_ORDER.index(t["priority"]) for t in items]
+        assert ranks == sorted(ranks)
+        assert all(t["status"] in ["open", "in_progress"] for t in items)
+
+    def test_list_projection(self, auth_headers, tickets):
+        """Test queue rows carry only list-view fields"""
+        response = requests.get(f"{BASE_URL}/api/admin/tickets/queue", headers=auth_headers, params={"limit": 1})
+        item = response.json()["items"][0]
+        assert "ticket_number" in item
+        assert "updated_at" not in item and "_id" not in item
+
+    def test_age_sort(self, auth_headers, tickets):
+        """Test age sort returns oldest first"""
+        items = collect(f"{BASE_URL}/api/admin/tickets/queue", auth_headers, {"sort": "age", "limit": 3})
+        dates = [t["created_at"] for t in items]
+        assert dates == sorted(dates)
+
+    def test_invalid_sort_and_cursor(self, auth_headers):
+        """Test bad sort or cursor values return 400"""
+        for params in [{"sort": "random"}, {"cursor": "not-a-cursor"}, {"priority": "critical"}]:
+            response = requests.get(f"{BASE_URL}/api/admin/tickets/queue", headers=auth_headers, params=params)
+            assert response.status_code == 400, f"Expected 400 for {params}"
+
+    def test_ticket_queue_requires_auth(self):
+        """Test ticket queue requires auth"""
+        response = requests.get(f"{BASE_URL}/api/admin/tickets/queue")
+        assert response.status_code == 401, "Should require authentication"
+
+
+class TestPaymentQueue:
+    """Test GET /api/admin/payments/queue"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_due_date_range(self, auth_headers):
+        """Test payments stay inside the due date range and ascend across pages"""
+        items = collect(
+            f"{BASE_URL}/api/admin/payments/queue",
+            auth_headers,
+            {"due_from": "2020-01-01", "due_to": "2030-01-01", "limit": 5}
+        )
+        ids = [p["id"] for p in items]
+        assert len(ids) == len(set(ids)), "Cursor repeated a payment"
+        dates = [p["due_date"] for p in items]
+        assert dates == sorted(dates)
+        assert all("2020-01-01" <= d[:10] < "2030-01-01" for d in dates)
+
+    def test_desc_order_and_status(self, auth_headers):
+        """Test descending order with a status filter"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/payments/queue",
+            headers=auth_headers,
+            params={"status": "pending", "order": "desc", "limit": 20}
+        )
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert all(p["status"] == "pending" for p in items)
+        dates = [p["due_date"] for p in items]
+        assert dates == sorted(dates, reverse=True)
+
+    def test_invalid_date(self, auth_headers):
+        """Test an unparseable date returns 400"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/payments/queue",
+            headers=auth_headers,
+            params={"due_from": "ontem"}
+        )
+        assert response.status_code == 400
+
+    def test_payment_queue_requires_auth(self):
+        """Test payment queue requires auth"""
+        response = requests.get(f"{BASE_URL}/api/admin/payments/queue")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,66 @@
+"""
+CRM Notification Trigger API Tests
+Tests for the batched payment reminder, overdue and suspension triggers
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+TRIGGER_ENDPOINTS = [
+    "send-payment-reminders",
+    "send-overdue-notices",
+    "send-suspension-warnings"
+]
+
+
+class TestNotificationTriggers:
+    """Test POST /api/admin/notifications/send-*"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.mark.parametrize("endpoint", TRIGGER_ENDPOINTS)
+    def test_trigger_returns_count(self, auth_headers, endpoint):
+        """Test each trigger reports how many notifications it created"""
+        response = requests.post(f"{BASE_URL}/api/admin/notifications/{endpoint}", headers=auth_headers)
+        assert response.status_code == 200, f"{endpoint} failed: {response.text}"
+
+        data = response.json()
+        assert isinstance(data["sent"], int)
+        assert data["message"].startswith(str(data["sent"]))
+
+    @pytest.mark.parametrize("endpoint", TRIGGER_ENDPOINTS)
+    def test_trigger_rerun_sends_nothing_new(self, auth_headers, endpoint):
+        """Test flagged payments are not notified twice"""
+        requests.post(f"{BASE_URL}/api/admin/notifications/{endpoint}", headers=auth_headers)
+        response = requests.post(f"{BASE_URL}/api/admin/notifications/{endpoint}", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["sent"] == 0
+
+    def test_trigger_requires_auth(self):
+        """Test triggers require auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/notifications/send-payment-reminders")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,105 @@
+"""
+Customer Overview API Tests
+Tests for the customer 360 endpoint
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestCustomerOverview:
+    """Test GET /api/admin/customers/{id}/overview"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def customer(self, auth_headers):
+        """Create a customer with a contract and an open ticket"""
+        suffix = uuid.uuid4().hex[:8]
+        response = requests.post(
+            f"{BASE_URL}/api/admin/customers",
+            headers=auth_headers,
+            json={
+                "name": f"TEST_Overview {suffix}",
+                "email": f"test_overview_{suffix}@example.com",
+                "phone": "13999999999",
+                "whatsapp": "13999999999",
+                "address": {"city": "Santos"}
+            }
+        )
+        assert response.status_code == 200, f"Create customer failed: {response.text}"
+        customer = response.json()
+
+        contract = requests.post(
+            f"{BASE_URL}/api/admin/contracts",
+            headers=auth_headers,
+            json={
+                "customer_id": customer["id"],
+                "service_type": "camera",
+                "monthly_value": 150.0,
+                "installation_value": 0,
+                "start_date": "2026-01-01T00:00:00+00:00",
+                "payment_day": 10
+            }
+        )
+        assert contract.status_code == 200
+
+        ticket = requests.post(
+            f"{BASE_URL}/api/admin/tickets",
+            headers=auth_headers,
+            json={"customer_id": customer["id"], "title": "TEST ticket", "description": "Camera offline"}
+        )
+        assert ticket.status_code == 200
+        return customer
+
+    def test_overview_sections(self, auth_headers, customer):
+        """Test overview returns every CRM section for the customer"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/customers/{customer['id']}/overview",
+            headers=auth_headers
+        )
+        assert response.status_code == 200, f"Overview failed: {response.text}"
+
+        data = response.json()
+        assert data["id"] == customer["id"]
+        for section in ["contracts", "equipment", "open_tickets", "recent_payments", "notifications", "balances"]:
+            assert section in data, f"Missing section {section}"
+        assert len(data["contracts"]) == 1
+        assert data["contracts"][0]["monthly_value"] == 150.0
+        assert len(data["open_tickets"]) == 1
+        assert "open_balance" in data["balances"]
+
+    def test_overview_not_found(self, auth_headers):
+        """Test unknown customers return 404"""
+        response = requests.get(f"{BASE_URL}/api/admin/customers/nonexistent/overview", headers=auth_headers)
+        assert response.status_code == 404
+
+    def test_overview_requires_auth(self):
+        """Test overview requires auth"""
+        response = requests.get(f"{BASE_URL}/api/admin/customers/any/overview")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,72 @@
+"""
+Date Migration API Tests
+Tests for the ISO string to BSON datetime migration and datetime-backed responses
+"""
+
+import pytest
+import requests
+import os
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestDateMigration:
+    """Test /api/admin/migrations/dates endpoints"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_run_migration(self, auth_headers):
+        """Test POST /api/admin/migrations/dates/run completes every collection"""
+        response = requests.post(f"{BASE_URL}/api/admin/migrations/dates/run", headers=auth_headers)
+        assert response.status_code in [200, 409], f"Migration failed: {response.text}"
+        if response.status_code == 409:
+            pytest.skip("Migration already running")
+
+        state = response.json()
+        assert state["status"] == "completed"
+        for progress in state["collections"].values():
+            assert progress["done"] is True
+
+    def test_migration_status(self, auth_headers):
+        """Test GET /api/admin/migrations/dates reports per-collection checkpoints"""
+        response = requests.get(f"{BASE_URL}/api/admin/migrations/dates", headers=auth_headers)
+        assert response.status_code == 200
+
+        state = response.json()
+        assert state["status"] in ["not_started", "running", "completed"]
+        assert "payments" in state["collections"] or state["status"] == "not_started"
+
+    def test_payment_dates_are_datetimes(self, auth_headers):
+        """Test payment dates are serialized as ISO datetimes"""
+        response = requests.get(f"{BASE_URL}/api/admin/payments", headers=auth_headers)
+        assert response.status_code == 200
+
+        for payment in response.json()[:20]:
+            datetime.fromisoformat(payment["due_date"].replace("Z", "+00:00"))
+
+    def test_migration_requires_auth(self):
+        """Test migration endpoints require auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/migrations/dates/run")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
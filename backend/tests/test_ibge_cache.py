@@ -0,0 +1,155 @@
+"""
+IBGE Population Cache Tests
+Serves a stub IBGE API from this test and checks that the prospecting stats
+fetch the nine municipalities concurrently, then answer from the Mongo cache,
+and serve stale entries while refreshing them. The backend must run with
+IBGE_API_URL=http://<IBGE_STUB_HOST>:<IBGE_STUB_PORT> (defaults 127.0.0.1:8766).
+"""
+
+import pytest
+import requests
+import os
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+STUB_HOST = os.environ.get('IBGE_STUB_HOST', '127.0.0.1')
+STUB_PORT = int(os.environ.get('IBGE_STUB_PORT', '8766'))
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+MUNICIPIOS = 9
+
+
+def stub_population(codigo):
+    return int(codigo) % 100000
+
+
+class StubIBGE(BaseHTTPRequestHandler):
+    """GET /v3/agregados/6579/...?localidades=N6[code]; records peak concurrency"""
+
+    calls = 0
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        stub = type(self)
+        with stub.lock:
+            stub.calls += 1
+            stub.active += 1
+            stub.peak = max(stub.peak, stub.active)
+        try:
+            time.sleep(0.3)
+            localidades = parse_qs(urlparse(self.path).query).get("localidades", [""])[0]
+            codigo = localidades[len("N6["):-1]
+            body = json.dumps([{"resultados": [{"series": [{"serie": {"2024": str(stub_population(codigo))}}]}]}]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with stub.lock:
+                stub.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class TestIBGECache:
+    """Test /api/admin/prospecting/stats against the stub IBGE API"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def stub(self, auth_headers):
+        """Stub IBGE API; skips unless the backend is configured to use it"""
+        status = requests.get(f"{BASE_URL}/api/admin/prospecting/ibge-cache", headers=auth_headers).json()
+        if status.get("api_url") != f"http://{STUB_HOST}:{STUB_PORT}":
+            pytest.skip("Backend not started with IBGE_API_URL pointing at the stub")
+        server = ThreadingHTTPServer(("0.0.0.0", STUB_PORT), StubIBGE)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield server
+        server.shutdown()
+
+    def stats(self, auth_headers):
+        response = requests.get(f"{BASE_URL}/api/admin/prospecting/stats", headers=auth_headers)
+        assert response.status_code == 200, f"Stats failed: {response.text}"
+        return response.json()
+
+    def test_cold_fetch_is_concurrent(self, auth_headers, stub):
+        """Test missing populations are fetched in parallel"""
+        # Nothing cached for the stub yet: make every entry stale and let the refresh finish
+        requests.post(f"{BASE_URL}/api/admin/prospecting/ibge-cache/expire", headers=auth_headers)
+        self.stats(auth_headers)
+        time.sleep(1.5)
+        StubIBGE.peak = 0
+        calls = StubIBGE.calls
+
+        requests.post(f"{BASE_URL}/api/admin/prospecting/ibge-cache/expire", headers=auth_headers)
+        start = time.monotonic()
+        self.stats(auth_headers)
+        assert time.monotonic() - start < 0.3 * MUNICIPIOS
+        time.sleep(1.5)
+        assert StubIBGE.calls - calls == MUNICIPIOS
+        assert StubIBGE.peak > 1
+
+    def test_populations_from_stub(self, auth_headers, stub):
+        """Test the stats carry the stub's populations"""
+        stats = self.stats(auth_headers)
+        assert len(stats["municipios"]) == MUNICIPIOS
+        for municipio in stats["municipios"]:
+            assert municipio["populacao"] == stub_population(municipio["codigo_ibge"])
+        assert stats["totals"]["populacao"] == sum(m["populacao"] for m in stats["municipios"])
+
+    def test_warm_cache_skips_api(self, auth_headers, stub):
+        """Test fresh entries are served without calling IBGE"""
+        calls = StubIBGE.calls
+        self.stats(auth_headers)
+        self.stats(auth_headers)
+        assert StubIBGE.calls == calls
+
+    def test_stale_served_while_revalidating(self, auth_headers, stub):
+        """Test stale entries answer immediately and are refreshed in the background"""
+        before = self.stats(auth_headers)["totals"]
+        response = requests.post(f"{BASE_URL}/api/admin/prospecting/ibge-cache/expire", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["expired"] >= MUNICIPIOS
+
+        calls = StubIBGE.calls
+        start = time.monotonic()
+        assert self.stats(auth_headers)["totals"] == before
+        assert time.monotonic() - start < 0.3
+
+        time.sleep(1.5)
+        assert StubIBGE.calls - calls == MUNICIPIOS
+        status = requests.get(f"{BASE_URL}/api/admin/prospecting/ibge-cache", headers=auth_headers).json()
+        assert status["stale"] == 0
+
+    def test_cache_status_requires_auth(self):
+        """Test the cache status is admin only"""
+        response = requests.get(f"{BASE_URL}/api/admin/prospecting/ibge-cache")
+        assert response.status_code in [401, 403]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,74 @@
+"""
+Notification Dispatch API Tests
+Tests for delivering pending notifications through channel adapters.
+Delivery tests need the backend started with NOTIFICATION_ADAPTERS=stub.
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestNotificationDispatch:
+    """Test /api/admin/notifications/dispatch endpoints"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_dispatch_stats(self, auth_headers):
+        """Test GET /api/admin/notifications/dispatch/stats returns per-channel counts"""
+        response = requests.get(f"{BASE_URL}/api/admin/notifications/dispatch/stats", headers=auth_headers)
+        assert response.status_code == 200, f"Stats failed: {response.text}"
+
+        stats = response.json()
+        assert isinstance(stats["active_channels"], list)
+        assert isinstance(stats["channels"], dict)
+
+    def test_dispatch_batch(self, auth_headers):
+        """Test POST /api/admin/notifications/dispatch delivers a batch"""
+        stats = requests.get(f"{BASE_URL}/api/admin/notifications/dispatch/stats", headers=auth_headers).json()
+        if not stats["active_channels"]:
+            pytest.skip("No delivery channel configured (set NOTIFICATION_ADAPTERS=stub)")
+
+        response = requests.post(f"{BASE_URL}/api/admin/notifications/dispatch", headers=auth_headers)
+        assert response.status_code == 200, f"Dispatch failed: {response.text}"
+
+        result = response.json()
+        assert result["claimed"] == result["sent"] + result["retry"] + result["failed"]
+
+    def test_delivered_notifications_have_latency(self, auth_headers):
+        """Test sent notifications record sent_at and latency"""
+        response = requests.get(f"{BASE_URL}/api/admin/notifications", headers=auth_headers)
+        assert response.status_code == 200
+
+        for notification in response.json():
+            if notification["status"] == "sent" and notification.get("latency_ms") is not None:
+                assert notification["sent_at"] is not None
+                assert notification["latency_ms"] >= 0
+
+    def test_dispatch_requires_auth(self):
+        """Test dispatch requires auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/notifications/dispatch")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
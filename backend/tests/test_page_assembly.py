@@ -0,0 +1,125 @@
+"""
+Page Assembly API Tests
+Tests for /api/pages/{slug}/assembled and its cache invalidation
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestPageAssembly:
+    """Test GET /api/pages/{slug}/assembled"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def page(self, auth_headers):
+        """Create a published page with a text block and a product list block"""
+        suffix = uuid.uuid4().hex[:8]
+        category = f"TEST_Assembly {suffix}"
+
+        product = requests.post(
+            f"{BASE_URL}/api/admin/products",
+            headers=auth_headers,
+            json={
+                "name": f"TEST Camera {suffix}",
+                "category": category,
+                "description": "Camera",
+                "price": 199.9,
+                "image": "",
+                "features": [],
+                "published": True
+            }
+        )
+        assert product.status_code == 200
+
+        page = requests.post(
+            f"{BASE_URL}/api/admin/pages",
+            headers=auth_headers,
+            json={"slug": f"test-assembly-{suffix}", "title": "TEST Assembly", "published": True}
+        ).json()
+
+        blocks = []
+        for order, block in enumerate([
+            {"type": "text", "content": {"html": "<p>Intro</p>"}},
+            {"type": "product_list", "settings": {"limit": 5}, "content": {"category": category}}
+        ]):
+            response = requests.post(
+                f"{BASE_URL}/api/admin/content-blocks",
+                headers=auth_headers,
+                json={**block, "page_id": page["id"], "order": order}
+            )
+            assert response.status_code == 200
+            blocks.append(response.json())
+
+        yield {"page": page, "blocks": blocks, "product": product.json()}
+
+        requests.delete(f"{BASE_URL}/api/admin/pages/{page['id']}", headers=auth_headers)
+        requests.delete(f"{BASE_URL}/api/admin/products/{product.json()['id']}", headers=auth_headers)
+
+    def test_assembled_page(self, page):
+        """Test page, ordered blocks and resolved products come in one response"""
+        response = requests.get(f"{BASE_URL}/api/pages/{page['page']['slug']}/assembled")
+        assert response.status_code == 200, f"Assembly failed: {response.text}"
+
+        data = response.json()
+        assert data["page"]["id"] == page["page"]["id"]
+        assert [b["type"] for b in data["blocks"]] == ["text", "product_list"]
+        assert [p["id"] for p in data["blocks"][1]["products"]] == [page["product"]["id"]]
+
+    def test_block_update_invalidates(self, auth_headers, page):
+        """Test editing a block is visible on the next assembled read"""
+        slug = page["page"]["slug"]
+        requests.get(f"{BASE_URL}/api/pages/{slug}/assembled")
+
+        response = requests.put(
+            f"{BASE_URL}/api/admin/content-blocks/{page['blocks'][0]['id']}",
+            headers=auth_headers,
+            json={"content": {"html": "<p>Updated</p>"}}
+        )
+        assert response.status_code == 200
+
+        data = requests.get(f"{BASE_URL}/api/pages/{slug}/assembled").json()
+        assert data["blocks"][0]["content"]["html"] == "<p>Updated</p>"
+
+    def test_product_unpublish_invalidates(self, auth_headers, page):
+        """Test unpublishing a product drops it from product lists"""
+        response = requests.patch(
+            f"{BASE_URL}/api/admin/products/{page['product']['id']}/publish",
+            headers=auth_headers,
+            params={"published": False}
+        )
+        assert response.status_code == 200
+
+        data = requests.get(f"{BASE_URL}/api/pages/{page['page']['slug']}/assembled").json()
+        assert data["blocks"][1]["products"] == []
+
+    def test_unknown_slug(self):
+        """Test unknown or unpublished slugs return 404"""
+        response = requests.get(f"{BASE_URL}/api/pages/nonexistent-{uuid.uuid4().hex[:6]}/assembled")
+        assert response.status_code == 404
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
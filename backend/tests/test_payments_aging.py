@@ -0,0 +1,150 @@
+"""
+Receivables Aging API Tests
+Tests for the aging report and its refresh when payments change
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+# A period far enough in the past to land in the 90+ bucket
+OLD_PERIOD = "2020-01"
+
+
+class TestPaymentsAging:
+    """Test GET /api/admin/payments/aging"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def overdue_payment(self, auth_headers):
+        """Create a customer with a contract and an old unpaid invoice"""
+        suffix = uuid.uuid4().hex[:8]
+        customer = requests.post(
+            f"{BASE_URL}/api/admin/customers",
+            headers=auth_headers,
+            json={
+                "name": f"TEST_Aging {suffix}",
+                "email": f"test_aging_{suffix}@example.com",
+                "phone": "13999999999",
+                "whatsapp": "13999999999",
+                "address": {"city": "Santos"}
+            }
+        )
+        assert customer.status_code == 200, f"Create customer failed: {customer.text}"
+        customer = customer.json()
+
+        contract = requests.post(
+            f"{BASE_URL}/api/admin/contracts",
+            headers=auth_headers,
+            json={
+                "customer_id": customer["id"],
+                "service_type": "alarm",
+                "monthly_value": 99.9,
+                "installation_value": 0,
+                "start_date": "2019-12-01T00:00:00+00:00",
+                "payment_day": 10
+            }
+        )
+        assert contract.status_code == 200
+
+        generated = requests.post(
+            f"{BASE_URL}/api/admin/payments/generate-monthly",
+            headers=auth_headers,
+            params={"period": OLD_PERIOD}
+        )
+        assert generated.status_code == 200
+
+        payments = requests.get(f"{BASE_URL}/api/admin/payments", headers=auth_headers).json()
+        payment = next(p for p in payments if p["contract_id"] == contract.json()["id"])
+        return {"customer": customer, "payment": payment}
+
+    def get_aging(self, auth_headers, **params):
+        response = requests.get(
+            f"{BASE_URL}/api/admin/payments/aging",
+            headers=auth_headers,
+            params={"limit": 1000, **params}
+        )
+        assert response.status_code == 200, f"Aging failed: {response.text}"
+        return response.json()
+
+    def test_aging_structure(self, auth_headers):
+        """Test the report has every bucket and the totals add up"""
+        data = self.get_aging(auth_headers, refresh=True)
+        for bucket in ["current", "0_30", "31_60", "61_90", "90_plus"]:
+            assert bucket in data["buckets"], f"Missing bucket {bucket}"
+        assert round(sum(data["buckets"].values()), 2) == data["total"]
+        assert data["customer_count"] >= len(data["customers"])
+
+    def test_old_invoice_in_90_plus(self, auth_headers, overdue_payment):
+        """Test an invoice from years ago is aged into 90+ for its customer"""
+        data = self.get_aging(auth_headers, refresh=True)
+        row = next(c for c in data["customers"] if c["customer_id"] == overdue_payment["customer"]["id"])
+        assert row["customer_name"] == overdue_payment["customer"]["name"]
+        assert row["buckets"]["90_plus"] == 99.9
+        assert row["contracts"][0]["service_type"] == "alarm"
+        assert row["payments_with_pix"] == 0
+
+    def test_pix_update_refreshes_row(self, auth_headers, overdue_payment):
+        """Test updating PIX info is reflected without a full rebuild"""
+        response = requests.put(
+            f"{BASE_URL}/api/admin/payments/{overdue_payment['payment']['id']}/pix",
+            headers=auth_headers,
+            json={"pix_key": "financeiro@vigiloc.com", "pix_qrcode": "000201"}
+        )
+        assert response.status_code == 200
+
+        data = self.get_aging(auth_headers)
+        row = next(c for c in data["customers"] if c["customer_id"] == overdue_payment["customer"]["id"])
+        assert row["payments_with_pix"] == 1
+
+    def test_mark_paid_removes_customer(self, auth_headers, overdue_payment):
+        """Test paying the only open invoice drops the customer from the report"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/payments/{overdue_payment['payment']['id']}/mark-paid",
+            headers=auth_headers,
+            params={"payment_method": "pix"}
+        )
+        assert response.status_code == 200
+
+        data = self.get_aging(auth_headers)
+        ids = [c["customer_id"] for c in data["customers"]]
+        assert overdue_payment["customer"]["id"] not in ids
+
+    def test_mark_paid_not_found(self, auth_headers):
+        """Test marking an unknown payment returns 404"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/payments/nonexistent/mark-paid",
+            headers=auth_headers,
+            params={"payment_method": "pix"}
+        )
+        assert response.status_code == 404
+
+    def test_aging_requires_auth(self):
+        """Test aging requires auth"""
+        response = requests.get(f"{BASE_URL}/api/admin/payments/aging")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,158 @@
+"""
+Product Review Aggregate Tests
+Rating summary maintained on approve/reject, embedded in the catalog, and
+paginated review listing
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+RATINGS = [5, 4, 4, 3, 1]
+
+
+class TestProductReviews:
+    """Test the incremental rating summary and review pagination"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def product(self, auth_headers):
+        """Product for the reviews, deleted after the class"""
+        response = requests.post(f"{BASE_URL}/api/admin/products", headers=auth_headers, json={
+            "name": f"TEST_Avaliação {uuid.uuid4().hex[:6]}",
+            "description": "Produto de teste de avaliações",
+            "price": 10.0,
+            "category": "test",
+            "image": "https://example.com/test.jpg",
+            "features": []
+        })
+        assert response.status_code == 200, f"Create failed: {response.text}"
+        product = response.json()
+        yield product
+        requests.delete(f"{BASE_URL}/api/admin/products/{product['id']}", headers=auth_headers)
+
+    @pytest.fixture(scope="class")
+    def review_ids(self, auth_headers, product):
+        """One pending review per rating in RATINGS"""
+        for rating in RATINGS:
+            response = requests.post(f"{BASE_URL}/api/reviews", json={
+                "product_id": product['id'],
+                "user_name": "TEST_Cliente",
+                "user_email": "test_review@example.com",
+                "rating": rating,
+                "comment": f"Nota {rating}"
+            })
+            assert response.status_code == 200, f"Create failed: {response.text}"
+        response = requests.get(f"{BASE_URL}/api/admin/reviews?status=pending", headers=auth_headers)
+        return [r['id'] for r in response.json() if r['product_id'] == product['id']]
+
+    def rating(self, product):
+        response = requests.get(f"{BASE_URL}/api/products/{product['id']}/rating")
+        assert response.status_code == 200
+        return response.json()
+
+    def test_invalid_rating_rejected(self, product):
+        """Ratings outside 1-5 are refused"""
+        response = requests.post(f"{BASE_URL}/api/reviews", json={
+            "product_id": product['id'],
+            "user_name": "TEST_Cliente",
+            "user_email": "test_review@example.com",
+            "rating": 6,
+            "comment": "Fora da escala"
+        })
+        assert response.status_code == 400
+
+    def test_pending_reviews_not_counted(self, product, review_ids):
+        """Only approved reviews count"""
+        assert len(review_ids) == len(RATINGS)
+        assert self.rating(product)["count"] == 0
+
+    def test_approve_updates_summary(self, auth_headers, product, review_ids):
+        """Approving moves count, average and histogram; approving twice changes nothing"""
+        for review_id in review_ids:
+            response = requests.patch(f"{BASE_URL}/api/admin/reviews/{review_id}/approve", headers=auth_headers)
+            assert response.status_code == 200
+        requests.patch(f"{BASE_URL}/api/admin/reviews/{review_ids[0]}/approve", headers=auth_headers)
+
+        rating = self.rating(product)
+        assert rating["count"] == len(RATINGS)
+        assert rating["average"] == round(sum(RATINGS) / len(RATINGS), 2)
+        assert rating["histogram"] == {str(r): RATINGS.count(r) for r in range(1, 6)}
+
+    def test_catalog_embeds_rating(self, product, review_ids):
+        """The product endpoint carries the same summary"""
+        response = requests.get(f"{BASE_URL}/api/products/{product['id']}")
+        assert response.status_code == 200
+        assert response.json()["rating"] == self.rating(product)
+
+    def test_pagination(self, product, review_ids):
+        """Pages walk every approved review once, newest first"""
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = requests.get(f"{BASE_URL}/api/products/{product['id']}/reviews", params=params)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page["items"]) <= 2
+            seen.extend(r["id"] for r in page["items"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+        assert sorted(seen) == sorted(review_ids)
+
+    def test_invalid_cursor(self, product):
+        """A malformed cursor is a 400"""
+        response = requests.get(f"{BASE_URL}/api/products/{product['id']}/reviews", params={"cursor": "x"})
+        assert response.status_code == 400
+
+    def test_reject_updates_summary(self, auth_headers, product, review_ids):
+        """Rejecting an approved review takes it out of the summary"""
+        response = requests.patch(f"{BASE_URL}/api/admin/reviews/{review_ids[0]}/reject", headers=auth_headers)
+        assert response.status_code == 200
+        rating = self.rating(product)
+        assert rating["count"] == len(RATINGS) - 1
+        assert rating["sum"] == sum(RATINGS) - RATINGS[0]
+
+    def test_rebuild_matches(self, auth_headers, product, review_ids):
+        """Recomputing from the reviews gives the incrementally kept summary"""
+        before = self.rating(product)
+        response = requests.post(
+            f"{BASE_URL}/api/admin/reviews/ratings/rebuild",
+            headers=auth_headers,
+            params={"product_id": product['id']}
+        )
+        assert response.status_code == 200
+        assert self.rating(product) == before
+
+    def test_unknown_review(self, auth_headers):
+        """Approving a missing review is a 404"""
+        response = requests.patch(f"{BASE_URL}/api/admin/reviews/{uuid.uuid4()}/approve", headers=auth_headers)
+        assert response.status_code == 404
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
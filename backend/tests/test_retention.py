@@ -0,0 +1,230 @@
+"""
+Data Retention API Tests
+Tests for retention policies, archival runs and archive queries
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+import pytest
+import requests
+from dotenv import load_dotenv
+from pymongo.errors import ServerSelectionTimeoutError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+load_dotenv(Path(__file__).resolve().parent.parent / '.env')
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+RETENTION_COLLECTIONS = ["analytics_events", "crawler_logs", "seo_logs", "notifications"]
+
+
+class TestRetentionPolicies:
+    """Test retention policy endpoints"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_get_policies(self, auth_headers):
+        """Test GET /api/admin/retention/policies returns a policy per collection"""
+        response = requests.get(f"{BASE_URL}/api/admin/retention/policies", headers=auth_headers)
+        assert response.status_code == 200, f"Get policies failed: {response.text}"
+
+        policies = response.json()
+        for collection in RETENTION_COLLECTIONS:
+            assert collection in policies, f"Missing policy for {collection}"
+            assert "retention_days" in policies[collection]
+            assert "date_field" in policies[collection]
+            assert policies[collection]["format"] in ["parquet", "jsonl"]
+
+    def test_pending_notifications_never_archived(self, auth_headers):
+        """Test notification policy only covers delivered/failed notifications"""
+        response = requests.get(f"{BASE_URL}/api/admin/retention/policies", headers=auth_headers)
+        assert response.status_code == 200
+
+        policy = response.json()["notifications"]
+        assert "pending" not in policy["filter"]["status"]["$in"]
+
+    def test_update_policy(self, auth_headers):
+        """Test PUT /api/admin/retention/policies/{collection} updates retention days"""
+        response = requests.put(
+            f"{BASE_URL}/api/admin/retention/policies/crawler_logs",
+            headers=auth_headers,
+            json={"retention_days": 45}
+        )
+        assert response.status_code == 200, f"Update policy failed: {response.text}"
+        assert response.json()["policy"]["retention_days"] == 45
+
+        # Restore default
+        requests.put(
+            f"{BASE_URL}/api/admin/retention/policies/crawler_logs",
+            headers=auth_headers,
+            json={"retention_days": 30}
+        )
+
+    def test_update_policy_invalid_format(self, auth_headers):
+        """Test invalid archive format is rejected"""
+        response = requests.put(
+            f"{BASE_URL}/api/admin/retention/policies/crawler_logs",
+            headers=auth_headers,
+            json={"format": "csv"}
+        )
+        assert response.status_code == 400
+
+    def test_update_policy_unknown_collection(self, auth_headers):
+        """Test collections without a policy are rejected"""
+        response = requests.put(
+            f"{BASE_URL}/api/admin/retention/policies/users",
+            headers=auth_headers,
+            json={"retention_days": 1}
+        )
+        assert response.status_code == 400
+
+
+class TestRetentionRuns:
+    """Test retention runs and archive queries"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_dry_run_counts_without_deleting(self, auth_headers):
+        """Test POST /api/admin/retention/run?dry_run=true only counts expired documents"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/retention/run?dry_run=true",
+            headers=auth_headers
+        )
+        assert response.status_code == 200, f"Dry run failed: {response.text}"
+
+        run = response.json()
+        assert run["dry_run"] is True
+        for collection in RETENTION_COLLECTIONS:
+            assert "expired" in run["results"][collection]
+
+    def test_archive_summary(self, auth_headers):
+        """Test GET /api/admin/retention/archive lists partitions per collection"""
+        response = requests.get(f"{BASE_URL}/api/admin/retention/archive", headers=auth_headers)
+        assert response.status_code == 200
+
+        summary = response.json()
+        for collection in RETENTION_COLLECTIONS:
+            assert "partitions" in summary[collection]
+
+    def test_query_archive_range(self, auth_headers):
+        """Test GET /api/admin/retention/archive/{collection} reads a date range"""
+        response = requests.get(
+            f"{BASE_URL}/api/admin/retention/archive/analytics_events?start=2020-01-01&end=2020-01-31",
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["collection"] == "analytics_events"
+        assert isinstance(data["documents"], list)
+        assert data["count"] == len(data["documents"])
+
+    def test_run_requires_auth(self):
+        """Test POST /api/admin/retention/run requires auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/retention/run")
+        assert response.status_code == 401, "Should require authentication"
+
+
+
+class TestRetentionArchive:
+    """Test the archive-then-delete path against MongoDB (scratch database, temp archive dir)"""
+
+    @staticmethod
+    async def seed_and_run(archive_dir, collection):
+        """Seed a scratch database next to the app's, run retention on it and drop it.
+
+        Client, seeding, run and cleanup share one event loop; Motor clients
+        are bound to the loop they first run on.
+        """
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from date_codec import CODEC_OPTIONS
+        from retention_service import RetentionService, RETENTION_POLICIES
+
+        policy = RETENTION_POLICIES[collection]
+        date_field = policy["date_field"]
+        expired_at = datetime(2020, 1, 15, 12, 0, tzinfo=timezone.utc)
+        fresh_at = datetime.now(timezone.utc) - timedelta(days=1)
+
+        client = AsyncIOMotorClient(
+            os.environ.get('MONGO_URL', 'mongodb://localhost:27017'), serverSelectionTimeoutMS=2000
+        )
+        name = f"{os.environ.get('DB_NAME', 'vigiloc_db')}_retention_test"
+        try:
+            await client.admin.command("ping")
+            await client.drop_database(name)
+            db = client.get_database(name, codec_options=CODEC_OPTIONS)
+            try:
+                await db[collection].insert_many(
+                    [
+                        {"id": f"old-{i}", "status": "sent", date_field: expired_at, "metadata": {"n": i}}
+                        for i in range(5)
+                    ] + [{"id": "fresh", "status": "sent", date_field: fresh_at}]
+                )
+                service = RetentionService(db, archive_dir, batch_size=2)
+                run = await service.run(collection)
+                remaining = await db[collection].distinct("id")
+                archived = await service.query_archive(collection, "2020-01-15", "2020-01-15")
+                return run, remaining, archived
+            finally:
+                await client.drop_database(name)
+        finally:
+            client.close()
+
+    @pytest.mark.parametrize("collection", ["crawler_logs", "seo_logs"])
+    def test_expired_documents_archived_then_deleted(self, tmp_path, collection):
+        """Test expired documents land in the archive (parquet / jsonl.gz) and leave the collection"""
+        try:
+            run, remaining, archived = asyncio.run(self.seed_and_run(tmp_path, collection))
+        except ServerSelectionTimeoutError:
+            pytest.skip("MongoDB not reachable")
+
+        result = run["results"][collection]
+        assert result["archived"] == 5
+        assert result["files"], "No archive files written"
+        suffix = ".parquet" if collection == "crawler_logs" else ".jsonl.gz"
+        for path in result["files"]:
+            assert Path(path).exists()
+            assert "date=2020-01-15" in path
+            assert path.endswith(suffix)
+
+        assert remaining == ["fresh"], "Expired documents still in the collection"
+        assert sorted(doc["id"] for doc in archived) == [f"old-{i}" for i in range(5)]
+        assert all(doc["metadata"]["n"] == int(doc["id"][-1]) for doc in archived)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,107 @@
+"""
+Scheduler API Tests
+Tests for scheduled CRM/billing jobs, manual runs and run history
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+EXPECTED_JOBS = ["payment_reminders", "overdue_notices", "suspension_warnings", "monthly_billing", "data_retention"]
+
+
+class TestScheduler:
+    """Test /api/admin/scheduler endpoints"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_list_jobs(self, auth_headers):
+        """Test GET /api/admin/scheduler/jobs lists every registered job"""
+        response = requests.get(f"{BASE_URL}/api/admin/scheduler/jobs", headers=auth_headers)
+        assert response.status_code == 200, f"List jobs failed: {response.text}"
+
+        jobs = {job["name"]: job for job in response.json()}
+        for name in EXPECTED_JOBS:
+            assert name in jobs, f"Missing job {name}"
+            assert len(jobs[name]["schedule"].split()) == 5
+
+    def test_run_job_records_history(self, auth_headers):
+        """Test a manual run is recorded with its duration"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/scheduler/jobs/payment_reminders/run",
+            headers=auth_headers
+        )
+        assert response.status_code in [200, 409], f"Run failed: {response.text}"
+        if response.status_code == 409:
+            pytest.skip("Job already running on another worker")
+
+        run = response.json()
+        assert run["trigger"] == "manual"
+        assert run["status"] == "success"
+        assert run["duration_ms"] >= 0
+
+        history = requests.get(
+            f"{BASE_URL}/api/admin/scheduler/runs?job=payment_reminders",
+            headers=auth_headers
+        )
+        assert history.status_code == 200
+        assert run["id"] in [r["id"] for r in history.json()]
+
+    def test_update_job_schedule(self, auth_headers):
+        """Test PUT /api/admin/scheduler/jobs/{name} validates and applies a cron schedule"""
+        response = requests.put(
+            f"{BASE_URL}/api/admin/scheduler/jobs/overdue_notices",
+            headers=auth_headers,
+            json={"schedule": "30 10 * * 1-5"}
+        )
+        assert response.status_code == 200, f"Update failed: {response.text}"
+        assert response.json()["job"]["schedule"] == "30 10 * * 1-5"
+
+        # Restore default
+        requests.put(
+            f"{BASE_URL}/api/admin/scheduler/jobs/overdue_notices",
+            headers=auth_headers,
+            json={"schedule": None}
+        )
+
+    def test_invalid_schedule(self, auth_headers):
+        """Test malformed cron expressions are rejected"""
+        response = requests.put(
+            f"{BASE_URL}/api/admin/scheduler/jobs/overdue_notices",
+            headers=auth_headers,
+            json={"schedule": "61 * * * *"}
+        )
+        assert response.status_code == 400
+
+    def test_unknown_job(self, auth_headers):
+        """Test unknown jobs return 404"""
+        response = requests.post(f"{BASE_URL}/api/admin/scheduler/jobs/nope/run", headers=auth_headers)
+        assert response.status_code == 404
+
+    def test_jobs_require_auth(self):
+        """Test scheduler endpoints require auth"""
+        response = requests.get(f"{BASE_URL}/api/admin/scheduler/jobs")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,101 @@
+"""
+SEO Analyzer API Tests
+Tests for the batch SEO analyzer (pooled fetch, off-loop parsing, hash cache)
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestSeoAnalyzeBatch:
+    """Test POST /api/admin/seo/analyze-batch"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_batch_scores_and_failures(self, auth_headers):
+        """Test reachable pages get scores and unreachable ones an error"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/seo/analyze-batch",
+            headers=auth_headers,
+            json={"urls": [f"{BASE_URL}/", "http://127.0.0.1:9/unreachable"]}
+        )
+        assert response.status_code == 200, f"Batch failed: {response.text}"
+        data = response.json()
+        assert len(data["results"]) == 2
+        assert data["analyzed"] + data["failed"] == 2
+        assert data["failed"] >= 1
+
+        unreachable = data["results"][1]
+        assert "error" in unreachable and "score" not in unreachable
+
+    def test_malformed_urls_do_not_fail_batch(self, auth_headers):
+        """Test URLs that cannot even be requested get an error, not a 500"""
+        urls = [f"{BASE_URL}/", "http://[::1", "http://exa\x00mple.com/"]
+        response = requests.post(f"{BASE_URL}/api/admin/seo/analyze-batch", headers=auth_headers, json={"urls": urls})
+        assert response.status_code == 200, f"Batch failed: {response.text}"
+        results = response.json()["results"]
+        assert len(results) == 3
+        assert "error" in results[1] and "error" in results[2]
+
+    def test_unchanged_page_is_cached(self, auth_headers):
+        """Test analyzing the same content twice reuses the score"""
+        url = f"{BASE_URL}/api/llms.txt"
+        first = requests.post(f"{BASE_URL}/api/admin/seo/analyze-batch", headers=auth_headers, json={"urls": [url]}).json()
+        second = requests.post(f"{BASE_URL}/api/admin/seo/analyze-batch", headers=auth_headers, json={"urls": [url]}).json()
+
+        assert first["results"][0]["content_hash"] == second["results"][0]["content_hash"]
+        assert second["results"][0]["cached"] is True
+        assert first["results"][0]["score"] == second["results"][0]["score"]
+
+    def test_invalid_payload(self, auth_headers):
+        """Test empty or oversized URL lists return 400"""
+        for payload in [{}, {"urls": []}, {"urls": [f"{BASE_URL}/?p={i}" for i in range(201)]}]:
+            response = requests.post(f"{BASE_URL}/api/admin/seo/analyze-batch", headers=auth_headers, json=payload)
+            assert response.status_code == 400
+
+    def test_single_analyze_keeps_response_shape(self, auth_headers):
+        """Test the single-URL endpoint still returns the score fields"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/seo/analyze",
+            headers=auth_headers,
+            params={"url": f"{BASE_URL}/"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        for field in ["page_url", "score", "title_score", "issues", "warnings", "suggestions", "analyzed_at"]:
+            assert field in data
+
+    def test_analyzer_status(self, auth_headers):
+        """Test analyzer status reports parser and pool sizes"""
+        response = requests.get(f"{BASE_URL}/api/admin/seo/analyzer-status", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["parser"] in ("lxml", "html.parser")
+
+    def test_batch_requires_auth(self):
+        """Test batch analysis requires auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/seo/analyze-batch", json={"urls": ["x"]})
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,109 @@
+"""
+SEO Content Cache API Tests
+Tests for cached JSON-LD / llms.txt and incremental review stats
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestCrawlerDocuments:
+    """Test GET /api/seo/structured-data and /api/llms.txt"""
+
+    @pytest.mark.parametrize("path", ["/api/seo/structured-data", "/api/llms.txt"])
+    def test_etag_and_gzip(self, path):
+        """Test documents are served gzipped and revalidate with 304"""
+        response = requests.get(f"{BASE_URL}{path}", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers.get("content-encoding") == "gzip"
+        etag = response.headers.get("etag")
+        assert etag
+
+        cached = requests.get(f"{BASE_URL}{path}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+    @pytest.mark.parametrize("path", ["/api/seo/structured-data", "/api/llms.txt", "/api/sitemap.xml", "/api/bootstrap"])
+    def test_gzip_refused_with_q0(self, path):
+        """Test "gzip;q=0" gets the plain body"""
+        response = requests.get(f"{BASE_URL}{path}", headers={"Accept-Encoding": "gzip;q=0, identity"})
+        assert response.status_code == 200
+        assert response.headers.get("content-encoding") is None
+
+    def test_structured_data_graph(self):
+        """Test the JSON-LD graph keeps its Organization rating"""
+        data = requests.get(f"{BASE_URL}/api/seo/structured-data").json()
+        assert data["@context"] == "https://schema.org"
+        organization = data["@graph"][0]
+        assert organization["@type"] == "Organization"
+        stats = requests.get(f"{BASE_URL}/api/seo/review-stats").json()
+        assert organization["aggregateRating"]["reviewCount"] == stats["count"]
+
+    def test_llms_txt_is_text(self):
+        """Test llms.txt content type"""
+        response = requests.get(f"{BASE_URL}/api/llms.txt")
+        assert response.headers.get("content-type", "").startswith("text/plain")
+        assert "VIGILOC" in response.text
+
+
+class TestReviewStats:
+    """Test review stats follow review writes"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def get_stats(self):
+        return requests.get(f"{BASE_URL}/api/seo/review-stats").json()
+
+    def test_stats_follow_review_lifecycle(self, auth_headers):
+        """Test create, toggle and delete move count and invalidate JSON-LD"""
+        before = self.get_stats()
+        etag = requests.get(f"{BASE_URL}/api/seo/structured-data").headers.get("etag")
+
+        response = requests.post(
+            f"{BASE_URL}/api/admin/social-reviews",
+            headers=auth_headers,
+            json={"author_name": "TEST_Stats", "rating": 3, "text": "ok", "published": True}
+        )
+        assert response.status_code == 200
+        review_id = response.json()["id"]
+        assert self.get_stats()["count"] == before["count"] + 1
+
+        refreshed = requests.get(f"{BASE_URL}/api/seo/structured-data", headers={"If-None-Match": etag})
+        assert refreshed.status_code == 200, "JSON-LD should be rebuilt after a review change"
+
+        requests.patch(f"{BASE_URL}/api/admin/social-reviews/{review_id}/toggle-publish", headers=auth_headers)
+        assert self.get_stats()["count"] == before["count"]
+
+        requests.patch(f"{BASE_URL}/api/admin/social-reviews/{review_id}/toggle-publish", headers=auth_headers)
+        requests.delete(f"{BASE_URL}/api/admin/social-reviews/{review_id}", headers=auth_headers)
+        assert self.get_stats() == before
+
+    def test_rebuild_matches_incremental(self, auth_headers):
+        """Test a full recount agrees with the incremental stats"""
+        incremental = self.get_stats()
+        response = requests.post(f"{BASE_URL}/api/admin/seo/review-stats/rebuild", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == incremental
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
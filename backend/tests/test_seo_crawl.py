@@ -0,0 +1,159 @@
+"""
+SEO Crawl Audit API Tests
+Crawls a local stand-in site served by this test and checks the audit results.
+The backend must be able to reach the test machine (default 127.0.0.1; set
+SEO_CRAWL_TEST_HOST otherwise).
+"""
+
+import pytest
+import requests
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+STAND_IN_HOST = os.environ.get('SEO_CRAWL_TEST_HOST', '127.0.0.1')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+PAGES = 60
+
+
+class StandInSite(BaseHTTPRequestHandler):
+    """robots.txt, a sitemap with every third page, and pages linking to the next one"""
+
+    def do_GET(self):
+        site = f"http://{STAND_IN_HOST}:{self.server.server_port}"
+        if self.path == "/robots.txt":
+            self.reply(f"User-agent: *\nDisallow: /private\nSitemap: {site}/sitemap.xml\n", "text/plain")
+        elif self.path == "/sitemap.xml":
+            urls = "".join(f"<url><loc>{site}/page/{i}</loc></url>" for i in range(0, PAGES, 3))
+            self.reply(f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>', "application/xml")
+        elif self.path == "/":
+            self.reply("<html><head><title>Home</title></head><body><a href='/page/0'>start</a></body></html>", "text/html")
+        elif self.path.startswith("/page/") and int(self.path.split("/")[2]) < PAGES:
+            i = int(self.path.split("/")[2])
+            title = "Same title" if i < 2 else f"Page {i}"
+            links = f"<a href='/page/{i + 1}'>next</a><a href='/missing'>broken</a><a href='/private/x'>private</a>"
+            self.reply(f"<html><head><title>{title}</title></head><body><h1>{i}</h1>{links}</body></html>", "text/html")
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def reply(self, body: str, content_type: str):
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSeoCrawl:
+    """Test /api/admin/seo/crawl against the stand-in site"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def stand_in_site(self):
+        server = ThreadingHTTPServer(("0.0.0.0", 0), StandInSite)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield f"http://{STAND_IN_HOST}:{server.server_port}"
+        server.shutdown()
+
+    @pytest.fixture(scope="class")
+    def finished_job(self, auth_headers, stand_in_site):
+        """Run one crawl to completion"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/seo/crawl",
+            headers=auth_headers,
+            json={"site_url": stand_in_site, "concurrency": 8}
+        )
+        assert response.status_code == 200, f"Start failed: {response.text}"
+        job_id = response.json()["id"]
+
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            job = requests.get(f"{BASE_URL}/api/admin/seo/crawl/{job_id}", headers=auth_headers).json()
+            if job["status"] not in ("running", "cancelling"):
+                return job
+            time.sleep(0.5)
+        pytest.fail("Crawl did not finish in 60s")
+
+    def test_crawl_completes(self, finished_job):
+        """Test every page is reached from the sitemap and links"""
+        assert finished_job["status"] == "completed", finished_job.get("error")
+        # home + PAGES pages + /missing
+        assert finished_job["pages_crawled"] == PAGES + 2
+        assert finished_job["skipped_by_robots"] == 1
+
+    def test_broken_links_with_referrers(self, finished_job):
+        """Test the 404 link is reported with the pages linking to it"""
+        broken = finished_job["summary"]["broken_links"]
+        assert len(broken) == 1
+        assert broken[0]["url"].endswith("/missing")
+        assert broken[0]["status_code"] == 404
+        assert broken[0]["referrers"]
+
+    def test_duplicate_titles(self, finished_job):
+        """Test pages sharing a title are grouped"""
+        duplicates = finished_job["summary"]["duplicate_titles"]
+        assert duplicates[0]["value"] == "Same title"
+        assert duplicates[0]["count"] == 2
+
+    def test_pages_pagination(self, auth_headers, finished_job):
+        """Test page listing pages through every crawled URL"""
+        urls, cursor = [], None
+        while True:
+            params = {"limit": 25, **({"cursor": cursor} if cursor else {})}
+            data = requests.get(
+                f"{BASE_URL}/api/admin/seo/crawl/{finished_job['id']}/pages",
+                headers=auth_headers,
+                params=params
+            ).json()
+            urls += [p["url"] for p in data["items"]]
+            if not data["has_more"]:
+                break
+            cursor = data["next_cursor"]
+        assert len(urls) == len(set(urls)) == finished_job["pages_crawled"]
+
+    def test_invalid_requests(self, auth_headers, finished_job):
+        """Test bad URL / filter return 400 and cancelling a finished job 409"""
+        response = requests.post(f"{BASE_URL}/api/admin/seo/crawl", headers=auth_headers, json={"site_url": "ftp://x"})
+        assert response.status_code == 400
+        response = requests.get(
+            f"{BASE_URL}/api/admin/seo/crawl/{finished_job['id']}/pages",
+            headers=auth_headers,
+            params={"issue": "nope"}
+        )
+        assert response.status_code == 400
+        response = requests.post(f"{BASE_URL}/api/admin/seo/crawl/{finished_job['id']}/cancel", headers=auth_headers)
+        assert response.status_code == 409
+
+    def test_crawl_requires_auth(self):
+        """Test starting a crawl requires auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/seo/crawl", json={})
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,101 @@
+"""
+SEO File Store API Tests
+Tests for versioned SEO file saves, history, diffs and restore
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestSeoFileVersions:
+    """Test /api/admin/seo/files versioning on security.txt"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def original(self, auth_headers):
+        """Current security.txt, written back after the class"""
+        files = requests.get(f"{BASE_URL}/api/admin/seo/files", headers=auth_headers).json()
+        current = next(f for f in files if f["type"] == "security")
+        yield current.get("content")
+        if current.get("content") is not None:
+            requests.put(f"{BASE_URL}/api/admin/seo/files/security", headers=auth_headers, json={"content": current["content"]})
+
+    def save(self, auth_headers, content):
+        response = requests.put(f"{BASE_URL}/api/admin/seo/files/security", headers=auth_headers, json={"content": content})
+        assert response.status_code == 200, f"Save failed: {response.text}"
+        return response.json()
+
+    def test_saves_create_versions(self, auth_headers, original):
+        """Test each changed save is a new version and repeats are not"""
+        marker = uuid.uuid4().hex[:8]
+        first = self.save(auth_headers, f"Contact: mailto:a-{marker}@vigiloc.com\n")
+        second = self.save(auth_headers, f"Contact: mailto:b-{marker}@vigiloc.com\n")
+        assert second["version"] == first["version"] + 1
+        assert self.save(auth_headers, f"Contact: mailto:b-{marker}@vigiloc.com\n")["changed"] is False
+
+        versions = requests.get(f"{BASE_URL}/api/admin/seo/files/security/versions", headers=auth_headers).json()
+        assert versions[0]["version"] == second["version"]
+        assert "content" not in versions[0] and "diff" not in versions[0]
+
+    def test_version_diff_and_restore(self, auth_headers, original):
+        """Test an older version can be viewed, diffed and restored"""
+        marker = uuid.uuid4().hex[:8]
+        old = self.save(auth_headers, f"Contact: mailto:old-{marker}@vigiloc.com\nExpires: 2030-01-01T00:00:00Z\n")
+        self.save(auth_headers, f"Contact: mailto:new-{marker}@vigiloc.com\n")
+
+        detail = requests.get(
+            f"{BASE_URL}/api/admin/seo/files/security/versions/{old['version']}",
+            headers=auth_headers
+        ).json()
+        assert f"old-{marker}" in detail["content"]
+        assert f"-Contact: mailto:old-{marker}" in detail["diff"]
+
+        response = requests.post(
+            f"{BASE_URL}/api/admin/seo/files/security/restore",
+            headers=auth_headers,
+            params={"version": old["version"]}
+        )
+        assert response.status_code == 200
+        assert response.json()["restored_from"] == old["version"]
+
+        files = requests.get(f"{BASE_URL}/api/admin/seo/files", headers=auth_headers).json()
+        security = next(f for f in files if f["type"] == "security")
+        assert security["content"] == detail["content"]
+
+    def test_invalid_requests(self, auth_headers):
+        """Test unknown file types and versions"""
+        response = requests.put(f"{BASE_URL}/api/admin/seo/files/nope", headers=auth_headers, json={"content": "x"})
+        assert response.status_code == 400
+        response = requests.get(f"{BASE_URL}/api/admin/seo/files/security/versions/999999", headers=auth_headers)
+        assert response.status_code == 404
+
+    def test_versions_require_auth(self):
+        """Test history requires auth"""
+        response = requests.get(f"{BASE_URL}/api/admin/seo/files/security/versions")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
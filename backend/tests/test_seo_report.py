@@ -0,0 +1,82 @@
+"""
+SEO Report API Tests
+Tests for the aggregation-based SEO report and health check
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestSeoReport:
+    """Test GET /api/seo/report and /api/admin/seo/health-check"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_report_and_health_agree(self, auth_headers):
+        """Test both reports show the same content counts"""
+        report = requests.get(f"{BASE_URL}/api/seo/report", headers=auth_headers).json()
+        health = requests.get(f"{BASE_URL}/api/admin/seo/health-check", headers=auth_headers).json()
+
+        content = report["content_analysis"]
+        assert content["total_services"] == health["content"]["services_count"]
+        assert content["total_reviews"] == health["content"]["reviews_count"]
+        assert content["services_with_description"] <= content["total_services"]
+        assert 0 <= health["score"] <= 100
+
+    def test_new_service_is_counted(self, auth_headers):
+        """Test the cached metrics follow a service write"""
+        before = requests.get(f"{BASE_URL}/api/seo/report", headers=auth_headers).json()["content_analysis"]
+
+        slug = f"test-report-{uuid.uuid4().hex[:8]}"
+        response = requests.post(
+            f"{BASE_URL}/api/admin/services",
+            headers=auth_headers,
+            json={"name": "TEST report", "slug": slug, "shortDescription": "desc", "published": True}
+        )
+        assert response.status_code == 200
+        service_id = response.json()["id"]
+
+        report = requests.get(f"{BASE_URL}/api/seo/report", headers=auth_headers).json()
+        assert report["content_analysis"]["total_services"] == before["total_services"] + 1
+        assert report["content_analysis"]["services_with_description"] == before["services_with_description"] + 1
+
+        requests.delete(f"{BASE_URL}/api/admin/services/{service_id}", headers=auth_headers)
+        after = requests.get(f"{BASE_URL}/api/seo/report", headers=auth_headers).json()["content_analysis"]
+        assert after == before
+
+    def test_health_check_files(self, auth_headers):
+        """Test file checks report every tracked file"""
+        health = requests.get(f"{BASE_URL}/api/admin/seo/health-check", headers=auth_headers).json()
+        assert set(health["files"]) == {"robots.txt", "llms.txt", "manifest.json", "security.txt"}
+        for status in health["files"].values():
+            assert status["status"] in ("✅", "❌")
+
+    def test_report_requires_auth(self):
+        """Test report requires auth"""
+        response = requests.get(f"{BASE_URL}/api/seo/report")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
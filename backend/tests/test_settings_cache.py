@@ -0,0 +1,107 @@
+"""
+Settings Cache API Tests
+Tests for the in-memory settings registry and its invalidation
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class TestSettingsCache:
+    """Test cached settings reads and /api/admin/settings-cache"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_put_is_visible_on_next_read(self, auth_headers):
+        """Test a PUT handler invalidates the cached entry"""
+        original = requests.get(f"{BASE_URL}/api/tracking-settings").json()
+        marker = f"GTM-{uuid.uuid4().hex[:6].upper()}"
+
+        response = requests.put(
+            f"{BASE_URL}/api/admin/tracking-settings",
+            headers=auth_headers,
+            json={**original, "gtm_id": marker}
+        )
+        assert response.status_code == 200
+
+        assert requests.get(f"{BASE_URL}/api/tracking-settings").json()["gtm_id"] == marker
+
+        requests.put(f"{BASE_URL}/api/admin/tracking-settings", headers=auth_headers, json=original)
+
+    def test_defaults_when_missing(self):
+        """Test public settings still return defaults"""
+        response = requests.get(f"{BASE_URL}/api/contact-page-settings")
+        assert response.status_code == 200
+        assert "hero_title" in response.json()
+
+    def test_menu_route(self):
+        """Test unknown menus return an empty item list"""
+        response = requests.get(f"{BASE_URL}/api/menus/nonexistent-{uuid.uuid4().hex[:6]}")
+        assert response.status_code == 200
+        assert response.json()["items"] == []
+
+    def test_status(self, auth_headers):
+        """Test the cache status lists every registered entry"""
+        response = requests.get(f"{BASE_URL}/api/admin/settings-cache", headers=auth_headers)
+        assert response.status_code == 200
+        names = [entry["name"] for entry in response.json()]
+        for name in ["site_settings", "homepage_settings", "seo_settings", "menus"]:
+            assert name in names
+
+    def test_invalidate(self, auth_headers):
+        """Test invalidating one entry bumps its version"""
+        before = {e["name"]: e["version"] for e in requests.get(
+            f"{BASE_URL}/api/admin/settings-cache", headers=auth_headers
+        ).json()}
+
+        response = requests.post(
+            f"{BASE_URL}/api/admin/settings-cache/invalidate",
+            headers=auth_headers,
+            params={"name": "homepage_settings"}
+        )
+        assert response.status_code == 200
+        assert response.json()["invalidated"] == ["homepage_settings"]
+
+        after = {e["name"]: e["version"] for e in requests.get(
+            f"{BASE_URL}/api/admin/settings-cache", headers=auth_headers
+        ).json()}
+        assert after["homepage_settings"] == before["homepage_settings"] + 1
+
+    def test_invalidate_unknown(self, auth_headers):
+        """Test unknown entries return 404"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/settings-cache/invalidate",
+            headers=auth_headers,
+            params={"name": "nonexistent"}
+        )
+        assert response.status_code == 404
+
+    def test_settings_cache_requires_auth(self):
+        """Test cache admin requires auth"""
+        response = requests.post(f"{BASE_URL}/api/admin/settings-cache/invalidate")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
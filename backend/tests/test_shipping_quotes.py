@@ -0,0 +1,159 @@
+"""
+Melhor Envio Quote API Tests
+Points the shipping settings at a stub Melhor Envio API served by this test and
+checks caching, request coalescing and the local-table fallback. The backend
+must be able to reach the test machine (default 127.0.0.1; set
+SHIPPING_STUB_HOST otherwise).
+"""
+
+import pytest
+import requests
+import os
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+STUB_HOST = os.environ.get('SHIPPING_STUB_HOST', '127.0.0.1')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+PRODUCTS = [{"id": "cam-1", "name": "Câmera", "price": 199.9, "weight": 0.8, "quantity": 2}]
+
+
+class StubMelhorEnvio(BaseHTTPRequestHandler):
+    """POST /api/v2/me/shipment/calculate; answers 503 while `down` is set"""
+
+    calls = 0
+    down = False
+
+    def do_POST(self):
+        type(self).calls += 1
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.down or self.path != "/api/v2/me/shipment/calculate":
+            self.send_response(503)
+            self.end_headers()
+            return
+        time.sleep(0.3)
+        body = json.dumps([
+            {"id": 2, "name": "SEDEX", "price": "31.50", "delivery_time": 2, "company": {"name": "Correios"}},
+            {"id": 1, "name": "PAC", "price": "18.90", "delivery_time": 6, "company": {"name": "Correios"}}
+        ]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestMelhorEnvioQuotes:
+    """Test /api/shipping/calculate-melhor-envio against the stub API"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def stub_settings(self, auth_headers):
+        """Shipping settings pointing at the stub, restored after the class"""
+        server = ThreadingHTTPServer(("0.0.0.0", 0), StubMelhorEnvio)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        original = requests.get(f"{BASE_URL}/api/admin/shipping-settings", headers=auth_headers).json()
+        requests.put(f"{BASE_URL}/api/admin/shipping-settings", headers=auth_headers, json={
+            **original,
+            "melhor_envio_enabled": True,
+            "melhor_envio_token": "stub-token",
+            "origin_cep": "01001-000",
+            "melhor_envio_api_url": f"http://{STUB_HOST}:{server.server_port}"
+        })
+        # Let every worker pick up the new settings
+        time.sleep(6)
+        yield server
+        requests.put(f"{BASE_URL}/api/admin/shipping-settings", headers=auth_headers, json={
+            **original, "melhor_envio_api_url": original.get("melhor_envio_api_url")
+        })
+        server.shutdown()
+
+    def quote(self, cep, products=PRODUCTS):
+        response = requests.post(
+            f"{BASE_URL}/api/shipping/calculate-melhor-envio",
+            json={"destination_cep": cep, "products": products}
+        )
+        assert response.status_code == 200, f"Quote failed: {response.text}"
+        return response.json()
+
+    def test_quote_is_cached(self, stub_settings):
+        """Test the second identical quote is served without calling the API"""
+        first = self.quote("20040-002")
+        assert first["source"] == "melhor_envio"
+        assert [o["name"] for o in first["options"]] == ["PAC", "SEDEX"]
+
+        calls = StubMelhorEnvio.calls
+        # Same package described differently (other id/name) hits the same cache entry
+        second = self.quote("20040002", [{"id": "x", "name": "Outro", "price": 199.90, "weight": 0.80, "quantity": 2}])
+        assert second["source"] == "cache"
+        assert second["options"] == first["options"]
+        assert StubMelhorEnvio.calls == calls
+
+    def test_concurrent_quotes_share_one_call(self, stub_settings):
+        """Test identical concurrent quotes are coalesced (per worker)"""
+        calls = StubMelhorEnvio.calls
+        with ThreadPoolExecutor(10) as pool:
+            results = list(pool.map(lambda _: self.quote("30130-000"), range(10)))
+        assert all(r["options"][0]["name"] == "PAC" for r in results)
+        # At most one upstream call per uvicorn worker
+        assert StubMelhorEnvio.calls - calls <= 4
+
+    def test_provider_down_uses_local_table(self, stub_settings):
+        """Test a failing provider falls back to the local shipping table"""
+        StubMelhorEnvio.down = True
+        try:
+            result = self.quote("69900-000")
+        finally:
+            StubMelhorEnvio.down = False
+        assert result["source"] == "fallback"
+        assert result["options"]
+        assert all("fallback_reason" in option for option in result["options"])
+
+    def test_invalid_cep(self, stub_settings):
+        """Test invalid destination CEP"""
+        response = requests.post(
+            f"{BASE_URL}/api/shipping/calculate-melhor-envio",
+            json={"destination_cep": "123", "products": PRODUCTS}
+        )
+        assert response.status_code == 400
+
+    def test_quote_status(self, auth_headers, stub_settings):
+        """Test circuit breaker status endpoint"""
+        response = requests.get(f"{BASE_URL}/api/admin/shipping/quote-status", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["circuit"]["state"] in ("closed", "open", "half_open")
+        assert "cached_quotes" in data
+
+    def test_quote_status_requires_auth(self):
+        """Test status requires auth"""
+        response = requests.get(f"{BASE_URL}/api/admin/shipping/quote-status")
+        assert response.status_code == 401, "Should require authentication"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
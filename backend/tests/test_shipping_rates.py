@@ -0,0 +1,163 @@
+"""
+Shipping Rate Engine API Tests
+Tests for CEP-range shipping rates, weight brackets and batch quotes
+"""
+
+import pytest
+import requests
+import os
+import sys
+import asyncio
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shipping_rate_engine import ShippingRateEngine
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+# Range at the far end of Acre, unlikely to be covered by real rates
+TEST_RATE = {
+    "name": "TEST_Entrega Regional",
+    "type": "cep",
+    "regions": ["69990-000:69999-999"],
+    "weight_brackets": [{"max_weight": 1, "price": 10}, {"max_weight": 5, "price": 18}],
+    "price_per_kg": 1.0,
+    "min_days": 2,
+    "max_days": 4,
+    "active": True
+}
+
+
+def rate_ids(cep, weight=1.0):
+    response = requests.get(f"{BASE_URL}/api/shipping/calculate", params={"cep": cep, "weight": weight})
+    assert response.status_code == 200
+    return {rate["id"]: rate for rate in response.json()["rates"]}
+
+
+def wait_for(check, timeout=7):
+    """Other workers reload the rate index on their next settings poll"""
+    deadline = time.time() + timeout
+    while not check():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.5)
+    return True
+
+
+class TestShippingRateEngine:
+    """Test /api/shipping/calculate with admin CEP rates"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    @pytest.fixture(scope="class")
+    def test_rate(self, auth_headers):
+        """Create the regional rate, delete it after the class"""
+        response = requests.post(f"{BASE_URL}/api/admin/shipping/rates", headers=auth_headers, json=TEST_RATE)
+        assert response.status_code == 200, f"Create failed: {response.text}"
+        rate = response.json()
+        yield rate
+        requests.delete(f"{BASE_URL}/api/admin/shipping/rates/{rate['id']}", headers=auth_headers)
+
+    def test_rate_applies_inside_range(self, test_rate):
+        """Test the rate is quoted inside its CEP range with bracket pricing"""
+        assert wait_for(lambda: test_rate["id"] in rate_ids("69995-000", 0.5))
+        assert rate_ids("69995-000", 0.5)[test_rate["id"]]["price"] == 10.5
+        assert rate_ids("69995000", 3)[test_rate["id"]]["price"] == 21.0
+        # Above the last bracket the rate does not apply
+        assert test_rate["id"] not in rate_ids("69995000", 8)
+        assert test_rate["id"] not in rate_ids("69989999", 1)
+
+    def test_batch_quotes(self, test_rate):
+        """Test many CEP/weight pairs in one call"""
+        assert wait_for(lambda: test_rate["id"] in rate_ids("69990000"))
+        items = [{"cep": "69990-000", "weight": 1}, {"cep": "01001-000", "weight": 2}, {"cep": "123"}]
+        response = requests.post(f"{BASE_URL}/api/shipping/calculate-batch", json={"items": items})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results) == 3
+        assert test_rate["id"] in [rate["id"] for rate in results[0]["rates"]]
+        assert "rates" in results[1]
+        assert results[2]["error"] == "CEP inválido"
+
+    def test_batch_limit(self):
+        """Test oversized batches are rejected"""
+        items = [{"cep": "01001000", "weight": 1}] * 1001
+        response = requests.post(f"{BASE_URL}/api/shipping/calculate-batch", json={"items": items})
+        assert response.status_code == 400
+
+    def test_invalid_region_rejected(self, auth_headers):
+        """Test malformed CEP regions"""
+        response = requests.post(
+            f"{BASE_URL}/api/admin/shipping/rates",
+            headers=auth_headers,
+            json={**TEST_RATE, "regions": ["99999:01000"]}
+        )
+        assert response.status_code == 400
+
+    def test_invalid_cep(self):
+        """Test invalid CEP"""
+        response = requests.get(f"{BASE_URL}/api/shipping/calculate", params={"cep": "12ab"})
+        assert response.status_code == 400
+
+    def test_rate_index_status(self, auth_headers, test_rate):
+        """Test compiled index status"""
+        response = requests.get(f"{BASE_URL}/api/admin/shipping/rate-index", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["rates"] >= 1
+        assert data["using_defaults"] is False
+
+    def test_rate_index_requires_auth(self):
+        """Test status requires auth"""
+        response = requests.get(f"{BASE_URL}/api/admin/shipping/rate-index")
+        assert response.status_code == 401, "Should require authentication"
+
+
+class TestLegacyCepRates:
+    """'cep' rates saved before regions existed (regions: None) can't be created through the API,
+    so these run the engine directly"""
+
+    def engine(self, rates):
+        async def load_rates():
+            return rates
+        return ShippingRateEngine(load_rates)
+
+    def test_regionless_rate_keeps_defaults(self):
+        """Test a region-less 'cep' rate does not switch the default table off"""
+        engine = self.engine([{"id": "legacy", "name": "Legado", "type": "cep", "regions": None, "price": 9}])
+        quote = asyncio.run(engine.quote("01310100"))
+        assert {rate["id"] for rate in quote["rates"]} == {"pac-sp", "sedex-sp"}
+        status = asyncio.run(engine.status())
+        assert status["using_defaults"] is True
+        assert status["ignored_rates"] == ["legacy"]
+
+    def test_regionless_rate_next_to_valid_rate(self):
+        """Test a valid 'cep' rate still replaces the defaults when a legacy one is present"""
+        engine = self.engine([
+            {"id": "legacy", "name": "Legado", "type": "cep", "regions": None, "price": 9},
+            {**TEST_RATE, "id": "regional"}
+        ])
+        assert [rate["id"] for rate in asyncio.run(engine.quote("69995000"))["rates"]] == ["regional"]
+        assert asyncio.run(engine.quote("01310100"))["rates"] == []
+        assert asyncio.run(engine.status())["using_defaults"] is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,110 @@
+"""
+Sitemap API Tests
+Tests for the cached sitemap: gzip, ETag, real lastmod and invalidation
+"""
+
+import pytest
+import requests
+import os
+import uuid
+import xml.etree.ElementTree as ET
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials
+ADMIN_EMAIL = "admin@vigiloc.com"
+ADMIN_PASSWORD = "admin123"
+
+NS = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+
+
+def sitemap_locs():
+    """All <loc> of the sitemap, following the index when there is one"""
+    root = ET.fromstring(requests.get(f"{BASE_URL}/api/sitemap.xml").content)
+    if root.tag.endswith("sitemapindex"):
+        locs = []
+        for loc in root.findall("sm:sitemap/sm:loc", NS):
+            path = loc.text.split("/api/", 1)[1]
+            child = ET.fromstring(requests.get(f"{BASE_URL}/api/{path}").content)
+            locs += [l.text for l in child.findall("sm:url/sm:loc", NS)]
+        return locs
+    return [l.text for l in root.findall("sm:url/sm:loc", NS)]
+
+
+class TestSitemapPublic:
+    """Test GET /api/sitemap.xml"""
+
+    def test_sitemap_is_valid_xml(self):
+        """Test sitemap parses and lists the homepage"""
+        response = requests.get(f"{BASE_URL}/api/sitemap.xml")
+        assert response.status_code == 200
+        assert "application/xml" in response.headers.get("content-type", "")
+        assert any(loc.endswith("/") for loc in sitemap_locs())
+
+    def test_sitemap_served_gzipped_with_etag(self):
+        """Test gzip encoding and 304 on a matching ETag"""
+        response = requests.get(f"{BASE_URL}/api/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+        assert response.headers.get("content-encoding") == "gzip"
+        etag = response.headers.get("etag")
+        assert etag
+
+        cached = requests.get(f"{BASE_URL}/api/sitemap.xml", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+    def test_lastmod_is_a_date(self):
+        """Test lastmod values are W3C dates, not one shared timestamp"""
+        root = ET.fromstring(requests.get(f"{BASE_URL}/api/sitemap.xml").content)
+        for lastmod in root.iter("{%s}lastmod" % NS["sm"]):
+            assert len(lastmod.text) == 10 and lastmod.text[4] == "-"
+
+    def test_unknown_chunk_404(self):
+        """Test a chunk number past the end returns 404"""
+        response = requests.get(f"{BASE_URL}/api/sitemap-9999.xml")
+        assert response.status_code == 404
+
+
+class TestSitemapInvalidation:
+    """Test content changes reach the cached sitemap"""
+
+    @pytest.fixture(scope="class")
+    def auth_headers(self):
+        """Get authentication headers"""
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+        )
+        if response.status_code != 200:
+            pytest.skip("Authentication failed")
+        token = response.json().get("token")
+        return {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+    def test_published_page_appears_and_disappears(self, auth_headers):
+        """Test publishing and deleting a page updates the sitemap"""
+        slug = f"test-sitemap-{uuid.uuid4().hex[:8]}"
+        response = requests.post(
+            f"{BASE_URL}/api/admin/pages",
+            headers=auth_headers,
+            json={"slug": slug, "title": "Sitemap test", "published": True}
+        )
+        assert response.status_code == 200
+        page_id = response.json()["id"]
+
+        assert any(loc.endswith(f"/p/{slug}") for loc in sitemap_locs())
+
+        requests.delete(f"{BASE_URL}/api/admin/pages/{page_id}", headers=auth_headers)
+        assert not any(loc.endswith(f"/p/{slug}") for loc in sitemap_locs())
+
+    def test_sitemap_status(self, auth_headers):
+        """Test admin status reports URL counts per source"""
+        response = requests.get(f"{BASE_URL}/api/admin/seo/sitemap-status", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["urls"] == sum(data["by_source"].values())
+        assert data["files"] >= 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -5,8 +5,7 @@ import 'swiper/css';
 import 'swiper/css/pagination';
 import 'swiper/css/navigation';
 import 'swiper/css/effect-fade';
-import axios from "axios";
-import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 
 const BannerCarousel = () => {
   const [banners, setBanners] = useState([]);
@@ -17,8 +16,8 @@ const BannerCarousel = () => {
 
   const fetchBanners = async () => {
     try {
-      const response = await axios.get(`${API}/banners`);
-      setBanners(response.data);
+      const { banners } = await getBootstrap();
+      setBanners(banners || []);
     } catch (error) {
       console.error("Erro ao carregar banners:", error);
     }
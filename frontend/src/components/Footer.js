@@ -3,6 +3,7 @@ import { Facebook, Instagram, Linkedin, MessageCircle, Youtube, Twitter } from "
 import { useState, useEffect } from "react";
 import axios from "axios";
 import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 import VigiLocLogo from "./VigiLocLogo";
 
 const Footer = () => {
@@ -40,15 +41,13 @@ const Footer = () => {
 
   const fetchSettings = async () => {
     try {
-      const [siteRes, footerRes, navbarRes, categoriesRes] = await Promise.all([
-        axios.get(`${API}/site-settings`),
-        axios.get(`${API}/footer-settings`),
-        axios.get(`${API}/navbar-settings`),
+      const [bootstrap, categoriesRes] = await Promise.all([
+        getBootstrap(),
         axios.get(`${API}/categories`)
       ]);
-      setSiteSettings(siteRes.data);
-      setFooterSettings(footerRes.data);
-      setNavbarLinks(navbarRes.data.links || []);
+      setSiteSettings(bootstrap.site);
+      setFooterSettings(bootstrap.footer);
+      setNavbarLinks(bootstrap.navbar.links || []);
       setCategories(categoriesRes.data || []);
     } catch (error) {
       console.error("Erro ao carregar configurações:", error);
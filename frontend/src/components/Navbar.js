@@ -2,8 +2,7 @@ import { useState, useEffect } from "react";
 import { Link, useLocation } from "react-router-dom";
 import { Menu, X, ShoppingCart, ChevronDown } from "lucide-react";
 import { Button } from "@/components/ui/button";
-import axios from "axios";
-import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 import VigiLocLogo from "./VigiLocLogo";
 
 const Navbar = () => {
@@ -14,28 +13,19 @@ const Navbar = () => {
   const location = useLocation();
 
   useEffect(() => {
-    fetchSiteSettings();
-    fetchNavbarSettings();
+    fetchSettings();
   }, []);
 
-  const fetchSiteSettings = async () => {
+  const fetchSettings = async () => {
     try {
-      const response = await axios.get(`${API}/site-settings`);
-      setSiteSettings(response.data);
+      const { site, navbar } = await getBootstrap();
+      setSiteSettings(site);
+      setNavbarSettings(navbar);
     } catch (error) {
       console.error("Erro ao carregar configurações do site");
     }
   };
 
-  const fetchNavbarSettings = async () => {
-    try {
-      const response = await axios.get(`${API}/navbar-settings`);
-      setNavbarSettings(response.data);
-    } catch (error) {
-      console.error("Erro ao carregar configurações da navbar");
-    }
-  };
-
   const isActive = (path) => location.pathname === path;
 
   // Default links if none configured
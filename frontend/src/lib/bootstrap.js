@@ -0,0 +1,19 @@
+import axios from "axios";
+import { API } from "@/App";
+
+let bootstrapRequest = null;
+
+// Settings, menus, banners and featured reviews for the storefront shell.
+// One /bootstrap request per page load, shared by every component that asks.
+export const getBootstrap = () => {
+  if (!bootstrapRequest) {
+    bootstrapRequest = axios.get(`${API}/bootstrap`)
+      .then((response) => response.data)
+      .catch((error) => {
+        // Let the next caller retry instead of caching the failure
+        bootstrapRequest = null;
+        throw error;
+      });
+  }
+  return bootstrapRequest;
+};
@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import axios from "axios";
 import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 import { Card, CardContent } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Link } from "react-router-dom";
@@ -18,11 +19,11 @@ const About = () => {
 
   const fetchData = async () => {
     try {
-      const [settingsRes, blocksRes] = await Promise.all([
-        axios.get(`${API}/site-settings`),
+      const [bootstrap, blocksRes] = await Promise.all([
+        getBootstrap(),
         axios.get(`${API}/content-blocks/sobre`).catch(() => ({ data: [] }))
       ]);
-      setSiteSettings(settingsRes.data);
+      setSiteSettings(bootstrap.site);
       setHasCustomContent(blocksRes.data && blocksRes.data.length > 0);
     } catch (error) {
       console.error("Error fetching data:", error);
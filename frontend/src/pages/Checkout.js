@@ -11,7 +11,9 @@ import { toast } from "sonner";
 
 const Checkout = () => {
   const [cart, setCart] = useState(null);
-  const [shippingRates, setShippingRates] = useState([]);
+  const [quote, setQuote] = useState(null);
+  const [couponInput, setCouponInput] = useState("");
+  const [couponCode, setCouponCode] = useState("");
   const [formData, setFormData] = useState({
     customer_name: "",
     customer_email: "",
@@ -28,9 +30,17 @@ const Checkout = () => {
 
   useEffect(() => {
     fetchCart();
-    fetchShippingRates();
   }, []);
 
+  // Totals, coupon and shipping options come from one quote request
+  useEffect(() => {
+    if (formData.cep.replace(/\D/g, "").length !== 8) {
+      setQuote(null);
+      return;
+    }
+    fetchQuote();
+  }, [formData.cep, formData.shipping_method, couponCode]);
+
   const fetchCart = async () => {
     try {
       const sessionId = localStorage.getItem("cart_session_id");
@@ -41,17 +51,31 @@ const Checkout = () => {
     }
   };
 
-  const fetchShippingRates = async () => {
+  const fetchQuote = async () => {
     try {
-      const response = await axios.get(`${API}/shipping/rates`);
-      setShippingRates(response.data);
+      const sessionId = localStorage.getItem("cart_session_id");
+      const response = await axios.post(`${API}/checkout/quote?session_id=${sessionId}`, {
+        cep: formData.cep,
+        shipping_method: formData.shipping_method || null,
+        coupon_code: couponCode || null
+      });
+      setQuote(response.data);
+      if (couponCode && response.data.coupon_error) {
+        toast.error(response.data.coupon_error);
+        setCouponCode("");
+      }
     } catch (error) {
-      console.error("Erro ao carregar fretes:", error);
+      setQuote(null);
+      console.error("Erro ao calcular frete:", error);
     }
   };
 
   const handleSubmit = async (e) => {
     e.preventDefault();
+    if (!quote?.quote_token) {
+      toast.error("Informe o CEP e selecione o frete");
+      return;
+    }
     setLoading(true);
 
     try {
@@ -67,7 +91,8 @@ const Checkout = () => {
           cep: formData.cep
         },
         shipping_method: formData.shipping_method,
-        notes: formData.notes
+        notes: formData.notes,
+        quote_token: quote.quote_token
       };
 
       const response = await axios.post(`${API}/orders?session_id=${sessionId}`, orderData);
@@ -79,21 +104,22 @@ const Checkout = () => {
       
       navigate("/");
     } catch (error) {
-      toast.error("Erro ao finalizar pedido");
+      toast.error(error.response?.data?.detail || "Erro ao finalizar pedido");
+      fetchQuote();
     } finally {
       setLoading(false);
     }
   };
 
   const getSubtotal = () => {
+    if (quote) return quote.subtotal;
     if (!cart || !cart.items) return 0;
     return cart.items.reduce((sum, item) => sum + ((item.price || 0) * (item.quantity || 0)), 0);
   };
 
-  const getShippingCost = () => {
-    const rate = shippingRates.find(r => r.id === formData.shipping_method);
-    return rate && rate.price ? rate.price : 0;
-  };
+  const getShippingCost = () => (quote ? quote.shipping_cost : 0);
+
+  const getDiscount = () => (quote ? quote.discount : 0);
 
   return (
     <div className="min-h-screen bg-gray-50 py-16">
@@ -183,10 +209,10 @@ const Checkout = () => {
             <CardContent>
               <Select value={formData.shipping_method} onValueChange={(value) => setFormData({...formData, shipping_method: value})} required>
                 <SelectTrigger>
-                  <SelectValue placeholder="Selecione o frete" />
+                  <SelectValue placeholder={quote ? "Selecione o frete" : "Informe o CEP para calcular o frete"} />
                 </SelectTrigger>
                 <SelectContent>
-                  {shippingRates.map((rate) => (
+                  {(quote?.shipping_options || []).map((rate) => (
                     <SelectItem key={rate.id} value={rate.id}>
                       {rate.name} - R$ {(rate.price || 0).toFixed(2)} ({rate.min_days || 0}-{rate.max_days || 0} dias)
                     </SelectItem>
@@ -196,6 +222,27 @@ const Checkout = () => {
             </CardContent>
           </Card>
 
+          <Card>
+            <CardHeader>
+              <CardTitle>Cupom de Desconto</CardTitle>
+            </CardHeader>
+            <CardContent className="flex gap-2">
+              <Input
+                placeholder="Código do cupom"
+                value={couponInput}
+                onChange={(e) => setCouponInput(e.target.value.toUpperCase())}
+              />
+              <Button
+                type="button"
+                variant="outline"
+                disabled={!quote || !couponInput}
+                onClick={() => setCouponCode(couponInput.trim())}
+              >
+                Aplicar
+              </Button>
+            </CardContent>
+          </Card>
+
           <Card>
             <CardHeader>
               <CardTitle>Observações</CardTitle>
@@ -216,13 +263,19 @@ const Checkout = () => {
                   <span>Subtotal</span>
                   <span>R$ {getSubtotal().toFixed(2)}</span>
                 </div>
+                {getDiscount() > 0 && (
+                  <div className="flex justify-between text-green-600">
+                    <span>Desconto ({quote.coupon_code})</span>
+                    <span>- R$ {getDiscount().toFixed(2)}</span>
+                  </div>
+                )}
                 <div className="flex justify-between">
                   <span>Frete</span>
                   <span>R$ {getShippingCost().toFixed(2)}</span>
                 </div>
                 <div className="border-t pt-2 flex justify-between font-bold text-lg">
                   <span>Total</span>
-                  <span className="text-blue-600">R$ {(getSubtotal() + getShippingCost()).toFixed(2)}</span>
+                  <span className="text-blue-600">R$ {(getSubtotal() - getDiscount() + getShippingCost()).toFixed(2)}</span>
                 </div>
               </div>
               <Button type="submit" className="w-full" disabled={loading}>
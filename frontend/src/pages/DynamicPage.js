@@ -5,6 +5,7 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { MessageCircle, ArrowLeft, Loader2 } from "lucide-react";
 import axios from "axios";
 import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 
 // Renderizador de Hero Section
 const HeroRenderer = ({ component, whatsappNumber }) => {
@@ -333,13 +334,13 @@ const DynamicPage = () => {
         setError(null);
         
         // Buscar página e configurações do site em paralelo
-        const [pageResponse, settingsResponse] = await Promise.all([
+        const [pageResponse, bootstrap] = await Promise.all([
           axios.get(`${API}/pages/${slug}`),
-          axios.get(`${API}/site-settings`)
+          getBootstrap()
         ]);
         
         setPage(pageResponse.data);
-        setSiteSettings(settingsResponse.data);
+        setSiteSettings(bootstrap.site);
       } catch (err) {
         console.error('Error fetching page:', err);
         if (err.response?.status === 404) {
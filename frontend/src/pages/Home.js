@@ -2,6 +2,7 @@ import { useEffect, useState } from "react";
 import { Link } from "react-router-dom";
 import axios from "axios";
 import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 import { 
   MessageCircle, 
   ArrowRight, 
@@ -294,14 +295,13 @@ const Home = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [servicesRes, siteRes, homepageRes] = await Promise.all([
+        const [servicesRes, bootstrap] = await Promise.all([
           axios.get(`${API}/services`),
-          axios.get(`${API}/site-settings`),
-          axios.get(`${API}/homepage-settings`)
+          getBootstrap()
         ]);
         setServices(servicesRes.data.filter(s => s.published) || []);
-        setSiteSettings(siteRes.data || {});
-        setHomepageSettings(homepageRes.data || {});
+        setSiteSettings(bootstrap.site || {});
+        setHomepageSettings(bootstrap.homepage || {});
       } catch (error) {
         console.error("Erro ao carregar dados:", error);
       } finally {
@@ -2,6 +2,7 @@ import { useEffect, useState } from "react";
 import { useParams, Link } from "react-router-dom";
 import axios from "axios";
 import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent } from "@/components/ui/card";
 import { CheckCircle, ArrowLeft, MessageCircle, ShoppingCart } from "lucide-react";
@@ -32,8 +33,8 @@ const ProductDetail = () => {
 
   const fetchSiteSettings = async () => {
     try {
-      const response = await axios.get(`${API}/site-settings`);
-      setSiteSettings(response.data);
+      const { site } = await getBootstrap();
+      setSiteSettings(site);
     } catch (error) {
       console.error("Erro ao buscar configurações:", error);
     }
@@ -5,6 +5,7 @@ import { Card, CardContent } from "@/components/ui/card";
 import { MessageCircle, ArrowLeft, Loader2, Phone, Check, ChevronRight } from "lucide-react";
 import axios from "axios";
 import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 
 // Hero/Banner Renderer with video support
 const ServiceHero = ({ banner, service, whatsappNumber }) => {
@@ -302,13 +303,13 @@ const ServicePage = () => {
         setLoading(true);
         setError(null);
         
-        const [serviceRes, settingsRes] = await Promise.all([
+        const [serviceRes, bootstrap] = await Promise.all([
           axios.get(`${API}/services/${slug}`),
-          axios.get(`${API}/site-settings`)
+          getBootstrap()
         ]);
         
         setService(serviceRes.data);
-        setSiteSettings(settingsRes.data);
+        setSiteSettings(bootstrap.site);
       } catch (err) {
         console.error('Error fetching service:', err);
         if (err.response?.status === 404) {
@@ -5,6 +5,7 @@ import { Card, CardContent } from "@/components/ui/card";
 import { MessageCircle, ArrowRight, Loader2, Play, ChevronRight } from "lucide-react";
 import axios from "axios";
 import { API } from "@/App";
+import { getBootstrap } from "@/lib/bootstrap";
 
 // Hero Section with Video Background
 const ServicesHero = ({ siteSettings }) => {
@@ -331,13 +332,13 @@ const ServicesPage = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [servicesRes, settingsRes] = await Promise.all([
+        const [servicesRes, bootstrap] = await Promise.all([
           axios.get(`${API}/services`),
-          axios.get(`${API}/site-settings`)
+          getBootstrap()
         ]);
         
         setServices(servicesRes.data);
-        setSiteSettings(settingsRes.data);
+        setSiteSettings(bootstrap.site);
       } catch (error) {
         console.error('Error fetching data:', error);
       } finally {
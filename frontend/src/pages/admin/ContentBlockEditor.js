@@ -22,6 +22,7 @@ const ContentBlockEditor = () => {
   const navigate = useNavigate();
   const [page, setPage] = useState(null);
   const [blocks, setBlocks] = useState([]);
+  const [blocksVersion, setBlocksVersion] = useState(0);
   const [open, setOpen] = useState(false);
   const [editingBlock, setEditingBlock] = useState(null);
   const [uploading, setUploading] = useState(false);
@@ -87,8 +88,12 @@ const ContentBlockEditor = () => {
 
   const fetchBlocks = async () => {
     try {
-      const response = await axios.get(`${API}/admin/content-blocks/${pageId}`);
+      const [response, version] = await Promise.all([
+        axios.get(`${API}/admin/content-blocks/${pageId}`),
+        axios.get(`${API}/admin/content-blocks/${pageId}/version`)
+      ]);
       setBlocks(response.data.sort((a, b) => a.order - b.order));
+      setBlocksVersion(version.data.version);
     } catch (error) {
       console.error("Erro ao carregar blocos");
     }
@@ -166,15 +171,23 @@ const ContentBlockEditor = () => {
     }
 
     const newIndex = direction === "up" ? currentIndex - 1 : currentIndex + 1;
-    const newOrder = blocks[newIndex].order;
+    const ordered = [...blocks];
+    [ordered[currentIndex], ordered[newIndex]] = [ordered[newIndex], ordered[currentIndex]];
 
     try {
-      await axios.put(`${API}/admin/content-blocks/${blockId}/reorder?new_order=${newOrder}`);
+      await axios.post(`${API}/admin/content-blocks/${pageId}/bulk`, {
+        expected_version: blocksVersion,
+        order: ordered.map(b => b.id)
+      });
       toast.success("Ordem atualizada!");
-      fetchBlocks();
     } catch (error) {
-      toast.error("Erro ao reordenar");
+      if (error.response?.status === 409) {
+        toast.error("A página foi alterada em outra aba. Blocos recarregados.");
+      } else {
+        toast.error("Erro ao reordenar");
+      }
     }
+    fetchBlocks();
   };
 
   const resetForm = () => {
@@ -20,6 +20,9 @@ const Shipping = () => {
     price: 0,
     min_days: 0,
     max_days: 0,
+    regions: "",
+    price_per_kg: 0,
+    weight_brackets: null,
     active: true
   });
 
@@ -39,19 +42,24 @@ const Shipping = () => {
   const handleSubmit = async (e) => {
     e.preventDefault();
 
+    const payload = {
+      ...formData,
+      regions: formData.regions.split(",").map((r) => r.trim()).filter(Boolean)
+    };
+
     try {
       if (editingRate) {
-        await axios.put(`${API}/admin/shipping/rates/${editingRate.id}`, formData);
+        await axios.put(`${API}/admin/shipping/rates/${editingRate.id}`, payload);
         toast.success("Taxa atualizada com sucesso");
       } else {
-        await axios.post(`${API}/admin/shipping/rates`, formData);
+        await axios.post(`${API}/admin/shipping/rates`, payload);
         toast.success("Taxa criada com sucesso");
       }
       setOpen(false);
       resetForm();
       fetchRates();
     } catch (error) {
-      toast.error("Erro ao salvar taxa");
+      toast.error(error.response?.data?.detail || "Erro ao salvar taxa");
     }
   };
 
@@ -63,6 +71,9 @@ const Shipping = () => {
       price: rate.price || 0,
       min_days: rate.min_days || 0,
       max_days: rate.max_days || 0,
+      regions: (rate.regions || []).join(", "),
+      price_per_kg: rate.price_per_kg || 0,
+      weight_brackets: rate.weight_brackets || null,
       active: rate.active !== undefined ? rate.active : true
     });
     setOpen(true);
@@ -87,6 +98,9 @@ const Shipping = () => {
       price: 0,
       min_days: 0,
       max_days: 0,
+      regions: "",
+      price_per_kg: 0,
+      weight_brackets: null,
       active: true
     });
     setEditingRate(null);
@@ -143,6 +157,33 @@ const Shipping = () => {
                 />
               </div>
 
+              {formData.type === "cep" && (
+                <>
+                  <div>
+                    <label className="block text-sm font-medium mb-2">Regiões de CEP</label>
+                    <Input
+                      required
+                      value={formData.regions}
+                      onChange={(e) => setFormData({ ...formData, regions: e.target.value })}
+                      placeholder="Ex: 01, 04500-000:04599-999, 20:28"
+                    />
+                    <p className="text-xs text-gray-500 mt-1">
+                      Prefixos, CEPs ou faixas (início:fim), separados por vírgula
+                    </p>
+                  </div>
+
+                  <div>
+                    <label className="block text-sm font-medium mb-2">Adicional por kg</label>
+                    <Input
+                      type="number"
+                      step="0.01"
+                      value={formData.price_per_kg}
+                      onChange={(e) => setFormData({ ...formData, price_per_kg: parseFloat(e.target.value) || 0 })}
+                    />
+                  </div>
+                </>
+              )}
+
               <div className="grid grid-cols-2 gap-4">
                 <div>
                   <label className="block text-sm font-medium mb-2">Dias Mín</label>
@@ -13,6 +13,7 @@ import { Badge } from "@/components/ui/badge";
 
 const Payments = () => {
   const [payments, setPayments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [customers, setCustomers] = useState([]);
   const [filterStatus, setFilterStatus] = useState("all");
   const [open, setOpen] = useState(false);
@@ -24,11 +25,14 @@ const Payments = () => {
     fetchCustomers();
   }, [filterStatus]);
 
-  const fetchPayments = async () => {
+  const fetchPayments = async (cursor = null) => {
     try {
-      const url = filterStatus === "all" ? `${API}/admin/payments` : `${API}/admin/payments?status=${filterStatus}`;
-      const response = await axios.get(url);
-      setPayments(response.data);
+      const params = { order: "desc" };
+      if (filterStatus !== "all") params.status = filterStatus;
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API}/admin/payments/queue`, { params });
+      setPayments(cursor ? [...payments, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error("Erro ao carregar pagamentos");
     }
@@ -162,6 +166,13 @@ const Payments = () => {
               ))}
             </TableBody>
           </Table>
+          {nextCursor && (
+            <div className="flex justify-center mt-4">
+              <Button variant="outline" onClick={() => fetchPayments(nextCursor)}>
+                Carregar mais
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
 
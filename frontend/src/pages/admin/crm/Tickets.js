@@ -13,6 +13,7 @@ import { Badge } from "@/components/ui/badge";
 
 const Tickets = () => {
   const [tickets, setTickets] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [customers, setCustomers] = useState([]);
   const [equipment, setEquipment] = useState([]);
   const [open, setOpen] = useState(false);
@@ -34,11 +35,16 @@ const Tickets = () => {
     fetchEquipment();
   }, [filterStatus]);
 
-  const fetchTickets = async () => {
+  const fetchTickets = async (cursor = null) => {
     try {
-      const url = filterStatus === "all" ? `${API}/admin/tickets` : `${API}/admin/tickets?status=${filterStatus}`;
-      const response = await axios.get(url);
-      setTickets(response.data);
+      const params = {
+        status: filterStatus === "all" ? "open,in_progress,resolved,closed" : filterStatus,
+        sort: "priority"
+      };
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API}/admin/tickets/queue`, { params });
+      setTickets(cursor ? [...tickets, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error("Erro ao carregar chamados");
     }
@@ -296,6 +302,13 @@ const Tickets = () => {
               ))}
             </TableBody>
           </Table>
+          {nextCursor && (
+            <div className="flex justify-center mt-4">
+              <Button variant="outline" onClick={() => fetchTickets(nextCursor)}>
+                Carregar mais
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>